@@ -8,8 +8,10 @@ from app.analysis.risk_monitor import RiskMonitor
 from app.analysis.scenario_predictor import ScenarioPredictor
 from app.analysis.news_fetcher import NewsFetcher
 from app.analysis.index_industry_analyzer import IndexIndustryAnalyzer
+from app.analysis.industry_board_history import IndustryBoardHistory
 from app.analysis.fundamental_analyzer import FundamentalAnalyzer
 from app.analysis.task_manager import TaskManager
+from app.analysis.task_queue import TaskQueue
 from app.analysis.stock_qa import StockQA
 from app.core._core_container import CoreContainer
 
@@ -24,7 +26,9 @@ class AnalysisContainer(containers.DeclarativeContainer):
     redis_client = providers.Singleton(_core_container.redis_cache)
 
     capital_flow_analyzer = providers.Singleton(CapitalFlowAnalyzer, cache=cache)
-    industry_analyzer = providers.Singleton(IndustryAnalyzer)
+    # 行业板块历史缓存，两个行业分析器共用
+    industry_board_history = providers.Singleton(IndustryBoardHistory)
+    industry_analyzer = providers.Singleton(IndustryAnalyzer, board_history=industry_board_history)
     
     stock_analyzer = providers.Singleton(StockAnalyzer, cache=cache)
 
@@ -33,7 +37,8 @@ class AnalysisContainer(containers.DeclarativeContainer):
     scenario_predictor = providers.Singleton(ScenarioPredictor,analyzer=stock_analyzer)
 
     news_fetcher = providers.Singleton(NewsFetcher)
-    index_industry_analyzer = providers.Singleton(IndexIndustryAnalyzer)
+    index_industry_analyzer = providers.Singleton(IndexIndustryAnalyzer, analyzer=stock_analyzer,
+                                                  board_history=industry_board_history)
     fundamental_analyzer = providers.Singleton(FundamentalAnalyzer, cache=cache)
     stock_qa = providers.Singleton(StockQA, stock_analyzer=stock_analyzer, cache=cache)
 
@@ -41,3 +46,4 @@ class AnalysisContainer(containers.DeclarativeContainer):
 
 
     task_manager = providers.Singleton(TaskManager, redis_client=redis_client)
+    task_queue = providers.Singleton(TaskQueue, task_manager=task_manager)
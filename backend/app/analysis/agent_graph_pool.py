@@ -0,0 +1,100 @@
+# app/analysis/agent_graph_pool.py
+"""
+智能体分析图实例池
+
+TradingAgentsGraph 的构建开销主要在 LLM 客户端、五个 FinancialSituationMemory（ChromaDB 集合）、
+Toolkit、工具节点和 LangGraph 编译上，与具体股票无关。按配置缓存已构建的实例，
+相同配置的任务直接复用；每次 propagate 的运行状态只保存在调用栈中，同一实例可被并发任务共用。
+
+键包含分析师列表、调试标志和完整配置（模型供应商、模型、记忆开关、输出长度等），
+任一项不同都会构建新实例；超过 AGENT_GRAPH_POOL_SIZE 时淘汰最久未使用的实例，
+正在使用该实例的任务不受影响。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def _build_trading_graph(selected_analysts, config, debug):
+    from tradingagents.graph.trading_graph import TradingAgentsGraph
+    return TradingAgentsGraph(selected_analysts=list(selected_analysts), debug=debug, config=config)
+
+
+class AgentGraphPool:
+    """按配置复用 TradingAgentsGraph 实例的 LRU 池（线程安全）"""
+
+    def __init__(self, max_size: Optional[int] = None, factory: Optional[Callable] = None):
+        self.max_size = max_size or int(os.getenv('AGENT_GRAPH_POOL_SIZE', 4))
+        self._factory = factory or _build_trading_graph
+        self._graphs: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每个键一把构建锁：相同配置并发请求时只构建一次，不同配置可并行构建
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(selected_analysts: Sequence[str], config: Dict, debug: bool = False) -> str:
+        """配置键：分析师顺序会影响串行模式的图结构，因此保留顺序"""
+        return json.dumps({'analysts': list(selected_analysts), 'debug': bool(debug), 'config': config},
+                          sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, selected_analysts: Sequence[str], config: Dict, debug: bool = False):
+        """获取（必要时构建）与配置对应的 TradingAgentsGraph"""
+        key = self.make_key(selected_analysts, config, debug)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                return graph
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                graph = self._graphs.get(key)
+                if graph is not None:
+                    self._graphs.move_to_end(key)
+                    self.hits += 1
+                    return graph
+                self.misses += 1
+
+            start = time.perf_counter()
+            graph = self._factory(list(selected_analysts), dict(config), debug)
+            logger.info(f"构建智能体分析图: analysts={list(selected_analysts)}, "
+                        f"provider={config.get('llm_provider')}, 耗时 {time.perf_counter() - start:.2f}s")
+
+            with self._lock:
+                self._graphs[key] = graph
+                while len(self._graphs) > self.max_size:
+                    evicted, _ = self._graphs.popitem(last=False)
+                    self._build_locks.pop(evicted, None)
+                self._build_locks.pop(key, None)
+            return graph
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._graphs), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+_agent_graph_pool: Optional[AgentGraphPool] = None
+_agent_graph_pool_lock = threading.Lock()
+
+
+def get_agent_graph_pool() -> AgentGraphPool:
+    """获取进程内共享的智能体分析图实例池"""
+    global _agent_graph_pool
+    with _agent_graph_pool_lock:
+        if _agent_graph_pool is None:
+            _agent_graph_pool = AgentGraphPool()
+        return _agent_graph_pool
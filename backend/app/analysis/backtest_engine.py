@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+智能分析系统（股票） - 股票市场数据分析系统
+回测引擎：在完整历史上回放 calculate_score / get_recommendation 的信号
+
+- 指标与评分由 BatchIndicatorEngine 对整段历史一次算出 (N, T)，每根K线的评分等价于
+  在当天收盘时调用 calculate_score，不再逐日重算指标
+- 交易动作按 get_recommendation 的评分阈值与技术面调整向量化生成；
+  美股财报季、港股大陆情绪、新闻情绪依赖当前时点的数据，无法回放，不参与
+- 逐根K线推进持仓时对 N 只股票同时计算：按 calculate_position_size 的风险公式定仓位，
+  止损（盘中最低价触及止损价按止损价或开盘价成交）、check_profit_taking 的分批止盈、
+  check_consecutive_losses 的连续亏损冷静期，以及按换手计的交易成本
+- 股票按批分配到多个进程；参数调优把「参数组合 × 股票批次」作为独立任务并行执行
+
+信号在收盘时产生并以收盘价成交，当天的收益属于前一天收盘后的持仓，不使用未来数据。
+
+命令行（使用本地行情库 HISTORY_STORE_DIR 中已保存的历史，不访问数据源）：
+    python -m app.analysis.backtest_engine --symbols 600000,000001 --processes 4
+    python -m app.analysis.backtest_engine --all --tune rsi_period=10,14,20 --tune ma_periods.short=5,10
+"""
+# backtest_engine.py
+import argparse
+import copy
+import glob
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.analysis.batch_indicator_engine import BatchIndicatorEngine, OHLCVPanel, DEFAULT_PARAMS
+
+TRADING_DAYS = 252
+
+# get_recommendation 的动作，按看多程度排序
+SELL, REDUCE, CAUTIOUS_HOLD, HOLD, CAUTIOUS_BUY, BUY, STRONG_BUY = range(7)
+ACTION_NAMES = ('sell', 'reduce', 'cautious_hold', 'hold', 'cautious_buy', 'buy', 'strong_buy')
+
+
+@dataclass(frozen=True)
+class BacktestStrategy:
+    """
+    回测策略
+
+    entry_score 为 None 时按 get_recommendation 的动作交易：strong_buy/buy 建满仓位，
+    cautious_buy 至少建 cautious_buy_scale 仓位，reduce 减到不超过 reduce_scale 仓位，sell 清仓，
+    hold/cautious_hold 不动；否则为评分阈值策略：评分 >= entry_score 建满仓位，< exit_score 清仓。
+    """
+    name: str = 'recommendation'
+    entry_score: Optional[float] = None
+    exit_score: float = 45
+    cautious_buy_scale: float = 0.5
+    reduce_scale: float = 0.5
+    # 仓位：risk_percent / stop_loss_percent × 波动率因子（与 calculate_position_size 相同）
+    risk_percent: float = 2.0
+    stop_loss_percent: float = 5.0
+    max_position: float = 1.0
+    # 止盈：浮盈达到 profit_take_percent 时减仓 profit_take_fraction（每笔交易一次）
+    profit_take_percent: float = 20.0
+    profit_take_fraction: float = 0.5
+    # 连续亏损 max_consecutive_losses 笔后暂停开仓 cooldown_bars 根K线
+    max_consecutive_losses: int = 3
+    cooldown_bars: int = 10
+    # 单边交易成本（佣金 + 滑点），按换手比例扣除
+    fee_rate: float = 0.0005
+
+
+DEFAULT_STRATEGIES = (
+    BacktestStrategy(),
+    BacktestStrategy(name='score_70_45', entry_score=70, exit_score=45),
+)
+
+
+def recommendation_actions(scores, ind, market_type='A'):
+    """
+    get_recommendation 的动作（向量化），返回 (N, T) 的动作编码
+
+    依次应用：评分阈值 → A股高波动时 buy 降为 cautious_buy → RSI 超买/超卖 → MACD 金叉/死叉
+    """
+    action = np.select(
+        [scores >= 85, scores >= 70, scores >= 55, scores >= 45, scores >= 30, scores >= 15],
+        [STRONG_BUY, BUY, CAUTIOUS_BUY, HOLD, CAUTIOUS_HOLD, REDUCE], default=SELL)
+    buying = (action == BUY) | (action == STRONG_BUY)
+    if market_type == 'A':
+        action = np.where(buying & (ind['Volatility'] > 4.0), CAUTIOUS_BUY, action)
+
+    rsi = ind['RSI']
+    buying = (action == BUY) | (action == STRONG_BUY)
+    selling = (action == SELL) | (action == REDUCE)
+    action = np.where(buying & (rsi > 80), HOLD, action)
+    action = np.where(selling & (rsi < 20), HOLD, action)
+
+    bullish = ind['MACD'] > ind['Signal']
+    action = np.where(bullish & ((action == HOLD) | (action == CAUTIOUS_HOLD)), CAUTIOUS_BUY, action)
+    action = np.where(~bullish & ((action == CAUTIOUS_BUY) | (action == BUY)), HOLD, action)
+    return action
+
+
+def position_sizes(ind, strategy):
+    """每根K线的满仓位（占该股票资金的比例），波动率越高仓位越小"""
+    vol = ind['Volatility']
+    factor = np.select([vol > 4.0, vol > 2.5, vol < 1.0], [0.6, 0.8, 1.2], default=1.0)
+    size = strategy.risk_percent / strategy.stop_loss_percent * factor
+    # 波动率尚未算出（历史不足）时不开仓
+    return np.where(np.isfinite(vol), np.minimum(size, strategy.max_position), 0.0)
+
+
+def _target_rules(scores, actions, strategy):
+    """
+    把信号转换为目标仓位规则，返回 (下限, 上限) 两个 (N, T) 数组，单位为满仓位的倍数
+
+    新仓位 = clip(当前仓位, 下限, 上限)；下限 0、上限 inf 表示不动
+    """
+    if strategy.entry_score is not None:
+        floor = np.where(scores >= strategy.entry_score, 1.0, 0.0)
+        cap = np.where(scores < strategy.exit_score, 0.0, np.inf)
+        return floor, cap
+    floor = np.select([actions >= BUY, actions == CAUTIOUS_BUY], [1.0, strategy.cautious_buy_scale], default=0.0)
+    cap = np.select([actions == SELL, actions == REDUCE], [0.0, strategy.reduce_scale], default=np.inf)
+    return floor, cap
+
+
+def simulate(ind, scores, actions, strategy):
+    """
+    逐根K线推进所有股票的持仓（股票维度向量化）
+
+    Returns:
+        dict: returns / exposure / turnover 为 (N, T) 数组，trades / wins 为 (N,) 数组
+    """
+    close, high, low, open_ = ind['close'], ind['high'], ind['low'], ind['open']
+    n, t_count = close.shape
+    size = position_sizes(ind, strategy)
+    floor, cap = _target_rules(scores, actions, strategy)
+
+    returns = np.zeros((n, t_count))
+    exposure_rec = np.zeros((n, t_count))
+    turnover = np.zeros((n, t_count))
+    trades = np.zeros(n, dtype=int)
+    wins = np.zeros(n, dtype=int)
+
+    exposure = np.zeros(n)
+    entry_price = np.full(n, np.nan)
+    stop_price = np.full(n, np.nan)
+    took_profit = np.zeros(n, dtype=bool)
+    losses = np.zeros(n, dtype=int)
+    cooldown_until = np.full(n, -1)
+
+    def close_trades(mask, exit_price):
+        nonlocal losses
+        won = mask & (exit_price > entry_price)
+        lost = mask & ~won
+        trades[mask] += 1
+        wins[won] += 1
+        losses = np.where(won, 0, losses + lost)
+        hit = lost & (losses >= strategy.max_consecutive_losses)
+        cooldown_until[hit] = t + strategy.cooldown_bars
+        losses[hit] = 0
+        entry_price[mask] = np.nan
+        stop_price[mask] = np.nan
+        took_profit[mask] = False
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for t in range(1, t_count):
+            prev_close, price = close[:, t - 1], close[:, t]
+            active = np.isfinite(prev_close) & np.isfinite(price)
+            held = active & (exposure > 0)
+
+            # 1. 止损：盘中最低价触及止损价，以止损价（跳空低开则以开盘价）离场
+            stopped = held & (low[:, t] <= stop_price)
+            stop_fill = np.where(np.isfinite(open_[:, t]), np.minimum(open_[:, t], stop_price), stop_price)
+            bar_return = np.where(stopped, stop_fill, price) / prev_close - 1
+            day_return = np.where(held, exposure * bar_return, 0.0)
+            # 持仓随价格漂移后的仓位比例
+            drifted = np.where(held, exposure * (1 + bar_return) / (1 + day_return), exposure)
+            if stopped.any():
+                turnover[stopped, t] += drifted[stopped]
+                close_trades(stopped, stop_fill)
+                drifted = np.where(stopped, 0.0, drifted)
+
+            # 2. 收盘时按信号调整仓位
+            base = size[:, t]
+            upper = np.where(np.isinf(cap[:, t]), np.inf, cap[:, t] * base)
+            target = np.clip(drifted, floor[:, t] * base, upper)
+            # 冷静期内、当天止损的股票不开新仓
+            blocked = (cooldown_until >= t) | stopped | ~active
+            target = np.where(blocked & (target > drifted), drifted, target)
+
+            # 3. 分批止盈
+            profit = price / entry_price - 1
+            take = (target > 0) & ~took_profit & (profit * 100 >= strategy.profit_take_percent) & active
+            target = np.where(take, np.minimum(target, drifted * (1 - strategy.profit_take_fraction)), target)
+            took_profit |= take
+
+            # 4. 成交
+            change = np.abs(target - drifted)
+            opened = (drifted == 0) & (target > 0)
+            exited = (drifted > 0) & (target == 0) & ~stopped
+            if exited.any():
+                close_trades(exited, price)
+            entry_price[opened] = price[opened]
+            stop_price[opened] = price[opened] * (1 - strategy.stop_loss_percent / 100)
+
+            turnover[:, t] += change
+            returns[:, t] = day_return - (turnover[:, t]) * strategy.fee_rate
+            exposure = target
+            exposure_rec[:, t] = exposure
+
+    return {'returns': returns, 'exposure': exposure_rec, 'turnover': turnover, 'trades': trades, 'wins': wins}
+
+
+class _DateGrid:
+    """把 (N, T) 数组（各股票右对齐、日期不同）展开为「日期 × 股票代码」的 DataFrame，无数据处为 NaN"""
+
+    def __init__(self, panel, valid):
+        self.symbols = panel.symbols
+        self.valid = valid
+        dates = panel.dates[valid]
+        self.index = np.unique(dates)
+        self.rows = np.searchsorted(self.index, dates)
+        self.cols = np.nonzero(valid)[0]
+
+    def frame(self, values):
+        out = np.full((len(self.index), len(self.symbols)), np.nan)
+        out[self.rows, self.cols] = values[self.valid]
+        return pd.DataFrame(out, index=pd.DatetimeIndex(self.index), columns=self.symbols)
+
+
+def _run_chunk(frames, params, strategies, market_type):
+    """
+    回测一批股票（在工作进程中执行）
+
+    Returns:
+        {策略名: {'returns', 'exposure', 'turnover': DataFrame(日期 × 股票), 'trades', 'wins': Series}}，
+        另含 'benchmark'（等权持有不动）
+    """
+    engine = BatchIndicatorEngine(params)
+    panel = OHLCVPanel.from_frames(frames)
+    if not panel.symbols:
+        return {}
+    ind = engine.calculate_indicators(panel)
+    scores = engine.calculate_scores(ind, market_type, latest_only=False)
+    actions = recommendation_actions(scores, ind, market_type)
+    # 第一根K线没有收益
+    grid = _DateGrid(panel, (ind['bars'] >= 2) & np.isfinite(panel.close))
+
+    results = {}
+    for strategy in strategies:
+        sim = simulate(ind, scores, actions, strategy)
+        results[strategy.name] = {
+            'returns': grid.frame(sim['returns']),
+            'exposure': grid.frame(sim['exposure']),
+            'turnover': grid.frame(sim['turnover']),
+            'trades': pd.Series(sim['trades'], index=panel.symbols),
+            'wins': pd.Series(sim['wins'], index=panel.symbols),
+        }
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hold_returns = panel.close / np.concatenate([panel.close[:, :1], panel.close[:, :-1]], axis=1) - 1
+    results['benchmark'] = {
+        'returns': grid.frame(hold_returns),
+        'exposure': grid.frame(np.ones(panel.shape)),
+        'turnover': grid.frame(np.zeros(panel.shape)),
+        'trades': pd.Series(0, index=panel.symbols),
+        'wins': pd.Series(0, index=panel.symbols),
+    }
+    return results
+
+
+def summarize(parts):
+    """
+    汇总一个策略在所有股票上的结果：每只股票分配相同资金，组合日收益为当天有行情的股票的平均收益
+
+    Returns:
+        dict: 组合收益、年化、波动率、夏普、最大回撤、年化换手、交易次数、胜率及每只股票的收益与回撤；
+        没有任何股票的结果（未提供股票或行情都太短）时为 {"error": ...}
+    """
+    if not parts:
+        return {"error": "没有可回测的数据"}
+    returns = pd.concat([p['returns'] for p in parts], axis=1).sort_index()
+    exposure = pd.concat([p['exposure'] for p in parts], axis=1).sort_index()
+    turnover = pd.concat([p['turnover'] for p in parts], axis=1).sort_index()
+    trades = pd.concat([p['trades'] for p in parts])
+    wins = pd.concat([p['wins'] for p in parts])
+    if returns.empty:
+        return {"error": "没有可回测的数据"}
+
+    daily = returns.mean(axis=1).fillna(0.0)
+    equity = (1 + daily).cumprod()
+    periods = len(daily)
+    std = daily.std(ddof=1)
+
+    symbol_equity = (1 + returns.fillna(0.0)).cumprod()
+    symbol_drawdown = (symbol_equity / symbol_equity.cummax() - 1).min()
+    per_symbol = {
+        code: {"total_return": float((symbol_equity[code].iloc[-1] - 1) * 100),
+               "max_drawdown": float(symbol_drawdown[code] * 100),
+               "trades": int(trades.get(code, 0))}
+        for code in returns.columns
+    }
+    return {
+        "start_date": daily.index[0].strftime('%Y-%m-%d'),
+        "end_date": daily.index[-1].strftime('%Y-%m-%d'),
+        "symbols": returns.shape[1],
+        "total_return": float((equity.iloc[-1] - 1) * 100),
+        "annual_return": float((equity.iloc[-1] ** (TRADING_DAYS / periods) - 1) * 100),
+        "annual_volatility": float(std * np.sqrt(TRADING_DAYS) * 100),
+        "sharpe": float(daily.mean() / std * np.sqrt(TRADING_DAYS)) if std > 0 else 0.0,
+        "max_drawdown": float((equity / equity.cummax() - 1).min() * 100),
+        # 年化换手：每年买卖的仓位合计相当于资金的倍数
+        "annual_turnover": float(turnover.mean(axis=1).fillna(0.0).sum() * TRADING_DAYS / periods),
+        "average_exposure": float(exposure.mean(axis=1).mean() * 100),
+        "trades": int(trades.sum()),
+        "win_rate": float(wins.sum() / trades.sum() * 100) if trades.sum() else 0.0,
+        "per_symbol": per_symbol
+    }
+
+
+def _set_param(params, key, value):
+    """按点号路径设置参数，如 'ma_periods.short'"""
+    target = params
+    parts = key.split('.')
+    for part in parts[:-1]:
+        target = target[part]
+    target[parts[-1]] = value
+
+
+class BacktestEngine:
+    """
+    多进程回测引擎
+
+    股票按 chunk_size 分批，每批在一个进程中计算指标并回测所有策略；
+    processes 为 1 时在当前进程中执行。
+    """
+
+    def __init__(self, params: Optional[Dict] = None, market_type: str = 'A',
+                 processes: Optional[int] = None, chunk_size: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.params = copy.deepcopy(params or DEFAULT_PARAMS)
+        self.market_type = market_type
+        self.processes = processes or int(os.getenv('BACKTEST_PROCESSES', os.cpu_count() or 1))
+        self.chunk_size = chunk_size or int(os.getenv('BACKTEST_CHUNK_SIZE', 50))
+
+    def _chunks(self, frames):
+        codes = list(frames)
+        for start in range(0, len(codes), self.chunk_size):
+            yield {code: frames[code] for code in codes[start:start + self.chunk_size]}
+
+    def _map(self, jobs):
+        """执行 [(frames, params, strategies, market_type)]，按提交顺序返回结果"""
+        if self.processes <= 1 or len(jobs) <= 1:
+            return [_run_chunk(*job) for job in jobs]
+        # 与任务队列工作进程一致使用 spawn，避免在多线程的 Web 进程中 fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(self.processes, len(jobs)), mp_context=context) as pool:
+            return list(pool.map(_run_chunk, *zip(*jobs)))
+
+    def run(self, frames: Dict[str, pd.DataFrame], strategies=DEFAULT_STRATEGIES) -> Dict:
+        """
+        回测多个策略
+
+        Args:
+            frames: {股票代码: 含 date/open/high/low/close/volume 的历史行情}
+            strategies: BacktestStrategy 序列
+        Returns:
+            {策略名: summarize 结果}，另含 'benchmark'（等权持有不动）
+        """
+        strategies = tuple(strategies)
+        jobs = [(chunk, self.params, strategies, self.market_type) for chunk in self._chunks(frames)]
+        chunk_results = self._map(jobs)
+        names = [s.name for s in strategies] + ['benchmark']
+        return {name: summarize([r[name] for r in chunk_results if name in r]) for name in names}
+
+    def tune(self, frames: Dict[str, pd.DataFrame], param_grid: Dict[str, List],
+             strategy: BacktestStrategy = DEFAULT_STRATEGIES[0], metric: str = 'sharpe', top: int = 10) -> List[Dict]:
+        """
+        参数网格搜索（StockAnalyzer.params 的指标参数）
+
+        Args:
+            param_grid: {参数路径: 候选值列表}，嵌套参数用点号，如 {'ma_periods.short': [5, 10]}
+            metric: 排序依据（summarize 结果中的字段，越大越好）
+            top: 返回前几组
+        Returns:
+            [{'params': 参数覆盖, 'metrics': 不含 per_symbol 的汇总}]，按 metric 降序
+        """
+        keys = list(param_grid)
+        combos = [dict(zip(keys, values)) for values in itertools.product(*(param_grid[k] for k in keys))]
+        chunks = list(self._chunks(frames))
+
+        jobs, owners = [], []
+        for index, combo in enumerate(combos):
+            params = copy.deepcopy(self.params)
+            for key, value in combo.items():
+                _set_param(params, key, value)
+            for chunk in chunks:
+                jobs.append((chunk, params, (strategy,), self.market_type))
+                owners.append(index)
+        self.logger.info(f"参数调优: {len(combos)} 组参数 × {len(chunks)} 批股票")
+
+        grouped = [[] for _ in combos]
+        for index, result in zip(owners, self._map(jobs)):
+            if strategy.name in result:
+                grouped[index].append(result[strategy.name])
+
+        ranked = []
+        for combo, parts in zip(combos, grouped):
+            metrics = summarize(parts)
+            metrics.pop('per_symbol', None)
+            ranked.append({'params': combo, 'metrics': metrics})
+        ranked.sort(key=lambda item: item['metrics'].get(metric, float('-inf')), reverse=True)
+        return ranked[:top]
+
+
+def load_frames(symbols=None, market_type='A', base_dir=None):
+    """从本地行情库读取历史（不访问数据源），symbols 为 None 时读取该市场的全部股票"""
+    from app.core.history_store import PriceHistoryStore
+
+    store = PriceHistoryStore(fetcher=None, base_dir=base_dir)
+    if symbols is None:
+        pattern = os.path.join(store.base_dir, market_type, '*.bin')
+        symbols = sorted(os.path.basename(path)[:-len('.bin')] for path in glob.glob(pattern))
+    frames = {}
+    for code in symbols:
+        df, _ = store.load(code, market_type)
+        if df is not None and not df.empty:
+            frames[code] = df
+    return frames
+
+
+def _parse_grid(values):
+    grid = {}
+    for item in values or []:
+        key, _, options = item.partition('=')
+        grid[key] = [json.loads(option) for option in options.split(',')]
+    return grid
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest StockAnalyzer signals over stored history.')
+    parser.add_argument('--symbols', help='comma separated stock codes')
+    parser.add_argument('--all', action='store_true', help='use every symbol in the local history store')
+    parser.add_argument('--market', default='A')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--tune', action='append', metavar='PARAM=V1,V2', help='parameter grid, repeatable')
+    parser.add_argument('--metric', default='sharpe')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    symbols = None if args.all else [s for s in (args.symbols or '').split(',') if s]
+    history = load_frames(symbols, args.market)
+    engine = BacktestEngine(market_type=args.market, processes=args.processes)
+    if args.tune:
+        output = engine.tune(history, _parse_grid(args.tune), metric=args.metric)
+    else:
+        output = {name: {k: v for k, v in summary.items() if k != 'per_symbol'}
+                  for name, summary in engine.run(history).items()}
+    print(json.dumps(output, ensure_ascii=False, indent=2))
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+智能分析系统（股票） - 股票市场数据分析系统
+批量技术指标引擎：一次向量化计算 N 只股票的全部指标与评分
+"""
+# batch_indicator_engine.py
+import logging
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 与 StockAnalyzer.params 保持一致的默认参数
+DEFAULT_PARAMS = {
+    'ma_periods': {'short': 5, 'medium': 20, 'long': 60},
+    'rsi_period': 14,
+    'bollinger_period': 20,
+    'bollinger_std': 2,
+    'volume_ma_period': 20,
+    'atr_period': 14
+}
+
+# 与 StockAnalyzer.format_indicator_data 保持一致的小数位
+ROUND_DECIMALS = {
+    'MA5': 2, 'MA20': 2, 'MA60': 2,
+    'BB_upper': 2, 'BB_middle': 2, 'BB_lower': 2,
+    'MACD': 3, 'Signal': 3, 'MACD_hist': 3,
+    'RSI': 2, 'Volatility': 2, 'ROC': 2, 'Volume_Ratio': 2
+}
+
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+@dataclass
+class OHLCVPanel:
+    """
+    N 只股票的 OHLCV 面板，每个字段为 (N, T) 的二维数组
+
+    各股票按K线序号右对齐：最后一列为每只股票的最新K线，历史不足 T 根的
+    股票在左侧以 NaN 填充。这样停牌日不会在序列中间留下空洞，指标结果与
+    逐只调用 StockAnalyzer.calculate_indicators 一致。
+    """
+    symbols: List[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    dates: Optional[np.ndarray] = None
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], lookback: Optional[int] = None):
+        """
+        由 {股票代码: DataFrame} 构建面板
+
+        参数:
+            frames: get_stock_data 返回的数据帧，需包含 open/high/low/close/volume 列
+            lookback: 每只股票保留的最近K线数量，None 表示保留全部
+        """
+        symbols = [code for code, df in frames.items() if df is not None and not df.empty]
+        lengths = [len(frames[code]) for code in symbols]
+        width = max(lengths) if lengths else 0
+        if lookback is not None:
+            width = min(width, lookback)
+
+        arrays = {field: np.full((len(symbols), width), np.nan) for field in PANEL_FIELDS}
+        dates = np.full((len(symbols), width), np.datetime64('NaT', 'ns'), dtype='datetime64[ns]')
+
+        for i, code in enumerate(symbols):
+            df = frames[code].iloc[-width:] if width else frames[code].iloc[0:0]
+            n = len(df)
+            if n == 0:
+                continue
+            for field in PANEL_FIELDS:
+                arrays[field][i, width - n:] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=float)
+            if 'date' in df.columns:
+                dates[i, width - n:] = pd.to_datetime(df['date'], errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+        return cls(symbols=symbols, dates=dates, **arrays)
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """沿时间轴计算 EMA，等价于 Series.ewm(span=span, adjust=False).mean()"""
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(values)
+    prev = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        step = alpha * x + (1.0 - alpha) * prev
+        # 首个有效值直接作为初值；缺失值沿用上一期结果
+        step = np.where(np.isnan(prev), x, step)
+        prev = np.where(np.isnan(x), prev, step)
+        out[:, t] = np.where(np.isnan(x), np.nan, prev)
+    return out
+
+
+def _rolling(values: np.ndarray, window: int, func: str = 'mean') -> np.ndarray:
+    """
+    沿时间轴计算滚动均值/标准差，窗口内存在 NaN 时结果为 NaN（与 pandas 默认 min_periods 一致）
+
+    采用与 pandas 相同的在线算法（均值为补偿求和，标准差为 Welford 增量），
+    保证取整到两位小数后与 Series.rolling 的结果逐位一致。
+    """
+    if func not in ('mean', 'std'):
+        raise ValueError(f"不支持的滚动函数: {func}")
+
+    n_rows, n_cols = values.shape
+    out = np.full(values.shape, np.nan)
+    nobs = np.zeros(n_rows)
+    neg_count = np.zeros(n_rows)
+    total = np.zeros(n_rows)
+    comp_add = np.zeros(n_rows)
+    comp_remove = np.zeros(n_rows)
+    ssqdm = np.zeros(n_rows)
+    same_count = np.zeros(n_rows)
+    prev_value = np.full(n_rows, np.nan)
+
+    for t in range(n_cols):
+        # 先移出窗口外的旧值，再加入新值
+        if t >= window:
+            old = values[:, t - window]
+            has_old = ~np.isnan(old)
+            old = np.where(has_old, old, 0.0)
+            nobs = nobs - has_old
+            if func == 'mean':
+                neg_count = neg_count - (has_old & np.signbit(old))
+                y = -old - comp_remove
+                s = total + y
+                comp_remove = np.where(has_old, s - total - y, comp_remove)
+                total = np.where(has_old, s, total)
+            else:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    prev_mean = total - comp_remove
+                    y = old - comp_remove
+                    d = y - total
+                    new_mean = total - d / nobs
+                    new_ssqdm = ssqdm - (old - prev_mean) * (old - new_mean)
+                empty = nobs == 0
+                comp_remove = np.where(has_old & ~empty, d + total - y, comp_remove)
+                total = np.where(has_old, np.where(empty, 0.0, new_mean), total)
+                ssqdm = np.where(has_old, np.where(empty, 0.0, new_ssqdm), ssqdm)
+
+        x = values[:, t]
+        has_new = ~np.isnan(x)
+        xv = np.where(has_new, x, 0.0)
+        same_count = np.where(has_new, np.where(xv == prev_value, same_count + 1, 1), same_count)
+        prev_value = np.where(has_new, xv, prev_value)
+        nobs = nobs + has_new
+        if func == 'mean':
+            neg_count = neg_count + (has_new & np.signbit(xv))
+            y = xv - comp_add
+            s = total + y
+            comp_add = np.where(has_new, s - total - y, comp_add)
+            total = np.where(has_new, s, total)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = total / nobs
+            # 与 pandas 相同：全部非负（或全部为负）时消除补偿求和带来的符号误差
+            result = np.where((neg_count == 0) & (result < 0), 0.0, result)
+            result = np.where((neg_count == nobs) & (result > 0), 0.0, result)
+            result = np.where(same_count >= nobs, prev_value, result)
+        else:
+            prev_mean = total - comp_add
+            y = xv - comp_add
+            d = y - total
+            with np.errstate(divide='ignore', invalid='ignore'):
+                new_mean = total + d / nobs
+            comp_add = np.where(has_new, d + total - y, comp_add)
+            total = np.where(has_new, new_mean, total)
+            ssqdm = np.where(has_new, ssqdm + (xv - prev_mean) * (xv - total), ssqdm)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                var = np.where((nobs == 1) | (same_count >= nobs), 0.0, ssqdm / (nobs - 1))
+            result = np.sqrt(np.maximum(var, 0.0))
+
+        out[:, t] = np.where(nobs >= window, result, np.nan)
+    return out
+
+
+def _shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """沿时间轴平移，等价于 Series.shift(periods)"""
+    out = np.full(values.shape, np.nan)
+    if periods < values.shape[1]:
+        out[:, periods:] = values[:, :values.shape[1] - periods]
+    return out
+
+
+class BatchIndicatorEngine:
+    """
+    批量指标引擎 - 对整个面板一次性计算 MA/EMA、RSI、MACD、布林带、ATR、
+    Volume_Ratio、ROC，并按 StockAnalyzer.calculate_score 的规则批量评分
+    """
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.logger = logging.getLogger(__name__)
+        self.params = params or DEFAULT_PARAMS
+
+    def calculate_indicators(self, panel: OHLCVPanel) -> Dict[str, np.ndarray]:
+        """计算全部技术指标，返回 {指标名: (N, T) 数组}，数值已按 format_indicator_data 规则取整"""
+        close, high, low, volume = panel.close, panel.high, panel.low, panel.volume
+        valid = ~np.isnan(close)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ind = {
+                'open': panel.open,
+                'high': high,
+                'low': low,
+                'close': close,
+                'volume': volume,
+                'MA5': _ema(close, self.params['ma_periods']['short']),
+                'MA20': _ema(close, self.params['ma_periods']['medium']),
+                'MA60': _ema(close, self.params['ma_periods']['long']),
+            }
+
+            # RSI：首根K线的 diff 为 NaN，pandas 的 where 会将其置 0
+            delta = close - _shift(close)
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+            gain[~valid] = np.nan
+            loss[~valid] = np.nan
+            period = self.params['rsi_period']
+            rs = _rolling(gain, period) / _rolling(loss, period)
+            ind['RSI'] = 100 - (100 / (1 + rs))
+
+            # MACD
+            macd = _ema(close, 12) - _ema(close, 26)
+            signal = _ema(macd, 9)
+            ind['MACD'] = macd
+            ind['Signal'] = signal
+            ind['MACD_hist'] = macd - signal
+
+            # 布林带
+            bb_period = self.params['bollinger_period']
+            middle = _rolling(close, bb_period)
+            std = _rolling(close, bb_period, 'std')
+            ind['BB_upper'] = middle + std * self.params['bollinger_std']
+            ind['BB_middle'] = middle
+            ind['BB_lower'] = middle - std * self.params['bollinger_std']
+
+            # 成交量
+            ind['Volume_MA'] = _rolling(volume, self.params['volume_ma_period'])
+            ind['Volume_Ratio'] = volume / ind['Volume_MA']
+
+            # ATR 与波动率：真实波幅取三者最大值，忽略缺失的前收盘价
+            prev_close = _shift(close)
+            tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+            tr[~valid] = np.nan
+            ind['ATR'] = _rolling(tr, self.params['atr_period'])
+            ind['Volatility'] = ind['ATR'] / close * 100
+
+            # 动量
+            ind['ROC'] = (close / _shift(close, 10) - 1) * 100
+
+        for name, decimals in ROUND_DECIMALS.items():
+            ind[name] = np.round(ind[name], decimals)
+
+        ind['bars'] = np.cumsum(valid, axis=1)
+        return ind
+
+    def calculate_score_details(self, ind: Dict[str, np.ndarray], market_type: str = 'A') -> Dict[str, np.ndarray]:
+        """
+        按时空共振评分规则对每只股票的每根K线评分
+
+        返回 {'trend', 'volatility', 'technical', 'volume', 'momentum', 'total'}，
+        每项为 (N, T) 数组；第 t 列等价于对前 t+1 根K线调用 calculate_score。
+        """
+        close = ind['close']
+        ma5, ma20, ma60 = ind['MA5'], ind['MA20'], ind['MA60']
+        prev_close = _shift(close)
+
+        # 1. 趋势评分（最高30分）
+        trend = np.select(
+            [(ma5 > ma20) & (ma20 > ma60), ma5 > ma20, ma20 > ma60],
+            [15, 10, 5], default=0)
+        trend = trend + 5 * (close > ma5) + 5 * (close > ma20) + 5 * (close > ma60)
+        trend = np.minimum(30, trend)
+
+        # 2. 波动率评分（最高15分）
+        vol = ind['Volatility']
+        volatility = np.select(
+            [(vol >= 1.0) & (vol <= 2.5), (vol > 2.5) & (vol <= 4.0), vol < 1.0],
+            [15, 10, 5], default=0)
+
+        # 3. 技术指标评分（最高25分）
+        rsi = ind['RSI']
+        technical = np.select(
+            [(rsi >= 40) & (rsi <= 60),
+             ((rsi >= 30) & (rsi < 40)) | ((rsi > 60) & (rsi <= 70)),
+             rsi < 30,
+             rsi > 70],
+            [7, 10, 8, 2], default=0)
+
+        macd, signal, hist = ind['MACD'], ind['Signal'], ind['MACD_hist']
+        technical = technical + np.select(
+            [(macd > signal) & (hist > 0), macd > signal, (macd < signal) & (hist < 0), hist > _shift(hist)],
+            [10, 8, 0, 5], default=0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bb_position = (close - ind['BB_lower']) / (ind['BB_upper'] - ind['BB_lower'])
+        technical = technical + np.select(
+            [(bb_position >= 0.3) & (bb_position <= 0.7), bb_position < 0.2, bb_position > 0.8],
+            [3, 5, 1], default=0)
+        technical = np.minimum(25, technical)
+
+        # 4. 成交量评分（最高20分）：最近 min(5, 根数-1) 根K线的量比均值
+        bars = ind['bars']
+        lookback = np.minimum(5, bars - 1)
+        ratio = ind['Volume_Ratio']
+        ratio_sum = np.zeros(ratio.shape)
+        for lag in range(5):
+            shifted = ratio if lag == 0 else _shift(ratio, lag)
+            ratio_sum = ratio_sum + np.where(lag < lookback, shifted, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_ratio = ratio_sum / lookback
+        up = close > prev_close
+        down = close < prev_close
+        volume = np.select(
+            [(avg_ratio > 1.5) & up, (avg_ratio > 1.2) & up, (avg_ratio < 0.8) & down, (avg_ratio > 1.2) & down],
+            [20, 15, 10, 0], default=8)
+
+        # 5. 动量评分（最高10分）
+        roc = ind['ROC']
+        momentum = np.select(
+            [roc > 5, (roc >= 2) & (roc <= 5), (roc >= 0) & (roc < 2), (roc >= -2) & (roc < 0)],
+            [10, 8, 5, 3], default=0)
+
+        weights = self.get_weights(market_type)
+        total = (
+            trend * weights['trend'] / 0.30 +
+            volatility * weights['volatility'] / 0.15 +
+            technical * weights['technical'] / 0.25 +
+            volume * weights['volume'] / 0.20 +
+            momentum * weights['momentum'] / 0.10
+        )
+
+        return {
+            'trend': trend,
+            'volatility': volatility,
+            'technical': technical,
+            'volume': volume,
+            'momentum': momentum,
+            'total': total
+        }
+
+    def calculate_scores(self, ind: Dict[str, np.ndarray], market_type: str = 'A',
+                         adjust: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                         latest_only: bool = True) -> np.ndarray:
+        """
+        批量评分
+
+        参数:
+            ind: calculate_indicators 的返回值
+            market_type: 市场类型 (A/HK/US)
+            adjust: 市场特殊调整函数，作用于取整前的总分（对应 calculate_score 的“市场适应机制”）
+            latest_only: True 时只返回每只股票最新K线的评分 (N,)，否则返回 (N, T)
+        返回:
+            整数评分数组，K线不足2根的位置按 calculate_score 的异常分支记为 50
+        """
+        details = self.calculate_score_details(ind, market_type)
+        total = details['total']
+        bars = ind['bars']
+        if latest_only:
+            total = total[:, -1:]
+            bars = bars[:, -1:]
+        if adjust is not None:
+            total = adjust(total)
+        scores = np.clip(np.round(total), 0, 100)
+        scores = np.where(bars >= 2, scores, 50).astype(int)
+        return scores[:, 0] if latest_only else scores
+
+    @staticmethod
+    def get_weights(market_type: str = 'A') -> Dict[str, float]:
+        """各评分因子权重，与 calculate_score 的市场调整保持一致"""
+        weights = {
+            'trend': 0.30,
+            'volatility': 0.15,
+            'technical': 0.25,
+            'volume': 0.20,
+            'momentum': 0.10
+        }
+        if market_type == 'US':
+            weights['trend'] = 0.35
+            weights['volatility'] = 0.10
+            weights['momentum'] = 0.15
+        elif market_type == 'HK':
+            weights['volatility'] = 0.20
+            weights['volume'] = 0.25
+        return weights
+
+    def to_frame(self, panel: OHLCVPanel, ind: Dict[str, np.ndarray], index: int) -> pd.DataFrame:
+        """将面板中第 index 只股票的指标还原为 calculate_indicators 格式的 DataFrame"""
+        bars = int(ind['bars'][index, -1])
+        start = ind['bars'].shape[1] - bars
+        columns = ['open', 'close', 'high', 'low', 'volume', 'MA5', 'MA20', 'MA60', 'RSI',
+                   'MACD', 'Signal', 'MACD_hist', 'BB_upper', 'BB_middle', 'BB_lower',
+                   'Volume_MA', 'Volume_Ratio', 'ATR', 'Volatility', 'ROC']
+        data = {col: ind[col][index, start:] for col in columns}
+        if panel.dates is not None:
+            data = {'date': panel.dates[index, start:], **data}
+        return pd.DataFrame(data)
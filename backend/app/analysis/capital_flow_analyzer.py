@@ -4,12 +4,53 @@ import traceback
 import akshare as ak
 import pandas as pd
 import numpy as np
+import os
 from datetime import datetime, timedelta
 
+from app.analysis.column_mapping import frame_to_records
+from app.analysis.fund_flow_snapshot import FundFlowSnapshot
+
+# akshare 资金流向表的字段映射：(输出键, 源列名, 类型)
+CONCEPT_FLOW_FIELDS = [
+    ("rank", "序号", "int"),
+    ("sector", "行业", "raw"),
+    ("company_count", "公司家数", "int"),
+    ("sector_index", "行业指数", "float"),
+    ("change_percent", "阶段涨跌幅", "percent"),
+    ("inflow", "流入资金", "float"),
+    ("outflow", "流出资金", "float"),
+    ("net_flow", "净额", "float"),
+]
+
+SECTOR_STOCK_FIELDS = [
+    ("code", "代码", "raw"),
+    ("name", "名称", "raw"),
+    ("price", "最新价", "float"),
+    ("change_percent", "涨跌幅", "float"),
+    ("main_net_inflow", None, "int"),  # 需要时另行获取
+    ("main_net_inflow_percent", None, "int"),
+]
+
+
+def fund_flow_fields(prefix=""):
+    """个股资金流向各档位字段，排名表按统计周期带列名前缀（如 "10日主力净流入-净额"）"""
+    fields = [("change_percent", f"{prefix}涨跌幅", "float")]
+    for key, label in (("main", "主力"), ("super_large", "超大单"), ("large", "大单"),
+                       ("medium", "中单"), ("small", "小单")):
+        fields.append((f"{key}_net_inflow", f"{prefix}{label}净流入-净额", "float"))
+        fields.append((f"{key}_net_inflow_percent", f"{prefix}{label}净流入-净占比", "float"))
+    return fields
+
+
+INDIVIDUAL_FLOW_FIELDS = [("date", "日期", "raw"), ("price", "收盘价", "float")] + fund_flow_fields()
+
 
 class CapitalFlowAnalyzer:
-    def __init__(self, cache):
+    def __init__(self, cache, fund_flow_snapshot=None):
         self.cache = cache
+        # 全市场资金流向快照及每日历史，评分时优先使用，避免逐只股票请求
+        self.fund_flow_snapshot = fund_flow_snapshot or FundFlowSnapshot(
+            save_dir=os.getenv('FUND_FLOW_SNAPSHOT_DIR', 'data/fund_flow'))
 
         # 设置日志记录
         logging.basicConfig(level=logging.INFO,
@@ -31,25 +72,8 @@ class CapitalFlowAnalyzer:
             # 从akshare获取数据
             concept_data = ak.stock_fund_flow_concept(symbol=period)
 
-            # 处理数据
-            result = []
-            for _, row in concept_data.iterrows():
-                try:
-                    # 列名可能有所不同，所以我们使用灵活的方法
-                    item = {
-                        "rank": int(row.get("序号", 0)),
-                        "sector": row.get("行业", ""),
-                        "company_count": int(row.get("公司家数", 0)),
-                        "sector_index": float(row.get("行业指数", 0)),
-                        "change_percent": self._parse_percent(row.get("阶段涨跌幅", "0%")),
-                        "inflow": float(row.get("流入资金", 0)),
-                        "outflow": float(row.get("流出资金", 0)),
-                        "net_flow": float(row.get("净额", 0))
-                    }
-                    result.append(item)
-                except Exception as e:
-                    # self.logger.warning(f"Error processing row in concept fund flow: {str(e)}")
-                    continue
+            # 处理数据（整列转换）
+            result = frame_to_records(concept_data, CONCEPT_FLOW_FIELDS)
 
             # 缓存结果
             self.cache.set(cache_key, result, ttl=3600)
@@ -76,34 +100,11 @@ class CapitalFlowAnalyzer:
             # 从akshare获取数据
             stock_data = ak.stock_individual_fund_flow_rank(indicator=period)
 
-            # 处理数据
-            result = []
-            for _, row in stock_data.iterrows():
-                try:
-                    # 根据不同时间段设置列名前缀
-                    period_prefix = "" if period == "今日" else f"{period}"
-
-                    item = {
-                        "rank": int(row.get("序号", 0)),
-                        "code": row.get("代码", ""),
-                        "name": row.get("名称", ""),
-                        "price": float(row.get("最新价", 0)),
-                        "change_percent": float(row.get(f"{period_prefix}涨跌幅", 0)),
-                        "main_net_inflow": float(row.get(f"{period_prefix}主力净流入-净额", 0)),
-                        "main_net_inflow_percent": float(row.get(f"{period_prefix}主力净流入-净占比", 0)),
-                        "super_large_net_inflow": float(row.get(f"{period_prefix}超大单净流入-净额", 0)),
-                        "super_large_net_inflow_percent": float(row.get(f"{period_prefix}超大单净流入-净占比", 0)),
-                        "large_net_inflow": float(row.get(f"{period_prefix}大单净流入-净额", 0)),
-                        "large_net_inflow_percent": float(row.get(f"{period_prefix}大单净流入-净占比", 0)),
-                        "medium_net_inflow": float(row.get(f"{period_prefix}中单净流入-净额", 0)),
-                        "medium_net_inflow_percent": float(row.get(f"{period_prefix}中单净流入-净占比", 0)),
-                        "small_net_inflow": float(row.get(f"{period_prefix}小单净流入-净额", 0)),
-                        "small_net_inflow_percent": float(row.get(f"{period_prefix}小单净流入-净占比", 0))
-                    }
-                    result.append(item)
-                except Exception as e:
-                    self.logger.warning(f"Error processing row in individual fund flow rank: {str(e)}")
-                    continue
+            # 处理数据（整列转换），根据不同时间段设置列名前缀
+            period_prefix = "" if period == "今日" else f"{period}"
+            fields = [("rank", "序号", "int"), ("code", "代码", "raw"), ("name", "名称", "raw"),
+                      ("price", "最新价", "float")] + fund_flow_fields(period_prefix)
+            result = frame_to_records(stock_data, fields)
 
             # 缓存结果
             self.cache.set(cache_key, result, ttl=3600)
@@ -139,47 +140,18 @@ class CapitalFlowAnalyzer:
             # 从akshare获取数据
             flow_data = ak.stock_individual_fund_flow(stock=stock_code, market=market_type)
 
-            # 处理数据
+            # 处理数据（整列转换）
             result = {
                 "stock_code": stock_code,
-                "data": []
+                "data": frame_to_records(flow_data, INDIVIDUAL_FLOW_FIELDS)
             }
 
-            for _, row in flow_data.iterrows():
-                try:
-                    item = {
-                        "date": row.get("日期", ""),
-                        "price": float(row.get("收盘价", 0)),
-                        "change_percent": float(row.get("涨跌幅", 0)),
-                        "main_net_inflow": float(row.get("主力净流入-净额", 0)),
-                        "main_net_inflow_percent": float(row.get("主力净流入-净占比", 0)),
-                        "super_large_net_inflow": float(row.get("超大单净流入-净额", 0)),
-                        "super_large_net_inflow_percent": float(row.get("超大单净流入-净占比", 0)),
-                        "large_net_inflow": float(row.get("大单净流入-净额", 0)),
-                        "large_net_inflow_percent": float(row.get("大单净流入-净占比", 0)),
-                        "medium_net_inflow": float(row.get("中单净流入-净额", 0)),
-                        "medium_net_inflow_percent": float(row.get("中单净流入-净占比", 0)),
-                        "small_net_inflow": float(row.get("小单净流入-净额", 0)),
-                        "small_net_inflow_percent": float(row.get("小单净流入-净占比", 0))
-                    }
-                    result["data"].append(item)
-                except Exception as e:
-                    self.logger.warning(f"Error processing row in individual fund flow: {str(e)}")
-                    continue
+            # 补录进全市场快照历史，此后该股票的多日汇总可直接由每日快照得到
+            self.fund_flow_snapshot.record_history(stock_code, result["data"])
 
             # 计算汇总统计数据
             if result["data"]:
-                # 最近数据 (最近10天)
-                recent_data = result["data"][:min(10, len(result["data"]))]
-
-                result["summary"] = {
-                    "recent_days": len(recent_data),
-                    "total_main_net_inflow": sum(item["main_net_inflow"] for item in recent_data),
-                    "avg_main_net_inflow_percent": np.mean(
-                        [item["main_net_inflow_percent"] for item in recent_data]),
-                    "positive_days": sum(1 for item in recent_data if item["main_net_inflow"] > 0),
-                    "negative_days": sum(1 for item in recent_data if item["main_net_inflow"] <= 0)
-                }
+                result["summary"] = self._summarize_fund_flow(result["data"])
 
             # Cache the result
             self.cache.set(cache_key, result, ttl=3600)
@@ -191,6 +163,35 @@ class CapitalFlowAnalyzer:
             # 如果API调用失败则返回模拟数据
             return self._generate_mock_individual_fund_flow(stock_code, market_type)
 
+    def get_recent_fund_flow(self, stock_code, market_type="", days=10):
+        """
+        获取股票最近 days 个交易日的资金流向（格式同 get_individual_fund_flow）
+
+        优先从全市场资金流向快照的每日历史中取得，历史不足时才单独请求该股票。
+        """
+        self.fund_flow_snapshot.refresh()
+        records = self.fund_flow_snapshot.history(stock_code, days=days)
+        if records is None:
+            return self.get_individual_fund_flow(stock_code, market_type)
+        return {
+            "stock_code": stock_code,
+            "data": records,
+            "summary": self._summarize_fund_flow(records)
+        }
+
+    def _summarize_fund_flow(self, data):
+        """最近 (最多10天) 资金流向的汇总统计"""
+        # 单只股票请求返回的数据按日期升序，快照历史按日期降序，统一取最新的10天
+        recent_data = sorted(data, key=lambda item: str(item.get("date", "")), reverse=True)[:10]
+        return {
+            "recent_days": len(recent_data),
+            "total_main_net_inflow": sum(item["main_net_inflow"] for item in recent_data),
+            "avg_main_net_inflow_percent": np.mean(
+                [item["main_net_inflow_percent"] for item in recent_data]),
+            "positive_days": sum(1 for item in recent_data if item["main_net_inflow"] > 0),
+            "negative_days": sum(1 for item in recent_data if item["main_net_inflow"] <= 0)
+        }
+
     def get_sector_stocks(self, sector):
         """获取特定行业的股票"""
         try:
@@ -210,21 +211,7 @@ class CapitalFlowAnalyzer:
 
                 # 提取股票列表
                 if not stocks.empty and '代码' in stocks.columns:
-                    result = []
-                    for _, row in stocks.iterrows():
-                        try:
-                            item = {
-                                "code": row.get("代码", ""),
-                                "name": row.get("名称", ""),
-                                "price": float(row.get("最新价", 0)),
-                                "change_percent": float(row.get("涨跌幅", 0)) if "涨跌幅" in row else 0,
-                                "main_net_inflow": 0,  # We'll get this data separately if needed
-                                "main_net_inflow_percent": 0  # We'll get this data separately if needed
-                            }
-                            result.append(item)
-                        except Exception as e:
-                            # self.logger.warning(f"Error processing row in sector stocks: {str(e)}")
-                            continue
+                    result = frame_to_records(stocks, SECTOR_STOCK_FIELDS)
 
                     # 缓存结果
                     self.cache.set(cache_key, result, ttl=3600)
@@ -249,8 +236,8 @@ class CapitalFlowAnalyzer:
         try:
             self.logger.info(f"Calculating capital flow score for stock: {stock_code}")
 
-            # 获取个股资金流向数据
-            fund_flow = self.get_individual_fund_flow(stock_code, market_type)
+            # 获取个股资金流向数据（优先使用全市场快照历史）
+            fund_flow = self.get_recent_fund_flow(stock_code, market_type)
 
             if not fund_flow or not fund_flow.get("data") or not fund_flow.get("summary"):
                 return {
@@ -367,15 +354,6 @@ class CapitalFlowAnalyzer:
                 "error": str(e)
             }
 
-    def _parse_percent(self, percent_str):
-        """将百分比字符串转换为浮点数"""
-        try:
-            if isinstance(percent_str, str) and '%' in percent_str:
-                return float(percent_str.replace('%', ''))
-            return float(percent_str)
-        except (ValueError, TypeError):
-            return 0.0
-
     def _generate_mock_concept_fund_flow(self, period):
         """生成模拟概念资金流向数据"""
         # self.logger.warning(f"Generating mock concept fund flow data for period: {period}")
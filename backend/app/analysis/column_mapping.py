@@ -0,0 +1,94 @@
+# app/analysis/column_mapping.py
+"""
+akshare 表格的列映射
+
+把 akshare 返回的中文列按字段表整列重命名、转换类型，再一次性输出字典列表，
+替代逐行 iterrows() 并对每个单元格 try/float 的做法。
+
+字段表是 (输出键, 源列名, 类型) 的序列，类型可选：
+    float        数值，无法解析或缺失时为 0.0
+    int          整数，无法解析或缺失时为 0
+    str          字符串，缺失时为 ''
+    percent      去掉 % 后的数值，如 '1.23%' -> 1.23
+    percent_str  去掉 % 后的字符串，数值转为 str(float)，无法解析时为 '0.00'
+    raw          原样保留，缺失时为 ''
+源列名为 None 时该字段取类型默认值（常量列）。
+"""
+import numpy as np
+import pandas as pd
+
+_DEFAULTS = {
+    'float': 0.0,
+    'int': 0,
+    'str': '',
+    'percent': 0.0,
+    'percent_str': '0.00',
+    'raw': '',
+}
+
+
+def _to_float(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0.0).astype(float)
+
+
+def _to_int(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0).astype(np.int64)
+
+
+def _to_str(series):
+    return series.where(series.notna(), '').astype(str)
+
+
+def _to_percent(series):
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace('%', '', regex=False).str.strip()
+    return _to_float(series)
+
+
+def _to_percent_str(series):
+    text = series.astype(str)
+    has_percent = text.str.contains('%', regex=False)
+    numeric = pd.to_numeric(series.where(~has_percent), errors='coerce')
+    result = numeric.astype(str).where(numeric.notna(), '0.00')
+    return result.where(~has_percent, text.str.replace('%', '', regex=False))
+
+
+_CONVERTERS = {
+    'float': _to_float,
+    'int': _to_int,
+    'str': _to_str,
+    'percent': _to_percent,
+    'percent_str': _to_percent_str,
+    'raw': lambda series: series,
+}
+
+
+def map_columns(frame, fields, optional=()):
+    """
+    按字段表转换整张表
+
+    Args:
+        frame: akshare 返回的 DataFrame
+        fields: (输出键, 源列名, 类型) 序列
+        optional: 源列不存在时整列省略的输出键（否则取类型默认值）
+    Returns:
+        DataFrame: 列为输出键，行与 frame 一一对应
+    """
+    columns = {}
+    for key, column, kind in fields:
+        if column is not None and column in frame.columns:
+            columns[key] = _CONVERTERS[kind](frame[column])
+        elif key not in optional:
+            columns[key] = _DEFAULTS[kind]
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def frame_to_records(frame, fields, optional=()):
+    """按字段表转换整张表并输出字典列表（值为 Python 原生类型）"""
+    if frame is None or frame.empty:
+        return []
+    mapped = map_columns(frame, fields, optional)
+    # 按列取 Python 原生值后逐行拼装，比 to_dict('records') 少一次逐单元格装箱
+    keys = list(mapped.columns)
+    columns = [mapped[key].tolist() for key in keys]
+    return [dict(zip(keys, values)) for values in zip(*columns)]
@@ -0,0 +1,247 @@
+# app/analysis/fund_flow_snapshot.py
+"""
+全市场个股资金流向快照
+
+一次调用 ak.stock_individual_fund_flow_rank(indicator="今日") 取得全市场当日资金流向，
+按股票代码建立索引，过期（默认5分钟）后在下次访问时刷新。每天的快照按列保存为历史，
+任意字段可取出「日期 × 股票代码」的面板，多日汇总不必再逐只股票请求。
+
+单只股票请求到的历史资金流（ak.stock_individual_fund_flow）也会补录进历史，
+此后该股票只需每日快照即可保持连续。快照按日期保存到磁盘（列式二进制文件，见 cache_codec），进程重启后恢复。
+周末取得的快照记在上一交易日；节假日没有区分，历史中可能多出一天重复数据，
+且跨节假日的历史不被视为连续（回退到单只股票请求）。
+"""
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from app.analysis.column_mapping import map_columns
+from app.core.cache_codec import NumpyFrameCodec
+
+# 每日快照保留的字段（与 get_individual_fund_flow 的 data 项一致）
+FLOW_LEVELS = (("main", "主力"), ("super_large", "超大单"), ("large", "大单"),
+               ("medium", "中单"), ("small", "小单"))
+SNAPSHOT_FIELDS = ["price", "change_percent"] + [
+    f"{key}_net_inflow{suffix}" for key, _ in FLOW_LEVELS for suffix in ("", "_percent")]
+
+
+def _snapshot_columns(prefix):
+    fields = [("code", "代码", "str"), ("price", "最新价", "float"), ("change_percent", f"{prefix}涨跌幅", "float")]
+    for key, label in FLOW_LEVELS:
+        fields.append((f"{key}_net_inflow", f"{prefix}{label}净流入-净额", "float"))
+        fields.append((f"{key}_net_inflow_percent", f"{prefix}{label}净流入-净占比", "float"))
+    return fields
+
+
+class FundFlowSnapshot:
+    def __init__(self, save_dir=None, ttl=None, history_days=None, retry_interval=None):
+        """
+        Args:
+            save_dir: 每日快照的保存目录，None 表示只保存在内存
+            ttl: 快照有效期（秒）
+            history_days: 保留的历史天数
+            retry_interval: 获取失败后再次请求前的等待时间（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.save_dir = save_dir
+        self.ttl = float(ttl if ttl is not None else os.getenv('FUND_FLOW_SNAPSHOT_TTL', 300))
+        self.history_days = int(history_days or os.getenv('FUND_FLOW_HISTORY_DAYS', 60))
+        self.retry_interval = float(retry_interval if retry_interval is not None
+                                    else os.getenv('FUND_FLOW_SNAPSHOT_RETRY_INTERVAL', 60))
+        self.codec = NumpyFrameCodec()
+
+        # 当日快照：DataFrame（索引为股票代码，列为 SNAPSHOT_FIELDS）
+        self._latest = None
+        self._latest_date = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        # 历史：日期(YYYY-mm-dd) -> 当日快照 DataFrame；面板按需由此生成
+        self._days = {}
+        self._panels = None
+        # 补录后尚未写盘的日期，随下一次快照更新一起保存
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+        if self.save_dir:
+            os.makedirs(self.save_dir, exist_ok=True)
+            self._load()
+
+    # ---- 当日快照 ----
+
+    def is_fresh(self):
+        return self._latest is not None and time.time() - self._fetched_at < self.ttl
+
+    def _backing_off(self):
+        return self._failed_at is not None and time.time() - self._failed_at < self.retry_interval
+
+    def refresh(self, force=False):
+        """
+        过期时重新获取全市场资金流向（并发访问时只请求一次），返回是否有可用快照
+
+        获取失败后 retry_interval 秒内不再请求，期间沿用已有快照（或直接返回 False），
+        避免数据源故障时每次评分都重新请求全市场数据。
+        """
+        if not force and (self.is_fresh() or self._backing_off()):
+            return self._latest is not None
+        with self._refresh_lock:
+            if not force and (self.is_fresh() or self._backing_off()):
+                return self._latest is not None
+            try:
+                frame = ak.stock_individual_fund_flow_rank(indicator="今日")
+            except Exception as e:
+                self._failed_at = time.time()
+                self.logger.error(f"获取全市场资金流向快照失败，{self.retry_interval:.0f}秒内不再重试: {e}")
+                return self._latest is not None
+            self._failed_at = None
+            self.update(frame)
+        return True
+
+    def update(self, frame, date=None):
+        """用全市场资金流向排名表更新当日快照，并写入当天的历史"""
+        prefix = "今日" if "今日涨跌幅" in frame.columns else ""
+        snapshot = map_columns(frame, _snapshot_columns(prefix))
+        snapshot = snapshot[snapshot['code'] != ''].drop_duplicates('code').set_index('code')
+        # 非交易日（周末）取得的仍是上一交易日的数据
+        date = date or pd.offsets.BDay().rollback(pd.Timestamp(datetime.now().date())).strftime('%Y-%m-%d')
+
+        with self._lock:
+            self._latest = snapshot
+            self._latest_date = date
+            self._fetched_at = time.time()
+            existing = self._days.get(date)
+            # 当天补录过的个股保留，全市场快照覆盖同名股票
+            self._days[date] = snapshot if existing is None else snapshot.combine_first(existing)
+            self._panels = None
+            self._dirty.add(date)
+            self._prune()
+        self.flush()
+        self.logger.info(f"资金流向快照已更新: {date}, {len(snapshot)} 只股票")
+
+    def get(self, stock_code):
+        """当日快照中单只股票的资金流向（字典），没有时返回 None"""
+        if not self.refresh():
+            return None
+        with self._lock:
+            if stock_code not in self._latest.index:
+                return None
+            row = self._latest.loc[stock_code]
+        return dict(row.items(), date=self._latest_date)
+
+    # ---- 历史 ----
+
+    def record_history(self, stock_code, records):
+        """补录单只股票的每日资金流（get_individual_fund_flow 的 data 项）"""
+        if not records:
+            return
+        frame = pd.DataFrame.from_records(records)
+        if 'date' not in frame.columns:
+            return
+        frame['date'] = pd.to_datetime(frame['date'], errors='coerce').dt.strftime('%Y-%m-%d')
+        frame = frame.dropna(subset=['date']).drop_duplicates('date', keep='last')
+        frame = frame.reindex(columns=['date'] + SNAPSHOT_FIELDS)
+
+        with self._lock:
+            for date, values in zip(frame['date'], frame[SNAPSHOT_FIELDS].to_numpy(dtype=float)):
+                day = self._days.get(date)
+                row = pd.DataFrame([values], index=pd.Index([stock_code], name='code'), columns=SNAPSHOT_FIELDS)
+                if day is None:
+                    self._days[date] = row
+                elif stock_code not in day.index:
+                    self._days[date] = pd.concat([day, row])
+                else:
+                    continue
+                self._dirty.add(date)
+            self._panels = None
+            self._prune()
+
+    def panel(self, field):
+        """某个字段的历史面板：索引为日期（升序），列为股票代码"""
+        with self._lock:
+            if self._panels is None:
+                dates = sorted(self._days)
+                self._panels = {
+                    name: pd.DataFrame({date: self._days[date][name] for date in dates}).T
+                    if dates else pd.DataFrame()
+                    for name in SNAPSHOT_FIELDS
+                }
+            return self._panels[field]
+
+    def history(self, stock_code, days=10):
+        """
+        单只股票最近 days 个交易日（最新在前），格式与 get_individual_fund_flow 的 data 项一致
+
+        从当日快照日期起逐日往前，要求每一天都有该股票且日期为相邻的工作日；
+        历史不足 days 天或中间有缺失时返回 None，调用方应回退到单只股票请求（并补录历史）。
+        """
+        records = []
+        with self._lock:
+            # 从最新日期往前逐日查找，不必为单只股票生成整张面板
+            dates = sorted((date for date in self._days if not self._latest_date or date <= self._latest_date),
+                           reverse=True)
+            expected = None
+            for date in dates[:days]:
+                day = self._days[date]
+                if stock_code not in day.index or (expected is not None and date != expected):
+                    return None
+                values = day.loc[stock_code, SNAPSHOT_FIELDS].to_numpy(dtype=float)
+                item = {"date": date}
+                item.update(zip(SNAPSHOT_FIELDS, np.nan_to_num(values).tolist()))
+                records.append(item)
+                expected = (pd.Timestamp(date) - pd.offsets.BDay()).strftime('%Y-%m-%d')
+        return records if len(records) == days else None
+
+    def _prune(self):
+        """只保留最近 history_days 个日期"""
+        for date in sorted(self._days)[:-self.history_days]:
+            del self._days[date]
+            self._dirty.discard(date)
+            if self.save_dir:
+                path = self._path(date)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    # ---- 持久化 ----
+
+    def _path(self, date):
+        return os.path.join(self.save_dir, f"fund_flow_{date}.bin")
+
+    def flush(self):
+        """把有变化的日期写盘（每个日期一个文件）"""
+        if not self.save_dir:
+            return
+        with self._lock:
+            pending = {date: self._days[date] for date in self._dirty if date in self._days}
+            self._dirty.clear()
+        for date, day in pending.items():
+            path = self._path(date)
+            # 临时文件名唯一，多个进程同时写同一日期时互不覆盖
+            fd, tmp_path = tempfile.mkstemp(dir=self.save_dir, prefix=os.path.basename(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self.codec.encode(day))
+                os.replace(tmp_path, path)
+            except Exception as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self.logger.warning(f"保存资金流向快照 {path} 失败: {e}")
+
+    def _load(self):
+        for path in sorted(glob.glob(os.path.join(self.save_dir, "fund_flow_*.bin"))):
+            date = os.path.basename(path)[len("fund_flow_"):-len(".bin")]
+            try:
+                with open(path, 'rb') as f:
+                    self._days[date] = self.codec.decode(f.read())
+            except Exception as e:
+                self.logger.warning(f"加载资金流向快照 {path} 失败: {e}")
+        self._prune()
+        if self._days:
+            self.logger.info(f"已加载 {len(self._days)} 天资金流向快照")
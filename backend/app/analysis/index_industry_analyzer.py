@@ -1,24 +1,61 @@
 # index_industry_analyzer.py
+import logging
+import os
+
 import akshare as ak
 import pandas as pd
 import numpy as np
-import threading
+
+from app.core.cache import MemoryCache
+from app.analysis.market_scan_engine import MarketScanEngine
+from app.analysis.industry_board_history import IndustryBoardHistory
 
 
 class IndexIndustryAnalyzer:
-    def __init__(self, analyzer):
+    def __init__(self, analyzer, board_history=None):
         self.analyzer = analyzer
-        self.data_cache = {}
+        self.board_history = board_history or IndustryBoardHistory()
+        self.logger = logging.getLogger(__name__)
+        # 指数/行业汇总结果缓存1小时
+        self.result_ttl = int(os.getenv('INDEX_ANALYSIS_CACHE_TTL', 3600))
+        self.data_cache = MemoryCache(max_entries=256)
+        # 成分股快速分析结果，不同指数、行业之间共用（如沪深300与上证指数的重叠成分股）
+        self.stock_ttl = int(os.getenv('INDEX_STOCK_CACHE_TTL', 900))
+        self.stock_cache = MemoryCache(max_entries=int(os.getenv('INDEX_STOCK_CACHE_SIZE', 5000)))
+
+    def _analyze_constituents(self, stock_list, market_type='A'):
+        """
+        快速分析成分股，返回结果列表（每项为副本，调用方可直接修改）
+
+        已缓存的股票直接复用；其余在市场扫描引擎中执行，
+        与市场扫描共用有界线程池和数据源限速。
+        """
+        results = {}
+        missing = []
+        for stock_code in dict.fromkeys(stock_list):
+            cached = self.stock_cache.get(f"{market_type}:{stock_code}")
+            if cached is not None:
+                results[stock_code] = cached
+            else:
+                missing.append(stock_code)
+
+        if missing:
+            self.logger.info(f"分析 {len(missing)} 只成分股（复用缓存 {len(results)} 只）")
+            reports = MarketScanEngine(self.analyzer).scan(missing, min_score=float('-inf'), market_type=market_type)
+            for report in reports:
+                stock_code = report.get('stock_code')
+                results[stock_code] = report
+                self.stock_cache.set(f"{market_type}:{stock_code}", report, expire=self.stock_ttl)
+
+        return [dict(results[code]) for code in dict.fromkeys(stock_list) if code in results]
 
     def analyze_index(self, index_code, limit=30):
         """分析指数整体情况"""
         try:
-            cache_key = f"index_{index_code}"
-            if cache_key in self.data_cache:
-                cache_time, cached_result = self.data_cache[cache_key]
-                # 如果缓存时间在1小时内，直接返回
-                if (pd.Timestamp.now() - cache_time).total_seconds() < 3600:
-                    return cached_result
+            cache_key = f"index_{index_code}_{limit}"
+            cached_result = self.data_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
 
             # 获取指数成分股
             if index_code == '000300':
@@ -56,32 +93,11 @@ class IndexIndustryAnalyzer:
                 stock_list = [s[0] for s in stock_weights[:limit]]
                 weights = [s[1] for s in stock_weights[:limit]]
 
-            # 多线程分析股票
-            results = []
-            threads = []
-            results_lock = threading.Lock()
-
-            def analyze_stock(stock_code, weight):
-                try:
-                    # 分析股票
-                    result = self.analyzer.quick_analyze_stock(stock_code)
-                    result['weight'] = weight
-
-                    with results_lock:
-                        results.append(result)
-                except Exception as e:
-                    print(f"分析股票 {stock_code} 时出错: {str(e)}")
-
-            # 创建并启动线程
-            for i, stock_code in enumerate(stock_list):
-                weight = weights[i] if i < len(weights) else 1
-                thread = threading.Thread(target=analyze_stock, args=(stock_code, weight))
-                threads.append(thread)
-                thread.start()
-
-            # 等待所有线程完成
-            for thread in threads:
-                thread.join()
+            # 并发分析成分股（共享线程池、限速和成分股缓存）
+            weight_map = {code: weights[i] if i < len(weights) else 1 for i, code in enumerate(stock_list)}
+            results = self._analyze_constituents(stock_list)
+            for result in results:
+                result['weight'] = weight_map.get(result.get('stock_code'), 1)
 
             # 计算指数整体情况
             total_weight = sum([r.get('weight', 1) for r in results])
@@ -123,7 +139,7 @@ class IndexIndustryAnalyzer:
             }
 
             # 缓存结果
-            self.data_cache[cache_key] = (pd.Timestamp.now(), index_analysis)
+            self.data_cache.set(cache_key, index_analysis, expire=self.result_ttl)
 
             return index_analysis
 
@@ -134,12 +150,10 @@ class IndexIndustryAnalyzer:
     def analyze_industry(self, industry, limit=30):
         """分析行业整体情况"""
         try:
-            cache_key = f"industry_{industry}"
-            if cache_key in self.data_cache:
-                cache_time, cached_result = self.data_cache[cache_key]
-                # 如果缓存时间在1小时内，直接返回
-                if (pd.Timestamp.now() - cache_time).total_seconds() < 3600:
-                    return cached_result
+            cache_key = f"industry_{industry}_{limit}"
+            cached_result = self.data_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
 
             # 获取行业成分股
             stocks = ak.stock_board_industry_cons_em(symbol=industry)
@@ -154,30 +168,8 @@ class IndexIndustryAnalyzer:
             if limit and len(stock_list) > limit:
                 stock_list = stock_list[:limit]
 
-            # 多线程分析股票
-            results = []
-            threads = []
-            results_lock = threading.Lock()
-
-            def analyze_stock(stock_code):
-                try:
-                    # 分析股票
-                    result = self.analyzer.quick_analyze_stock(stock_code)
-
-                    with results_lock:
-                        results.append(result)
-                except Exception as e:
-                    print(f"分析股票 {stock_code} 时出错: {str(e)}")
-
-            # 创建并启动线程
-            for stock_code in stock_list:
-                thread = threading.Thread(target=analyze_stock, args=(stock_code,))
-                threads.append(thread)
-                thread.start()
-
-            # 等待所有线程完成
-            for thread in threads:
-                thread.join()
+            # 并发分析成分股（共享线程池、限速和成分股缓存）
+            results = self._analyze_constituents(stock_list)
 
             # 计算行业整体情况
             if not results:
@@ -215,7 +207,7 @@ class IndexIndustryAnalyzer:
             }
 
             # 缓存结果
-            self.data_cache[cache_key] = (pd.Timestamp.now(), industry_analysis)
+            self.data_cache.set(cache_key, industry_analysis, expire=self.result_ttl)
 
             return industry_analysis
 
@@ -224,52 +216,9 @@ class IndexIndustryAnalyzer:
             return {"error": f"分析行业时出错: {str(e)}"}
 
     def compare_industries(self, limit=10):
-        """比较不同行业的表现"""
+        """比较不同行业的表现（各板块历史并发获取并缓存，见 IndustryBoardHistory）"""
         try:
-            # 获取行业板块数据
-            industry_data = ak.stock_board_industry_name_em()
-
-            # 提取行业名称列表
-            industries = industry_data['板块名称'].tolist() if '板块名称' in industry_data.columns else []
-
-            if not industries:
-                return {"error": "获取行业列表失败"}
-
-            # 限制分析的行业数量
-            industries = industries[:limit] if limit else industries
-
-            # 分析各行业情况
-            industry_results = []
-
-            for industry in industries:
-                try:
-                    # 简化分析，只获取基本指标
-                    industry_info = ak.stock_board_industry_hist_em(symbol=industry, period="3m")
-
-                    # 计算行业涨跌幅
-                    if not industry_info.empty:
-                        latest = industry_info.iloc[0]
-                        change = latest['涨跌幅'] if '涨跌幅' in latest.index else 0
-
-                        industry_results.append({
-                            "industry": industry,
-                            "change": change,
-                            "volume": latest['成交量'] if '成交量' in latest.index else 0,
-                            "turnover": latest['成交额'] if '成交额' in latest.index else 0
-                        })
-                except Exception as e:
-                    print(f"分析行业 {industry} 时出错: {str(e)}")
-
-            # 按涨跌幅排序
-            industry_results.sort(key=lambda x: x.get('change', 0), reverse=True)
-
-            return {
-                "count": len(industry_results),
-                "top_industries": industry_results[:5] if len(industry_results) >= 5 else industry_results,
-                "bottom_industries": industry_results[-5:] if len(industry_results) >= 5 else [],
-                "results": industry_results
-            }
-
+            return self.board_history.compare(limit)
         except Exception as e:
-            print(f"比较行业表现时出错: {str(e)}")
-            return {"error": f"比较行业表现时出错: {str(e)}"}
\ No newline at end of file
+            self.logger.error(f"比较行业表现时出错: {str(e)}")
+            return {"error": f"比较行业表现时出错: {str(e)}"}
@@ -13,11 +13,42 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from app.analysis.column_mapping import frame_to_records
+from app.analysis.industry_board_history import IndustryBoardHistory
+
+# 行业资金流向表的字段映射：(输出键, 源列名, 类型)，即时数据与阶段排行的涨跌幅列名不同
+INDUSTRY_FLOW_FIELDS = [
+    ("rank", "序号", "int"),
+    ("industry", "行业", "str"),
+    ("companyCount", "公司家数", "int"),
+    ("index", "行业指数", "float"),
+    ("change", "阶段涨跌幅", "percent_str"),
+    ("inflow", "流入资金", "float"),
+    ("outflow", "流出资金", "float"),
+    ("netFlow", "净额", "float"),
+]
+
+INDUSTRY_FLOW_REALTIME_FIELDS = [
+    ("rank", "序号", "int"),
+    ("industry", "行业", "str"),
+    ("index", "行业指数", "float"),
+    ("change", "行业-涨跌幅", "percent_str"),
+    ("inflow", "流入资金", "float"),
+    ("outflow", "流出资金", "float"),
+    ("netFlow", "净额", "float"),
+    ("companyCount", "公司家数", "int"),
+    ("leadingStock", "领涨股", "str"),
+    ("leadingStockChange", "领涨股-涨跌幅", "percent_str"),
+    ("leadingStockPrice", "当前价", "float"),
+]
+LEADING_STOCK_KEYS = ("leadingStock", "leadingStockChange", "leadingStockPrice")
+
 
 class IndustryAnalyzer:
-    def __init__(self):
+    def __init__(self, board_history=None):
         """初始化行业分析类"""
         self.data_cache = {}
+        self.board_history = board_history or IndustryBoardHistory()
         self.industry_code_map = {}  # 缓存行业名称到代码的映射
 
         # 设置日志记录
@@ -46,53 +77,11 @@ class IndustryAnalyzer:
             # 打印列名以便调试
             self.logger.info(f"行业资金流向数据列名: {fund_flow_data.columns.tolist()}")
 
-            # 转换为字典列表
-            result = []
-
+            # 整列转换为字典列表，领涨股相关列存在时才输出
             if symbol == "即时":
-                for _, row in fund_flow_data.iterrows():
-                    try:
-                        # 安全地将值转换为对应的类型
-                        item = {
-                            "rank": self._safe_int(row["序号"]),
-                            "industry": str(row["行业"]),
-                            "index": self._safe_float(row["行业指数"]),
-                            "change": self._safe_percent(row["行业-涨跌幅"]),
-                            "inflow": self._safe_float(row["流入资金"]),
-                            "outflow": self._safe_float(row["流出资金"]),
-                            "netFlow": self._safe_float(row["净额"]),
-                            "companyCount": self._safe_int(row["公司家数"])
-                        }
-
-                        # 添加领涨股相关数据，如果存在
-                        if "领涨股" in row:
-                            item["leadingStock"] = str(row["领涨股"])
-                        if "领涨股-涨跌幅" in row:
-                            item["leadingStockChange"] = self._safe_percent(row["领涨股-涨跌幅"])
-                        if "当前价" in row:
-                            item["leadingStockPrice"] = self._safe_float(row["当前价"])
-
-                        result.append(item)
-                    except Exception as e:
-                        self.logger.warning(f"处理行业资金流向数据行时出错: {str(e)}")
-                        continue
+                result = frame_to_records(fund_flow_data, INDUSTRY_FLOW_REALTIME_FIELDS, optional=LEADING_STOCK_KEYS)
             else:
-                for _, row in fund_flow_data.iterrows():
-                    try:
-                        item = {
-                            "rank": self._safe_int(row["序号"]),
-                            "industry": str(row["行业"]),
-                            "companyCount": self._safe_int(row["公司家数"]),
-                            "index": self._safe_float(row["行业指数"]),
-                            "change": self._safe_percent(row["阶段涨跌幅"]),
-                            "inflow": self._safe_float(row["流入资金"]),
-                            "outflow": self._safe_float(row["流出资金"]),
-                            "netFlow": self._safe_float(row["净额"])
-                        }
-                        result.append(item)
-                    except Exception as e:
-                        self.logger.warning(f"处理行业资金流向数据行时出错: {str(e)}")
-                        continue
+                result = frame_to_records(fund_flow_data, INDUSTRY_FLOW_FIELDS)
 
             # 缓存结果
             self.data_cache[cache_key] = (datetime.now(), result)
@@ -443,91 +432,9 @@ class IndustryAnalyzer:
             return "无法生成投资建议"
 
     def compare_industries(self, limit=10):
-        """比较不同行业的表现"""
+        """比较不同行业的表现（各板块历史并发获取并缓存，见 IndustryBoardHistory）"""
         try:
-            # 获取行业板块数据
-            industry_data = ak.stock_board_industry_name_em()
-
-            # 提取行业名称列表
-            industries = industry_data['板块名称'].tolist() if '板块名称' in industry_data.columns else []
-
-            if not industries:
-                return {"error": "获取行业列表失败"}
-
-            # 限制分析的行业数量
-            industries = industries[:limit] if limit else industries
-
-            # 分析各行业情况
-            industry_results = []
-
-            for industry in industries:
-                try:
-                    # 尝试获取行业板块代码
-                    industry_code = None
-                    for _, row in industry_data.iterrows():
-                        if row['板块名称'] == industry:
-                            industry_code = row['板块代码']
-                            break
-
-                    if not industry_code:
-                        self.logger.warning(f"未找到行业 {industry} 的板块代码")
-                        continue
-
-                    # 尝试使用不同的参数来获取行业数据 - 不使用"3m"
-                    try:
-                        # 尝试不使用period参数
-                        industry_info = ak.stock_board_industry_hist_em(symbol=industry_code)
-                    except Exception as e1:
-                        try:
-                            # 尝试使用daily参数
-                            industry_info = ak.stock_board_industry_hist_em(symbol=industry_code, period="daily")
-                        except Exception as e2:
-                            self.logger.warning(f"分析行业 {industry} 历史数据失败: {str(e1)}, {str(e2)}")
-                            continue
-
-                    # 计算行业涨跌幅
-                    if not industry_info.empty:
-                        latest = industry_info.iloc[0]
-
-                        # 尝试获取涨跌幅，列名可能有变化
-                        change = 0.0
-                        if '涨跌幅' in latest.index:
-                            change = latest['涨跌幅']
-                        elif '涨跌幅' in industry_info.columns:
-                            change = latest['涨跌幅']
-
-                        # 尝试获取成交量和成交额
-                        volume = 0.0
-                        turnover = 0.0
-                        if '成交量' in latest.index:
-                            volume = latest['成交量']
-                        elif '成交量' in industry_info.columns:
-                            volume = latest['成交量']
-
-                        if '成交额' in latest.index:
-                            turnover = latest['成交额']
-                        elif '成交额' in industry_info.columns:
-                            turnover = latest['成交额']
-
-                        industry_results.append({
-                            "industry": industry,
-                            "change": float(change) if change else 0.0,
-                            "volume": float(volume) if volume else 0.0,
-                            "turnover": float(turnover) if turnover else 0.0
-                        })
-                except Exception as e:
-                    self.logger.error(f"分析行业 {industry} 时出错: {str(e)}")
-
-            # 按涨跌幅排序
-            industry_results.sort(key=lambda x: x.get('change', 0), reverse=True)
-
-            return {
-                "count": len(industry_results),
-                "top_industries": industry_results[:5] if len(industry_results) >= 5 else industry_results,
-                "bottom_industries": industry_results[-5:] if len(industry_results) >= 5 else [],
-                "results": industry_results
-            }
-
+            return self.board_history.compare(limit)
         except Exception as e:
             self.logger.error(f"比较行业表现时出错: {str(e)}")
-            return {"error": f"比较行业表现时出错: {str(e)}"}
\ No newline at end of file
+            return {"error": f"比较行业表现时出错: {str(e)}"}
@@ -0,0 +1,194 @@
+# app/analysis/industry_board_history.py
+"""
+行业板块历史行情缓存与横向比较
+
+compare_industries 原先逐个行业串行调用 ak.stock_board_industry_hist_em，全部约90个行业要
+串行请求约90次。这里在共享分析线程池中并发获取各板块历史（按 akshare 限速），每个板块的
+历史缓存到收盘（15:05）为止；过期后只请求缓存最后一天之后的行情并合并，不再重取整段历史。
+各板块的收盘价、涨跌幅、成交量、成交额对齐为「日期 × 板块」面板，排名在同一交易日上计算。
+
+请求时传入板块代码（BKxxxx），akshare 收到板块名称时每次都要先请求一遍板块列表来查代码。
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from app.analysis.market_scan_engine import get_analysis_executor, get_rate_limiter
+
+# 面板字段：(输出键, 源列名)
+BOARD_FIELDS = (("close", "收盘"), ("change", "涨跌幅"), ("volume", "成交量"), ("turnover", "成交额"))
+
+# 每日行情在收盘后几分钟才稳定
+MARKET_CLOSE = (15, 5)
+
+
+def next_close_time(now=None):
+    """下一个收盘时间（时间戳）：当天收盘前为当天，否则为下一个交易日（不区分节假日）"""
+    now = now or datetime.now()
+    close = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+    if now.weekday() >= 5 or now >= close:
+        close = (pd.Timestamp(close) + pd.offsets.BDay()).to_pydatetime()
+    return close.timestamp()
+
+
+class IndustryBoardHistory:
+    def __init__(self, history_days=None, list_ttl=None):
+        """
+        Args:
+            history_days: 每个板块保留的交易日数
+            list_ttl: 行业板块列表缓存时间（秒）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.history_days = int(history_days or os.getenv('INDUSTRY_HISTORY_DAYS', 60))
+        self.list_ttl = float(list_ttl if list_ttl is not None else os.getenv('INDUSTRY_BOARD_LIST_TTL', 300))
+
+        # 板块代码 -> (历史 DataFrame, 有效期截止时间戳)；过期后保留旧数据用于增量更新
+        self._histories = {}
+        self._board_list = None
+        self._board_list_at = 0.0
+        self._lock = threading.Lock()
+        # 每个板块一把锁，同一板块同时只请求一次
+        self._board_locks = {}
+
+    # ---- 板块列表 ----
+
+    def board_list(self):
+        """行业板块列表（含 板块名称、板块代码 列），获取失败时返回上一次的结果"""
+        with self._lock:
+            if self._board_list is not None and time.time() - self._board_list_at < self.list_ttl:
+                return self._board_list
+        try:
+            frame = ak.stock_board_industry_name_em()
+        except Exception as e:
+            self.logger.error(f"获取行业板块列表失败: {e}")
+            return self._board_list
+        with self._lock:
+            self._board_list = frame
+            self._board_list_at = time.time()
+        return frame
+
+    # ---- 单个板块历史 ----
+
+    def _board_lock(self, board_code):
+        with self._lock:
+            return self._board_locks.setdefault(board_code, threading.Lock())
+
+    def history(self, board_code):
+        """板块最近 history_days 个交易日的行情（日期升序），无数据时返回 None"""
+        with self._board_lock(board_code):
+            today = datetime.now()
+            with self._lock:
+                cached, valid_until = self._histories.get(board_code, (None, 0.0))
+            if cached is not None and today.timestamp() < valid_until:
+                return cached
+
+            if cached is not None and not cached.empty:
+                # 从缓存最后一天开始请求：那一天可能是盘中数据，需要用收盘数据覆盖
+                start = pd.Timestamp(cached['日期'].iloc[-1])
+            else:
+                start = pd.Timestamp(today - timedelta(days=self.history_days * 2 + 10))
+
+            get_rate_limiter('akshare').acquire()
+            try:
+                frame = ak.stock_board_industry_hist_em(symbol=board_code, start_date=start.strftime('%Y%m%d'),
+                                                        end_date=today.strftime('%Y%m%d'), period="日k")
+            except Exception as e:
+                self.logger.warning(f"获取行业板块 {board_code} 历史行情失败: {e}")
+                return cached
+
+            merged = self._merge(cached, frame)
+            with self._lock:
+                self._histories[board_code] = (merged, next_close_time(today))
+            return merged
+
+    def _merge(self, cached, frame):
+        """把新取得的行情并入缓存，同一日期以新数据为准"""
+        if frame is None or frame.empty or '日期' not in frame.columns:
+            return cached
+        frame = frame.copy()
+        frame['日期'] = pd.to_datetime(frame['日期'], errors='coerce').dt.strftime('%Y-%m-%d')
+        if cached is not None:
+            frame = pd.concat([cached, frame], ignore_index=True)
+        frame = frame.dropna(subset=['日期']).drop_duplicates('日期', keep='last').sort_values('日期')
+        return frame.tail(self.history_days).reset_index(drop=True)
+
+    def fetch_many(self, board_codes):
+        """在共享分析线程池中并发获取多个板块的历史，返回 {板块代码: DataFrame}"""
+        executor = get_analysis_executor()
+        futures = {code: executor.submit(self.history, code) for code in dict.fromkeys(board_codes)}
+        histories = {}
+        for code, future in futures.items():
+            try:
+                frame = future.result()
+            except Exception as e:
+                self.logger.warning(f"获取行业板块 {code} 历史行情出错: {e}")
+                continue
+            if frame is not None and not frame.empty:
+                histories[code] = frame
+        return histories
+
+    # ---- 面板与比较 ----
+
+    @staticmethod
+    def build_panels(histories):
+        """把各板块历史对齐为面板：{字段: DataFrame(索引为日期升序，列为板块代码)}"""
+        panels = {}
+        for key, column in BOARD_FIELDS:
+            series = {code: pd.to_numeric(frame[column], errors='coerce').set_axis(frame['日期'])
+                      for code, frame in histories.items() if column in frame.columns}
+            panels[key] = pd.DataFrame(series).sort_index()
+        return panels
+
+    def compare(self, limit=10):
+        """
+        比较行业板块表现
+
+        Args:
+            limit: 比较的行业数量（按板块列表顺序取前 limit 个），0/None 表示全部
+        Returns:
+            dict: count / date / top_industries / bottom_industries / results（按当日涨跌幅降序）
+        """
+        boards = self.board_list()
+        if boards is None or '板块名称' not in boards.columns or '板块代码' not in boards.columns:
+            return {"error": "获取行业列表失败"}
+        boards = boards[['板块名称', '板块代码']].dropna()
+        if limit:
+            boards = boards.head(limit)
+        if boards.empty:
+            return {"error": "获取行业列表失败"}
+
+        histories = self.fetch_many(boards['板块代码'].tolist())
+        panels = self.build_panels(histories)
+        change = panels['change']
+        if change.empty:
+            return {"count": 0, "date": None, "top_industries": [], "bottom_industries": [], "results": []}
+
+        # 取数据最完整的最近一个交易日，所有板块在同一天上排名
+        counts = change.notna().sum(axis=1)
+        date = counts[counts == counts.max()].index[-1]
+        close = panels['close'].loc[:date]
+        latest = pd.DataFrame({
+            "change": change.loc[date],
+            "change_5d": (close.iloc[-1] / close.iloc[-6] - 1) * 100 if len(close) > 5 else np.nan,
+            "change_20d": (close.iloc[-1] / close.iloc[-21] - 1) * 100 if len(close) > 20 else np.nan,
+            "volume": panels['volume'].loc[date],
+            "turnover": panels['turnover'].loc[date],
+        }).dropna(subset=['change'])
+
+        names = dict(zip(boards['板块代码'], boards['板块名称']))
+        latest = latest.round(4).fillna(0.0).sort_values('change', ascending=False, kind='stable')
+        results = [dict(industry=names.get(code, code), code=code, **row)
+                   for code, row in zip(latest.index, latest.to_dict('records'))]
+        return {
+            "count": len(results),
+            "date": date,
+            "top_industries": results[:5] if len(results) >= 5 else results,
+            "bottom_industries": results[-5:] if len(results) >= 5 else [],
+            "results": results
+        }
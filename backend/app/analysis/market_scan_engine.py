@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+智能分析系统（股票） - 股票市场数据分析系统
+市场扫描引擎：有界线程池并发获取行情、批量计算指标与评分、按数据源限速、流式推送部分结果、支持取消
+"""
+# market_scan_engine.py
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from app.analysis.task_manager import TaskCancelledException
+
+# 各数据源默认的每秒请求上限，可通过环境变量 SCAN_RATE_LIMIT_<SOURCE> 覆盖
+DEFAULT_RATE_LIMITS = {
+    'akshare': 20.0,
+}
+
+# 各市场扫描时主要依赖的数据源
+MARKET_SOURCES = {
+    'A': 'akshare',
+    'HK': 'akshare',
+    'US': 'akshare',
+}
+
+
+class RateLimiter:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Args:
+            rate: 每秒允许的请求数，<=0 表示不限速
+            burst: 桶容量，默认与 rate 相同（至少为1）
+        """
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """获取令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(source: str) -> RateLimiter:
+    """获取进程内共享的数据源限速器"""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(source)
+        if limiter is None:
+            rate = float(os.getenv(f"SCAN_RATE_LIMIT_{source.upper()}", DEFAULT_RATE_LIMITS.get(source, 0)))
+            limiter = RateLimiter(rate)
+            _rate_limiters[source] = limiter
+        return limiter
+
+
+_analysis_executor: Optional[ThreadPoolExecutor] = None
+_analysis_executor_lock = threading.Lock()
+
+
+def get_analysis_executor() -> ThreadPoolExecutor:
+    """
+    获取进程内共享的分析线程池（SCAN_MAX_WORKERS 个线程）
+
+    市场扫描、指数/行业成分股分析共用同一个线程池，并发请求再多，
+    同时访问数据源的线程总数也不超过池大小。
+    """
+    global _analysis_executor
+    with _analysis_executor_lock:
+        if _analysis_executor is None:
+            _analysis_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SCAN_MAX_WORKERS', 10)),
+                                                    thread_name_prefix='stock-analysis')
+        return _analysis_executor
+
+
+class MarketScanEngine:
+    """
+    市场扫描引擎 - StockAnalyzer.scan_market 与 /start_market_scan 共用的扫描实现
+
+    - 使用进程内共享的分析线程池，单次扫描的在途任务数不超过 max_workers 的两倍，避免一次性提交数千个 future
+    - 每只股票取数前按数据源限速
+    - 线程池只负责取数；取回的行情累积到 score_batch_size 只（或需要推送进度）时，
+      由 analyzer.quick_analyze_batch 在面板上一次计算指标与评分，不再逐只计算
+      （指定 analyze_fn 时仍逐只分析）
+    - 按 progress_interval 节流，把部分结果、吞吐量和预计剩余时间写入任务
+    - 每完成一只股票检查本地取消标记（由 TaskManager 推送），取消后不再提交新的股票
+    """
+
+    def __init__(self, analyzer, task_manager=None, max_workers: Optional[int] = None,
+                 progress_interval: float = 1.0, score_batch_size: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.analyzer = analyzer
+        self.task_manager = task_manager
+        self.max_workers = max_workers or int(os.getenv('SCAN_MAX_WORKERS', 10))
+        self.progress_interval = progress_interval
+        self.score_batch_size = score_batch_size or int(os.getenv('SCAN_SCORE_BATCH_SIZE', 500))
+
+    def scan(self, stock_list: List[str], min_score: int = 60, market_type: str = 'A',
+             task_id: Optional[str] = None, analyze_fn: Optional[Callable] = None,
+             cancel_event: Optional[threading.Event] = None) -> List[Dict]:
+        """
+        扫描股票列表，返回评分不低于 min_score 的报告（按评分降序）
+
+        参数:
+            stock_list: 股票代码列表
+            min_score: 最低评分
+            market_type: 市场类型 (A/HK/US)
+            task_id: 关联的任务ID，提供时推送进度并响应取消
+            analyze_fn: 单只股票分析函数；默认用 analyzer.fetch_scan_data 并发取数、
+                        analyzer.quick_analyze_batch 批量评分
+            cancel_event: 本地取消标记
+        异常:
+            TaskCancelledException: 任务被取消
+        """
+        batch = analyze_fn is None
+        limiter = get_rate_limiter(MARKET_SOURCES.get(market_type, 'akshare'))
+        cancel_event = cancel_event or threading.Event()
+
+        total = len(stock_list)
+        results = []
+        processed = 0
+        failed = 0
+        start_time = time.time()
+        last_report = 0.0
+        # 已取回、尚未评分的行情和股票信息
+        frames = {}
+        stock_infos = {}
+
+        self.logger.info(f"开始市场扫描，共 {total} 只股票，并发数 {self.max_workers}")
+
+        def run_one(stock_code):
+            if cancel_event.is_set():
+                return None
+            limiter.acquire()
+            if batch:
+                return self.analyzer.fetch_scan_data(stock_code, market_type)
+            return analyze_fn(stock_code, market_type)
+
+        def collect(report):
+            if report and report.get('score', 0) >= min_score:
+                results.append(report)
+
+        def score_frames():
+            nonlocal failed
+            if not frames:
+                return
+            try:
+                reports = self.analyzer.quick_analyze_batch(frames, stock_infos, market_type)
+            except Exception as e:
+                failed += len(frames)
+                self.logger.error(f"批量评分 {len(frames)} 只股票时出错: {str(e)}")
+                reports = {}
+            finally:
+                frames.clear()
+                stock_infos.clear()
+            for report in reports.values():
+                collect(report)
+
+        pending = {}
+        codes = iter(stock_list)
+        executor = get_analysis_executor()
+        try:
+            def submit_more():
+                while len(pending) < self.max_workers * 2 and not cancel_event.is_set():
+                    code = next(codes, None)
+                    if code is None:
+                        return
+                    pending[executor.submit(run_one, code)] = code
+
+            submit_more()
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    stock_code = pending.pop(future)
+                    try:
+                        result = future.result()
+                        if not batch:
+                            collect(result)
+                        elif result is not None:
+                            frames[stock_code], stock_infos[stock_code] = result
+                    except Exception as e:
+                        failed += 1
+                        self.logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
+                    processed += 1
+
+                if len(frames) >= self.score_batch_size:
+                    score_frames()
+
+                if self._is_cancelled(task_id):
+                    cancel_event.set()
+
+                now = time.time()
+                if now - last_report >= self.progress_interval or processed == total:
+                    last_report = now
+                    # 有任务在等待部分结果时，推送前先为已取回的股票评分
+                    if task_id and self.task_manager:
+                        score_frames()
+                    self._report_progress(task_id, results, processed, failed, total, start_time)
+
+                if cancel_event.is_set():
+                    for future in pending:
+                        future.cancel()
+                    pending.clear()
+                    break
+                submit_more()
+            score_frames()
+        finally:
+            if task_id and self.task_manager:
+                self.task_manager.release_cancel_event(task_id)
+
+        results.sort(key=lambda x: x['score'], reverse=True)
+        elapsed = time.time() - start_time
+
+        if cancel_event.is_set() and processed < total:
+            self.logger.info(f"市场扫描已取消，已处理 {processed}/{total} 只股票")
+            raise TaskCancelledException(f"扫描任务已取消，已处理 {processed}/{total} 只股票")
+
+        self.logger.info(
+            f"市场扫描完成，共分析 {total} 只股票，找到 {len(results)} 只符合条件的股票，"
+            f"失败 {failed} 只，总耗时 {elapsed:.1f}秒")
+        return results
+
+    def _is_cancelled(self, task_id):
+        """检查 TaskManager 维护的本地取消标记，不访问 Redis"""
+        if not task_id or not self.task_manager:
+            return False
+        return self.task_manager.is_cancelled(task_id)
+
+    def _report_progress(self, task_id, results, processed, failed, total, start_time):
+        elapsed = time.time() - start_time
+        throughput = processed / elapsed if elapsed > 0 else 0.0
+        eta = (total - processed) / throughput if throughput > 0 else None
+
+        self.logger.info(
+            f"已处理 {processed}/{total} 只股票，耗时 {elapsed:.1f}秒，"
+            f"速度 {throughput:.1f}只/秒，预计剩余 {eta or 0:.1f}秒")
+
+        if not task_id or not self.task_manager:
+            return
+        partial = sorted(results, key=lambda x: x['score'], reverse=True)
+        self.task_manager.update_task(
+            task_id,
+            progress=int(processed / total * 100) if total else 100,
+            result={
+                'partial_results': partial,
+                'processed': processed,
+                'failed': failed,
+                'total': total,
+                'throughput': round(throughput, 2),
+                'eta_seconds': round(eta, 1) if eta is not None else None,
+            }
+        )
@@ -0,0 +1,76 @@
+# app/analysis/monte_carlo.py
+"""
+蒙特卡洛价格路径模拟
+
+一次生成「路径数 × 天数」的对数收益矩阵，按行累加得到全部路径，不逐步循环：
+    gbm        几何布朗运动，日对数收益 ~ N(μ, σ)，μ、σ 取自历史对数收益
+    bootstrap  从历史对数收益中有放回抽样，保留厚尾和偏度
+
+所有结果都在对数价格上计算。给路径叠加确定性漂移 d·t 不改变分位数的排序，
+因此多种情景可以共用同一组随机数，只需把分位数平移，不必重复模拟。
+"""
+import numpy as np
+
+SIMULATION_METHODS = ('gbm', 'bootstrap')
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def historical_log_returns(close):
+    """收盘价序列的日对数收益（去掉缺失和非正价格）"""
+    close = np.asarray(close, dtype=float)
+    close = close[np.isfinite(close) & (close > 0)]
+    return np.diff(np.log(close))
+
+
+def simulate_log_paths(returns, days, paths=10000, method='gbm', seed=None):
+    """
+    模拟累计对数收益路径
+
+    Args:
+        returns: 历史日对数收益
+        days: 模拟天数
+        paths: 路径数
+        method: 'gbm' 或 'bootstrap'
+        seed: 随机种子，相同种子得到相同结果
+    Returns:
+        ndarray: (paths, days + 1)，第0列为0（当前价格）
+    """
+    if method not in SIMULATION_METHODS:
+        raise ValueError(f"不支持的模拟方法: {method}")
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    if len(returns) < 2:
+        raise ValueError("历史收益数据不足，无法模拟")
+
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        steps = rng.choice(returns, size=(paths, days))
+    else:
+        steps = rng.standard_normal((paths, days))
+        steps *= returns.std(ddof=1)
+        steps += returns.mean()
+    log_paths = np.zeros((paths, days + 1))
+    np.cumsum(steps, axis=1, out=log_paths[:, 1:])
+    return log_paths
+
+
+def percentile_bands(log_paths, percentiles=DEFAULT_PERCENTILES):
+    """每一天各分位数的累计对数收益，返回 {分位数: ndarray(days + 1)}"""
+    values = np.percentile(log_paths, percentiles, axis=0)
+    return dict(zip(percentiles, values))
+
+
+def target_probability(log_paths, log_target):
+    """
+    到达目标的概率（目标高于当前价格为上涨目标，否则为下跌目标）
+
+    Returns:
+        (期末达到目标的概率, 期间任意一天触及目标的概率)
+    """
+    if log_target >= 0:
+        final = np.mean(log_paths[:, -1] >= log_target)
+        touch = np.mean(log_paths.max(axis=1) >= log_target)
+    else:
+        final = np.mean(log_paths[:, -1] <= log_target)
+        touch = np.mean(log_paths.min(axis=1) <= log_target)
+    return float(final), float(touch)
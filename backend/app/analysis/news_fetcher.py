@@ -14,6 +14,7 @@ import hashlib
 from datetime import datetime, timedelta, date
 import akshare as ak
 import pandas as pd
+from app.tradingagents.utils.news_dedup import NearDuplicateIndex
 
 # A dictionary mapping news source keys to their akshare function and parameters
 NEWS_SOURCES = {
@@ -26,6 +27,10 @@ NEWS_SOURCES = {
 }
 
 
+# 去重时保留的新闻天数，与加载哈希值的范围一致
+DEDUP_RETENTION_DAYS = 3
+
+
 # 设置日志
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -50,6 +55,10 @@ class NewsFetcher:
 
         # 哈希集合用于快速判断新闻是否已存在
         self.news_hashes = set()
+        # 近似重复索引：识别不同来源转载、措辞略有差异的同一条新闻，保存在本地以便下次运行继续使用
+        self.near_dup_index_path = os.path.join(self.save_dir, "near_duplicate_index.npz")
+        self.near_dup_index = NearDuplicateIndex.load(
+            self.near_dup_index_path, threshold=float(os.getenv('NEWS_NEAR_DUP_THRESHOLD', 0.6)))
         # 加载已有的新闻哈希
         self._load_existing_hashes()
 
@@ -58,7 +67,9 @@ class NewsFetcher:
         try:
             # 获取最近3天的文件来加载哈希值
             today = datetime.now()
-            for i in range(3):  # 检查今天和前两天的数据
+            # 索引文件不存在（首次运行或升级）时从已保存的新闻重建
+            rebuild_index = len(self.near_dup_index) == 0
+            for i in range(DEDUP_RETENTION_DAYS):  # 检查今天和前两天的数据
                 date = today - timedelta(days=i)
                 filename = self.get_news_filename(date)
 
@@ -69,14 +80,17 @@ class NewsFetcher:
                             for item in news_data:
                                 # 如果有哈希字段就直接使用，否则计算新的哈希
                                 if 'hash' in item:
-                                    self.news_hashes.add(item['hash'])
+                                    content_hash = item['hash']
                                 else:
                                     content_hash = self._calculate_hash(item['content'])
-                                    self.news_hashes.add(content_hash)
+                                self.news_hashes.add(content_hash)
+                                if rebuild_index:
+                                    self.near_dup_index.add(content_hash, self._dedup_text(item),
+                                                            timestamp=self._item_timestamp(item, date))
                         except json.JSONDecodeError:
                             logger.warning(f"文件 {filename} 格式错误，跳过加载哈希值")
 
-            logger.info(f"已加载 {len(self.news_hashes)} 条新闻哈希值")
+            logger.info(f"已加载 {len(self.news_hashes)} 条新闻哈希值，近似重复索引 {len(self.near_dup_index)} 条")
         except Exception as e:
             logger.error(f"加载现有新闻哈希值时出错: {str(e)}")
             # 出错时清空哈希集合，保证程序可以继续运行
@@ -88,6 +102,32 @@ class NewsFetcher:
         # 对于财经新闻，内容通常是唯一的标识，所以只对内容计算哈希
         return hashlib.md5(str(content).encode('utf-8')).hexdigest()
 
+    @staticmethod
+    def _dedup_text(item):
+        """近似重复比较使用的文本：标题 + 内容"""
+        return f"{item.get('title') or ''} {item.get('content') or ''}"
+
+    @staticmethod
+    def _item_timestamp(item, default):
+        """重建索引时条目的登记时间：优先使用保存时的获取时间，其次是发布时间，最后是所在文件的日期"""
+        for field in ('fetch_time', 'datetime', 'date'):
+            value = item.get(field)
+            if value:
+                try:
+                    return pd.to_datetime(value).timestamp()
+                except (ValueError, TypeError):
+                    continue
+        return datetime(default.year, default.month, default.day).timestamp()
+
+    def _save_near_dup_index(self):
+        """清理超出保留天数的条目并保存近似重复索引"""
+        try:
+            cutoff = time.time() - DEDUP_RETENTION_DAYS * 86400
+            self.near_dup_index.prune(cutoff)
+            self.near_dup_index.save(self.near_dup_index_path)
+        except Exception as e:
+            logger.error(f"保存新闻去重索引时出错: {e}")
+
     def get_news_filename(self, date=None):
         """获取指定日期的新闻文件名"""
         if date is None:
@@ -183,6 +223,7 @@ class NewsFetcher:
         
         now = datetime.now()
         all_new_items = []
+        near_duplicate_count = 0
         
         for source in sources:
             news_items = self._fetch_from_source(source)
@@ -196,6 +237,11 @@ class NewsFetcher:
                 if content_hash in self.news_hashes:
                     continue
 
+                # 转载的同一条新闻内容略有差异时哈希不同，再按相似度判断
+                if self.near_dup_index.check_and_add(content_hash, self._dedup_text(item)) is not None:
+                    near_duplicate_count += 1
+                    continue
+
                 self.news_hashes.add(content_hash)
 
                 pub_date = item.get("date", "")
@@ -212,6 +258,10 @@ class NewsFetcher:
                     "source": item.get("source", source)
                 })
         
+        if near_duplicate_count:
+            logger.info(f"跳过 {near_duplicate_count} 条近似重复新闻")
+        self._save_near_dup_index()
+
         if not all_new_items:
             logger.info("没有新的新闻数据需要保存")
             return True
@@ -0,0 +1,116 @@
+# app/analysis/portfolio_risk.py
+"""
+组合风险的协方差计算
+
+把各持仓的收盘价按日期对齐为「日期 × 持仓」收益矩阵，一次矩阵运算得到：
+组合波动率、相关系数矩阵、历史模拟法与参数法（正态）的 VaR/CVaR、
+各持仓的边际风险贡献与风险贡献占比。收益、波动率、VaR 等均以百分比表示。
+"""
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+
+def align_returns(frames, lookback=250):
+    """
+    把各持仓的行情对齐为日收益矩阵
+
+    Args:
+        frames: {股票代码: 含 date、close 列的 DataFrame}
+        lookback: 使用最近多少个交易日的收益
+    Returns:
+        DataFrame: 索引为日期，列为股票代码；停牌日沿用前收盘价（收益为0），
+        只保留所有持仓都已上市的日期
+    """
+    closes = {}
+    for code, df in frames.items():
+        if df is None or df.empty or 'close' not in df.columns:
+            continue
+        index = pd.to_datetime(df['date'], errors='coerce') if 'date' in df.columns else df.index
+        series = pd.Series(pd.to_numeric(df['close'], errors='coerce').to_numpy(), index=index)
+        closes[code] = series[series.index.notna()].groupby(level=0).last()
+    if not closes:
+        return pd.DataFrame()
+
+    prices = pd.DataFrame(closes).sort_index().ffill()
+    returns = prices.pct_change(fill_method=None).iloc[1:].replace([np.inf, -np.inf], np.nan).dropna(how='any')
+    return returns.tail(lookback) if lookback else returns
+
+
+def portfolio_risk_metrics(returns, weights, confidence=0.95):
+    """
+    计算组合风险指标
+
+    Args:
+        returns: align_returns 返回的收益矩阵（T × N）
+        weights: 与 returns 列顺序一致的权重，内部归一化
+        confidence: VaR/CVaR 的置信水平
+    Returns:
+        dict: 组合波动率、VaR/CVaR、相关系数矩阵和各持仓的风险贡献
+    """
+    symbols = list(returns.columns)
+    matrix = returns.to_numpy(dtype=float)
+    if matrix.shape[0] < 2 or not symbols:
+        raise ValueError("可对齐的收益数据不足，无法计算组合风险")
+
+    weights = np.asarray(weights, dtype=float)
+    weights = weights / weights.sum()
+
+    cov = np.atleast_2d(np.cov(matrix, rowvar=False, ddof=1))
+    std = np.sqrt(np.diag(cov))
+    portfolio_returns = matrix @ weights
+    sigma = float(np.sqrt(weights @ cov @ weights))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+        # 边际风险贡献 ∂σ/∂w，风险贡献 w·∂σ/∂w 之和等于组合波动率
+        marginal = cov @ weights / sigma
+    corr = np.nan_to_num(corr)
+    np.fill_diagonal(corr, 1.0)
+    marginal = np.nan_to_num(marginal)
+    component = weights * marginal
+
+    # 历史模拟法：组合日收益的经验分位数
+    alpha = 1 - confidence
+    threshold = np.quantile(portfolio_returns, alpha)
+    historical_var = -threshold
+    historical_cvar = -portfolio_returns[portfolio_returns <= threshold].mean()
+
+    # 参数法：假设组合日收益服从正态分布
+    mean = portfolio_returns.mean()
+    z = NormalDist().inv_cdf(confidence)
+    parametric_var = z * sigma - mean
+    parametric_cvar = sigma * NormalDist().pdf(z) / alpha - mean
+
+    upper = corr[np.triu_indices(len(symbols), k=1)]
+    holdings = [
+        {
+            "stock_code": code,
+            "weight": float(w),
+            "volatility": float(s * np.sqrt(TRADING_DAYS) * 100),
+            "marginal_risk": float(m * np.sqrt(TRADING_DAYS) * 100),
+            "risk_contribution": float(c * np.sqrt(TRADING_DAYS) * 100),
+            "risk_contribution_percent": float(c / sigma * 100) if sigma > 0 else 0.0
+        }
+        for code, w, s, m, c in zip(symbols, weights, std, marginal, component)
+    ]
+    return {
+        "observations": int(matrix.shape[0]),
+        "start_date": returns.index[0].strftime('%Y-%m-%d'),
+        "end_date": returns.index[-1].strftime('%Y-%m-%d'),
+        "daily_volatility": sigma * 100,
+        "annual_volatility": sigma * np.sqrt(TRADING_DAYS) * 100,
+        # 分散化比率：持仓波动率加权和 / 组合波动率，越大说明分散效果越好
+        "diversification_ratio": float(weights @ std / sigma) if sigma > 0 else 1.0,
+        "average_correlation": float(upper.mean()) if len(upper) else 1.0,
+        "var": {
+            "confidence": confidence,
+            "historical": {"var": float(historical_var * 100), "cvar": float(historical_cvar * 100)},
+            "parametric": {"var": float(parametric_var * 100), "cvar": float(parametric_cvar * 100)}
+        },
+        "correlation": {"symbols": symbols, "matrix": np.round(corr, 4).tolist()},
+        "holdings": holdings
+    }
@@ -10,6 +10,10 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from app.analysis.batch_indicator_engine import BatchIndicatorEngine, OHLCVPanel
+from app.analysis.market_scan_engine import MARKET_SOURCES, get_analysis_executor, get_rate_limiter
+from app.analysis.portfolio_risk import align_returns, portfolio_risk_metrics
+
 class RiskMonitor:
     def __init__(self, analyzer):
         self.analyzer = analyzer
@@ -20,73 +24,7 @@ class RiskMonitor:
             # 获取股票数据和技术指标
             df = self.analyzer.get_stock_data(stock_code, market_type)
             df = self.analyzer.calculate_indicators(df)
-
-            # 计算各类风险指标
-            volatility_risk = self._analyze_volatility_risk(df)
-            trend_risk = self._analyze_trend_risk(df)
-            reversal_risk = self._analyze_reversal_risk(df)
-            volume_risk = self._analyze_volume_risk(df)
-
-            # 综合评估总体风险
-            total_risk_score = (
-                    volatility_risk['score'] * 0.3 +
-                    trend_risk['score'] * 0.3 +
-                    reversal_risk['score'] * 0.25 +
-                    volume_risk['score'] * 0.15
-            )
-
-            # 确定风险等级
-            if total_risk_score >= 80:
-                risk_level = "极高"
-            elif total_risk_score >= 60:
-                risk_level = "高"
-            elif total_risk_score >= 40:
-                risk_level = "中等"
-            elif total_risk_score >= 20:
-                risk_level = "低"
-            else:
-                risk_level = "极低"
-
-            # 生成风险警报
-            alerts = []
-
-            if volatility_risk['score'] >= 70:
-                alerts.append({
-                    "type": "volatility",
-                    "level": "高",
-                    "message": f"波动率风险较高 ({volatility_risk['value']:.2f}%)，可能面临大幅波动"
-                })
-
-            if trend_risk['score'] >= 70:
-                alerts.append({
-                    "type": "trend",
-                    "level": "高",
-                    "message": f"趋势风险较高，当前处于{trend_risk['trend']}趋势，可能面临加速下跌"
-                })
-
-            if reversal_risk['score'] >= 70:
-                alerts.append({
-                    "type": "reversal",
-                    "level": "高",
-                    "message": f"趋势反转风险较高，技术指标显示可能{reversal_risk['direction']}反转"
-                })
-
-            if volume_risk['score'] >= 70:
-                alerts.append({
-                    "type": "volume",
-                    "level": "高",
-                    "message": f"成交量异常，{volume_risk['pattern']}，可能预示价格波动"
-                })
-
-            return {
-                "total_risk_score": total_risk_score,
-                "risk_level": risk_level,
-                "volatility_risk": volatility_risk,
-                "trend_risk": trend_risk,
-                "reversal_risk": reversal_risk,
-                "volume_risk": volume_risk,
-                "alerts": alerts
-            }
+            return self._assess_risk(df)
 
         except Exception as e:
             print(f"分析股票风险出错: {str(e)}")
@@ -94,6 +32,75 @@ class RiskMonitor:
                 "error": f"分析风险时出错: {str(e)}"
             }
 
+    def _assess_risk(self, df):
+        """根据已计算指标的行情评估单只股票的风险"""
+        # 计算各类风险指标
+        volatility_risk = self._analyze_volatility_risk(df)
+        trend_risk = self._analyze_trend_risk(df)
+        reversal_risk = self._analyze_reversal_risk(df)
+        volume_risk = self._analyze_volume_risk(df)
+
+        # 综合评估总体风险
+        total_risk_score = (
+                volatility_risk['score'] * 0.3 +
+                trend_risk['score'] * 0.3 +
+                reversal_risk['score'] * 0.25 +
+                volume_risk['score'] * 0.15
+        )
+
+        # 确定风险等级
+        if total_risk_score >= 80:
+            risk_level = "极高"
+        elif total_risk_score >= 60:
+            risk_level = "高"
+        elif total_risk_score >= 40:
+            risk_level = "中等"
+        elif total_risk_score >= 20:
+            risk_level = "低"
+        else:
+            risk_level = "极低"
+
+        # 生成风险警报
+        alerts = []
+
+        if volatility_risk['score'] >= 70:
+            alerts.append({
+                "type": "volatility",
+                "level": "高",
+                "message": f"波动率风险较高 ({volatility_risk['value']:.2f}%)，可能面临大幅波动"
+            })
+
+        if trend_risk['score'] >= 70:
+            alerts.append({
+                "type": "trend",
+                "level": "高",
+                "message": f"趋势风险较高，当前处于{trend_risk['trend']}趋势，可能面临加速下跌"
+            })
+
+        if reversal_risk['score'] >= 70:
+            alerts.append({
+                "type": "reversal",
+                "level": "高",
+                "message": f"趋势反转风险较高，技术指标显示可能{reversal_risk['direction']}反转"
+            })
+
+        if volume_risk['score'] >= 70:
+            alerts.append({
+                "type": "volume",
+                "level": "高",
+                "message": f"成交量异常，{volume_risk['pattern']}，可能预示价格波动"
+            })
+
+        return {
+            "total_risk_score": total_risk_score,
+            "risk_level": risk_level,
+            "volatility_risk": volatility_risk,
+            "trend_risk": trend_risk,
+            "reversal_risk": reversal_risk,
+            "volume_risk": volume_risk,
+            "alerts": alerts
+        }
+
     def _analyze_volatility_risk(self, df):
         """分析波动率风险"""
         # 计算近期波动率
@@ -260,34 +267,34 @@ class RiskMonitor:
             "risk_level": "高" if score >= 60 else "中" if score >= 30 else "低"
         }
 
-    def analyze_portfolio_risk(self, portfolio):
-        """分析投资组合整体风险"""
+    def analyze_portfolio_risk(self, portfolio, confidence=0.95, lookback=250):
+        """
+        分析投资组合整体风险
+
+        所有持仓的行情在共享分析线程池中并发获取（每只只取一次），技术指标由批量引擎
+        一次算完；各持仓收益对齐为一个矩阵，计算组合波动率、相关系数、VaR/CVaR 和风险贡献。
+        """
         try:
             if not portfolio or len(portfolio) == 0:
                 return {"error": "投资组合为空"}
 
-            # 分析每只股票的风险
-            stock_risks = {}
-            total_weight = 0
-            weighted_risk_score = 0
-
+            # 合并重复持仓
+            holdings = {}
             for stock in portfolio:
                 stock_code = stock.get('stock_code')
-                weight = stock.get('weight', 1)
-                market_type = stock.get('market_type', 'A')
-
                 if not stock_code:
                     continue
+                weight, market_type = holdings.get(stock_code, (0, stock.get('market_type', 'A')))
+                holdings[stock_code] = (weight + stock.get('weight', 1), market_type)
 
-                # 分析股票风险
-                risk = self.analyze_stock_risk(stock_code, market_type)
-                stock_risks[stock_code] = risk
-
-                # 计算加权风险分数
-                total_weight += weight
-                weighted_risk_score += risk.get('total_risk_score', 50) * weight
+            frames, stock_infos, failed = self._fetch_holdings(holdings)
+            assessed = self._assess_holdings(frames)
+            stock_risks = {code: assessed.get(code) or failed.get(code, {}) for code in holdings}
 
             # 计算组合总风险分数
+            total_weight = sum(weight for weight, _ in holdings.values())
+            weighted_risk_score = sum(stock_risks[code].get('total_risk_score', 50) * weight
+                                      for code, (weight, _) in holdings.items())
             if total_weight > 0:
                 portfolio_risk_score = weighted_risk_score / total_weight
             else:
@@ -325,8 +332,18 @@ class RiskMonitor:
                         **alert
                     })
 
+            # 基于收益协方差的组合风险
+            returns = align_returns(frames, lookback)
+            try:
+                metrics = portfolio_risk_metrics(returns, [holdings[code][0] for code in returns.columns],
+                                                 confidence)
+                metrics["excluded"] = [code for code in holdings if code not in returns.columns]
+                all_alerts.extend(self._portfolio_alerts(metrics))
+            except ValueError as e:
+                metrics = {"error": str(e)}
+
             # 分析风险集中度
-            risk_concentration = self._analyze_risk_concentration(portfolio, stock_risks)
+            risk_concentration = self._analyze_risk_concentration(portfolio, stock_risks, stock_infos)
 
             return {
                 "portfolio_risk_score": portfolio_risk_score,
@@ -334,6 +351,7 @@ class RiskMonitor:
                 "high_risk_stocks": high_risk_stocks,
                 "alerts": all_alerts,
                 "risk_concentration": risk_concentration,
+                "portfolio_metrics": metrics,
                 "stock_risks": stock_risks
             }
 
@@ -343,13 +361,87 @@ class RiskMonitor:
                 "error": f"分析投资组合风险时出错: {str(e)}"
             }
 
-    def _analyze_risk_concentration(self, portfolio, stock_risks):
+    def _fetch_holdings(self, holdings):
+        """
+        并发获取所有持仓的行情和基本信息（按数据源限速）
+
+        Returns:
+            (行情 {代码: DataFrame}, 基本信息 {代码: dict}, 获取失败的持仓 {代码: {"error": ...}})
+        """
+        def fetch(stock_code, market_type):
+            limiter = get_rate_limiter(MARKET_SOURCES.get(market_type, 'akshare'))
+            limiter.acquire()
+            df = self.analyzer.get_stock_data(stock_code, market_type)
+            limiter.acquire()
+            try:
+                info = self.analyzer.get_stock_info(stock_code)
+            except Exception:
+                info = {}
+            return df, info
+
+        executor = get_analysis_executor()
+        futures = {code: executor.submit(fetch, code, market_type) for code, (_, market_type) in holdings.items()}
+        frames, stock_infos, failed = {}, {}, {}
+        for code, future in futures.items():
+            try:
+                df, info = future.result()
+            except Exception as e:
+                failed[code] = {"error": f"分析风险时出错: {str(e)}"}
+                continue
+            if df is None or df.empty:
+                failed[code] = {"error": "分析风险时出错: 无行情数据"}
+                continue
+            frames[code] = df
+            stock_infos[code] = info if isinstance(info, dict) else {}
+        return frames, stock_infos, failed
+
+    def _assess_holdings(self, frames):
+        """用批量指标引擎一次计算所有持仓的技术指标，再逐只评估风险"""
+        engine = BatchIndicatorEngine(getattr(self.analyzer, 'params', None))
+        panel = OHLCVPanel.from_frames(frames)
+        if not panel.symbols:
+            return {}
+        indicators = engine.calculate_indicators(panel)
+
+        stock_risks = {}
+        for i, code in enumerate(panel.symbols):
+            try:
+                stock_risks[code] = self._assess_risk(engine.to_frame(panel, indicators, i))
+            except Exception as e:
+                stock_risks[code] = {"error": f"分析风险时出错: {str(e)}"}
+        return stock_risks
+
+    def _portfolio_alerts(self, metrics):
+        """组合层面的风险警报：风险贡献过于集中、持仓高度相关"""
+        alerts = []
+        for holding in metrics['holdings']:
+            contribution = holding['risk_contribution_percent']
+            if len(metrics['holdings']) > 1 and contribution >= 30 and contribution >= holding['weight'] * 150:
+                alerts.append({
+                    "stock_code": holding['stock_code'],
+                    "type": "risk_contribution",
+                    "level": "高",
+                    "message": f"风险贡献占组合的 {contribution:.1f}%，远高于其权重 {holding['weight'] * 100:.1f}%"
+                })
+        if len(metrics['holdings']) > 1 and metrics['average_correlation'] >= 0.7:
+            alerts.append({
+                "stock_code": None,
+                "type": "correlation",
+                "level": "高",
+                "message": f"持仓平均相关系数 {metrics['average_correlation']:.2f}，分散效果有限"
+            })
+        return alerts
+
+    def _analyze_risk_concentration(self, portfolio, stock_risks, stock_infos=None):
         """分析风险集中度"""
         # 分析行业集中度
         industries = {}
         for stock in portfolio:
             stock_code = stock.get('stock_code')
-            stock_info = self.analyzer.get_stock_info(stock_code)
+            if stock_infos is not None:
+                stock_info = stock_infos.get(stock_code, {})
+            else:
+                stock_info = self.analyzer.get_stock_info(stock_code)
             industry = stock_info.get('行业', '未知')
             weight = stock.get('weight', 1)
 
@@ -14,6 +14,9 @@ import openai
 from openai import OpenAI
 import logging
 from logging.handlers import RotatingFileHandler
+
+from app.analysis.monte_carlo import (SIMULATION_METHODS, historical_log_returns, simulate_log_paths,
+                                      percentile_bands, target_probability)
 """
 
 """
@@ -22,6 +25,49 @@ from logging.handlers import RotatingFileHandler
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+# 模拟矩阵为 路径数 × 天数，请求参数超过上限时截断到上限，避免单次请求占用过多内存和CPU
+SCENARIO_SIMULATION_MAX_PATHS = int(os.getenv('SCENARIO_SIMULATION_MAX_PATHS', 50000))
+SCENARIO_MAX_DAYS = int(os.getenv('SCENARIO_MAX_DAYS', 365))
+
+
+def _positive_int(value, name):
+    if isinstance(value, bool):
+        raise ValueError(f"{name} 必须是正整数")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是正整数") from None
+    if number <= 0:
+        raise ValueError(f"{name} 必须是正整数")
+    return number
+
+
+def limit_simulation_args(days, paths=None, method=None, seed=None):
+    """
+    校验并限制情景预测的模拟参数
+
+    Returns:
+        (days, paths, method, seed)：超过上限的截断到 SCENARIO_MAX_DAYS / SCENARIO_SIMULATION_MAX_PATHS，
+        未指定的 paths / method / seed 仍为 None
+    Raises:
+        ValueError: days / paths 不是正整数，method 不在 SIMULATION_METHODS 中，或 seed 不是非负整数
+    """
+    days = min(_positive_int(days, 'days'), SCENARIO_MAX_DAYS)
+    if paths is not None:
+        paths = min(_positive_int(paths, 'paths'), SCENARIO_SIMULATION_MAX_PATHS)
+    if method is not None and method not in SIMULATION_METHODS:
+        raise ValueError(f"method 必须是 {' / '.join(SIMULATION_METHODS)} 之一")
+    if seed is not None:
+        if isinstance(seed, bool) or not isinstance(seed, (int, str)):
+            raise ValueError("seed 必须是非负整数")
+        try:
+            seed = int(seed)
+        except ValueError:
+            raise ValueError("seed 必须是非负整数") from None
+        if seed < 0:
+            raise ValueError("seed 必须是非负整数")
+    return days, paths, method, seed
+
 class ScenarioPredictor:
     def __init__(self, analyzer, openai_api_key=None, openai_model=None):
         self.analyzer = analyzer
@@ -34,8 +80,16 @@ class ScenarioPredictor:
         )
         # logging.info(f"scenario_predictor初始化完成：「{self.openai_api_key} {self.openai_api_url} {self.openai_model}」")
 
-    def generate_scenarios(self, stock_code, market_type='A', days=60):
-        """生成乐观、中性、悲观三种市场情景预测"""
+    def generate_scenarios(self, stock_code, market_type='A', days=60, method=None, paths=None, seed=None):
+        """
+        生成乐观、中性、悲观三种市场情景预测
+
+        Args:
+            method: 路径模拟方法 'gbm' 或 'bootstrap'，默认取 SCENARIO_SIMULATION_METHOD
+            paths: 模拟路径数，默认取 SCENARIO_SIMULATION_PATHS；days 与 paths 超过上限时截断（见 limit_simulation_args）
+            seed: 随机种子（非负整数），指定后结果可复现
+            参数应先经 limit_simulation_args 校验，非法参数在这里与其他错误一样返回空结果
+        """
         try:
             # 获取股票数据和技术指标
             df = self.analyzer.get_stock_data(stock_code, market_type)
@@ -49,7 +103,7 @@ class ScenarioPredictor:
             avg_volatility = df['Volatility'].mean()
 
             # 根据历史波动率计算情景
-            scenarios = self._calculate_scenarios(df, days)
+            scenarios = self._calculate_scenarios(df, days, method=method, paths=paths, seed=seed)
 
             # 使用AI生成各情景的分析
             if self.openai_api_key:
@@ -62,15 +116,20 @@ class ScenarioPredictor:
             # logging.info(f"生成情景预测出错: {str(e)}")
             return {}
 
-    def _calculate_scenarios(self, df, days):
-        """基于历史数据计算三种情景的价格预测"""
+    def _calculate_scenarios(self, df, days, method=None, paths=None, seed=None):
+        """
+        基于历史数据计算三种情景的价格预测
+
+        用历史日对数收益一次模拟 paths 条路径（gbm 或 bootstrap，见 monte_carlo），
+        各情景共用同一组路径，只把漂移调整到指向各自的目标价，
+        返回每个情景的中位数路径、分位数区间，以及按历史漂移到达目标价的概率。
+        """
         current_price = df.iloc[-1]['close']
+        days, paths, method, seed = limit_simulation_args(
+            days, paths or os.getenv('SCENARIO_SIMULATION_PATHS', 10000),
+            method or os.getenv('SCENARIO_SIMULATION_METHOD', 'gbm'), seed)
 
-        # 计算历史波动率和移动均线
-        volatility = df['Volatility'].mean() / 100  # 转换为小数
-        daily_volatility = volatility / np.sqrt(252)  # 转换为日波动率
         ma20 = df.iloc[-1]['MA20']
-        ma60 = df.iloc[-1]['MA60']
 
         # 计算乐观情景（上涨至压力位或突破）
         optimistic_return = 0.15  # 15%上涨
@@ -89,54 +148,50 @@ class ScenarioPredictor:
         else:
             pessimistic_target = current_price * (1 + pessimistic_return)
 
-        # 计算预期时间
-        time_periods = np.arange(1, days + 1)
-
-        # 生成乐观路径
-        opt_path = [current_price]
-        for _ in range(days):
-            daily_return = (optimistic_target / current_price) ** (1 / days) - 1
-            random_component = np.random.normal(0, daily_volatility)
-            new_price = opt_path[-1] * (1 + daily_return + random_component / 2)
-            opt_path.append(new_price)
-
-        # 生成中性路径
-        neu_path = [current_price]
-        for _ in range(days):
-            daily_return = (neutral_target / current_price) ** (1 / days) - 1
-            random_component = np.random.normal(0, daily_volatility)
-            new_price = neu_path[-1] * (1 + daily_return + random_component)
-            neu_path.append(new_price)
-
-        # 生成悲观路径
-        pes_path = [current_price]
-        for _ in range(days):
-            daily_return = (pessimistic_target / current_price) ** (1 / days) - 1
-            random_component = np.random.normal(0, daily_volatility)
-            new_price = pes_path[-1] * (1 + daily_return + random_component / 2)
-            pes_path.append(new_price)
+        # 模拟历史漂移下的全部路径（paths × (days + 1) 的累计对数收益）
+        returns = historical_log_returns(df['close'])
+        log_paths = simulate_log_paths(returns, days, paths=paths, method=method, seed=seed)
+        bands = percentile_bands(log_paths)
+        historical_drift = returns[np.isfinite(returns)].mean()
+        time_periods = np.arange(days + 1)
 
         # 生成日期序列
         start_date = datetime.now()
         dates = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days + 1)]
 
+        def price_bands(shift):
+            return {f"p{q}": dict(zip(dates, (current_price * np.exp(band + shift)).tolist()))
+                    for q, band in bands.items()}
+
+        def scenario(target_price):
+            log_target = np.log(target_price / current_price)
+            # 把历史漂移替换为指向目标价的漂移，中位数路径在期末到达目标价
+            shift = (log_target / days - historical_drift) * time_periods
+            scenario_bands = price_bands(shift)
+            final_probability, touch_probability = target_probability(log_paths, log_target)
+            return {
+                'target_price': target_price,
+                'change_percent': (target_price / current_price - 1) * 100,
+                'path': scenario_bands['p50'],
+                'bands': scenario_bands,
+                'probability': final_probability,
+                'touch_probability': touch_probability
+            }
+
+        final_prices = current_price * np.exp(log_paths[:, -1])
         # 组织结果
         return {
             'current_price': current_price,
-            'optimistic': {
-                'target_price': optimistic_target,
-                'change_percent': (optimistic_target / current_price - 1) * 100,
-                'path': dict(zip(dates, opt_path))
-            },
-            'neutral': {
-                'target_price': neutral_target,
-                'change_percent': (neutral_target / current_price - 1) * 100,
-                'path': dict(zip(dates, neu_path))
-            },
-            'pessimistic': {
-                'target_price': pessimistic_target,
-                'change_percent': (pessimistic_target / current_price - 1) * 100,
-                'path': dict(zip(dates, pes_path))
+            'optimistic': scenario(optimistic_target),
+            'neutral': scenario(neutral_target),
+            'pessimistic': scenario(pessimistic_target),
+            'simulation': {
+                'method': method,
+                'paths': paths,
+                'days': days,
+                'seed': seed,
+                'expected_price': float(final_prices.mean()),
+                'bands': price_bands(0.0)
             }
         }
 
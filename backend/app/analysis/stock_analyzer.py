@@ -22,6 +22,9 @@ import threading
 from urllib.parse import urlparse
 from openai import OpenAI
 from app.core.cache import Cache
+from app.core.history_store import PriceHistoryStore
+from app.analysis.batch_indicator_engine import BatchIndicatorEngine, OHLCVPanel
+from app.analysis.market_scan_engine import MarketScanEngine
 
 # 线程局部存储
 thread_local = threading.local()
@@ -64,19 +67,35 @@ class StockAnalyzer:
         # 添加缓存初始化
         self.cache = cache
 
+        # 本地增量行情库
+        self.history_store = None
+        if os.getenv('USE_HISTORY_STORE', 'True').lower() == 'true':
+            self.history_store = PriceHistoryStore(self._fetch_stock_data)
+
         # JSON匹配标志
         self.json_match_flag = True
     def get_stock_data(self, stock_code, market_type='A', start_date=None, end_date=None):
         """获取股票数据 - 增强版，具备更强的容错能力"""
-        import akshare as ak
-
         self.logger.info(f"开始获取股票 {stock_code} 数据，市场类型: {market_type}")
 
+        # 港股接口不支持日期参数，未指定起始日期时保持返回全部历史
+        query_start = start_date if start_date is not None or market_type == 'HK' else \
+            (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
+
+        # 优先从本地增量行情库切片，只在过期时拉取最新的K线
+        if self.history_store is not None:
+            try:
+                df = self.history_store.get_range(stock_code, market_type, query_start, end_date)
+                if not df.empty:
+                    return df
+            except Exception as e:
+                self.logger.warning(f"本地行情库获取 {stock_code} 失败，改为直接拉取: {e}")
+
         cache_key = f"get_stock_data:{stock_code}_{market_type}_{start_date}_{end_date}_price"
-        cached_data = self.cache.get(cache_key)
+        cached_data = self.cache.get_frame(cache_key)
         if cached_data is not None:
             self.logger.info(f"Cache hit for stock data: {stock_code}")
-            return pd.DataFrame(cached_data)
+            return cached_data
 
         if start_date is None:
             start_date = (datetime.now() - timedelta(days=365)).strftime('%Y%m%d')
@@ -84,55 +103,60 @@ class StockAnalyzer:
             end_date = datetime.now().strftime('%Y%m%d')
 
         try:
-            df = None
-            if market_type == 'A':
-                df = ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust="qfq")
-            elif market_type == 'HK':
-                df = ak.stock_hk_daily(symbol=stock_code, adjust="qfq")
-            elif market_type == 'US':
-                df = ak.stock_us_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust="qfq")
-            else:
-                raise ValueError(f"不支持的市场类型: {market_type}")
+            result = self._fetch_stock_data(stock_code, market_type, start_date, end_date)
+            self.cache.set_frame(cache_key, result)
+            return result
 
-            if df is None or df.empty:
-                raise ValueError("akshare返回了空的DataFrame")
+        except Exception as e:
+            self.logger.error(f"获取股票 {stock_code} 数据失败: {e}")
+            # 返回一个空的DataFrame以避免下游崩溃
+            return pd.DataFrame()
 
-            # 1. 标准化列名
-            rename_map = {
-                "日期": "date", "开盘": "open", "收盘": "close", "最高": "high",
-                "最低": "low", "成交量": "volume", "成交额": "amount",
-                "trade_date": "date" # 兼容不同命名
-            }
-            df.rename(columns=rename_map, inplace=True)
+    def _fetch_stock_data(self, stock_code, market_type, start_date, end_date):
+        """从akshare拉取并标准化行情数据（日期格式 YYYYMMDD），失败时抛出异常"""
+        import akshare as ak
 
-            # 2. 验证关键列是否存在
-            essential_columns = ['date', 'open', 'close', 'high', 'low', 'volume']
-            missing_cols = [col for col in essential_columns if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"数据中缺少关键列: {', '.join(missing_cols)}. 可用列: {df.columns.tolist()}")
+        df = None
+        if market_type == 'A':
+            df = ak.stock_zh_a_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust="qfq")
+        elif market_type == 'HK':
+            df = ak.stock_hk_daily(symbol=stock_code, adjust="qfq")
+        elif market_type == 'US':
+            df = ak.stock_us_hist(symbol=stock_code, start_date=start_date, end_date=end_date, adjust="qfq")
+        else:
+            raise ValueError(f"不支持的市场类型: {market_type}")
 
-            # 3. 数据清洗和类型转换
-            df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            df.dropna(subset=['date'], inplace=True)
+        if df is None or df.empty:
+            raise ValueError("akshare返回了空的DataFrame")
 
-            for col in ['open', 'close', 'high', 'low', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            df.dropna(subset=essential_columns, inplace=True)
+        # 1. 标准化列名
+        rename_map = {
+            "日期": "date", "开盘": "open", "收盘": "close", "最高": "high",
+            "最低": "low", "成交量": "volume", "成交额": "amount",
+            "trade_date": "date" # 兼容不同命名
+        }
+        df.rename(columns=rename_map, inplace=True)
 
-            if df.empty:
-                raise ValueError("数据清洗后DataFrame为空")
+        # 2. 验证关键列是否存在
+        essential_columns = ['date', 'open', 'close', 'high', 'low', 'volume']
+        missing_cols = [col for col in essential_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"数据中缺少关键列: {', '.join(missing_cols)}. 可用列: {df.columns.tolist()}")
 
-            # 4. 排序并返回
-            result = df.sort_values('date').reset_index(drop=True)
-            self.cache.set(cache_key, result.to_dict('records'))
-            
-            return result
+        # 3. 数据清洗和类型转换
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df.dropna(subset=['date'], inplace=True)
 
-        except Exception as e:
-            self.logger.error(f"获取股票 {stock_code} 数据失败: {e}")
-            # 返回一个空的DataFrame以避免下游崩溃
-            return pd.DataFrame()
+        for col in ['open', 'close', 'high', 'low', 'volume']:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+        df.dropna(subset=essential_columns, inplace=True)
+
+        if df.empty:
+            raise ValueError("数据清洗后DataFrame为空")
+
+        # 4. 排序并返回
+        return df.sort_values('date').reset_index(drop=True)
 
     def get_north_flow_history(self, stock_code, start_date=None, end_date=None):
         """获取单个股票的北向资金历史持股数据"""
@@ -487,6 +511,51 @@ class StockAnalyzer:
             # Return neutral score on error
             return 50
 
+    def calculate_scores_batch(self, frames, market_type='A'):
+        """
+        批量计算多只股票的评分 - 一次向量化计算所有股票的指标，结果与逐只调用
+        calculate_indicators + calculate_score 一致
+
+        参数:
+            frames: {股票代码: get_stock_data 返回的 DataFrame}
+            market_type: 市场类型 (A/HK/US)
+        返回:
+            {股票代码: {'score': 总分, 'trend': ..., 'volatility': ..., 'technical': ...,
+                        'volume': ..., 'momentum': ..., 'indicators': 最新K线指标}}
+        """
+        engine = BatchIndicatorEngine(self.params)
+        panel = OHLCVPanel.from_frames(frames)
+        if not panel.symbols:
+            return {}
+
+        indicators = engine.calculate_indicators(panel)
+        details = engine.calculate_score_details(indicators, market_type)
+
+        # 特殊市场调整 - 与 calculate_score 的“市场适应机制”相同
+        def adjust(total):
+            if market_type == 'US' and self._is_earnings_season():
+                return 0.9 * total + 5
+            if market_type == 'HK' and self._check_a_share_linkage(None) > 0.7:
+                return total + (5 if self._get_mainland_market_sentiment() > 0 else -5)
+            return total
+
+        scores = engine.calculate_scores(indicators, market_type, adjust=adjust)
+
+        results = {}
+        for i, code in enumerate(panel.symbols):
+            latest = {name: float(values[i, -1]) for name, values in indicators.items() if name != 'bars'}
+            results[code] = {
+                'score': int(scores[i]),
+                'trend': int(details['trend'][i, -1]),
+                'volatility': int(details['volatility'][i, -1]),
+                'technical': int(details['technical'][i, -1]),
+                'volume': int(details['volume'][i, -1]),
+                'momentum': int(details['momentum'][i, -1]),
+                'bars': int(indicators['bars'][i, -1]),
+                'indicators': latest
+            }
+        return results
+
     def calculate_position_size(self, stock_code, risk_percent=2.0, stop_loss_percent=5.0):
         """
         根据风险管理原则计算最佳仓位大小
@@ -1137,49 +1206,8 @@ class StockAnalyzer:
 
     # 原有API：保持接口不变
     def scan_market(self, stock_list, min_score=60, market_type='A'):
-        """扫描市场，寻找符合条件的股票"""
-        recommendations = []
-        total_stocks = len(stock_list)
-
-        self.logger.info(f"开始市场扫描，共 {total_stocks} 只股票")
-        start_time = time.time()
-        processed = 0
-
-        # 批量处理，减少日志输出
-        batch_size = 10
-        for i in range(0, total_stocks, batch_size):
-            batch = stock_list[i:i + batch_size]
-            batch_results = []
-
-            for stock_code in batch:
-                try:
-                    # 使用简化版分析以加快速度
-                    report = self.quick_analyze_stock(stock_code, market_type)
-                    if report['score'] >= min_score:
-                        batch_results.append(report)
-                except Exception as e:
-                    self.logger.error(f"分析股票 {stock_code} 时出错: {str(e)}")
-                    continue
-
-            # 添加批处理结果
-            recommendations.extend(batch_results)
-
-            # 更新处理进度
-            processed += len(batch)
-            elapsed = time.time() - start_time
-            remaining = (elapsed / processed) * (total_stocks - processed) if processed > 0 else 0
-
-            self.logger.info(
-                f"已处理 {processed}/{total_stocks} 只股票，耗时 {elapsed:.1f}秒，预计剩余 {remaining:.1f}秒")
-
-        # 按得分排序
-        recommendations.sort(key=lambda x: x['score'], reverse=True)
-
-        total_time = time.time() - start_time
-        self.logger.info(
-            f"市场扫描完成，共分析 {total_stocks} 只股票，找到 {len(recommendations)} 只符合条件的股票，总耗时 {total_time:.1f}秒")
-
-        return recommendations
+        """扫描市场，寻找符合条件的股票（并发取数、批量评分，见 MarketScanEngine）"""
+        return MarketScanEngine(self).scan(stock_list, min_score=min_score, market_type=market_type)
 
     # def quick_analyze_stock(self, stock_code, market_type='A'):
     #     """快速分析股票，用于市场扫描"""
@@ -1281,6 +1309,55 @@ class StockAnalyzer:
             self.logger.error(f"快速分析股票 {stock_code} 时出错: {str(e)}")
             raise
 
+    def fetch_scan_data(self, stock_code, market_type='A'):
+        """市场扫描的取数部分：返回 (行情数据, 股票信息)，股票信息获取失败时为空字典"""
+        df = self.get_stock_data(stock_code, market_type)
+        if df is None or df.empty:
+            raise ValueError(f"股票 {stock_code} 的数据为空或无法处理")
+        try:
+            stock_info = self.get_stock_info(stock_code)
+        except Exception as e:
+            self.logger.error(f"获取股票 {stock_code} 信息时出错: {str(e)}")
+            stock_info = {}
+        return df, stock_info
+
+    def quick_analyze_batch(self, frames, stock_infos=None, market_type='A'):
+        """
+        批量快速分析 - 用 calculate_scores_batch 对所有股票一次计算指标与评分，
+        报告格式与 quick_analyze_stock 一致
+
+        参数:
+            frames: {股票代码: get_stock_data 返回的 DataFrame}
+            stock_infos: {股票代码: get_stock_info 返回的字典}
+            market_type: 市场类型 (A/HK/US)
+        返回:
+            {股票代码: 报告}
+        """
+        stock_infos = stock_infos or {}
+        analysis_date = datetime.now().strftime('%Y-%m-%d')
+        reports = {}
+        for stock_code, scored in self.calculate_scores_batch(frames, market_type).items():
+            latest = scored['indicators']
+            close = pd.to_numeric(frames[stock_code]['close'], errors='coerce')
+            prev_close = float(close.iloc[-2]) if len(close) > 1 else latest['close']
+            stock_info = stock_infos.get(stock_code) or {}
+            score = scored['score']
+            reports[stock_code] = {
+                'stock_code': stock_code,
+                'stock_name': stock_info.get('股票名称', '未知'),
+                'industry': stock_info.get('行业', '未知'),
+                'analysis_date': analysis_date,
+                'score': score,
+                'price': latest['close'],
+                'price_change': (latest['close'] - prev_close) / prev_close * 100,
+                'ma_trend': 'UP' if latest['MA5'] > latest['MA20'] else 'DOWN',
+                'rsi': latest['RSI'],
+                'macd_signal': 'BUY' if latest['MACD'] > latest['Signal'] else 'SELL',
+                'volume_status': 'HIGH' if latest['Volume_Ratio'] > 1.5 else 'NORMAL',
+                'recommendation': self.get_recommendation(score)
+            }
+        return reports
+
     # ======================== 新增功能 ========================#
 
     def get_stock_info(self, stock_code):
@@ -0,0 +1,115 @@
+# app/analysis/task_handlers.py
+"""
+后台任务处理函数
+
+智能体分析、市场扫描、ETF分析的执行逻辑。由任务队列的工作进程调用（见 task_queue），
+未启用队列时也可在 Web 进程的线程中直接调用。
+
+处理函数签名为 handler(task_id, payload, task_manager, stock_analyzer)：
+负责写入运行中/完成状态和进度；出错时直接抛出异常，由调用方决定重试或标记失败。
+"""
+import logging
+import os
+from datetime import datetime
+
+from app.analysis.agent_graph_pool import get_agent_graph_pool
+from app.analysis.etf_analyzer import EtfAnalyzer
+from app.analysis.market_scan_engine import MarketScanEngine
+from app.analysis.task_manager import TaskStatus, TaskCancelledException
+
+logger = logging.getLogger(__name__)
+
+
+def run_agent_analysis(task_id, payload, task_manager, stock_analyzer):
+    """运行智能体分析"""
+    from tradingagents.default_config import DEFAULT_CONFIG
+
+    stock_code = payload['stock_code']
+    market_type = payload.get('market_type', 'A')
+    # 本地取消标记，取消请求经 TaskManager 控制频道送达，进度回调中无需访问 Redis
+    cancel_event = task_manager.get_cancel_event(task_id)
+    try:
+        task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=5, result={'current_step': '正在初始化智能体...'})
+
+        # 强制使用主应用的OpenAI代理配置
+        config = DEFAULT_CONFIG.copy()
+        config['llm_provider'] = 'openai'
+        config['backend_url'] = os.getenv('OPENAI_API_URL')
+        main_model = os.getenv('OPENAI_API_MODEL', 'gpt-4o')
+        config['deep_think_llm'] = main_model
+        config['quick_think_llm'] = main_model
+        config['memory_enabled'] = payload.get('enable_memory', True)
+        config['max_tokens'] = payload.get('max_output_length', 2048)
+
+        if not os.getenv('OPENAI_API_KEY'):
+            raise ValueError("主应用的 OPENAI_API_KEY 未在.env文件中设置")
+
+        logger.info(f"强制使用主应用代理配置进行智能体分析: provider={config['llm_provider']}, url={config['backend_url']}, model={config['deep_think_llm']}")
+
+        # 相同配置的任务复用已构建的分析图（LLM 客户端、记忆库、编译后的图）
+        ta = get_agent_graph_pool().get(
+            payload.get('selected_analysts', ["market", "social", "news", "fundamentals"]),
+            config,
+            debug=True
+        )
+
+        def progress_callback(progress, step):
+            if cancel_event.is_set():
+                raise TaskCancelledException(f"任务 {task_id} 已被用户取消")
+            task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=progress, result={'current_step': step})
+
+        today = payload.get('analysis_date') or datetime.now().strftime('%Y-%m-%d')
+        state, decision = ta.propagate(stock_code, today, market_type=market_type, progress_callback=progress_callback)
+
+        # 在任务完成时，获取并添加公司名称到最终结果中
+        try:
+            stock_info = stock_analyzer.get_stock_info(stock_code)
+            stock_name = stock_info.get('股票名称', '未知')
+            # 将公司名称添加到 state 字典中，前端将从这里读取
+            if isinstance(state, dict):
+                state['company_name'] = stock_name
+        except Exception as e:
+            logger.error(f"为 {stock_code} 获取公司名称时出错: {e}")
+            if isinstance(state, dict):
+                state['company_name'] = '名称获取失败'
+
+        task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result={'decision': decision, 'final_state': state, 'current_step': '分析完成'})
+        logger.info(f"智能体分析任务 {task_id} 完成")
+
+    except TaskCancelledException:
+        task_manager.update_task(task_id, status=TaskStatus.FAILED, error='任务已被用户取消', result={'current_step': '任务已被用户取消'})
+        raise
+    except Exception as e:
+        task_manager.update_task(task_id, result={'current_step': f'分析失败: {e}'})
+        raise
+    finally:
+        task_manager.release_cancel_event(task_id)
+
+
+def run_market_scan(task_id, payload, task_manager, stock_analyzer):
+    """运行市场扫描"""
+    task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=0)
+
+    engine = MarketScanEngine(stock_analyzer, task_manager=task_manager)
+    results = engine.scan(payload['stock_list'], min_score=payload.get('min_score', 60),
+                          market_type=payload.get('market_type', 'A'), task_id=task_id)
+
+    task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result=results)
+    logger.info(f"Market scan task {task_id} completed, found {len(results)} matching stocks.")
+
+
+def run_etf_analysis(task_id, payload, task_manager, stock_analyzer):
+    """运行ETF分析"""
+    task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=10)
+    etf_analyzer_instance = EtfAnalyzer(payload['etf_code'], stock_analyzer, payload.get('market_type', 'A'),
+                                        payload.get('period', '1y'))
+    result = etf_analyzer_instance.run_analysis()
+    task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result=result)
+    logger.info(f"ETF analysis task {task_id} completed for {payload['etf_code']}")
+
+
+TASK_HANDLERS = {
+    'agent_analysis': run_agent_analysis,
+    'market_scan': run_market_scan,
+    'etf_analysis': run_etf_analysis,
+}
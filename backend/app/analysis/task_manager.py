@@ -1,4 +1,5 @@
 # app/analysis/task_manager.py
+import os
 import uuid
 import threading
 import time
@@ -8,6 +9,56 @@ from enum import Enum
 import redis
 import json
 
+# 任务进度事件频道（每个任务一个），以及跨进程广播取消请求的控制频道
+TASK_EVENTS_CHANNEL = "task_events:{task_id}"
+TASK_CONTROL_CHANNEL = "task_control"
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# 已结束任务的保留时长（秒），智能体分析历史等页面从保留的任务中读取，默认 30 天
+TASK_RETENTION_SECONDS = float(os.getenv('TASK_RETENTION_SECONDS', 30 * 86400))
+# 清理间隔（秒）；多个 Web 进程各有清理线程，同一间隔内只有取得该锁的进程执行清理
+TASK_CLEANER_INTERVAL = 600
+TASK_CLEANER_LOCK_KEY = "task_cleaner_lock"
+
+# 单个进度推送连接的最长时长（秒），到期后结束，客户端 EventSource 会自动重连并重新收到快照
+TASK_EVENTS_MAX_STREAM_SECONDS = float(os.getenv('TASK_EVENTS_MAX_STREAM_SECONDS', 300))
+
+# 任务索引：全部任务按创建时间排序；按状态分组（分值为创建时间）；已结束任务按结束时间排序
+TASKS_BY_TIME_KEY = "tasks_sorted_by_time"
+TASKS_BY_STATUS_KEY = "tasks_by_status:{status}"
+TASKS_FINISHED_KEY = "tasks_finished_at"
+TASKS_INDEX_VERSION_KEY = "tasks_index_version"
+TASKS_INDEX_VERSION = "1"
+
+# 任务存在时才写入并发布事件，一次往返完成（Redis 3.x 兼容 HMSET）。
+# 状态变化时同时维护按状态分组的索引和已结束任务的结束时间索引。
+# ARGV: 事件JSON, 任务ID, 新状态(无则为空), 当前时间戳, 字段1, 值1, ...
+_UPDATE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 0 then
+    return 0
+end
+local status = ARGV[3]
+if status ~= '' then
+    local old = redis.call('hget', KEYS[1], 'status')
+    if old ~= status then
+        local created = redis.call('zscore', KEYS[3], ARGV[2]) or ARGV[4]
+        if old then
+            redis.call('zrem', KEYS[4] .. old, ARGV[2])
+        end
+        redis.call('zadd', KEYS[4] .. status, created, ARGV[2])
+    end
+    if status == 'completed' or status == 'failed' or status == 'cancelled' then
+        redis.call('zadd', KEYS[5], ARGV[4], ARGV[2])
+    else
+        redis.call('zrem', KEYS[5], ARGV[2])
+    end
+end
+redis.call('hmset', KEYS[1], unpack(ARGV, 5))
+redis.call('publish', KEYS[2], ARGV[1])
+return 1
+"""
+
 
 class TaskStatus(str, Enum):
     PENDING = "pending"
@@ -33,6 +84,15 @@ class TaskManager:
             self.logger.error(f"FATAL: Could not connect to Redis for TaskManager. Tasks will not be operational. Error: {e}")
             self.redis_client = None
 
+        self._update_script = self.redis_client.register_script(_UPDATE_SCRIPT) if self.redis_client else None
+        # 本进程内运行中任务的取消标记，由控制频道监听线程设置
+        self._cancel_events = {}
+        self._cancel_lock = threading.Lock()
+        self._control_listener = None
+
+        if self.redis_client:
+            self._ensure_indexes()
+
     def _serialize(self, data):
         if data is None:
             return ""
@@ -43,6 +103,32 @@ class TaskManager:
             return None
         return json.loads(data)
 
+    def _ensure_indexes(self):
+        """旧版本创建的任务没有状态和结束时间索引，首次启动时补建一次"""
+        if self.redis_client.get(TASKS_INDEX_VERSION_KEY) == TASKS_INDEX_VERSION:
+            return
+        task_ids = self.redis_client.zrange(TASKS_BY_TIME_KEY, 0, -1, withscores=True)
+        with self.redis_client.pipeline() as pipe:
+            for task_id, _ in task_ids:
+                pipe.hmget(f"task:{task_id}", ['status', 'updated_at'])
+            rows = pipe.execute() if task_ids else []
+
+        with self.redis_client.pipeline() as pipe:
+            for (task_id, created_ts), (task_status, updated_at) in zip(task_ids, rows):
+                if not task_status:
+                    pipe.zrem(TASKS_BY_TIME_KEY, task_id)
+                    continue
+                pipe.zadd(TASKS_BY_STATUS_KEY.format(status=task_status), {task_id: created_ts})
+                if task_status in TERMINAL_STATUSES:
+                    try:
+                        finished_ts = datetime.fromisoformat(updated_at).timestamp()
+                    except (TypeError, ValueError):
+                        finished_ts = 0
+                    pipe.zadd(TASKS_FINISHED_KEY, {task_id: finished_ts})
+            pipe.set(TASKS_INDEX_VERSION_KEY, TASKS_INDEX_VERSION)
+            pipe.execute()
+        self.logger.info(f"Built task status/expiry indexes for {len(task_ids)} tasks.")
+
     def _generate_task_id(self):
         return str(uuid.uuid4())
 
@@ -68,7 +154,8 @@ class TaskManager:
         with self.redis_client.pipeline() as pipe:
             pipe.hset(task_key, mapping=task)
             # Use timestamp as score for sorting
-            pipe.zadd('tasks_sorted_by_time', {task_id: now.timestamp()})
+            pipe.zadd(TASKS_BY_TIME_KEY, {task_id: now.timestamp()})
+            pipe.zadd(TASKS_BY_STATUS_KEY.format(status=TaskStatus.PENDING.value), {task_id: now.timestamp()})
             pipe.execute()
             
         self.logger.info(f"Task created in Redis: {task_id} ({name})")
@@ -102,8 +189,47 @@ class TaskManager:
             return []
 
         # Get all task IDs, newest first
-        task_ids = self.redis_client.zrevrange('tasks_sorted_by_time', 0, -1)
-        
+        task_ids = self.redis_client.zrevrange(TASKS_BY_TIME_KEY, 0, -1)
+        return self._load_tasks(task_ids)
+
+    def list_tasks(self, status=None, offset=0, limit=50):
+        """
+        分页列出任务（按创建时间倒序）
+
+        Args:
+            status: 状态或状态列表，None 表示全部
+            offset: 跳过的任务数
+            limit: 返回的最大任务数，None 表示不限
+        Returns:
+            (tasks, total)：当前页的任务和符合条件的任务总数
+        """
+        if not self.redis_client:
+            return [], 0
+
+        end = -1 if limit is None else offset + limit - 1
+        if status is None:
+            keys = [TASKS_BY_TIME_KEY]
+        else:
+            statuses = [status] if isinstance(status, (str, Enum)) else list(status)
+            keys = [TASKS_BY_STATUS_KEY.format(status=s.value if isinstance(s, Enum) else s) for s in statuses]
+
+        with self.redis_client.pipeline() as pipe:
+            for key in keys:
+                pipe.zcard(key)
+                pipe.zrevrange(key, 0, end, withscores=True)
+            replies = pipe.execute()
+        total = sum(replies[0::2])
+
+        # 多个状态时各取前 offset+limit 条，按创建时间合并后再分页
+        merged = sorted((item for page in replies[1::2] for item in page), key=lambda x: x[1], reverse=True)
+        page_ids = [task_id for task_id, _ in merged[offset:None if limit is None else offset + limit]]
+        return self._load_tasks(page_ids), total
+
+    def _load_tasks(self, task_ids):
+        """批量读取任务（一次往返）"""
+        if not task_ids:
+            return []
+
         tasks = []
         with self.redis_client.pipeline() as pipe:
             for task_id in task_ids:
@@ -122,13 +248,14 @@ class TaskManager:
         return tasks
 
     def update_task(self, task_id, status=None, progress=None, result=None, error=None):
-        if not self.redis_client:
-            return None
+        """
+        更新任务并向订阅者推送进度事件
 
-        task_key = f"task:{task_id}"
-        if not self.redis_client.exists(task_key):
-            self.logger.warning(f"Attempted to update non-existent task: {task_id}")
-            return None
+        只写不读：更新字段和发布事件在一次 Redis 往返内完成，不再回读任务。
+        返回任务是否存在（不存在时不写入）。
+        """
+        if not self.redis_client:
+            return False
 
         update_data = {'updated_at': datetime.now().isoformat()}
         if status:
@@ -139,19 +266,155 @@ class TaskManager:
             update_data['result'] = self._serialize(result)
         if error is not None:
             update_data['error'] = self._serialize(error)
-        
-        # 使用HMSET命令兼容Redis 3.x
-        self.redis_client.hmset(task_key, update_data)
-        return self.get_task(task_id)
+
+        # 推送给订阅者的事件携带反序列化后的结果，与 get_task 的返回格式一致
+        event = dict(update_data, id=task_id)
+        if result is not None:
+            event['result'] = result
+        if error is not None:
+            event['error'] = error
+        args = [json.dumps(event, default=str), task_id, update_data.get('status', ''), time.time()]
+        for field, value in update_data.items():
+            args.extend([field, value])
+
+        updated = self._update_script(
+            keys=[f"task:{task_id}", TASK_EVENTS_CHANNEL.format(task_id=task_id), TASKS_BY_TIME_KEY,
+                  TASKS_BY_STATUS_KEY.format(status=''), TASKS_FINISHED_KEY],
+            args=args)
+        if not updated:
+            self.logger.warning(f"Attempted to update non-existent task: {task_id}")
+            return False
+        return True
+
+    def cancel_task(self, task_id, error='任务已被用户取消'):
+        """
+        取消任务：写入 CANCELLED 状态，并通过控制频道通知所有进程，
+        运行该任务的进程随即设置本地取消标记
+        """
+        if not self.redis_client:
+            return False
+        if not self.update_task(task_id, status=TaskStatus.CANCELLED, error=error):
+            return False
+        self._set_cancel_flag(task_id)
+        self.redis_client.publish(TASK_CONTROL_CHANNEL, json.dumps({'action': 'cancel', 'id': task_id}))
+        return True
+
+    def get_cancel_event(self, task_id):
+        """
+        获取任务的本地取消标记（threading.Event）
+
+        运行任务的线程只需检查 event.is_set()，不必每次访问 Redis。
+        注册时读取一次当前状态，处理注册前已被取消的情况。任务结束后调用 release_cancel_event。
+        """
+        with self._cancel_lock:
+            event = self._cancel_events.get(task_id)
+            if event is None:
+                event = threading.Event()
+                self._cancel_events[task_id] = event
+        if self.redis_client:
+            self._ensure_control_listener()
+            task_status = self.redis_client.hget(f"task:{task_id}", 'status')
+            if task_status is None or task_status == TaskStatus.CANCELLED:
+                event.set()
+        return event
+
+    def release_cancel_event(self, task_id):
+        with self._cancel_lock:
+            self._cancel_events.pop(task_id, None)
+
+    def is_cancelled(self, task_id):
+        """检查本地取消标记（任务未注册时注册）"""
+        event = self._cancel_events.get(task_id)
+        if event is None:
+            event = self.get_cancel_event(task_id)
+        return event.is_set()
+
+    def _set_cancel_flag(self, task_id):
+        with self._cancel_lock:
+            event = self._cancel_events.get(task_id)
+        if event is not None:
+            event.set()
+
+    def _ensure_control_listener(self):
+        with self._cancel_lock:
+            if self._control_listener is not None and self._control_listener.is_alive():
+                return
+            self._control_listener = threading.Thread(target=self._listen_control, daemon=True,
+                                                      name='task-control-listener')
+            self._control_listener.start()
+
+    def _listen_control(self):
+        """监听控制频道，把取消请求转换为本地取消标记"""
+        while True:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(TASK_CONTROL_CHANNEL)
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    try:
+                        payload = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get('action') == 'cancel':
+                        self._set_cancel_flag(payload.get('id'))
+            except Exception as e:
+                self.logger.error(f"Task control listener error, reconnecting: {e}")
+                time.sleep(1)
+
+    def subscribe(self, task_id, heartbeat=15.0, max_lifetime=None):
+        """
+        订阅任务进度事件
+
+        先订阅再读取当前状态作为第一条事件（type=snapshot），之后逐条产出更新事件（type=update），
+        任务进入终态后结束。超过 heartbeat 秒没有事件时产出 None，调用方可借此发送心跳。
+        任务不存在、任务在订阅期间被删除（或被清理），或订阅超过 max_lifetime 秒
+        （默认 TASK_EVENTS_MAX_STREAM_SECONDS）时结束。
+        """
+        if not self.redis_client:
+            return
+        if max_lifetime is None:
+            max_lifetime = TASK_EVENTS_MAX_STREAM_SECONDS
+        deadline = time.monotonic() + max_lifetime
+
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(TASK_EVENTS_CHANNEL.format(task_id=task_id))
+        try:
+            task = self.get_task(task_id)
+            if not task:
+                return
+            yield dict(task, type='snapshot')
+            if task.get('status') in TERMINAL_STATUSES:
+                return
+
+            last_event = time.monotonic()
+            while time.monotonic() < deadline:
+                message = pubsub.get_message(timeout=min(1.0, max(deadline - time.monotonic(), 0)))
+                if message is None or message.get('type') != 'message':
+                    # 删除任务不发布事件，空闲时确认任务仍然存在
+                    if not self.redis_client.exists(f"task:{task_id}"):
+                        return
+                    if time.monotonic() - last_event >= heartbeat:
+                        last_event = time.monotonic()
+                        yield None
+                    continue
+                last_event = time.monotonic()
+                event = json.loads(message['data'])
+                if 'progress' in event:
+                    event['progress'] = int(event['progress'])
+                event['type'] = 'update'
+                yield event
+                if event.get('status') in TERMINAL_STATUSES:
+                    return
+        finally:
+            pubsub.close()
 
     def delete_task(self, task_id):
         if not self.redis_client:
             return False
 
-        task_key = f"task:{task_id}"
         with self.redis_client.pipeline() as pipe:
-            pipe.delete(task_key)
-            pipe.zrem('tasks_sorted_by_time', task_id)
+            self._queue_delete(pipe, task_id)
             results = pipe.execute()
         
         deleted_count = results[0]
@@ -160,47 +423,55 @@ class TaskManager:
             return True
         return False
 
-    def _clean_old_tasks(self):
-        """Clean up old, completed/failed tasks from Redis."""
+    @staticmethod
+    def _queue_delete(pipe, task_id):
+        """在管道中加入删除任务及其全部索引项的命令（第一条为删除任务本身）"""
+        pipe.delete(f"task:{task_id}")
+        pipe.zrem(TASKS_BY_TIME_KEY, task_id)
+        pipe.zrem(TASKS_FINISHED_KEY, task_id)
+        for task_status in TaskStatus:
+            pipe.zrem(TASKS_BY_STATUS_KEY.format(status=task_status.value), task_id)
+
+    def _clean_old_tasks(self, max_age=None, batch_size=500):
+        """Clean up completed/failed/cancelled tasks that finished more than max_age seconds ago
+        (TASK_RETENTION_SECONDS by default)."""
         if not self.redis_client:
-            return
+            return 0
+        if max_age is None:
+            max_age = TASK_RETENTION_SECONDS
 
-        # Clean tasks older than 1 hour (3600 seconds)
-        cutoff_timestamp = time.time() - 3600
-        
-        # Find tasks with an updated_at timestamp older than the cutoff
-        # This is complex with Hashes. A simpler approach is to use a second sorted set.
-        # For now, let's iterate, but this is inefficient for large numbers of tasks.
-        task_ids = self.redis_client.zrange('tasks_sorted_by_time', 0, -1)
-        
-        to_delete = []
-        for task_id in task_ids:
-            task_data = self.redis_client.hmget(f"task:{task_id}", ['status', 'updated_at'])
-            if len(task_data) == 2:
-                task_status, updated_at_iso = task_data
-                if task_status and task_status in [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED]:
-                    try:
-                        if updated_at_iso:
-                            updated_at = datetime.fromisoformat(updated_at_iso)
-                            if updated_at.timestamp() < cutoff_timestamp:
-                                to_delete.append(task_id)
-                    except (ValueError, TypeError):
-                        # Invalid timestamp, mark for deletion
-                        to_delete.append(task_id)
-        
-        if to_delete:
-            for task_id in to_delete:
-                self.delete_task(task_id)
-            self.logger.info(f"Cleaned up {len(to_delete)} old tasks from Redis.")
+        cutoff_timestamp = time.time() - max_age
+        cleaned = 0
+        # 已结束任务按结束时间索引，过期任务是一次范围查询，分批在管道中删除
+        while True:
+            task_ids = self.redis_client.zrangebyscore(TASKS_FINISHED_KEY, '-inf', cutoff_timestamp,
+                                                       start=0, num=batch_size)
+            if not task_ids:
+                break
+            with self.redis_client.pipeline() as pipe:
+                for task_id in task_ids:
+                    self._queue_delete(pipe, task_id)
+                pipe.execute()
+            cleaned += len(task_ids)
+
+        if cleaned:
+            self.logger.info(f"Cleaned up {cleaned} old tasks from Redis.")
+        return cleaned
+
+    def _acquire_cleaner_lock(self):
+        """每个清理间隔只允许一个进程执行清理，锁随间隔到期自动释放"""
+        return bool(self.redis_client.set(TASK_CLEANER_LOCK_KEY, f"{os.getpid()}:{threading.get_ident()}",
+                                          nx=True, ex=TASK_CLEANER_INTERVAL))
 
     def _run_cleaner(self):
         """Periodically run the task cleaner."""
         while True:
             try:
-                self._clean_old_tasks()
+                if self._acquire_cleaner_lock():
+                    self._clean_old_tasks()
             except Exception as e:
                 self.logger.error(f"Error in Redis task cleaner thread: {e}", exc_info=True)
-            time.sleep(600)  # Run every 10 minutes
+            time.sleep(TASK_CLEANER_INTERVAL)  # Run every 10 minutes
 
     def start_cleaner_thread(self):
         if not self.redis_client:
@@ -0,0 +1,385 @@
+# app/analysis/task_queue.py
+"""
+基于 Redis 的持久化任务队列
+
+Web 进程只负责创建任务并入队，智能体分析、市场扫描、ETF分析在独立的工作进程中执行，
+不再占用 Web 进程的线程和 GIL。
+
+- 入队：任务参数保存在 task_payload:{id}，任务ID推入待处理列表
+- 领取：Lua 脚本原子地弹出任务ID、登记租约（处理中有序集合，分值为租约到期时间）并累加执行次数
+- 心跳：工作进程定期续租，并在工作进程注册表中登记存活时间
+- 重试：执行失败且未超过最大次数（可按任务类型设置，智能体分析默认不重试）时重新入队（状态回到 PENDING），否则标记 FAILED
+- 回收：租约到期（工作进程崩溃或失联）的任务由任意工作进程重新入队
+- 取消：领取时任务已被取消或删除则直接丢弃；运行中的取消沿用 TaskManager 的控制频道
+
+启动工作进程：
+    python -m app.analysis.task_queue --workers 2
+
+没有存活的工作进程或 TASK_EXECUTION_MODE=thread 时，任务在 Web 进程的后台线程中执行（原有方式）。
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+
+from app.analysis.task_manager import TaskStatus, TaskCancelledException
+
+# 待处理任务列表（LPUSH 入队，RPOP 领取）、处理中任务（分值为租约到期时间）、任务归属的工作进程
+TASK_QUEUE_PENDING_KEY = "task_queue:pending"
+TASK_QUEUE_PROCESSING_KEY = "task_queue:processing"
+TASK_QUEUE_CLAIMS_KEY = "task_queue:claims"
+# 工作进程注册表（分值为最近一次心跳时间）
+TASK_QUEUE_WORKERS_KEY = "task_queue:workers"
+TASK_PAYLOAD_KEY = "task_payload:{task_id}"
+
+# 按任务类型覆盖最大执行次数（含首次），未列出的类型使用 TASK_MAX_ATTEMPTS。
+# 智能体分析耗时长且每次都调用付费的 LLM，默认失败后不自动重试
+JOB_MAX_ATTEMPTS = {'agent_analysis': int(os.getenv('AGENT_TASK_MAX_ATTEMPTS', 1))}
+
+# 弹出任务并登记租约，返回 {任务ID, 任务类型, 参数JSON, 已执行次数}
+# KEYS: 待处理列表, 处理中集合, 归属哈希, 参数键前缀  ARGV: 租约到期时间, 工作进程ID
+_CLAIM_SCRIPT = """
+local task_id = redis.call('rpop', KEYS[1])
+if not task_id then
+    return nil
+end
+local payload_key = KEYS[4] .. task_id
+redis.call('zadd', KEYS[2], ARGV[1], task_id)
+redis.call('hset', KEYS[3], task_id, ARGV[2])
+local attempts = redis.call('hincrby', payload_key, 'attempts', 1)
+return {task_id, redis.call('hget', payload_key, 'job_type') or '', redis.call('hget', payload_key, 'payload') or '', attempts}
+"""
+
+# 仍由该工作进程持有时释放租约，返回是否释放（租约已被回收时返回 0，避免重复处理）
+# KEYS: 处理中集合, 归属哈希  ARGV: 任务ID, 工作进程ID
+_RELEASE_SCRIPT = """
+if redis.call('hget', KEYS[2], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+redis.call('zrem', KEYS[1], ARGV[1])
+redis.call('hdel', KEYS[2], ARGV[1])
+return 1
+"""
+
+# 取出租约已到期的任务并释放租约，返回任务ID列表
+# KEYS: 处理中集合, 归属哈希  ARGV: 当前时间, 单次数量上限
+_REAP_SCRIPT = """
+local ids = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, task_id in ipairs(ids) do
+    redis.call('zrem', KEYS[1], task_id)
+    redis.call('hdel', KEYS[2], task_id)
+end
+return ids
+"""
+
+
+class TaskQueue:
+    def __init__(self, task_manager, lease_timeout=None, max_attempts=None, job_max_attempts=None):
+        """
+        Args:
+            task_manager: TaskManager 实例，任务状态与进度仍由它维护
+            lease_timeout: 租约时长（秒），超过该时间没有心跳的任务会被重新入队
+            max_attempts: 单个任务的最大执行次数（含首次）
+            job_max_attempts: 按任务类型覆盖的最大执行次数，默认 JOB_MAX_ATTEMPTS
+        """
+        self.logger = logging.getLogger(__name__)
+        self.task_manager = task_manager
+        self.redis_client = task_manager.redis_client
+        self.lease_timeout = float(lease_timeout or os.getenv('TASK_LEASE_TIMEOUT', 60))
+        self.max_attempts = int(max_attempts or os.getenv('TASK_MAX_ATTEMPTS', 3))
+        self.job_max_attempts = dict(JOB_MAX_ATTEMPTS if job_max_attempts is None else job_max_attempts)
+
+        if self.redis_client:
+            self._claim_script = self.redis_client.register_script(_CLAIM_SCRIPT)
+            self._release_script = self.redis_client.register_script(_RELEASE_SCRIPT)
+            self._reap_script = self.redis_client.register_script(_REAP_SCRIPT)
+
+    def enqueue(self, task_id, job_type, payload):
+        """任务参数写入 Redis 并推入待处理列表"""
+        if not self.redis_client:
+            return False
+        with self.redis_client.pipeline() as pipe:
+            pipe.hset(TASK_PAYLOAD_KEY.format(task_id=task_id),
+                      mapping={'job_type': job_type, 'payload': json.dumps(payload, default=str), 'attempts': 0})
+            pipe.lpush(TASK_QUEUE_PENDING_KEY, task_id)
+            pipe.execute()
+        self.logger.info(f"Task {task_id} ({job_type}) enqueued.")
+        return True
+
+    def claim(self, worker_id):
+        """
+        领取一个任务
+
+        Returns:
+            (task_id, job_type, payload, attempts)，队列为空时返回 None
+        """
+        reply = self._claim_script(
+            keys=[TASK_QUEUE_PENDING_KEY, TASK_QUEUE_PROCESSING_KEY, TASK_QUEUE_CLAIMS_KEY,
+                  TASK_PAYLOAD_KEY.format(task_id='')],
+            args=[time.time() + self.lease_timeout, worker_id])
+        if not reply:
+            return None
+        task_id, job_type, payload, attempts = reply
+        return task_id, job_type, json.loads(payload) if payload else {}, int(attempts)
+
+    def heartbeat(self, worker_id, task_ids=()):
+        """登记工作进程存活，并为其持有的任务续租（已被回收的租约不会重新加入）"""
+        now = time.time()
+        with self.redis_client.pipeline() as pipe:
+            pipe.zadd(TASK_QUEUE_WORKERS_KEY, {worker_id: now})
+            for task_id in task_ids:
+                pipe.zadd(TASK_QUEUE_PROCESSING_KEY, {task_id: now + self.lease_timeout}, xx=True)
+            pipe.execute()
+
+    def unregister_worker(self, worker_id):
+        self.redis_client.zrem(TASK_QUEUE_WORKERS_KEY, worker_id)
+
+    def live_workers(self):
+        """最近一个租约周期内有心跳的工作进程数"""
+        if not self.redis_client:
+            return 0
+        return self.redis_client.zcount(TASK_QUEUE_WORKERS_KEY, time.time() - self.lease_timeout, '+inf')
+
+    def complete(self, task_id, worker_id):
+        """任务结束（完成、取消或跳过），释放租约并删除任务参数"""
+        if not self._release(task_id, worker_id):
+            return False
+        self.redis_client.delete(TASK_PAYLOAD_KEY.format(task_id=task_id))
+        return True
+
+    def fail(self, task_id, worker_id, error):
+        """任务执行失败，释放租约后按执行次数决定重试或标记失败"""
+        if not self._release(task_id, worker_id):
+            return False
+        self._retry_or_fail(task_id, error)
+        return True
+
+    def _release(self, task_id, worker_id):
+        released = self._release_script(keys=[TASK_QUEUE_PROCESSING_KEY, TASK_QUEUE_CLAIMS_KEY],
+                                        args=[task_id, worker_id])
+        if not released:
+            self.logger.warning(f"Lease for task {task_id} no longer held by {worker_id}, result ignored.")
+        return bool(released)
+
+    def _retry_or_fail(self, task_id, error):
+        payload_key = TASK_PAYLOAD_KEY.format(task_id=task_id)
+        attempts, job_type = self.redis_client.hmget(payload_key, ['attempts', 'job_type'])
+        attempts = int(attempts or 0)
+        max_attempts = self.job_max_attempts.get(job_type, self.max_attempts)
+        task_status = self.redis_client.hget(f"task:{task_id}", 'status')
+
+        if task_status is None or task_status == TaskStatus.CANCELLED:
+            self.redis_client.delete(payload_key)
+        elif attempts < max_attempts:
+            self.task_manager.update_task(task_id, status=TaskStatus.PENDING, progress=0,
+                                          error=f"第{attempts}次执行失败，等待重试: {error}")
+            self.redis_client.lpush(TASK_QUEUE_PENDING_KEY, task_id)
+            self.logger.warning(f"Task {task_id} attempt {attempts}/{max_attempts} failed, requeued: {error}")
+        else:
+            self.task_manager.update_task(task_id, status=TaskStatus.FAILED, error=str(error))
+            self.redis_client.delete(payload_key)
+            self.logger.error(f"Task {task_id} failed after {attempts} attempts: {error}")
+
+    def requeue_expired(self, batch_size=100):
+        """回收租约到期的任务（工作进程崩溃或失联），按执行次数重新入队或标记失败"""
+        if not self.redis_client:
+            return 0
+        task_ids = self._reap_script(keys=[TASK_QUEUE_PROCESSING_KEY, TASK_QUEUE_CLAIMS_KEY],
+                                     args=[time.time(), batch_size])
+        for task_id in task_ids:
+            self._retry_or_fail(task_id, '工作进程失联，任务租约已过期')
+        if task_ids:
+            self.logger.warning(f"Requeued {len(task_ids)} tasks with expired leases.")
+        return len(task_ids)
+
+    def stats(self):
+        if not self.redis_client:
+            return {}
+        with self.redis_client.pipeline() as pipe:
+            pipe.llen(TASK_QUEUE_PENDING_KEY)
+            pipe.zcard(TASK_QUEUE_PROCESSING_KEY)
+            pending, processing = pipe.execute()
+        return {'pending': pending, 'processing': processing, 'workers': self.live_workers()}
+
+    def submit(self, task_id, job_type, payload, stock_analyzer):
+        """
+        提交任务：队列模式且有存活的工作进程时入队，否则在当前进程的后台线程中执行
+
+        Returns:
+            'queued' 或 'thread'
+        """
+        mode = os.getenv('TASK_EXECUTION_MODE', 'queue').lower()
+        if mode == 'queue' and self.redis_client and self.live_workers() > 0:
+            self.enqueue(task_id, job_type, payload)
+            return 'queued'
+
+        if mode == 'queue':
+            self.logger.warning(f"No live task workers, running task {task_id} ({job_type}) in a local thread.")
+        thread = threading.Thread(target=run_task_inline,
+                                  args=(task_id, job_type, payload, self.task_manager, stock_analyzer),
+                                  daemon=True)
+        thread.start()
+        return 'thread'
+
+
+def run_task_inline(task_id, job_type, payload, task_manager, stock_analyzer):
+    """在当前线程中执行任务，失败时直接标记 FAILED（不重试）"""
+    from app.analysis.task_handlers import TASK_HANDLERS
+
+    logger = logging.getLogger(__name__)
+    try:
+        TASK_HANDLERS[job_type](task_id, payload, task_manager, stock_analyzer)
+    except TaskCancelledException as e:
+        logger.info(f"Task {task_id} cancelled: {e}")
+    except Exception as e:
+        logger.error(f"Task {task_id} ({job_type}) failed: {e}", exc_info=True)
+        task_manager.update_task(task_id, status=TaskStatus.FAILED, error=str(e))
+
+
+class TaskWorker:
+    """从队列领取并执行任务的工作循环，每个工作进程一个"""
+
+    def __init__(self, task_queue, stock_analyzer, handlers=None, worker_id=None, poll_interval=1.0):
+        if handlers is None:
+            from app.analysis.task_handlers import TASK_HANDLERS
+            handlers = TASK_HANDLERS
+        self.logger = logging.getLogger(__name__)
+        self.queue = task_queue
+        self.task_manager = task_queue.task_manager
+        self.stock_analyzer = stock_analyzer
+        self.handlers = handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = max(1.0, self.queue.lease_timeout / 3)
+        self._current_task = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                current = self._current_task
+                self.queue.heartbeat(self.worker_id, [current] if current else [])
+            except Exception as e:
+                self.logger.error(f"Worker {self.worker_id} heartbeat failed: {e}")
+
+    def run(self):
+        """运行直到 stop()；当前任务执行完毕后退出"""
+        self.queue.heartbeat(self.worker_id)
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True, name='task-worker-heartbeat')
+        heartbeat_thread.start()
+        self.logger.info(f"Task worker {self.worker_id} started.")
+
+        last_reap = 0.0
+        try:
+            while not self._stop_event.is_set():
+                if time.monotonic() - last_reap >= self.queue.lease_timeout / 2:
+                    last_reap = time.monotonic()
+                    self.queue.requeue_expired()
+                if not self.run_once():
+                    self._stop_event.wait(self.poll_interval)
+        finally:
+            self._stop_event.set()
+            self.queue.unregister_worker(self.worker_id)
+            self.logger.info(f"Task worker {self.worker_id} stopped.")
+
+    def run_once(self):
+        """领取并执行一个任务，队列为空时返回 False"""
+        claimed = self.queue.claim(self.worker_id)
+        if claimed is None:
+            return False
+        task_id, job_type, payload, attempts = claimed
+
+        task_status = self.task_manager.redis_client.hget(f"task:{task_id}", 'status')
+        if task_status is None or task_status == TaskStatus.CANCELLED:
+            self.logger.info(f"Skipping task {task_id}: cancelled or deleted before it started.")
+            self.queue.complete(task_id, self.worker_id)
+            return True
+
+        handler = self.handlers.get(job_type)
+        if handler is None:
+            self.queue.complete(task_id, self.worker_id)
+            self.task_manager.update_task(task_id, status=TaskStatus.FAILED, error=f"未知的任务类型: {job_type}")
+            return True
+
+        self.logger.info(f"Worker {self.worker_id} running task {task_id} ({job_type}), attempt {attempts}.")
+        self._current_task = task_id
+        try:
+            handler(task_id, payload, self.task_manager, self.stock_analyzer)
+            self.queue.complete(task_id, self.worker_id)
+        except TaskCancelledException as e:
+            self.logger.info(f"Task {task_id} cancelled: {e}")
+            self.queue.complete(task_id, self.worker_id)
+        except Exception as e:
+            self.logger.error(f"Task {task_id} ({job_type}) failed: {e}", exc_info=True)
+            self.queue.fail(task_id, self.worker_id, str(e))
+        finally:
+            self._current_task = None
+        return True
+
+
+def _worker_main(poll_interval):
+    """工作进程入口：构建独立的依赖注入容器并运行工作循环"""
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv())
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    from app.analysis._analysis_container import AnalysisContainer
+
+    container = AnalysisContainer()
+    worker = TaskWorker(container.task_queue(), container.stock_analyzer(), poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    worker.run()
+
+
+def start_worker_processes(num_workers, poll_interval=1.0):
+    """以 spawn 方式启动工作进程（不继承父进程的线程和连接），返回进程列表"""
+    ctx = multiprocessing.get_context('spawn')
+    processes = []
+    for i in range(num_workers):
+        process = ctx.Process(target=_worker_main, args=(poll_interval,), name=f'task-worker-{i}', daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def run_workers(num_workers, poll_interval=1.0, check_interval=5.0):
+    """启动并守护工作进程，异常退出的进程会被重新拉起（其任务由租约回收重新入队）"""
+    logger = logging.getLogger(__name__)
+    processes = start_worker_processes(num_workers, poll_interval)
+    stopping = threading.Event()
+
+    def _shutdown(*_):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    try:
+        while not stopping.wait(check_interval):
+            for i, process in enumerate(processes):
+                if not process.is_alive():
+                    logger.warning(f"Task worker {process.name} exited with code {process.exitcode}, restarting.")
+                    processes[i] = start_worker_processes(1, poll_interval)[0]
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run background task workers.')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('TASK_WORKERS', 2)))
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    run_workers(args.workers, args.poll_interval)
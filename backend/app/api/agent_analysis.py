@@ -15,11 +15,10 @@ from app.analysis.stock_qa import StockQA
 from app.analysis.risk_monitor import RiskMonitor
 from app.analysis.index_industry_analyzer import IndexIndustryAnalyzer
 from app.analysis.industry_analyzer import IndustryAnalyzer
-from app.analysis.task_manager import TaskManager,TaskCancelledException
+from app.analysis.task_manager import TaskManager
 from app.analysis.task_manager import TaskStatus
+from app.analysis.task_queue import TaskQueue
 from app.analysis.stock_analyzer import StockAnalyzer
-import threading
-import os
 import logging
 import traceback
 import time
@@ -29,13 +28,11 @@ logger = logging.getLogger(__name__)
 
 agent_analysis_bp = Blueprint('agent_analysis', __name__, url_prefix='/agent_analysis')
 
-from tradingagents.graph.trading_graph import TradingAgentsGraph
-from tradingagents.default_config import DEFAULT_CONFIG
-
 # 智能体分析路由
 @agent_analysis_bp.route('/start_agent_analysis', methods=['POST'])
 @inject
-def start_agent_analysis(task_manager: TaskManager = Provide[AnalysisContainer.task_manager], stock_analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_analyzer]):
+def start_agent_analysis(task_manager: TaskManager = Provide[AnalysisContainer.task_manager], stock_analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_analyzer],
+                         task_queue: TaskQueue = Provide[AnalysisContainer.task_queue]):
     """启动智能体分析任务"""
     try:
         data = request.data
@@ -61,72 +58,9 @@ def start_agent_analysis(task_manager: TaskManager = Provide[AnalysisContainer.t
             'max_output_length': max_output_length
         })
         task_id = task['id']
-        
-        
-        def run_agent_analysis():
-            """在后台线程中运行智能体分析"""
-            try:
-   
-                
-                task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=5, result={'current_step': '正在初始化智能体...'})
-
-                # --- 修复 Start: 强制使用主应用的OpenAI代理配置 ---
-                config = DEFAULT_CONFIG.copy()
-                config['llm_provider'] = 'openai'
-                config['backend_url'] = os.getenv('OPENAI_API_URL')
-                main_model = os.getenv('OPENAI_API_MODEL', 'gpt-4o')
-                config['deep_think_llm'] = main_model
-                config['quick_think_llm'] = main_model
-                config['memory_enabled'] = enable_memory
-                config['max_tokens'] = max_output_length
-                
-                if not os.getenv('OPENAI_API_KEY'):
-                    raise ValueError("主应用的 OPENAI_API_KEY 未在.env文件中设置")
-
-                logger.info(f"强制使用主应用代理配置进行智能体分析: provider={config['llm_provider']}, url={config['backend_url']}, model={config['deep_think_llm']}")
-
-                ta = TradingAgentsGraph(
-                    selected_analysts=selected_analysts,
-                    debug=True, 
-                    config=config
-                )
-                # --- 修复 End ---
-                
-                def progress_callback(progress, step):
-                    current_task = task_manager.get_task(task_id)
-                    if not current_task or current_task.get('status') == TaskStatus.CANCELLED:
-                         raise TaskCancelledException(f"任务 {task_id} 已被用户取消")
-                    task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=progress, result={'current_step': step})
-
-                today = analysis_date or datetime.now().strftime('%Y-%m-%d')
-                state, decision = ta.propagate(stock_code, today, market_type=market_type, progress_callback=progress_callback)
-                
-                # 修复：在任务完成时，获取并添加公司名称到最终结果中
-                try:
-                    stock_info = stock_analyzer.get_stock_info(stock_code)
-                    stock_name = stock_info.get('股票名称', '未知')
-                    # 将公司名称添加到 state 字典中，前端将从这里读取
-                    if isinstance(state, dict):
-                        state['company_name'] = stock_name
-                except Exception as e:
-                    logger.error(f"为 {stock_code} 获取公司名称时出错: {e}")
-                    if isinstance(state, dict):
-                        state['company_name'] = '名称获取失败'
-                
-                task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result={'decision': decision, 'final_state': state, 'current_step': '分析完成'})
-                logger.info(f"智能体分析任务 {task_id} 完成")
-
-            except TaskCancelledException as e:
-                logger.info(str(e))
-                task_manager.update_task(task_id, status=TaskStatus.FAILED, error='任务已被用户取消', result={'current_step': '任务已被用户取消'})
-            except Exception as e:
-                logger.error(f"智能体分析任务 {task_id} 失败: {str(e)}")
-                logger.error(traceback.format_exc())
-                task_manager.update_task(task_id, status=TaskStatus.FAILED, error=str(e), result={'current_step': f'分析失败: {e}'})
-
-        thread = threading.Thread(target=run_agent_analysis)
-        thread.daemon = True
-        thread.start()
+
+        # 交给任务队列的工作进程执行（没有存活的工作进程时在后台线程中执行）
+        task_queue.submit(task_id, 'agent_analysis', task['params'], stock_analyzer)
 
         return {
             'task_id': task_id,
@@ -146,11 +80,7 @@ def start_agent_analysis(task_manager: TaskManager = Provide[AnalysisContainer.t
 def get_agent_analysis_history(task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
     """获取已完成的智能体分析任务历史"""
     try:
-        all_tasks = task_manager.get_all_tasks()
-        history = [
-            task for task in all_tasks 
-            if task.get('status') in [TaskStatus.COMPLETED, TaskStatus.FAILED]
-        ]
+        history, _ = task_manager.list_tasks(status=[TaskStatus.COMPLETED, TaskStatus.FAILED], limit=None)
         # 按更新时间排序，最新的在前
         history.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
         return custom_jsonify({'history': history})
@@ -213,10 +143,7 @@ def _delete_agent_analysis(task_manager: TaskManager = Provide[AnalysisContainer
 
             # If the task is running, mark it as cancelled
             if task.get('status') == TaskStatus.RUNNING:
-                task['status'] = TaskStatus.CANCELLED
-                task['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                task['error'] = '任务已被用户取消'
-                task_manager.update_task(task_id, status=TaskStatus.CANCELLED, error='任务已被用户取消')
+                task_manager.cancel_task(task_id, error='任务已被用户取消')
                 cancelled_count += 1
                 logger.info(f"任务 {task_id} 已被标记为取消。")
             
@@ -7,7 +7,7 @@ from dependency_injector.wiring import inject, Provide
 from app.analysis.fundamental_analyzer import FundamentalAnalyzer
 from app.analysis.capital_flow_analyzer import CapitalFlowAnalyzer
 from app.analysis._analysis_container import AnalysisContainer
-from app.analysis.scenario_predictor import ScenarioPredictor
+from app.analysis.scenario_predictor import ScenarioPredictor, limit_simulation_args
 from app.analysis.stock_qa import StockQA
 from app.analysis.risk_monitor import RiskMonitor
 from app.analysis.index_industry_analyzer import IndexIndustryAnalyzer
@@ -114,10 +114,17 @@ def api_scenario_predict(scenario_predictor: ScenarioPredictor = Provide[Analysi
         data = request.data
         stock_code = data.get('stock_code')
         market_type = data.get('market_type', 'A')
-        days = data.get('days', 60)
         if not stock_code:
             return {'error': '请提供股票代码'}, status.HTTP_400_BAD_REQUEST
-        result = scenario_predictor.generate_scenarios(stock_code, market_type, days)
+        try:
+            days, paths, method, seed = limit_simulation_args(data.get('days', 60), data.get('paths'),
+                                                              data.get('method'), data.get('seed'))
+        except ValueError as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+        result = scenario_predictor.generate_scenarios(stock_code, market_type, days,
+                                                       method=method,
+                                                       paths=paths,
+                                                       seed=seed)
         return custom_jsonify(result)
     except Exception as e:
         current_app.logger.error(f"情景预测出错: {e}", exc_info=True)
@@ -149,7 +156,7 @@ def api_portfolio_risk(risk_monitor: RiskMonitor = Provide[AnalysisContainer.ris
         portfolio = data.get('portfolio', [])
         if not portfolio:
             return {'error': '请提供投资组合'}, status.HTTP_400_BAD_REQUEST
-        result = risk_monitor.analyze_portfolio_risk(portfolio)
+        result = risk_monitor.analyze_portfolio_risk(portfolio, confidence=float(data.get('confidence', 0.95)))
         return custom_jsonify(result)
     except Exception as e:
         current_app.logger.error(f"投资组合风险分析出错: {e}", exc_info=True)
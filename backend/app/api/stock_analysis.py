@@ -11,6 +11,7 @@ import traceback
 from app.analysis.stock_analyzer import StockAnalyzer
 from app.analysis.task_manager import TaskStatus, TaskManager
 from app.analysis._analysis_container import AnalysisContainer
+from app.analysis.scenario_predictor import ScenarioPredictor, limit_simulation_args
 from dependency_injector.wiring import inject, Provide
 from app.web.utils import custom_jsonify
 from app.core.cache import Cache
@@ -186,10 +187,17 @@ def api_scenario_predict(scenario_predictor: ScenarioPredictor = Provide[Analysi
         data = request.data
         stock_code = data.get('stock_code')
         market_type = data.get('market_type', 'A')
-        days = data.get('days', 60)
         if not stock_code:
             return {'error': '请提供股票代码'}, status.HTTP_400_BAD_REQUEST
-        result = scenario_predictor.generate_scenarios(stock_code, market_type, days)
+        try:
+            days, paths, method, seed = limit_simulation_args(data.get('days', 60), data.get('paths'),
+                                                              data.get('method'), data.get('seed'))
+        except ValueError as e:
+            return {'error': str(e)}, status.HTTP_400_BAD_REQUEST
+        result = scenario_predictor.generate_scenarios(stock_code, market_type, days,
+                                                       method=method,
+                                                       paths=paths,
+                                                       seed=seed)
         return custom_jsonify(result)
     except Exception as e:
         current_app.logger.error(f"情景预测出错: {e}", exc_info=True)
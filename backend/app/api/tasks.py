@@ -1,26 +1,56 @@
 # app/web/api/tasks.py
 from flask_api import request, status
+from flask import Response, stream_with_context
 from . import api_blueprint
 from app.analysis.task_manager import TaskStatus, TaskManager
-from app.analysis.etf_analyzer import EtfAnalyzer   
-import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.analysis.task_queue import TaskQueue
+import os
 from dependency_injector.wiring import inject
 from app.analysis._analysis_container import AnalysisContainer
 from dependency_injector.wiring import Provide
 from app.analysis.stock_analyzer import StockAnalyzer
+from app.web.utils import NumpyJSONEncoder, convert_numpy_types
+import json
 import logging
 import traceback
 logger = logging.getLogger(__name__)
 
 from datetime import datetime
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _pagination_args():
+    """解析分页参数 page（从1开始）和 page_size"""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = min(MAX_PAGE_SIZE, max(1, int(request.args.get('page_size', DEFAULT_PAGE_SIZE))))
+    except (TypeError, ValueError):
+        page, page_size = 1, DEFAULT_PAGE_SIZE
+    return page, page_size
+
+
 # Generic Task Endpoints
 @api_blueprint.route('/tasks', methods=['GET'])
 @inject
 def get_tasks(task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
-    """Lists all tasks."""
-    return task_manager.get_all_tasks()
+    """
+    Lists tasks, newest first.
+
+    Query params: status (comma separated, e.g. running,pending), page, page_size.
+    """
+    page, page_size = _pagination_args()
+    status_filter = request.args.get('status')
+    statuses = None
+    if status_filter:
+        statuses = [s.strip() for s in status_filter.split(',') if s.strip()]
+        invalid = [s for s in statuses if s not in {t.value for t in TaskStatus}]
+        if invalid:
+            return {'error': f'Invalid status: {", ".join(invalid)}'}, status.HTTP_400_BAD_REQUEST
+
+    tasks, total = task_manager.list_tasks(status=statuses, offset=(page - 1) * page_size, limit=page_size)
+    return {'tasks': tasks, 'total': total, 'page': page, 'page_size': page_size}
 
 @api_blueprint.route('/tasks/<task_id>', methods=['GET'])
 @inject
@@ -31,6 +61,31 @@ def get_task(task_id, task_manager: TaskManager = Provide[AnalysisContainer.task
         return {'error': 'Task not found'}, status.HTTP_404_NOT_FOUND
     return task
 
+@api_blueprint.route('/tasks/<task_id>/events', methods=['GET'])
+@inject
+def stream_task_events(task_id, task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
+    """
+    以 Server-Sent Events 推送任务进度，替代轮询 /scan_status、/agent_analysis_status 等接口
+
+    第一条事件为 snapshot（当前完整状态），之后每次 update_task 推送一条 update 事件，
+    任务进入终态、任务被删除或连接超过 TASK_EVENTS_MAX_STREAM_SECONDS 后关闭；空闲时定期发送注释行作为心跳。
+    每个连接在推送期间占用一个处理线程，Web 服务需使用 gthread 等多线程工作进程（见 Dockerfile），
+    同步工作进程下少量连接即可占满全部工作进程。
+    """
+    if not task_manager.get_task(task_id):
+        return {'error': 'Task not found'}, status.HTTP_404_NOT_FOUND
+
+    def generate():
+        for event in task_manager.subscribe(task_id):
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.dumps(convert_numpy_types(event), cls=NumpyJSONEncoder, ensure_ascii=False)
+            yield f"event: {event['type']}\ndata: {payload}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @api_blueprint.route('/tasks/<task_id>', methods=['DELETE'])
 @inject
 def delete_task(task_id, task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
@@ -45,22 +100,23 @@ def delete_task(task_id, task_manager: TaskManager = Provide[AnalysisContainer.t
 @api_blueprint.route('/active_tasks', methods=['GET'])
 @inject
 def get_active_tasks(task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
-    """获取所有正在进行的智能体分析任务"""
+    """获取正在进行的任务（按创建时间倒序，支持 page/page_size 分页）"""
     try:
-        all_tasks = task_manager.get_all_tasks()
+        page, page_size = _pagination_args()
+        # 只读取运行中任务的索引，不再加载全部历史任务
+        running_tasks, total = task_manager.list_tasks(status=TaskStatus.RUNNING,
+                                                       offset=(page - 1) * page_size, limit=page_size)
         active_tasks_list = []
-        for task in all_tasks:
-            if task.get('status') == TaskStatus.RUNNING:
-                task_info = {
-                    'task_id': task['id'],
-                    'stock_code': task.get('params', {}).get('stock_code', ''),
-                    'progress': task.get('progress', 0),
-                    'current_step': (task.get('result') or {}).get('current_step', '加载中...'),
-                }
-                active_tasks_list.append(task_info)
-        # 按创建时间排序，最新的在前
-        active_tasks_list.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        return {'active_tasks': active_tasks_list}
+        for task in running_tasks:
+            task_info = {
+                'task_id': task['id'],
+                'stock_code': (task.get('params') or {}).get('stock_code', ''),
+                'progress': task.get('progress', 0),
+                'current_step': (task.get('result') or {}).get('current_step', '加载中...'),
+                'created_at': task.get('created_at'),
+            }
+            active_tasks_list.append(task_info)
+        return {'active_tasks': active_tasks_list, 'total': total, 'page': page, 'page_size': page_size}
     except Exception as e:
         logger.error(f"获取活动任务时出错: {traceback.format_exc()}")
         return {'error': str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -70,7 +126,8 @@ def get_active_tasks(task_manager: TaskManager = Provide[AnalysisContainer.task_
 # Market Scan Task
 @api_blueprint.route('/start_market_scan', methods=['POST'])
 @inject
-def start_market_scan(analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_analyzer], task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
+def start_market_scan(analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_analyzer], task_manager: TaskManager = Provide[AnalysisContainer.task_manager],
+                      task_queue: TaskQueue = Provide[AnalysisContainer.task_queue]):
     """Starts an asynchronous market scan task."""
     try:
         data = request.data
@@ -81,48 +138,18 @@ def start_market_scan(analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_
         if not stock_list:
             return {'error': 'Stock list is required'}, status.HTTP_400_BAD_REQUEST
 
-        if len(stock_list) > 100:
-            logger.warning(f"Stock list too long ({len(stock_list)}), truncating to 100.")
-            stock_list = stock_list[:100]
+        max_stocks = int(os.getenv('MARKET_SCAN_MAX_STOCKS', 6000))
+        if len(stock_list) > max_stocks:
+            logger.warning(f"Stock list too long ({len(stock_list)}), truncating to {max_stocks}.")
+            stock_list = stock_list[:max_stocks]
 
         task_params = {'stock_list_count': len(stock_list), 'min_score': min_score, 'market_type': market_type}
         task = task_manager.create_task(name="Market Scan", params=task_params)
         task_id = task['id']
 
-        def run_scan():
-            try:
-                task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=0)
-                
-                results = []
-                total = len(stock_list)
-                completed_count = 0
-                
-                with ThreadPoolExecutor(max_workers=10) as executor:
-                    future_to_stock = {executor.submit(analyzer.quick_analyze_stock, code, market_type): code for code in stock_list}
-                    
-                    for future in as_completed(future_to_stock):
-                        stock_code = future_to_stock[future]
-                        try:
-                            report = future.result()
-                            if report and report.get('score', 0) >= min_score:
-                                results.append(report)
-                        except Exception as exc:
-                            logger.error(f'Error analyzing {stock_code} in market scan: {exc}')
-                        
-                        completed_count += 1
-                        progress = int((completed_count / total) * 100)
-                        task_manager.update_task(task_id, progress=progress)
-
-                results.sort(key=lambda x: x['score'], reverse=True)
-                task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result=results)
-                logger.info(f"Market scan task {task_id} completed, found {len(results)} matching stocks.")
-
-            except Exception as e:
-                logger.error(f"Market scan task {task_id} failed: {e}", exc_info=True)
-                task_manager.update_task(task_id, status=TaskStatus.FAILED, error=str(e))
-
-        thread = threading.Thread(target=run_scan, daemon=True)
-        thread.start()
+        # 交给任务队列的工作进程执行（没有存活的工作进程时在后台线程中执行）
+        task_queue.submit(task_id, 'market_scan',
+                          {'stock_list': stock_list, 'min_score': min_score, 'market_type': market_type}, analyzer)
 
         return {'task_id': task_id}, status.HTTP_202_ACCEPTED
     except Exception as e:
@@ -135,7 +162,8 @@ def start_market_scan(analyzer: StockAnalyzer = Provide[AnalysisContainer.stock_
 # ETF Analysis Task
 @api_blueprint.route('/start_etf_analysis', methods=['POST'])
 @inject
-def start_etf_analysis(stock_analyzer = Provide[AnalysisContainer.stock_analyzer], task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
+def start_etf_analysis(stock_analyzer = Provide[AnalysisContainer.stock_analyzer], task_manager: TaskManager = Provide[AnalysisContainer.task_manager],
+                       task_queue: TaskQueue = Provide[AnalysisContainer.task_queue]):
     """Starts an asynchronous ETF analysis task."""
     try:
         data = request.data
@@ -150,20 +178,7 @@ def start_etf_analysis(stock_analyzer = Provide[AnalysisContainer.stock_analyzer
         task = task_manager.create_task(name=f"ETF Analysis for {etf_code}", params=task_params)
         task_id = task['id']
 
-        def run_etf_analysis():
-            try:
-                task_manager.update_task(task_id, status=TaskStatus.RUNNING, progress=10)
-                # 使用工厂创建EtfAnalyzer实例
-                etf_analyzer_instance = EtfAnalyzer(etf_code, stock_analyzer, market_type, period)
-                result = etf_analyzer_instance.run_analysis()
-                task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result=result)
-                logger.info(f"ETF analysis task {task_id} completed for {etf_code}")
-            except Exception as e:
-                logger.error(f"ETF analysis task {task_id} failed: {e}", exc_info=True)
-                task_manager.update_task(task_id, status=TaskStatus.FAILED, error=str(e))
-
-        thread = threading.Thread(target=run_etf_analysis, daemon=True)
-        thread.start()
+        task_queue.submit(task_id, 'etf_analysis', task_params, stock_analyzer)
 
         return {'task_id': task_id}, status.HTTP_202_ACCEPTED
     except Exception as e:
@@ -203,13 +218,15 @@ def get_etf_analysis_status(task_id, task_manager: TaskManager = Provide[Analysi
 def get_scan_status(task_id, task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
     """获取扫描任务状态"""
     task = task_manager.get_task(task_id)
+    if not task:
+        return {'error': '找不到指定的扫描任务'}, status.HTTP_404_NOT_FOUND
 
     # 基本状态信息
     status_info = {
         'id': task['id'],
         'status': task['status'],
         'progress': task.get('progress', 0),
-        'total': task.get('total', 0),
+        'total': (task.get('params') or {}).get('stock_list_count', 0),
         'created_at': task['created_at'],
         'updated_at': task['updated_at']
     }
@@ -218,6 +235,14 @@ def get_scan_status(task_id, task_manager: TaskManager = Provide[AnalysisContain
     if task['status'] == TaskStatus.COMPLETED and 'result' in task:
         status_info['result'] = task['result']
 
+    # 运行中或已取消的任务，返回已完成部分的结果和吞吐量
+    if task['status'] in [TaskStatus.RUNNING, TaskStatus.CANCELLED] and isinstance(task.get('result'), dict):
+        progress_info = task['result']
+        status_info['partial_results'] = progress_info.get('partial_results', [])
+        status_info['processed'] = progress_info.get('processed', 0)
+        status_info['throughput'] = progress_info.get('throughput')
+        status_info['eta_seconds'] = progress_info.get('eta_seconds')
+
     # 如果任务失败，包含错误信息
     if task['status'] == TaskStatus.FAILED and 'error' in task:
         status_info['error'] = task['error']
@@ -229,24 +254,14 @@ def get_scan_status(task_id, task_manager: TaskManager = Provide[AnalysisContain
 @inject
 def cancel_scan(task_id, task_manager: TaskManager = Provide[AnalysisContainer.task_manager]):
     """取消扫描任务"""
-    if task_id not in task_manager.get_all_tasks():
-        return {'error': '找不到指定的扫描任务'}, status.HTTP_404_NOT_FOUND
-
     task = task_manager.get_task(task_id)
+    if not task:
+        return {'error': '找不到指定的扫描任务'}, status.HTTP_404_NOT_FOUND
 
-    if task['status'] in [TaskStatus.COMPLETED, TaskStatus.FAILED]:
+    if task['status'] in [TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.CANCELLED]:
         return {'message': '任务已完成或失败，无法取消'}
 
-    # 更新状态为失败
-    task['status'] = TaskStatus.FAILED
-    task['error'] = '用户取消任务'
-    task['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # 运行扫描的进程收到取消通知后设置本地取消标记，扫描引擎随即停止提交新的股票
+    task_manager.cancel_task(task_id, error='用户取消任务')
 
     return {'message': '任务已取消'}
-
-
-
-
-
-
-
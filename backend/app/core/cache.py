@@ -1,21 +1,171 @@
 # app/core/cache.py
 import json
+import base64
 from datetime import datetime
 import os
+import sys
+import time
 import logging
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
 import redis
+from app.core.cache_codec import get_frame_codec
 
 logger = logging.getLogger(__name__)
 
+
+class MemoryCache:
+    """
+    进程内缓存 - 支持单条过期时间、按条目数和近似字节数限制容量、LRU淘汰
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=256 * 1024 * 1024):
+        """
+        初始化内存缓存
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 最大近似占用字节数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (value, expire_at, size)，按最近访问顺序排列
+        self._data = OrderedDict()
+        self._bytes = 0
+        # (expire_at, seq, key) 小顶堆，淘汰时只弹出已到期的条目；键被覆盖或删除后留下的旧项在弹出时跳过
+        self._expiry_heap = []
+        self._expiry_seq = itertools.count()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _estimate_size(value):
+        """估算缓存值占用的字节数（以序列化长度近似）"""
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        try:
+            return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+        except (TypeError, ValueError):
+            return sys.getsizeof(value)
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _get_entry(self, key):
+        """返回未过期的条目，已过期的条目顺带删除"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expire_at = entry[1]
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expire=None):
+        size = self._estimate_size(value)
+        expire_at = time.monotonic() + expire if expire and expire > 0 else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if size > self.max_bytes:
+                # 单条超过容量上限的值不缓存
+                return
+            self._data[key] = (value, expire_at, size)
+            self._bytes += size
+            if expire_at is not None:
+                heapq.heappush(self._expiry_heap, (expire_at, next(self._expiry_seq), key))
+                if len(self._expiry_heap) > 2 * len(self._data) + 64:
+                    self._rebuild_expiry_heap()
+            self._evict()
+
+    def _rebuild_expiry_heap(self):
+        """丢弃堆中已失效的旧项"""
+        self._expiry_heap = [(expire_at, next(self._expiry_seq), key)
+                             for key, (_, expire_at, _) in self._data.items() if expire_at is not None]
+        heapq.heapify(self._expiry_heap)
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expire_at, _, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            if entry is not None and entry[1] == expire_at:
+                self._remove(key)
+                self.expirations += 1
+
+    def _evict(self):
+        """先清理已过期条目，仍超限时按LRU顺序淘汰"""
+        if len(self._data) <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        self._purge_expired()
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, size) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._expiry_heap = []
+            self._bytes = 0
+
+    def exists(self, key):
+        with self._lock:
+            return self._get_entry(key) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
 class Cache:
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, frame_codec=None):
         """
         初始化缓存
         Args:
             redis_client: Redis客户端实例，通过依赖注入提供
+            frame_codec: DataFrame 编解码器，默认由 CACHE_FRAME_CODEC 环境变量决定（numpy/arrow/json）
         """
         self.logger = logging.getLogger(__name__)
         self.redis_client = redis_client
+        self.frame_codec = frame_codec or get_frame_codec(os.getenv('CACHE_FRAME_CODEC', 'numpy'))
         
         # 检查是否启用Redis缓存
         use_redis = os.getenv('USE_REDIS_CACHE', 'False').lower() == 'true'
@@ -28,12 +178,20 @@ class Cache:
             except Exception as e:
                 self.logger.warning(f"Redis连接失败，使用内存缓存: {e}")
                 self.cache_type = 'memory'
-                self._memory_cache = {}
+                self._memory_cache = self._create_memory_cache()
         else:
             self.cache_type = 'memory'
-            self._memory_cache = {}
+            self._memory_cache = self._create_memory_cache()
             self.logger.info("缓存初始化成功 - 使用内存缓存")
 
+    @staticmethod
+    def _create_memory_cache():
+        """按环境变量创建有界内存缓存"""
+        return MemoryCache(
+            max_entries=int(os.getenv('MEMORY_CACHE_MAX_ENTRIES', 10000)),
+            max_bytes=int(os.getenv('MEMORY_CACHE_MAX_MB', 256)) * 1024 * 1024
+        )
+
     def get(self, key):
         """获取缓存值"""
         try:
@@ -47,24 +205,52 @@ class Cache:
             self.logger.error(f"获取缓存失败 {key}: {e}")
         return None
 
-    def set(self, key, value, expire=3600):
-        """设置缓存值"""
+    def set(self, key, value, expire=3600, ttl=None):
+        """设置缓存值，expire/ttl 为过期秒数（ttl 为兼容参数名）"""
+        if ttl is not None:
+            expire = ttl
         try:
             if self.cache_type == 'redis' and self.redis_client:
                 self.redis_client.setex(key, expire, json.dumps(value, ensure_ascii=False))
             else:
-                # 内存缓存暂不处理过期时间
-                self._memory_cache[key] = value
+                self._memory_cache.set(key, value, expire)
         except Exception as e:
             self.logger.error(f"设置缓存失败 {key}: {e}")
 
+    def get_frame(self, key):
+        """获取缓存的 DataFrame，未命中或数据无法解码时返回 None"""
+        try:
+            if self.cache_type == 'redis' and self.redis_client:
+                value = self.redis_client.get(key)
+                # Redis 客户端启用了 decode_responses，二进制数据以 base64 文本保存
+                data = base64.b64decode(value) if value else None
+            else:
+                data = self._memory_cache.get(key)
+            if data is None:
+                return None
+            return self.frame_codec.decode(data)
+        except Exception as e:
+            self.logger.error(f"获取缓存DataFrame失败 {key}: {e}")
+        return None
+
+    def set_frame(self, key, df, expire=3600):
+        """以列式二进制格式缓存 DataFrame"""
+        try:
+            data = self.frame_codec.encode(df)
+            if self.cache_type == 'redis' and self.redis_client:
+                self.redis_client.setex(key, expire, base64.b64encode(data).decode('ascii'))
+            else:
+                self._memory_cache.set(key, data, expire)
+        except Exception as e:
+            self.logger.error(f"设置缓存DataFrame失败 {key}: {e}")
+
     def delete(self, key):
         """删除缓存"""
         try:
             if self.cache_type == 'redis' and self.redis_client:
                 self.redis_client.delete(key)
             else:
-                self._memory_cache.pop(key, None)
+                self._memory_cache.delete(key)
         except Exception as e:
             self.logger.error(f"删除缓存失败 {key}: {e}")
 
@@ -84,7 +270,7 @@ class Cache:
             if self.cache_type == 'redis' and self.redis_client:
                 return self.redis_client.exists(key)
             else:
-                return key in self._memory_cache
+                return self._memory_cache.exists(key)
         except Exception as e:
             self.logger.error(f"检查缓存存在性失败 {key}: {e}")
             return False
@@ -102,8 +288,9 @@ class Cache:
                 redis_info = self.redis_client.info()
                 info['memory_usage'] = redis_info.get('used_memory_human', 'N/A')
             else:
-                info['size'] = len(self._memory_cache)
-                info['memory_usage'] = 'N/A'
+                stats = self._memory_cache.get_stats()
+                info.update(stats)
+                info['memory_usage'] = f"{stats['bytes'] / 1024 / 1024:.2f}M"
         except Exception as e:
             self.logger.error(f"获取缓存信息失败: {e}")
             info['error'] = str(e)
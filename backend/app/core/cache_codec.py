@@ -0,0 +1,162 @@
+# app/core/cache_codec.py
+"""
+DataFrame 缓存编解码器
+
+缓存行情等 DataFrame 时，默认以列式二进制格式保存（NumPy 原始缓冲区 + JSON 模式头），
+解码时直接 np.frombuffer 还原各列，保留 dtype（日期仍为 datetime64），避免
+to_dict('records') + json 的逐行序列化开销。
+"""
+import json
+import logging
+import struct
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class FrameCodec:
+    """DataFrame 编解码器接口"""
+
+    name = 'base'
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class NumpyFrameCodec(FrameCodec):
+    """
+    列式二进制编解码器
+
+    布局: MAGIC | 头部长度(uint32, 小端) | JSON 头部 | 按8字节对齐的各列缓冲区
+    数值、布尔、datetime64/timedelta64 列保存原始内存；其他列以 JSON 数组保存。
+    """
+
+    name = 'numpy'
+    MAGIC = b'SAFC\x01'
+    ALIGN = 8
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        columns = []
+        buffers = []
+        offset = 0
+
+        frame = df
+        index_name = None
+        if not isinstance(df.index, pd.RangeIndex):
+            index_name = df.index.name if df.index.name is not None else '__index__'
+            frame = df.reset_index(names=index_name)
+
+        for name in frame.columns:
+            series = frame[name]
+            meta = {'name': name}
+            values = series.to_numpy()
+            tz = getattr(series.dtype, 'tz', None)
+            if tz is not None:
+                meta['tz'] = str(tz)
+                values = series.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+
+            if values.dtype.kind in 'biufcmM':
+                raw = np.ascontiguousarray(values).tobytes()
+                meta['dtype'] = values.dtype.str
+            else:
+                raw = json.dumps(series.tolist(), ensure_ascii=False, default=str).encode('utf-8')
+                meta['dtype'] = 'json'
+
+            meta['offset'] = offset
+            meta['nbytes'] = len(raw)
+            padding = (-len(raw)) % self.ALIGN
+            buffers.append(raw + b'\x00' * padding)
+            offset += len(raw) + padding
+            columns.append(meta)
+
+        header = json.dumps({
+            'rows': len(frame),
+            'columns': columns,
+            'index': index_name
+        }, ensure_ascii=False, default=str).encode('utf-8')
+        header += b' ' * ((-(len(self.MAGIC) + 4 + len(header))) % self.ALIGN)
+        return b''.join([self.MAGIC, struct.pack('<I', len(header)), header] + buffers)
+
+    def decode(self, data: bytes) -> pd.DataFrame:
+        if not data.startswith(self.MAGIC):
+            raise ValueError("不是有效的列式缓存数据")
+        start = len(self.MAGIC)
+        (header_len,) = struct.unpack_from('<I', data, start)
+        start += 4
+        header = json.loads(data[start:start + header_len].decode('utf-8'))
+        body = memoryview(data)[start + header_len:]
+
+        columns = {}
+        for meta in header['columns']:
+            chunk = body[meta['offset']:meta['offset'] + meta['nbytes']]
+            if meta['dtype'] == 'json':
+                values = json.loads(bytes(chunk).decode('utf-8'))
+            else:
+                values = np.frombuffer(chunk, dtype=np.dtype(meta['dtype']))
+                if 'tz' in meta:
+                    values = pd.DatetimeIndex(values).tz_localize('UTC').tz_convert(meta['tz'])
+            columns[meta['name']] = values
+
+        df = pd.DataFrame(columns)
+        if header.get('index') is not None:
+            df = df.set_index(header['index'])
+            if header['index'] == '__index__':
+                df.index.name = None
+        return df
+
+
+class ArrowFrameCodec(FrameCodec):
+    """Arrow IPC 编解码器（需要安装 pyarrow）"""
+
+    name = 'arrow'
+
+    def __init__(self):
+        import pyarrow  # noqa: F401  尽早暴露缺少依赖的问题
+        self._pa = pyarrow
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        table = self._pa.Table.from_pandas(df)
+        sink = self._pa.BufferOutputStream()
+        with self._pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def decode(self, data: bytes) -> pd.DataFrame:
+        return self._pa.ipc.open_stream(self._pa.py_buffer(data)).read_all().to_pandas()
+
+
+class JsonRecordsCodec(FrameCodec):
+    """原有的 to_dict('records') + JSON 格式，保留用于对比和兼容"""
+
+    name = 'json'
+
+    def encode(self, df: pd.DataFrame) -> bytes:
+        return json.dumps(df.to_dict('records'), ensure_ascii=False, default=str).encode('utf-8')
+
+    def decode(self, data: bytes) -> pd.DataFrame:
+        return pd.DataFrame(json.loads(data))
+
+
+FRAME_CODECS = {
+    NumpyFrameCodec.name: NumpyFrameCodec,
+    ArrowFrameCodec.name: ArrowFrameCodec,
+    JsonRecordsCodec.name: JsonRecordsCodec,
+}
+
+
+def get_frame_codec(name='numpy') -> FrameCodec:
+    """按名称创建编解码器，依赖缺失时回退到 numpy 编解码器"""
+    codec_cls = FRAME_CODECS.get(name)
+    if codec_cls is None:
+        logger.warning(f"未知的缓存编解码器 {name}，使用 numpy")
+        codec_cls = NumpyFrameCodec
+    try:
+        return codec_cls()
+    except ImportError as e:
+        logger.warning(f"缓存编解码器 {name} 不可用，使用 numpy: {e}")
+        return NumpyFrameCodec()
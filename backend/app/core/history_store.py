@@ -0,0 +1,189 @@
+# app/core/history_store.py
+"""
+本地行情历史库
+
+每只股票保存一份完整的复权日线历史（列式二进制文件，见 cache_codec），
+过期后只向数据源请求最后一根K线之后的增量数据并追加；任意日期区间的查询
+都在本地切片完成，不再因为 start_date/end_date 不同而重新拉取整段行情。
+数据文件先于元数据写入，元数据记录数据文件的校验值；两者不一致（写入中途失败或
+并发写入交错）时视为没有本地数据，重新同步。
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Callable, Optional
+
+import pandas as pd
+
+from app.core.cache_codec import NumpyFrameCodec
+
+logger = logging.getLogger(__name__)
+
+# 首次同步时请求的起始日期，相当于“全部历史”
+FULL_HISTORY_START = '19900101'
+
+
+class PriceHistoryStore:
+    """
+    按股票保存的增量行情库
+
+    fetcher(stock_code, market_type, start_date, end_date) 返回已标准化的
+    DataFrame（至少包含 date/open/close/high/low/volume 列，按日期升序），
+    日期参数为 YYYYMMDD 字符串。
+    """
+
+    def __init__(self, fetcher: Callable, base_dir: Optional[str] = None, refresh_interval: Optional[int] = None):
+        """
+        Args:
+            fetcher: 数据源拉取函数
+            base_dir: 存储目录，默认 HISTORY_STORE_DIR 环境变量或 data/history
+            refresh_interval: 距上次同步超过该秒数才请求增量数据，默认 HISTORY_REFRESH_INTERVAL 或 3600
+        """
+        self.fetcher = fetcher
+        self.base_dir = base_dir or os.getenv('HISTORY_STORE_DIR', os.path.join('data', 'history'))
+        self.refresh_interval = refresh_interval if refresh_interval is not None else int(
+            os.getenv('HISTORY_REFRESH_INTERVAL', 3600))
+        self.codec = NumpyFrameCodec()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {'full_syncs': 0, 'incremental_syncs': 0, 'local_hits': 0, 'rows_fetched': 0}
+
+    def _paths(self, stock_code, market_type):
+        directory = os.path.join(self.base_dir, market_type)
+        return os.path.join(directory, f"{stock_code}.bin"), os.path.join(directory, f"{stock_code}.meta.json")
+
+    def _lock_for(self, stock_code, market_type):
+        key = (stock_code, market_type)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def load(self, stock_code, market_type='A'):
+        """读取本地保存的完整历史，没有时返回 (None, None)"""
+        data_path, meta_path = self._paths(stock_code, market_type)
+        if not os.path.exists(data_path) or not os.path.exists(meta_path):
+            return None, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(data_path, 'rb') as f:
+                raw = f.read()
+            if meta.get('data_crc32') != zlib.crc32(raw):
+                logger.warning(f"本地行情 {market_type}:{stock_code} 数据与元数据不一致，将重新同步")
+                return None, None
+            return self.codec.decode(raw), meta
+        except Exception as e:
+            logger.warning(f"读取本地行情 {market_type}:{stock_code} 失败，将重新同步: {e}")
+            return None, None
+
+    def _save(self, stock_code, market_type, df, meta):
+        data_path, meta_path = self._paths(stock_code, market_type)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        payload = self.codec.encode(df)
+        # 先写数据再写元数据，元数据中的校验值用于读取时确认两者属于同一次写入
+        self._write_atomic(data_path, payload)
+        self._write_atomic(meta_path, json.dumps(dict(meta, data_crc32=zlib.crc32(payload)),
+                                                 ensure_ascii=False).encode('utf-8'))
+
+    @staticmethod
+    def _write_atomic(path, payload):
+        """写入唯一命名的临时文件再替换，避免并发读取到半截文件或多个进程共用临时文件"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def sync(self, stock_code, market_type='A', force=False):
+        """
+        同步一只股票的历史并返回完整历史
+
+        - 本地没有数据：拉取全部历史
+        - 距上次同步超过 refresh_interval：从最后一根K线（含）开始拉取增量数据。
+          重叠的那根K线收盘价与本地不一致时，说明复权因子已变化（除权除息），改为拉取全部历史
+        - 增量拉取失败：记录警告并返回本地已有的历史，下次调用再重试
+
+        港股数据源（ak.stock_hk_daily）不支持日期参数，每次"增量"同步实际都会下载完整历史，
+        只是本地仍按最后一根K线合并；港股的网络开销主要靠 refresh_interval 控制。
+        """
+        with self._lock_for(stock_code, market_type):
+            stored, meta = self.load(stock_code, market_type)
+            now = time.time()
+            if stored is not None and not force and now - meta.get('synced_at', 0) < self.refresh_interval:
+                self.stats['local_hits'] += 1
+                return stored
+
+            today = datetime.now().strftime('%Y%m%d')
+            if stored is None or stored.empty or force:
+                df = self._fetch_full(stock_code, market_type, today)
+            else:
+                try:
+                    df = self._sync_tail(stock_code, market_type, stored, today)
+                except Exception as e:
+                    # 不更新 synced_at，下次调用时再尝试
+                    logger.warning(f"{market_type}:{stock_code} 增量同步失败，返回本地已有数据: {e}")
+                    return stored
+
+            self._save(stock_code, market_type, df, {
+                'stock_code': stock_code,
+                'market_type': market_type,
+                'synced_at': now,
+                'first_date': df['date'].iloc[0].strftime('%Y-%m-%d') if not df.empty else None,
+                'last_date': df['date'].iloc[-1].strftime('%Y-%m-%d') if not df.empty else None,
+                'rows': len(df)
+            })
+            return df
+
+    def _sync_tail(self, stock_code, market_type, stored, today):
+        last_date = stored['date'].iloc[-1]
+        tail = self.fetcher(stock_code, market_type, last_date.strftime('%Y%m%d'), today)
+        tail = self._normalize(tail)
+        self.stats['incremental_syncs'] += 1
+        self.stats['rows_fetched'] += len(tail)
+
+        overlap = tail[tail['date'] == last_date]
+        if not overlap.empty and abs(float(overlap['close'].iloc[0]) - float(stored['close'].iloc[-1])) > 1e-6:
+            logger.info(f"{market_type}:{stock_code} 复权价格已变化，重新同步全部历史")
+            return self._fetch_full(stock_code, market_type, today)
+        if tail.empty:
+            return stored
+        # 最后一根K线可能是盘中数据，以新数据为准
+        return pd.concat([stored[stored['date'] < tail['date'].iloc[0]], tail], ignore_index=True)
+
+    def _fetch_full(self, stock_code, market_type, end_date):
+        df = self._normalize(self.fetcher(stock_code, market_type, FULL_HISTORY_START, end_date))
+        self.stats['full_syncs'] += 1
+        self.stats['rows_fetched'] += len(df)
+        return df
+
+    @staticmethod
+    def _normalize(df):
+        if df is None or df.empty:
+            return pd.DataFrame(columns=['date', 'open', 'close', 'high', 'low', 'volume'])
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        return df.sort_values('date').drop_duplicates('date', keep='last').reset_index(drop=True)
+
+    def get_range(self, stock_code, market_type='A', start_date=None, end_date=None):
+        """
+        返回 [start_date, end_date] 区间的行情（日期格式 YYYYMMDD 或 YYYY-MM-DD，None 表示不限）
+        """
+        df = self.sync(stock_code, market_type)
+        if df.empty:
+            return df
+        mask = pd.Series(True, index=df.index)
+        if start_date:
+            mask &= df['date'] >= pd.to_datetime(start_date)
+        if end_date:
+            mask &= df['date'] <= pd.to_datetime(end_date)
+        return df[mask].reset_index(drop=True)
@@ -1,4 +1,4 @@
-from typing import Annotated, Sequence
+from typing import Annotated, Dict, Sequence
 from datetime import date, timedelta, datetime
 from typing_extensions import TypedDict, Optional
 from langchain_openai import ChatOpenAI
@@ -11,6 +11,11 @@ from tradingagents.utils.logging_init import get_logger
 logger = get_logger("default")
 
 
+def merge_timings(left: Dict[str, float], right: Dict[str, float]) -> Dict[str, float]:
+    """Reducer for per-analyst timings written by concurrent analyst branches."""
+    return {**(left or {}), **(right or {})}
+
+
 # Researcher team state
 class InvestDebateState(TypedDict):
     bull_history: Annotated[
@@ -64,6 +69,7 @@ class AgentState(MessagesState):
         str, "Report from the News Researcher of current world affairs"
     ]
     fundamentals_report: Annotated[str, "Report from the Fundamentals Researcher"]
+    analyst_timings: Annotated[Dict[str, float], merge_timings]  # Seconds spent by each analyst
 
     # researcher team discussion step
     investment_debate_state: Annotated[
@@ -5,12 +5,19 @@ import dashscope
 from dashscope import TextEmbedding
 import os
 import threading
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from tradingagents.llm_adapters.embedding_providers import (DashScopeEmbeddingProvider, EmbeddingProvider,
+                                                            LocalEmbeddingProvider, OpenAIEmbeddingProvider,
+                                                            embed_texts)
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 logger = get_logger("agents.utils.memory")
 
+# 记忆功能禁用或嵌入失败时返回的空向量维度
+EMPTY_EMBEDDING_DIM = 1024
+
 
 class ChromaDBManager:
     """单例ChromaDB管理器，避免并发创建集合的冲突"""
@@ -107,12 +114,19 @@ class ChromaDBManager:
 
 
 class FinancialSituationMemory:
-    def __init__(self, name, config):
+    def __init__(self, name, config, embedding_provider: Optional[EmbeddingProvider] = None):
         self.config = config
         self.llm_provider = config.get("llm_provider", "openai").lower()
 
-        # 根据LLM提供商选择嵌入模型和客户端
-        if self.llm_provider == "dashscope" or self.llm_provider == "alibaba":
+        if embedding_provider is None and config.get("embedding_provider", "auto").lower() == "local":
+            embedding_provider = LocalEmbeddingProvider()
+
+        # 根据LLM提供商选择嵌入模型和客户端（显式指定的提供者优先）
+        if embedding_provider is not None:
+            self.embedding = embedding_provider.model
+            self.client = None
+            logger.info(f"💡 记忆库 {name} 使用 {embedding_provider.name} 嵌入服务")
+        elif self.llm_provider == "dashscope" or self.llm_provider == "alibaba":
             self.embedding = "text-embedding-v3"
             self.client = None  # DashScope不需要OpenAI客户端
 
@@ -269,197 +283,96 @@ class FinancialSituationMemory:
                 self.client = "DISABLED"
                 logger.warning(f"⚠️ 未找到OPENAI_API_KEY，记忆功能已禁用")
 
+        self.embedding_provider = embedding_provider or self._create_embedding_provider()
+
         # 使用单例ChromaDB管理器
         self.chroma_manager = ChromaDBManager()
         self.situation_collection = self.chroma_manager.get_or_create_collection(name)
 
+    def _create_embedding_provider(self) -> Optional[EmbeddingProvider]:
+        """按上面选定的嵌入服务创建提供者，记忆功能禁用时返回 None"""
+        if self.client == "DISABLED":
+            return None
+        if self.client is None:
+            # 阿里百炼嵌入不需要OpenAI客户端
+            return DashScopeEmbeddingProvider(self.embedding)
+        return OpenAIEmbeddingProvider(self.client, self.embedding)
+
     def get_embedding(self, text):
         """Get embedding for a text using the configured provider"""
+        return self.get_embeddings([text])[0]
 
-        # 检查记忆功能是否被禁用
-        if self.client == "DISABLED":
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for several texts, batched and shared across memories through the embedding cache"""
+        if not texts:
+            return []
+
+        if self.embedding_provider is None:
             # 内存功能已禁用，返回空向量
             logger.debug(f"⚠️ 记忆功能已禁用，返回空向量")
-            return [0.0] * 1024  # 返回1024维的零向量
-
-        if (self.llm_provider == "dashscope" or
-            self.llm_provider == "alibaba" or
-            (self.llm_provider == "google" and self.client is None) or
-            (self.llm_provider == "deepseek" and self.client is None) or
-            (self.llm_provider == "openrouter" and self.client is None)):
-            # 使用阿里百炼的嵌入模型
-            try:
-                # 导入DashScope模块
-                import dashscope
-                from dashscope import TextEmbedding
-
-                # 检查DashScope API密钥是否可用
-                if not hasattr(dashscope, 'api_key') or not dashscope.api_key:
-                    logger.warning(f"⚠️ DashScope API密钥未设置，记忆功能降级")
-                    return [0.0] * 1024  # 返回空向量
-
-                # 尝试调用DashScope API
-                response = TextEmbedding.call(
-                    model=self.embedding,
-                    input=text
-                )
-
-                # 检查响应状态
-                if response.status_code == 200:
-                    # 成功获取embedding
-                    embedding = response.output['embeddings'][0]['embedding']
-                    logger.debug(f"✅ DashScope embedding成功，维度: {len(embedding)}")
-                    return embedding
-                else:
-                    # API返回错误状态码
-                    logger.error(f"❌ DashScope API错误: {response.code} - {response.message}")
-                    logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                    return [0.0] * 1024  # 返回空向量而不是抛出异常
-
-            except ImportError as e:
-                # dashscope包未安装
-                logger.error(f"❌ DashScope包未安装: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except AttributeError as e:
-                # API调用方法不存在或参数错误
-                logger.error(f"❌ DashScope API调用错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except ConnectionError as e:
-                # 网络连接错误
-                logger.error(f"❌ DashScope网络连接错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except TimeoutError as e:
-                # 请求超时
-                logger.error(f"❌ DashScope请求超时: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except KeyError as e:
-                # 响应格式错误
-                logger.error(f"❌ DashScope响应格式错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except Exception as e:
-                # 其他所有异常
-                logger.error(f"❌ DashScope embedding未知异常: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024  # 返回空向量而不是抛出异常
-        else:
-            # 使用OpenAI兼容的嵌入模型
-            if self.client is None:
-                logger.warning(f"⚠️ 嵌入客户端未初始化，返回空向量")
-                return [0.0] * 1024  # 返回空向量
-            elif self.client == "DISABLED":
-                # 内存功能已禁用，返回空向量
-                logger.debug(f"⚠️ 内存功能已禁用，返回空向量")
-                return [0.0] * 1024  # 返回1024维的零向量
-
-            # 尝试调用OpenAI兼容的embedding API
-            try:
-                response = self.client.embeddings.create(
-                    model=self.embedding,
-                    input=text
-                )
-                embedding = response.data[0].embedding
-                logger.debug(f"✅ OpenAI embedding成功，维度: {len(embedding)}")
-                return embedding
-
-            except AttributeError as e:
-                # API调用方法不存在
-                logger.error(f"❌ OpenAI API调用错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except ConnectionError as e:
-                # 网络连接错误
-                logger.error(f"❌ OpenAI网络连接错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except TimeoutError as e:
-                # 请求超时
-                logger.error(f"❌ OpenAI请求超时: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            except KeyError as e:
-                # 响应格式错误
-                logger.error(f"❌ OpenAI响应格式错误: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
+            return [[0.0] * EMPTY_EMBEDDING_DIM for _ in texts]
 
-            except Exception as e:
-                # 其他所有异常
-                logger.error(f"❌ OpenAI embedding未知异常: {str(e)}")
-                logger.warning(f"⚠️ 记忆功能降级，返回空向量")
-                return [0.0] * 1024
-
-            response = self.client.embeddings.create(
-                model=self.embedding, input=text
-            )
-            return response.data[0].embedding
+        try:
+            return embed_texts(self.embedding_provider, texts)
+        except Exception as e:
+            logger.error(f"❌ {self.embedding_provider.name} embedding失败: {str(e)}")
+            logger.warning(f"⚠️ 记忆功能降级，返回空向量")
+            return [[0.0] * EMPTY_EMBEDDING_DIM for _ in texts]
 
     def add_situations(self, situations_and_advice):
         """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
 
-        situations = []
-        advice = []
-        ids = []
-        embeddings = []
+        if not situations_and_advice:
+            return
 
+        situations = [situation for situation, _ in situations_and_advice]
+        advice = [recommendation for _, recommendation in situations_and_advice]
         offset = self.situation_collection.count()
 
-        for i, (situation, recommendation) in enumerate(situations_and_advice):
-            situations.append(situation)
-            advice.append(recommendation)
-            ids.append(str(offset + i))
-            embeddings.append(self.get_embedding(situation))
-
         self.situation_collection.add(
             documents=situations,
             metadatas=[{"recommendation": rec} for rec in advice],
-            embeddings=embeddings,
-            ids=ids,
+            embeddings=self.get_embeddings(situations),
+            ids=[str(offset + i) for i in range(len(situations))],
         )
 
     def get_memories(self, current_situation, n_matches=1):
         """Find matching recommendations using embeddings"""
-        query_embedding = self.get_embedding(current_situation)
+        return self.get_memories_batch([current_situation], n_matches)[0]
 
-        # 检查是否为空向量（记忆功能被禁用）
-        if all(x == 0.0 for x in query_embedding):
+    def get_memories_batch(self, situations, n_matches=1):
+        """Find matching recommendations for several situations with one embedding request and one query"""
+        query_embeddings = self.get_embeddings(list(situations))
+        matched = [[] for _ in query_embeddings]
+
+        # 跳过空向量（记忆功能被禁用或嵌入失败）
+        active = [i for i, embedding in enumerate(query_embeddings) if any(x != 0.0 for x in embedding)]
+        if not active:
             logger.debug(f"⚠️ 记忆功能已禁用，返回空记忆列表")
-            return []  # 返回空列表而不是查询数据库
+            return matched  # 返回空列表而不是查询数据库
 
         try:
             results = self.situation_collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=[query_embeddings[i] for i in active],
                 n_results=n_matches,
                 include=["metadatas", "documents", "distances"],
             )
 
-            matched_results = []
-            for i in range(len(results["documents"][0])):
-                matched_results.append(
-                    {
-                        "matched_situation": results["documents"][0][i],
-                        "recommendation": results["metadatas"][0][i]["recommendation"],
-                        "similarity_score": 1 - results["distances"][0][i],
-                    }
-                )
+            for row, i in enumerate(active):
+                for j in range(len(results["documents"][row])):
+                    matched[i].append(
+                        {
+                            "matched_situation": results["documents"][row][j],
+                            "recommendation": results["metadatas"][row][j]["recommendation"],
+                            "similarity_score": 1 - results["distances"][row][j],
+                        }
+                    )
 
-            return matched_results
+            return matched
         except Exception as e:
             logger.error(f"❌ 记忆查询失败: {e}")
             logger.warning(f"⚠️ 返回空记忆列表")
-            return []  # 查询失败时返回空列表
+            return [[] for _ in query_embeddings]  # 查询失败时返回空列表
 
 
 if __name__ == "__main__":
@@ -6,12 +6,16 @@
 
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .usage_log import UsageLog
+
 # 导入统一日志系统
 from tradingagents.utils.logging_init import get_logger
 
@@ -71,9 +75,13 @@ class ConfigManager:
 
         self.models_file = self.config_dir / "models.json"
         self.pricing_file = self.config_dir / "pricing.json"
-        self.usage_file = self.config_dir / "usage.json"
+        self.usage_file = self.config_dir / "usage.jsonl"
         self.settings_file = self.config_dir / "settings.json"
 
+        # 按文件 mtime 缓存的 JSON 配置，避免每次 LLM 调用都读取 settings.json 和 pricing.json
+        self._json_cache: Dict[Path, tuple] = {}
+        self._json_cache_lock = threading.Lock()
+
         # 加载.env文件（保持向后兼容）
         self._load_env_file()
 
@@ -83,6 +91,31 @@ class ConfigManager:
 
         self._init_default_configs()
 
+        # 使用记录：内存缓冲 + 后台批量追加到 JSONL，旧版 usage.json 首次使用时迁移
+        self.usage_log = UsageLog(
+            self.usage_file,
+            max_records=lambda: self.load_settings().get("max_usage_records", 10000),
+            legacy_path=self.config_dir / "usage.json",
+        )
+
+    def _load_json_cached(self, path: Path):
+        """读取JSON文件，文件的 mtime 和大小未变化时直接返回上次解析的结果（调用方不可修改）"""
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._json_cache_lock:
+            cached = self._json_cache.get(path)
+            if cached and cached[0] == signature:
+                return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._json_cache_lock:
+            self._json_cache[path] = (signature, data)
+        return data
+
+    def _invalidate_json_cache(self, path: Path):
+        with self._json_cache_lock:
+            self._json_cache.pop(path, None)
+
     def _load_env_file(self):
         """加载.env文件（保持向后兼容）"""
         # 尝试从项目根目录加载.env文件
@@ -267,8 +300,7 @@ class ConfigManager:
     def load_pricing(self) -> List[PricingConfig]:
         """加载定价配置"""
         try:
-            with open(self.pricing_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._load_json_cached(self.pricing_file)
             return [PricingConfig(**item) for item in data]
         except Exception as e:
             logger.error(f"加载定价配置失败: {e}")
@@ -282,15 +314,13 @@ class ConfigManager:
                 json.dump(data, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存定价配置失败: {e}")
+        finally:
+            self._invalidate_json_cache(self.pricing_file)
     
     def load_usage_records(self) -> List[UsageRecord]:
         """加载使用记录"""
         try:
-            if not self.usage_file.exists():
-                return []
-            with open(self.usage_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [UsageRecord(**item) for item in data]
+            return [UsageRecord(**item) for item in self.usage_log.read_all()]
         except Exception as e:
             logger.error(f"加载使用记录失败: {e}")
             return []
@@ -298,9 +328,7 @@ class ConfigManager:
     def save_usage_records(self, records: List[UsageRecord]):
         """保存使用记录"""
         try:
-            data = [asdict(record) for record in records]
-            with open(self.usage_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self.usage_log.replace([asdict(record) for record in records])
         except Exception as e:
             logger.error(f"保存使用记录失败: {e}")
     
@@ -329,17 +357,8 @@ class ConfigManager:
             else:
                 logger.error(f"⚠️ MongoDB保存失败，回退到JSON文件存储")
         
-        # 回退到JSON文件存储
-        records = self.load_usage_records()
-        records.append(record)
-        
-        # 限制记录数量
-        settings = self.load_settings()
-        max_records = settings.get("max_usage_records", 10000)
-        if len(records) > max_records:
-            records = records[-max_records:]
-        
-        self.save_usage_records(records)
+        # 回退到文件存储：放入缓冲区，由后台线程批量追加，记录数量在压缩时限制
+        self.usage_log.append(asdict(record))
         return record
     
     def calculate_cost(self, provider: str, model_name: str, input_tokens: int, output_tokens: int) -> float:
@@ -364,8 +383,7 @@ class ConfigManager:
     def load_settings(self) -> Dict[str, Any]:
         """加载设置，合并.env中的配置"""
         try:
-            with open(self.settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
+            settings = dict(self._load_json_cached(self.settings_file))
         except Exception as e:
             logger.error(f"加载设置失败: {e}")
             settings = {}
@@ -414,6 +432,8 @@ class ConfigManager:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
         except Exception as e:
             logger.error(f"保存设置失败: {e}")
+        finally:
+            self._invalidate_json_cache(self.settings_file)
     
     def get_enabled_models(self) -> List[ModelConfig]:
         """获取启用的模型"""
@@ -541,6 +561,14 @@ class TokenTracker:
 
     def __init__(self, config_manager: ConfigManager):
         self.config_manager = config_manager
+        # LLM响应缓存的命中统计（进程内），键为 (provider, model_name)
+        self._cache_stats: Dict[tuple, Dict[str, Any]] = {}
+        self._cache_lock = threading.Lock()
+        # 成本警告用的当日累计成本 (日期, 成本, 统计时间)，从使用记录统计后逐条累加；
+        # 其他进程（多个 Web / 任务工作进程）的使用量只体现在使用记录中，每隔 reseed_interval 秒重新统计一次
+        self._daily_cost: Optional[tuple] = None
+        self._daily_cost_lock = threading.Lock()
+        self.reseed_interval = float(os.getenv('TOKEN_COST_RESEED_INTERVAL', 60))
 
     def track_usage(self, provider: str, model_name: str, input_tokens: int,
                    output_tokens: int, session_id: str = None, analysis_type: str = "stock_analysis"):
@@ -577,13 +605,74 @@ class TokenTracker:
         threshold = settings.get("cost_alert_threshold", 100.0)
 
         # 获取今日总成本
-        today_stats = self.config_manager.get_usage_statistics(1)
-        total_today = today_stats["total_cost"]
+        today = datetime.now().date()
+        now = time.monotonic()
+        with self._daily_cost_lock:
+            if (self._daily_cost is None or self._daily_cost[0] != today
+                    or now - self._daily_cost[2] >= self.reseed_interval):
+                # 统计结果已包含当前这条记录
+                total_today = self.config_manager.get_usage_statistics(1)["total_cost"]
+                self._daily_cost = (today, total_today, now)
+            else:
+                total_today = self._daily_cost[1] + current_cost
+                self._daily_cost = (today, total_today, self._daily_cost[2])
 
         if total_today >= threshold:
             logger.warning(f"⚠️ 成本警告: 今日成本已达到 ¥{total_today:.4f}，超过阈值 ¥{threshold}",
                           extra={'cost': total_today, 'threshold': threshold, 'event_type': 'cost_alert'})
 
+    def record_cache_lookup(self, provider: str, model_name: str, hit: bool,
+                            input_tokens: int = 0, output_tokens: int = 0, node: str = None):
+        """记录一次LLM响应缓存查询，命中时累计节省的token"""
+        with self._cache_lock:
+            stats = self._cache_stats.setdefault((provider, model_name), {
+                "hits": 0, "misses": 0, "saved_input_tokens": 0, "saved_output_tokens": 0, "nodes": {}
+            })
+            node_stats = stats["nodes"].setdefault(node or "default", {"hits": 0, "misses": 0})
+            if hit:
+                stats["hits"] += 1
+                node_stats["hits"] += 1
+                stats["saved_input_tokens"] += input_tokens
+                stats["saved_output_tokens"] += output_tokens
+            else:
+                stats["misses"] += 1
+                node_stats["misses"] += 1
+
+    def get_cache_statistics(self) -> Dict[str, Any]:
+        """LLM响应缓存的命中率与节省的token和成本"""
+        with self._cache_lock:
+            snapshot = {key: {**value, "nodes": {n: dict(c) for n, c in value["nodes"].items()}}
+                        for key, value in self._cache_stats.items()}
+
+        models = {}
+        total_hits = total_misses = 0
+        total_saved_cost = 0.0
+        for (provider, model_name), stats in snapshot.items():
+            lookups = stats["hits"] + stats["misses"]
+            saved_cost = self.config_manager.calculate_cost(
+                provider, model_name, stats["saved_input_tokens"], stats["saved_output_tokens"]
+            )
+            for counts in stats["nodes"].values():
+                node_lookups = counts["hits"] + counts["misses"]
+                counts["hit_rate"] = counts["hits"] / node_lookups if node_lookups else 0.0
+            models[f"{provider}/{model_name}"] = {
+                **stats,
+                "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                "saved_cost": saved_cost,
+            }
+            total_hits += stats["hits"]
+            total_misses += stats["misses"]
+            total_saved_cost += saved_cost
+
+        total = total_hits + total_misses
+        return {
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": total_hits / total if total else 0.0,
+            "saved_cost": total_saved_cost,
+            "models": models,
+        }
+
     def get_session_cost(self, session_id: str) -> float:
         """获取会话成本"""
         records = self.config_manager.load_usage_records()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Token使用记录的追加日志
+LLM调用只把记录放入内存缓冲区，由后台线程批量追加到 JSONL 文件（每行一条记录），
+不再在每次调用时读取并重写整个 usage.json。
+
+- 缓冲区达到 TOKEN_USAGE_FLUSH_SIZE 条或距上次写入 TOKEN_USAGE_FLUSH_INTERVAL 秒时写入
+- 读取前先写入缓冲区，统计结果包含刚记录的使用量
+- 日志行数超过保留上限的两倍时压缩为最近的 max_records 条（临时文件 + 原子替换）
+- 追加与压缩都持有 <日志名>.lock 的文件锁，多个进程共用一个日志时压缩不会丢掉其他进程刚追加的记录
+  （不支持 fcntl 的平台上只有进程内的锁）
+- 旧版 usage.json 在首次使用时迁移到 JSONL，原文件改名为 usage.json.bak
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+class UsageLog:
+    """带内存缓冲和后台写入线程的 JSONL 使用记录日志（线程安全）"""
+
+    def __init__(self, path: Union[str, Path], max_records: Union[int, Callable[[], int]] = 10000,
+                 legacy_path: Optional[Union[str, Path]] = None,
+                 flush_interval: Optional[float] = None, flush_size: Optional[int] = None):
+        self.path = Path(path)
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self._max_records = max_records
+        self.flush_interval = flush_interval if flush_interval is not None else \
+            float(os.getenv('TOKEN_USAGE_FLUSH_INTERVAL', 2.0))
+        self.flush_size = flush_size or int(os.getenv('TOKEN_USAGE_FLUSH_SIZE', 50))
+        self._reset_process_state()
+        self._line_count: Optional[int] = None
+        self._migrate_legacy()
+        atexit.register(self.close)
+
+    def _reset_process_state(self):
+        # fork 出的子进程不继承写入线程，锁和缓冲区也要重建
+        self._pid = os.getpid()
+        self._buffer: List[Dict] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.RLock()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def max_records(self) -> int:
+        value = self._max_records() if callable(self._max_records) else self._max_records
+        return max(int(value or 0), 1)
+
+    def append(self, record: Dict):
+        """记录一条使用量，O(1)，不访问磁盘"""
+        if self._pid != os.getpid():
+            self._reset_process_state()
+        with self._cond:
+            self._buffer.append(record)
+            if self._flusher is None or not self._flusher.is_alive():
+                self._closed = False
+                self._flusher = threading.Thread(target=self._run, name="usage-log-flusher", daemon=True)
+                self._flusher.start()
+            if len(self._buffer) >= self.flush_size:
+                self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._buffer) >= self.flush_size,
+                                    timeout=self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def flush(self):
+        """把缓冲区中的记录追加到日志文件"""
+        with self._write_lock:
+            with self._cond:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return
+
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self._file_lock(), open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in pending))
+            except Exception as e:
+                logger.error(f"写入使用记录失败: {e}")
+                with self._cond:
+                    self._buffer[:0] = pending
+                return
+
+            if self._line_count is None:
+                self._line_count = self._count_lines()
+            else:
+                self._line_count += len(pending)
+            if self._line_count > 2 * self.max_records:
+                self.compact()
+
+    def read_all(self) -> List[Dict]:
+        """读取最近的 max_records 条记录（含尚未写入的缓冲区）"""
+        with self._write_lock:
+            self.flush()
+            return self._read_lines()[-self.max_records:]
+
+    def replace(self, records: List[Dict]):
+        """用给定记录整体替换日志"""
+        with self._write_lock:
+            with self._cond:
+                self._buffer = []
+            with self._file_lock():
+                self._write_atomic(records[-self.max_records:])
+
+    def compact(self):
+        """只保留最近的 max_records 条记录"""
+        with self._write_lock, self._file_lock():
+            records = self._read_lines()
+            kept = records[-self.max_records:]
+            self._write_atomic(kept)
+            logger.debug(f"[使用记录] 日志压缩: {len(records)} → {len(kept)} 条")
+
+    def close(self):
+        """停止后台线程并写入剩余记录"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        flusher = self._flusher
+        if flusher is not None and flusher.is_alive() and flusher is not threading.current_thread():
+            flusher.join(timeout=5)
+        self.flush()
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程的排他锁（锁文件不随压缩替换），调用方需已持有 _write_lock，且不可嵌套"""
+        if fcntl is None:
+            yield
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_lines(self) -> List[Dict]:
+        if not self.path.exists():
+            self._line_count = 0
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 进程被强制结束时最后一行可能不完整
+                    logger.warning(f"跳过损坏的使用记录: {line[:80]}")
+        self._line_count = len(records)
+        return records
+
+    def _count_lines(self) -> int:
+        if not self.path.exists():
+            return 0
+        with open(self.path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+
+    def _write_atomic(self, records: List[Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix=self.path.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._line_count = len(records)
+
+    def _migrate_legacy(self):
+        if not self.legacy_path or not self.legacy_path.exists() or self.path.exists():
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            self._write_atomic(records)
+            os.replace(self.legacy_path, self.legacy_path.with_name(self.legacy_path.name + '.bak'))
+            logger.info(f"✅ 使用记录已迁移到 {self.path.name}: {len(records)} 条")
+        except Exception as e:
+            logger.error(f"迁移使用记录失败: {e}")
@@ -7,6 +7,8 @@
 import os
 import json
 import pickle
+import sqlite3
+import threading
 import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -18,6 +20,112 @@ from tradingagents.utils.logging_manager import get_logger
 logger = get_logger('agents')
 
 
+class CacheIndex:
+    """
+    缓存元数据索引（SQLite）
+
+    按 (symbol, data_type, market_type, data_source) 和 cached_at 建立索引，
+    查找、统计和清理都走索引查询，不再逐个读取 *_meta.json 文件。
+    """
+
+    COLUMNS = ('cache_key', 'symbol', 'data_type', 'market_type', 'data_source',
+               'start_date', 'end_date', 'file_path', 'file_format', 'file_size', 'cached_at')
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_key TEXT PRIMARY KEY,
+                    symbol TEXT,
+                    data_type TEXT,
+                    market_type TEXT,
+                    data_source TEXT,
+                    start_date TEXT,
+                    end_date TEXT,
+                    file_path TEXT,
+                    file_format TEXT,
+                    file_size INTEGER DEFAULT 0,
+                    cached_at REAL
+                )""")
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cache_lookup
+                ON cache_entries (symbol, data_type, market_type, data_source, cached_at)""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_time ON cache_entries (cached_at)")
+
+    def upsert(self, cache_key: str, metadata: Dict[str, Any]):
+        """写入或更新一条缓存记录"""
+        file_path = metadata.get('file_path')
+        file_size = os.path.getsize(file_path) if file_path and os.path.exists(file_path) else 0
+        cached_at = datetime.fromisoformat(metadata['cached_at']).timestamp()
+        row = (cache_key, metadata.get('symbol'), metadata.get('data_type'), metadata.get('market_type'),
+               metadata.get('data_source'), metadata.get('start_date'), metadata.get('end_date'),
+               file_path, metadata.get('file_format'), file_size, cached_at)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO cache_entries ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))})", row)
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """按缓存键读取记录，cached_at 以 ISO 格式返回，与元数据文件一致"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM cache_entries WHERE cache_key = ?", (cache_key,)).fetchone()
+        if row is None:
+            return None
+        metadata = dict(row)
+        metadata['cached_at'] = datetime.fromtimestamp(metadata['cached_at']).isoformat()
+        return metadata
+
+    def find(self, symbol: str, data_type: str, market_type: str = None,
+             data_source: str = None, min_cached_at: float = None) -> list:
+        """查找匹配的缓存键，最新的在前"""
+        sql = "SELECT cache_key FROM cache_entries WHERE symbol = ? AND data_type = ?"
+        params = [symbol, data_type]
+        if market_type is not None:
+            sql += " AND market_type = ?"
+            params.append(market_type)
+        if data_source is not None:
+            sql += " AND data_source = ?"
+            params.append(data_source)
+        if min_cached_at is not None:
+            sql += " AND cached_at >= ?"
+            params.append(min_cached_at)
+        sql += " ORDER BY cached_at DESC"
+        with self._lock:
+            return [row['cache_key'] for row in self._conn.execute(sql, params)]
+
+    def expired(self, cutoff: float) -> list:
+        """返回 cached_at 早于 cutoff 的 (cache_key, file_path)"""
+        with self._lock:
+            return [(row['cache_key'], row['file_path']) for row in self._conn.execute(
+                "SELECT cache_key, file_path FROM cache_entries WHERE cached_at < ?", (cutoff,))]
+
+    def delete(self, cache_keys: list):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM cache_entries WHERE cache_key = ?", [(k,) for k in cache_keys])
+
+    def stats(self) -> Dict[str, Any]:
+        """按数据类型汇总条目数和文件大小"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data_type, COUNT(*) AS count, COALESCE(SUM(file_size), 0) AS size "
+                "FROM cache_entries GROUP BY data_type").fetchall()
+        return {row['data_type']: {'count': row['count'], 'size': row['size']} for row in rows}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+
+    def cached_times(self) -> Dict[str, float]:
+        """所有记录的 cache_key -> cached_at，用于与元数据文件对账"""
+        with self._lock:
+            return {row['cache_key']: row['cached_at'] for row in
+                    self._conn.execute("SELECT cache_key, cached_at FROM cache_entries")}
+
+
 class StockDataCache:
     """股票数据缓存管理器 - 支持美股和A股数据缓存优化"""
 
@@ -51,6 +159,10 @@ class StockDataCache:
                         self.china_fundamentals_dir, self.metadata_dir]:
             dir_path.mkdir(exist_ok=True)
 
+        # 元数据索引，启动时与 *_meta.json 文件对账
+        self.index = CacheIndex(self.metadata_dir / "cache_index.sqlite3")
+        self._reconcile_index()
+
         # 缓存配置 - 针对不同市场设置不同的TTL
         self.cache_config = {
             'us_stock_data': {
@@ -90,6 +202,31 @@ class StockDataCache:
         logger.info(f"   美股数据: ✅ 已配置")
         logger.info(f"   A股数据: ✅ 已配置")
 
+    def _reconcile_index(self):
+        """
+        让索引与元数据文件一致：导入索引中没有的或在索引之后被修改过的元数据文件，
+        删除元数据文件已不存在的记录。只比较文件的 mtime，未变化的文件不读取。
+        """
+        indexed = self.index.cached_times()
+        imported = 0
+        for metadata_file in self.metadata_dir.glob("*_meta.json"):
+            cache_key = metadata_file.name[:-len("_meta.json")]
+            cached_at = indexed.pop(cache_key, None)
+            # 元数据文件在写入 cached_at 之后才落盘，留出 1 秒余量
+            if cached_at is not None and metadata_file.stat().st_mtime <= cached_at + 1:
+                continue
+            try:
+                with open(metadata_file, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+                self.index.upsert(cache_key, metadata)
+                imported += 1
+            except Exception as e:
+                logger.warning(f"⚠️ 导入缓存元数据失败 {metadata_file.name}: {e}")
+        if indexed:
+            self.index.delete(list(indexed))
+        if imported or indexed:
+            logger.info(f"🗂️ 缓存索引对账: 导入 {imported} 条，移除 {len(indexed)} 条")
+
     def _determine_market_type(self, symbol: str) -> str:
         """根据股票代码确定市场类型"""
         import re
@@ -143,16 +280,24 @@ class StockDataCache:
         
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
+        self.index.upsert(cache_key, metadata)
     
     def _load_metadata(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """加载元数据"""
+        """加载元数据 - 优先读取索引"""
+        metadata = self.index.get(cache_key)
+        if metadata:
+            return metadata
+
         metadata_path = self._get_metadata_path(cache_key)
         if not metadata_path.exists():
             return None
         
         try:
             with open(metadata_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                metadata = json.load(f)
+            # 索引之外新增的元数据文件，补进索引
+            self.index.upsert(cache_key, metadata)
+            return metadata
         except Exception as e:
             logger.error(f"⚠️ 加载元数据失败: {e}")
             return None
@@ -298,23 +443,11 @@ class StockDataCache:
             return search_key
 
         # 如果没有精确匹配，查找部分匹配（相同股票代码的其他缓存）
-        for metadata_file in self.metadata_dir.glob(f"*_meta.json"):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-
-                if (metadata.get('symbol') == symbol and
-                    metadata.get('data_type') == 'stock_data' and
-                    metadata.get('market_type') == market_type and
-                    (data_source is None or metadata.get('data_source') == data_source)):
-
-                    cache_key = metadata_file.stem.replace('_meta', '')
-                    if self.is_cache_valid(cache_key, max_age_hours, symbol, 'stock_data'):
-                        desc = self.cache_config.get(f"{market_type}_stock_data", {}).get('description', '数据')
-                        logger.info(f"📋 找到部分匹配的{desc}: {symbol} -> {cache_key}")
-                        return cache_key
-            except Exception:
-                continue
+        cache_keys = self.find_cache_keys(symbol, 'stock_data', market_type, data_source, max_age_hours)
+        if cache_keys:
+            desc = self.cache_config.get(f"{market_type}_stock_data", {}).get('description', '数据')
+            logger.info(f"📋 找到部分匹配的{desc}: {symbol} -> {cache_keys[0]}")
+            return cache_keys[0]
 
         desc = self.cache_config.get(f"{market_type}_stock_data", {}).get('description', '数据')
         logger.error(f"❌ 未找到有效的{desc}缓存: {symbol}")
@@ -412,89 +545,61 @@ class StockDataCache:
             max_age_hours = self.cache_config.get(cache_type, {}).get('ttl_hours', 24)
         
         # 查找匹配的缓存
-        for metadata_file in self.metadata_dir.glob(f"*_meta.json"):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                if (metadata.get('symbol') == symbol and
-                    metadata.get('data_type') == 'fundamentals' and
-                    metadata.get('market_type') == market_type and
-                    (data_source is None or metadata.get('data_source') == data_source)):
-                    
-                    cache_key = metadata_file.stem.replace('_meta', '')
-                    if self.is_cache_valid(cache_key, max_age_hours, symbol, 'fundamentals'):
-                        desc = self.cache_config.get(f"{market_type}_fundamentals", {}).get('description', '基本面数据')
-                        logger.info(f"🎯 找到匹配的{desc}缓存: {symbol} ({data_source}) -> {cache_key}")
-                        return cache_key
-            except Exception:
-                continue
-        
+        cache_keys = self.find_cache_keys(symbol, 'fundamentals', market_type, data_source, max_age_hours)
+        if cache_keys:
+            desc = self.cache_config.get(f"{market_type}_fundamentals", {}).get('description', '基本面数据')
+            logger.info(f"🎯 找到匹配的{desc}缓存: {symbol} ({data_source}) -> {cache_keys[0]}")
+            return cache_keys[0]
+
         desc = self.cache_config.get(f"{market_type}_fundamentals", {}).get('description', '基本面数据')
         logger.error(f"❌ 未找到有效的{desc}缓存: {symbol} ({data_source})")
         return None
     
+    def find_cache_keys(self, symbol: str, data_type: str, market_type: str = None,
+                        data_source: str = None, max_age_hours: float = None) -> list:
+        """
+        通过索引查找缓存键（最新的在前）
+
+        Args:
+            symbol: 股票代码
+            data_type: 数据类型（stock_data/news/fundamentals）
+            market_type: 市场类型（china/us），None 表示不限
+            data_source: 数据源，None 表示不限
+            max_age_hours: 最大缓存时间（小时），None 表示不考虑有效期
+        """
+        min_cached_at = None
+        if max_age_hours is not None:
+            min_cached_at = (datetime.now() - timedelta(hours=max_age_hours)).timestamp()
+        return self.index.find(symbol, data_type, market_type, data_source, min_cached_at)
+
     def clear_old_cache(self, max_age_days: int = 7):
         """清理过期缓存"""
         cutoff_time = datetime.now() - timedelta(days=max_age_days)
-        cleared_count = 0
-        
-        for metadata_file in self.metadata_dir.glob("*_meta.json"):
+        expired = self.index.expired(cutoff_time.timestamp())
+
+        for cache_key, file_path in expired:
             try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                cached_at = datetime.fromisoformat(metadata['cached_at'])
-                if cached_at < cutoff_time:
-                    # 删除数据文件
-                    data_file = Path(metadata['file_path'])
-                    if data_file.exists():
-                        data_file.unlink()
-                    
-                    # 删除元数据文件
-                    metadata_file.unlink()
-                    cleared_count += 1
-                    
+                # 删除数据文件和元数据文件
+                for path in [Path(file_path) if file_path else None, self._get_metadata_path(cache_key)]:
+                    if path is not None and path.exists():
+                        path.unlink()
             except Exception as e:
                 logger.warning(f"⚠️ 清理缓存时出错: {e}")
-        
-        logger.info(f"🧹 已清理 {cleared_count} 个过期缓存文件")
+
+        self.index.delete([cache_key for cache_key, _ in expired])
+        logger.info(f"🧹 已清理 {len(expired)} 个过期缓存文件")
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        stats = {
-            'total_files': 0,
-            'stock_data_count': 0,
-            'news_count': 0,
-            'fundamentals_count': 0,
-            'total_size_mb': 0
+        by_type = self.index.stats()
+        total_size = sum(item['size'] for item in by_type.values())
+        return {
+            'total_files': sum(item['count'] for item in by_type.values()),
+            'stock_data_count': by_type.get('stock_data', {}).get('count', 0),
+            'news_count': by_type.get('news', {}).get('count', 0),
+            'fundamentals_count': by_type.get('fundamentals', {}).get('count', 0),
+            'total_size_mb': round(total_size / (1024 * 1024), 2)
         }
-        
-        for metadata_file in self.metadata_dir.glob("*_meta.json"):
-            try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    metadata = json.load(f)
-                
-                data_type = metadata.get('data_type', 'unknown')
-                if data_type == 'stock_data':
-                    stats['stock_data_count'] += 1
-                elif data_type == 'news':
-                    stats['news_count'] += 1
-                elif data_type == 'fundamentals':
-                    stats['fundamentals_count'] += 1
-                
-                # 计算文件大小
-                data_file = Path(metadata['file_path'])
-                if data_file.exists():
-                    stats['total_size_mb'] += data_file.stat().st_size / (1024 * 1024)
-                
-                stats['total_files'] += 1
-                
-            except Exception:
-                continue
-        
-        stats['total_size_mb'] = round(stats['total_size_mb'], 2)
-        return stats
 
 
 # 全局缓存实例
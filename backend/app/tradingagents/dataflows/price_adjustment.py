@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+前复权价格计算
+
+以最新收盘价为基准，用涨跌幅（pct_chg）的累积乘积向前还原连续的收盘价，
+再按同日的调整比例同时调整开盘价、最高价、最低价。整段计算向量化完成，
+传入 group_col 时可一次处理多只股票的合并行情。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def forward_adjust_prices(data: pd.DataFrame, date_col: str = 'trade_date', pct_col: str = 'pct_chg',
+                          group_col: str = None) -> pd.DataFrame:
+    """
+    计算前复权价格
+
+    前复权收盘价满足 close[i] = close[i+1] / (1 + pct_chg[i+1] / 100)，
+    即 close[i] = 最新收盘价 / prod(1 + pct_chg[k] / 100, k > i)。
+    开盘价、最高价、最低价乘以同日的调整比例 close / close_raw（原始收盘价为0的行不调整）。
+
+    Args:
+        data: 包含除权价格和涨跌幅的行情
+        date_col: 日期列
+        pct_col: 涨跌幅列（百分数）
+        group_col: 股票代码列，提供时按股票分别复权
+
+    Returns:
+        DataFrame: 按 (group_col,) date_col 排序的新数据，原价格保存在 *_raw 列，
+        并添加 price_type='forward_adjusted'
+    """
+    sort_cols = [group_col, date_col] if group_col else [date_col]
+    adjusted = data.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+
+    for col in ('close', 'open', 'high', 'low'):
+        adjusted[f'{col}_raw'] = adjusted[col]
+
+    close_raw = adjusted['close'].to_numpy(dtype=float)
+    growth = 1.0 + adjusted[pct_col].to_numpy(dtype=float) / 100.0
+
+    if group_col:
+        groups = adjusted[group_col].to_numpy()
+        # 每只股票最后一行的位置
+        is_last = np.ones(len(adjusted), dtype=bool)
+        is_last[:-1] = groups[1:] != groups[:-1]
+        # 组内从后往前的累积乘积：反转后按组 cumprod
+        reversed_growth = pd.Series(growth[::-1])
+        suffix = reversed_growth.groupby(groups[::-1]).cumprod().to_numpy()[::-1]
+        latest_close = pd.Series(close_raw).groupby(groups).transform('last').to_numpy()
+    else:
+        is_last = np.zeros(len(adjusted), dtype=bool)
+        is_last[-1:] = True
+        suffix = np.cumprod(growth[::-1])[::-1]
+        latest_close = np.full(len(adjusted), close_raw[-1] if len(adjusted) else np.nan)
+
+    # 第 i 行的折算因子是 i 之后各行增长率的乘积，最后一行为 1
+    factor = np.ones(len(adjusted))
+    factor[:-1] = suffix[1:]
+    factor[is_last] = 1.0
+
+    adjusted_close = latest_close / factor
+    adjusted['close'] = adjusted_close
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(close_raw != 0, adjusted_close / close_raw, 1.0)
+    for col in ('open', 'high', 'low'):
+        raw = adjusted[f'{col}_raw'].to_numpy(dtype=float)
+        adjusted[col] = np.where(close_raw != 0, raw * ratio, raw)
+
+    adjusted['price_type'] = 'forward_adjusted'
+    return adjusted
@@ -10,13 +10,74 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import time
 import os
-from dataclasses import dataclass
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
+from tradingagents.utils.news_dedup import NearDuplicateIndex
 logger = get_logger('agents')
 
 
+# 新闻源获取模式：concurrent（并发，默认）/ sequential（逐个获取）
+NEWS_FETCH_MODE = os.getenv('NEWS_FETCH_MODE', 'concurrent').lower()
+# 单个新闻源的截止时间（秒），同时作为 HTTP 请求超时；可用 NEWS_SOURCE_TIMEOUT_<KEY> 单独设置
+# （KEY 为 FINNHUB / ALPHA_VANTAGE / NEWSAPI / CHINESE）
+NEWS_SOURCE_TIMEOUT = float(os.getenv('NEWS_SOURCE_TIMEOUT', 8))
+# 一次新闻聚合的总截止时间（秒），到期后返回已获取的新闻
+NEWS_TOTAL_TIMEOUT = float(os.getenv('NEWS_TOTAL_TIMEOUT', 12))
+
+# 新闻源获取线程池，进程内共享；超时的请求在后台自行结束（HTTP 超时与该新闻源截止时间一致），不阻塞调用方
+_news_executor = ThreadPoolExecutor(max_workers=int(os.getenv('NEWS_MAX_WORKERS', 8)),
+                                    thread_name_prefix='news-source')
+# 已超时但仍在线程池中运行的调用，按 (新闻源, 股票代码) 记录；同一股票再次获取时跳过该新闻源，
+# 避免超时请求不断堆积占满线程池，其他股票和未超时的并发请求不受影响
+_inflight_sources: Dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+@dataclass
+class LatencyHistogram:
+    """单个新闻源的耗时分布（累积计数的分桶直方图）"""
+    buckets: tuple = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+    counts: List[int] = field(default_factory=lambda: [0] * 8)
+    total: float = 0.0
+    count: int = 0
+    outcomes: Dict[str, int] = field(default_factory=dict)
+
+    def observe(self, seconds: float, outcome: str):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def to_dict(self) -> Dict:
+        labels = [f"<={bound}s" for bound in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            'count': self.count,
+            'avg_seconds': round(self.total / self.count, 3) if self.count else 0.0,
+            'buckets': dict(zip(labels, self.counts)),
+            'outcomes': dict(self.outcomes),
+        }
+
+
+_latency_histograms: Dict[str, LatencyHistogram] = {}
+_latency_lock = threading.Lock()
+
+
+def record_news_source_latency(source: str, seconds: float, outcome: str):
+    """记录一次新闻源调用的耗时，outcome 为 ok/empty/timeout/error/skipped"""
+    with _latency_lock:
+        _latency_histograms.setdefault(source, LatencyHistogram()).observe(seconds, outcome)
+
+
+def get_news_source_latency_stats() -> Dict[str, Dict]:
+    """获取各新闻源的耗时直方图"""
+    with _latency_lock:
+        return {source: histogram.to_dict() for source, histogram in _latency_histograms.items()}
+
 
 @dataclass
 class NewsItem:
@@ -33,10 +94,20 @@ class NewsItem:
 class RealtimeNewsAggregator:
     """实时新闻聚合器"""
     
-    def __init__(self):
+    def __init__(self, fetch_mode: Optional[str] = None, source_timeout: Optional[float] = None,
+                 total_timeout: Optional[float] = None):
+        """
+        Args:
+            fetch_mode: concurrent（各新闻源并发获取）或 sequential，默认 NEWS_FETCH_MODE
+            source_timeout: 单个新闻源的截止时间（秒），默认 NEWS_SOURCE_TIMEOUT
+            total_timeout: 并发模式下整体截止时间（秒），默认 NEWS_TOTAL_TIMEOUT
+        """
         self.headers = {
             'User-Agent': 'TradingAgents-CN/1.0'
         }
+        self.fetch_mode = (fetch_mode or NEWS_FETCH_MODE).lower()
+        self.source_timeout = source_timeout if source_timeout is not None else NEWS_SOURCE_TIMEOUT
+        self.total_timeout = total_timeout if total_timeout is not None else NEWS_TOTAL_TIMEOUT
         
         # API密钥配置
         self.finnhub_key = os.getenv('FINNHUB_API_KEY')
@@ -48,65 +119,15 @@ class RealtimeNewsAggregator:
         获取实时股票新闻
         优先级：专业API > 新闻API > 搜索引擎
         """
-        logger.info(f"[新闻聚合器] 开始获取 {ticker} 的实时新闻，回溯时间: {hours_back}小时")
+        logger.info(f"[新闻聚合器] 开始获取 {ticker} 的实时新闻，回溯时间: {hours_back}小时，模式: {self.fetch_mode}")
         start_time = datetime.now()
-        all_news = []
-        
-        # 1. FinnHub实时新闻 (最高优先级)
-        logger.info(f"[新闻聚合器] 尝试从 FinnHub 获取 {ticker} 的新闻")
-        finnhub_start = datetime.now()
-        finnhub_news = self._get_finnhub_realtime_news(ticker, hours_back)
-        finnhub_time = (datetime.now() - finnhub_start).total_seconds()
-        
-        if finnhub_news:
-            logger.info(f"[新闻聚合器] 成功从 FinnHub 获取 {len(finnhub_news)} 条新闻，耗时: {finnhub_time:.2f}秒")
-        else:
-            logger.info(f"[新闻聚合器] FinnHub 未返回新闻，耗时: {finnhub_time:.2f}秒")
-            
-        all_news.extend(finnhub_news)
-        
-        # 2. Alpha Vantage新闻
-        logger.info(f"[新闻聚合器] 尝试从 Alpha Vantage 获取 {ticker} 的新闻")
-        av_start = datetime.now()
-        av_news = self._get_alpha_vantage_news(ticker, hours_back)
-        av_time = (datetime.now() - av_start).total_seconds()
-        
-        if av_news:
-            logger.info(f"[新闻聚合器] 成功从 Alpha Vantage 获取 {len(av_news)} 条新闻，耗时: {av_time:.2f}秒")
-        else:
-            logger.info(f"[新闻聚合器] Alpha Vantage 未返回新闻，耗时: {av_time:.2f}秒")
-            
-        all_news.extend(av_news)
-        
-        # 3. NewsAPI (如果配置了)
-        if self.newsapi_key:
-            logger.info(f"[新闻聚合器] 尝试从 NewsAPI 获取 {ticker} 的新闻")
-            newsapi_start = datetime.now()
-            newsapi_news = self._get_newsapi_news(ticker, hours_back)
-            newsapi_time = (datetime.now() - newsapi_start).total_seconds()
-            
-            if newsapi_news:
-                logger.info(f"[新闻聚合器] 成功从 NewsAPI 获取 {len(newsapi_news)} 条新闻，耗时: {newsapi_time:.2f}秒")
-            else:
-                logger.info(f"[新闻聚合器] NewsAPI 未返回新闻，耗时: {newsapi_time:.2f}秒")
-                
-            all_news.extend(newsapi_news)
-        else:
-            logger.info(f"[新闻聚合器] NewsAPI 密钥未配置，跳过此新闻源")
-        
-        # 4. 中文财经新闻源
-        logger.info(f"[新闻聚合器] 尝试获取 {ticker} 的中文财经新闻")
-        chinese_start = datetime.now()
-        chinese_news = self._get_chinese_finance_news(ticker, hours_back)
-        chinese_time = (datetime.now() - chinese_start).total_seconds()
-        
-        if chinese_news:
-            logger.info(f"[新闻聚合器] 成功获取 {len(chinese_news)} 条中文财经新闻，耗时: {chinese_time:.2f}秒")
+
+        sources = self._news_sources()
+        if self.fetch_mode == 'sequential':
+            all_news = self._fetch_sequential(sources, ticker, hours_back)
         else:
-            logger.info(f"[新闻聚合器] 未获取到中文财经新闻，耗时: {chinese_time:.2f}秒")
-            
-        all_news.extend(chinese_news)
-        
+            all_news = self._fetch_concurrent(sources, ticker, hours_back)
+
         # 去重和排序
         logger.info(f"[新闻聚合器] 开始对 {len(all_news)} 条新闻进行去重和排序")
         dedup_start = datetime.now()
@@ -129,7 +150,106 @@ class RealtimeNewsAggregator:
         
         return sorted_news
     
-    def _get_finnhub_realtime_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
+    def _news_sources(self) -> List[tuple]:
+        """按优先级返回 (名称, 获取函数, 截止时间) 列表：专业API > 新闻API > 中文财经新闻源"""
+        sources = [
+            ('FinnHub', 'finnhub', self._get_finnhub_realtime_news),
+            ('Alpha Vantage', 'alpha_vantage', self._get_alpha_vantage_news),
+        ]
+        if self.newsapi_key:
+            sources.append(('NewsAPI', 'newsapi', self._get_newsapi_news))
+        else:
+            logger.info(f"[新闻聚合器] NewsAPI 密钥未配置，跳过此新闻源")
+        sources.append(('中文财经', 'chinese', self._get_chinese_finance_news))
+        return [(name, fetch, float(os.getenv(f"NEWS_SOURCE_TIMEOUT_{key.upper()}", self.source_timeout)))
+                for name, key, fetch in sources]
+
+    @staticmethod
+    def _log_source_result(name: str, news: List[NewsItem], elapsed: float):
+        record_news_source_latency(name, elapsed, 'ok' if news else 'empty')
+        if news:
+            logger.info(f"[新闻聚合器] 成功从 {name} 获取 {len(news)} 条新闻，耗时: {elapsed:.2f}秒")
+        else:
+            logger.info(f"[新闻聚合器] {name} 未返回新闻，耗时: {elapsed:.2f}秒")
+
+    def _fetch_sequential(self, sources: List[tuple], ticker: str, hours_back: int) -> List[NewsItem]:
+        """逐个获取新闻源，总耗时为各新闻源耗时之和"""
+        all_news = []
+        for name, fetch, timeout in sources:
+            logger.info(f"[新闻聚合器] 尝试从 {name} 获取 {ticker} 的新闻")
+            source_start = time.monotonic()
+            try:
+                news = fetch(ticker, hours_back, timeout=timeout)
+            except Exception as e:
+                record_news_source_latency(name, time.monotonic() - source_start, 'error')
+                logger.error(f"[新闻聚合器] {name} 新闻获取失败: {e}")
+                continue
+            self._log_source_result(name, news, time.monotonic() - source_start)
+            all_news.extend(news)
+        return all_news
+
+    def _fetch_concurrent(self, sources: List[tuple], ticker: str, hours_back: int) -> List[NewsItem]:
+        """
+        并发获取所有新闻源
+
+        每个新闻源有自己的截止时间（source_timeout），整体另有截止时间（total_timeout）。
+        到期仍未返回的新闻源记为超时并被忽略，直接使用已返回的新闻，
+        总耗时取决于最慢（且未超时）的新闻源，而不是各新闻源耗时之和。
+        结果按新闻源优先级顺序合并，与逐个获取时一致。
+        同一股票上一次超时的请求仍在后台运行时，本次跳过该新闻源，避免超时请求占满共享线程池。
+        """
+        start = time.monotonic()
+        global_deadline = start + self.total_timeout
+
+        futures = {}
+        deadlines = {}
+        for name, fetch, timeout in sources:
+            deadline = min(start + timeout, global_deadline)
+            with _inflight_lock:
+                running = _inflight_sources.get((name, ticker))
+                if running is not None and not running.done():
+                    record_news_source_latency(name, 0.0, 'skipped')
+                    logger.warning(f"[新闻聚合器] {name} 上一次 {ticker} 请求超时仍未结束，跳过该新闻源")
+                    continue
+                _inflight_sources.pop((name, ticker), None)
+            future = _news_executor.submit(fetch, ticker, hours_back, timeout=deadline - start)
+            futures[future] = name
+            deadlines[future] = deadline
+
+        results = {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            expired = {future for future in pending if deadlines[future] <= now}
+            for future in expired:
+                name = futures[future]
+                if not future.cancel():
+                    with _inflight_lock:
+                        _inflight_sources[(name, ticker)] = future
+                record_news_source_latency(name, now - start, 'timeout')
+                logger.warning(f"[新闻聚合器] {name} 超过截止时间未返回，忽略该新闻源")
+            pending -= expired
+            if not pending:
+                break
+            remaining = min(deadlines[future] for future in pending) - now
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                elapsed = time.monotonic() - start
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    record_news_source_latency(name, elapsed, 'error')
+                    logger.error(f"[新闻聚合器] {name} 新闻获取失败: {e}")
+                    continue
+                self._log_source_result(name, results[name], elapsed)
+
+        all_news = []
+        for name, _, _ in sources:
+            all_news.extend(results.get(name, []))
+        return all_news
+
+    def _get_finnhub_realtime_news(self, ticker: str, hours_back: int, timeout: Optional[float] = None) -> List[NewsItem]:
         """获取FinnHub实时新闻"""
         if not self.finnhub_key:
             return []
@@ -148,7 +268,7 @@ class RealtimeNewsAggregator:
                 'token': self.finnhub_key
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=timeout or self.source_timeout)
             response.raise_for_status()
             
             news_data = response.json()
@@ -179,7 +299,7 @@ class RealtimeNewsAggregator:
             logger.error(f"FinnHub新闻获取失败: {e}")
             return []
     
-    def _get_alpha_vantage_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
+    def _get_alpha_vantage_news(self, ticker: str, hours_back: int, timeout: Optional[float] = None) -> List[NewsItem]:
         """获取Alpha Vantage新闻"""
         if not self.alpha_vantage_key:
             return []
@@ -193,7 +313,7 @@ class RealtimeNewsAggregator:
                 'limit': 50
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=timeout or self.source_timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -230,7 +350,7 @@ class RealtimeNewsAggregator:
             logger.error(f"Alpha Vantage新闻获取失败: {e}")
             return []
     
-    def _get_newsapi_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
+    def _get_newsapi_news(self, ticker: str, hours_back: int, timeout: Optional[float] = None) -> List[NewsItem]:
         """获取NewsAPI新闻"""
         try:
             # 构建搜索查询
@@ -253,7 +373,7 @@ class RealtimeNewsAggregator:
                 'apiKey': self.newsapi_key
             }
             
-            response = requests.get(url, params=params, headers=self.headers)
+            response = requests.get(url, params=params, headers=self.headers, timeout=timeout or self.source_timeout)
             response.raise_for_status()
             
             data = response.json()
@@ -285,7 +405,7 @@ class RealtimeNewsAggregator:
             logger.error(f"NewsAPI新闻获取失败: {e}")
             return []
     
-    def _get_chinese_finance_news(self, ticker: str, hours_back: int) -> List[NewsItem]:
+    def _get_chinese_finance_news(self, ticker: str, hours_back: int, timeout: Optional[float] = None) -> List[NewsItem]:
         """获取中文财经新闻"""
         # 集成中文财经新闻API：财联社、东方财富等
         logger.info(f"[中文财经新闻] 开始获取 {ticker} 的中文财经新闻，回溯时间: {hours_back}小时")
@@ -557,8 +677,11 @@ class RealtimeNewsAggregator:
         start_time = datetime.now()
         
         seen_titles = set()
+        # 转载新闻标题常有细微差异，用标题+摘要的 MinHash 相似度识别近似重复
+        near_dup_index = NearDuplicateIndex()
         unique_news = []
         duplicate_count = 0
+        near_duplicate_count = 0
         short_title_count = 0
         
         for item in news_items:
@@ -576,7 +699,14 @@ class RealtimeNewsAggregator:
                 logger.debug(f"[新闻去重] 检测到重复新闻: '{item.title[:50]}...'，来源: {item.source}")
                 duplicate_count += 1
                 continue
-                
+
+            duplicate_of = near_dup_index.check_and_add(len(unique_news), f"{item.title} {item.content}")
+            if duplicate_of is not None:
+                logger.debug(f"[新闻去重] 检测到近似重复新闻: '{item.title[:50]}...'，来源: {item.source}，"
+                             f"与 '{unique_news[duplicate_of].title[:50]}...' 相似")
+                near_duplicate_count += 1
+                continue
+
             # 添加到结果集
             seen_titles.add(title_key)
             unique_news.append(item)
@@ -584,7 +714,7 @@ class RealtimeNewsAggregator:
         # 记录去重结果
         time_taken = (datetime.now() - start_time).total_seconds()
         logger.info(f"[新闻去重] 去重完成，原始新闻: {len(news_items)}条，去重后: {len(unique_news)}条，")
-        logger.info(f"[新闻去重] 去除重复: {duplicate_count}条，标题过短: {short_title_count}条，耗时: {time_taken:.2f}秒")
+        logger.info(f"[新闻去重] 去除重复: {duplicate_count}条，近似重复: {near_duplicate_count}条，标题过短: {short_title_count}条，耗时: {time_taken:.2f}秒")
         
         return unique_news
     
@@ -2,62 +2,64 @@ import pandas as pd
 import yfinance as yf
 from stockstats import wrap
 from typing import Annotated
+from collections import OrderedDict
 import os
+import threading
 from .config import get_config
 
 
+# 进程内保留的已包装行情数量（按数据文件区分），市场分析师多次调用指标工具时共用
+FRAME_CACHE_SIZE = int(os.getenv("STOCKSTATS_FRAME_CACHE_SIZE", 32))
+
+
+class _WrappedFrame:
+    """一份已用 stockstats 包装的行情，以及在其上计算过的指标序列"""
+
+    def __init__(self, frame, dates):
+        self.frame = frame
+        # 与 frame 行一一对应的 YYYY-mm-dd 日期字符串
+        self.dates = dates
+        self.indicators = {}
+        # stockstats 计算指标时会往 frame 上追加列，同一份数据串行计算
+        self.lock = threading.Lock()
+
+
 class StockstatsUtils:
+    _frames = OrderedDict()
+    _frames_lock = threading.Lock()
+
     @staticmethod
-    def get_stock_stats(
-        symbol: Annotated[str, "ticker symbol for the company"],
-        indicator: Annotated[
-            str, "quantitative indicators based off of the stock data for the company"
-        ],
-        curr_date: Annotated[
-            str, "curr date for retrieving stock price data, YYYY-mm-dd"
-        ],
-        data_dir: Annotated[
-            str,
-            "directory where the stock data is stored.",
-        ],
-        online: Annotated[
-            bool,
-            "whether to use online tools to fetch data or offline tools. If True, will use online tools.",
-        ] = False,
-    ):
-        df = None
-        data = None
+    def _offline_file(symbol, data_dir):
+        return os.path.join(data_dir, f"{symbol}-YFin-data-2015-01-01-2025-03-25.csv")
+
+    @staticmethod
+    def _online_file(symbol):
+        today_date = pd.Timestamp.today()
+        start_date = (today_date - pd.DateOffset(years=15)).strftime("%Y-%m-%d")
+        end_date = today_date.strftime("%Y-%m-%d")
+
+        # Get config and ensure cache directory exists
+        config = get_config()
+        os.makedirs(config["data_cache_dir"], exist_ok=True)
+
+        data_file = os.path.join(
+            config["data_cache_dir"],
+            f"{symbol}-YFin-data-{start_date}-{end_date}.csv",
+        )
+        return data_file, start_date, end_date
 
+    @staticmethod
+    def _load_data(symbol, data_dir, online):
+        """读取原始行情并生成日期字符串，返回 (缓存键, data, dates)"""
         if not online:
+            data_file = StockstatsUtils._offline_file(symbol, data_dir)
             try:
-                data = pd.read_csv(
-                    os.path.join(
-                        data_dir,
-                        f"{symbol}-YFin-data-2015-01-01-2025-03-25.csv",
-                    )
-                )
-                df = wrap(data)
+                data = pd.read_csv(data_file)
             except FileNotFoundError:
                 raise Exception("Stockstats fail: Yahoo Finance data not fetched yet!")
+            dates = data["Date"].astype(str).str[:10]
         else:
-            # Get today's date as YYYY-mm-dd to add to cache
-            today_date = pd.Timestamp.today()
-            curr_date = pd.to_datetime(curr_date)
-
-            end_date = today_date
-            start_date = today_date - pd.DateOffset(years=15)
-            start_date = start_date.strftime("%Y-%m-%d")
-            end_date = end_date.strftime("%Y-%m-%d")
-
-            # Get config and ensure cache directory exists
-            config = get_config()
-            os.makedirs(config["data_cache_dir"], exist_ok=True)
-
-            data_file = os.path.join(
-                config["data_cache_dir"],
-                f"{symbol}-YFin-data-{start_date}-{end_date}.csv",
-            )
-
+            data_file, start_date, end_date = StockstatsUtils._online_file(symbol)
             if os.path.exists(data_file):
                 data = pd.read_csv(data_file)
                 data["Date"] = pd.to_datetime(data["Date"])
@@ -72,16 +74,114 @@ class StockstatsUtils:
                 )
                 data = data.reset_index()
                 data.to_csv(data_file, index=False)
+            dates = data["Date"].dt.strftime("%Y-%m-%d")
+
+        return data_file, data, dates.tolist()
 
-            df = wrap(data)
-            df["Date"] = df["Date"].dt.strftime("%Y-%m-%d")
-            curr_date = curr_date.strftime("%Y-%m-%d")
+    @classmethod
+    def get_wrapped_frame(
+        cls,
+        symbol: Annotated[str, "ticker symbol for the company"],
+        data_dir: Annotated[str, "directory where the stock data is stored."],
+        online: Annotated[bool, "whether to use online tools to fetch data"] = False,
+    ) -> _WrappedFrame:
+        """
+        获取已包装的行情，每个数据文件只读取和包装一次
+
+        在线模式的数据文件名包含当天日期，跨天后自然换用新数据；
+        离线文件以修改时间区分，文件被替换后重新读取。
+        """
+        if online:
+            key = ("online", cls._online_file(symbol)[0])
+        else:
+            data_file = cls._offline_file(symbol, data_dir)
+            mtime = os.path.getmtime(data_file) if os.path.exists(data_file) else None
+            key = ("offline", data_file, mtime)
+
+        with cls._frames_lock:
+            entry = cls._frames.get(key)
+            if entry is not None:
+                cls._frames.move_to_end(key)
+                return entry
+
+        _, data, dates = cls._load_data(symbol, data_dir, online)
+        entry = _WrappedFrame(wrap(data), dates)
+
+        with cls._frames_lock:
+            # 并发加载同一文件时保留先放入的那份，已计算的指标不会丢失
+            entry = cls._frames.setdefault(key, entry)
+            cls._frames.move_to_end(key)
+            while len(cls._frames) > FRAME_CACHE_SIZE:
+                cls._frames.popitem(last=False)
+        return entry
+
+    @classmethod
+    def get_indicator_series(
+        cls,
+        symbol: Annotated[str, "ticker symbol for the company"],
+        indicator: Annotated[
+            str, "quantitative indicators based off of the stock data for the company"
+        ],
+        data_dir: Annotated[str, "directory where the stock data is stored."],
+        online: Annotated[bool, "whether to use online tools to fetch data"] = False,
+    ) -> pd.Series:
+        """返回整段历史的指标序列（索引为 YYYY-mm-dd），每个指标只计算一次"""
+        entry = cls.get_wrapped_frame(symbol, data_dir, online)
+        with entry.lock:
+            series = entry.indicators.get(indicator)
+            if series is None:
+                # trigger stockstats to calculate the indicator
+                values = entry.frame[indicator].to_numpy()
+                series = pd.Series(values, index=pd.Index(entry.dates, name="Date"), name=indicator)
+                # 同一交易日出现多行时与逐日查询一致，取第一行
+                series = series[~series.index.duplicated(keep="first")]
+                entry.indicators[indicator] = series
+        return series
 
-        df[indicator]  # trigger stockstats to calculate the indicator
-        matching_rows = df[df["Date"].str.startswith(curr_date)]
+    @classmethod
+    def get_stock_stats_window(
+        cls,
+        symbol: Annotated[str, "ticker symbol for the company"],
+        indicator: Annotated[
+            str, "quantitative indicators based off of the stock data for the company"
+        ],
+        start_date: Annotated[str, "window start date, YYYY-mm-dd"],
+        end_date: Annotated[str, "window end date, YYYY-mm-dd"],
+        data_dir: Annotated[str, "directory where the stock data is stored."],
+        online: Annotated[bool, "whether to use online tools to fetch data"] = False,
+    ) -> pd.Series:
+        """返回 [start_date, end_date] 区间内各交易日的指标值"""
+        series = cls.get_indicator_series(symbol, indicator, data_dir, online)
+        mask = (series.index >= start_date) & (series.index <= end_date)
+        return series[mask]
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._frames_lock:
+            cls._frames.clear()
+
+    @staticmethod
+    def get_stock_stats(
+        symbol: Annotated[str, "ticker symbol for the company"],
+        indicator: Annotated[
+            str, "quantitative indicators based off of the stock data for the company"
+        ],
+        curr_date: Annotated[
+            str, "curr date for retrieving stock price data, YYYY-mm-dd"
+        ],
+        data_dir: Annotated[
+            str,
+            "directory where the stock data is stored.",
+        ],
+        online: Annotated[
+            bool,
+            "whether to use online tools to fetch data or offline tools. If True, will use online tools.",
+        ] = False,
+    ):
+        curr_date = pd.to_datetime(curr_date).strftime("%Y-%m-%d")
+        series = StockstatsUtils.get_indicator_series(symbol, indicator, data_dir, online)
 
-        if not matching_rows.empty:
-            indicator_value = matching_rows[indicator].values[0]
-            return indicator_value
+        if curr_date in series.index:
+            return series[curr_date]
         else:
             return "N/A: Not a trading day (weekend or holiday)"
@@ -17,6 +17,10 @@ DEFAULT_CONFIG = {
     "max_debate_rounds": 1,
     "max_risk_discuss_rounds": 1,
     "max_recur_limit": 100,
+    # Analyst execution: "parallel" runs the selected analysts concurrently, "sequential" chains them
+    "analyst_mode": os.getenv("TRADINGAGENTS_ANALYST_MODE", "parallel"),
+    # Memory embeddings: "auto" picks the service matching llm_provider, "local" uses the offline hash embedder
+    "embedding_provider": os.getenv("TRADINGAGENTS_EMBEDDING_PROVIDER", "auto"),
     # Tool settings
     "online_tools": True,
 
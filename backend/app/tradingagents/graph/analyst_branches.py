@@ -0,0 +1,76 @@
+# TradingAgents/graph/analyst_branches.py
+
+import time
+from typing import Any, Callable
+
+from langgraph.graph import END, StateGraph, START
+
+# 导入统一日志系统
+from tradingagents.utils.logging_init import get_logger
+logger = get_logger("default")
+
+# 各分析师写入的报告字段
+ANALYST_REPORT_KEYS = {
+    "market": "market_report",
+    "social": "sentiment_report",
+    "news": "news_report",
+    "fundamentals": "fundamentals_report",
+}
+
+
+def create_analyst_branch(
+    analyst_type: str,
+    analyst_node: Callable,
+    tool_node: Any,
+    should_continue: Callable,
+    state_schema: type,
+    recursion_limit: int = 100,
+):
+    """Wrap an analyst's LLM/tool loop into a single node for parallel fan-out.
+
+    The analyst and its tools run as a compiled subgraph with its own message
+    list, so tool calls of concurrent branches never interleave. The wrapper
+    only returns the analyst's report and its wall-clock time, which keeps the
+    writes of sibling branches disjoint.
+
+    Args:
+        analyst_type: "market", "social", "news" or "fundamentals"
+        analyst_node: node created by create_*_analyst
+        tool_node: ToolNode with the analyst's tools
+        should_continue: ConditionalLogic.should_continue_<analyst_type>
+        state_schema: graph state class (AgentState)
+        recursion_limit: recursion limit of the branch subgraph
+    """
+    name = analyst_type.capitalize()
+    analyst_name = f"{name} Analyst"
+    tools_name = f"tools_{analyst_type}"
+    report_key = ANALYST_REPORT_KEYS[analyst_type]
+
+    branch = StateGraph(state_schema)
+    branch.add_node(analyst_name, analyst_node)
+    branch.add_node(tools_name, tool_node)
+    branch.add_edge(START, analyst_name)
+    # should_continue 返回 "Msg Clear <Name>" 时分支结束，消息随子图丢弃，无需清理节点
+    branch.add_conditional_edges(
+        analyst_name,
+        should_continue,
+        {tools_name: tools_name, f"Msg Clear {name}": END},
+    )
+    branch.add_edge(tools_name, analyst_name)
+    subgraph = branch.compile()
+
+    def run_branch(state):
+        logger.info(f"🚀 [并行分析] {analyst_name} 开始")
+        start = time.perf_counter()
+        branch_state = {
+            key: value for key, value in state.items() if key != "analyst_timings"
+        }
+        result = subgraph.invoke(branch_state, {"recursion_limit": recursion_limit})
+        elapsed = time.perf_counter() - start
+        logger.info(f"✅ [并行分析] {analyst_name} 完成，耗时 {elapsed:.2f}s")
+        return {
+            report_key: result.get(report_key, ""),
+            "analyst_timings": {analyst_type: elapsed},
+        }
+
+    return run_branch
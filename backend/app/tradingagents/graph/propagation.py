@@ -43,6 +43,7 @@ class Propagator:
             "fundamentals_report": "",
             "sentiment_report": "",
             "news_report": "",
+            "analyst_timings": {},
         }
 
     def get_graph_args(self) -> Dict[str, Any]:
@@ -71,7 +71,9 @@ Adhere strictly to these instructions, and ensure your output is detailed, accur
             ),
         ]
 
-        result = self.quick_thinking_llm.invoke(messages).content
+        result = self.quick_thinking_llm.invoke(
+            messages, config={"metadata": {"llm_cache_node": "reflector"}}
+        ).content
         return result
 
     def reflect_bull_researcher(self, current_state, returns_losses, bull_memory):
@@ -72,7 +72,9 @@ class SignalProcessor:
         ]
 
         try:
-            response = self.quick_thinking_llm.invoke(messages).content
+            response = self.quick_thinking_llm.invoke(
+                messages, config={"metadata": {"llm_cache_node": "signal_processor"}}
+            ).content
             logger.debug(f"🔍 [SignalProcessor] LLM响应: {response[:200]}...")
 
             # 尝试解析JSON响应
@@ -1,6 +1,7 @@
 # TradingAgents/graph/trading_graph.py
 
 import os
+import threading
 from pathlib import Path
 import json
 from datetime import date
@@ -9,7 +10,7 @@ from typing import Dict, Any, Tuple, List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_anthropic import ChatAnthropic
 from langchain_google_genai import ChatGoogleGenerativeAI
-from tradingagents.llm_adapters import ChatDashScope, ChatDashScopeOpenAI
+from tradingagents.llm_adapters import ChatDashScope, ChatDashScopeOpenAI, ChatOpenAICached
 
 from langgraph.prebuilt import ToolNode
 
@@ -37,8 +38,28 @@ from .reflection import Reflector
 from .signal_processing import SignalProcessor
 
 
+# (状态字段, 进度, 步骤说明)：流式执行时字段首次出现即报告进度
+PROGRESS_STAGES = [
+    ("market_report", 20, "市场分析师完成分析"),
+    ("sentiment_report", 30, "社交媒体分析师完成分析"),
+    ("news_report", 40, "新闻分析师完成分析"),
+    ("fundamentals_report", 50, "基本面分析师完成分析"),
+    ("investment_plan", 65, "研究团队完成多空辩论"),
+    ("trader_investment_plan", 75, "交易员制定交易计划"),
+    ("final_trade_decision", 90, "风险管理团队完成评估"),
+]
+
+# 同一股票的状态日志文件可能被多个并发任务写入
+_state_log_lock = threading.Lock()
+
+
 class TradingAgentsGraph:
-    """Main class that orchestrates the trading agents framework."""
+    """Main class that orchestrates the trading agents framework.
+
+    An instance holds only what is built from its config (LLM clients, memories,
+    toolkit and the compiled graph); each propagate call keeps its state local, so
+    one instance can serve concurrent runs (see app.analysis.agent_graph_pool.AgentGraphPool).
+    """
 
     def __init__(
         self,
@@ -67,8 +88,8 @@ class TradingAgentsGraph:
 
         # Initialize LLMs
         if self.config["llm_provider"].lower() == "openai":
-            self.deep_thinking_llm = ChatOpenAI(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
-            self.quick_thinking_llm = ChatOpenAI(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
+            self.deep_thinking_llm = ChatOpenAICached(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
+            self.quick_thinking_llm = ChatOpenAICached(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
         elif self.config["llm_provider"] == "openrouter":
             # OpenRouter支持：优先使用OPENROUTER_API_KEY，否则使用OPENAI_API_KEY
             openrouter_api_key = os.getenv('OPENROUTER_API_KEY') or os.getenv('OPENAI_API_KEY')
@@ -77,19 +98,19 @@ class TradingAgentsGraph:
 
             logger.info(f"🌐 [OpenRouter] 使用API密钥: {openrouter_api_key[:20]}...")
 
-            self.deep_thinking_llm = ChatOpenAI(
+            self.deep_thinking_llm = ChatOpenAICached(
                 model=self.config["deep_think_llm"],
                 base_url=self.config["backend_url"],
                 api_key=openrouter_api_key
             )
-            self.quick_thinking_llm = ChatOpenAI(
+            self.quick_thinking_llm = ChatOpenAICached(
                 model=self.config["quick_think_llm"],
                 base_url=self.config["backend_url"],
                 api_key=openrouter_api_key
             )
         elif self.config["llm_provider"] == "ollama":
-            self.deep_thinking_llm = ChatOpenAI(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
-            self.quick_thinking_llm = ChatOpenAI(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
+            self.deep_thinking_llm = ChatOpenAICached(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
+            self.quick_thinking_llm = ChatOpenAICached(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
         elif self.config["llm_provider"].lower() == "anthropic":
             self.deep_thinking_llm = ChatAnthropic(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
             self.quick_thinking_llm = ChatAnthropic(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
@@ -198,11 +219,6 @@ class TradingAgentsGraph:
         self.reflector = Reflector(self.quick_thinking_llm)
         self.signal_processor = SignalProcessor(self.quick_thinking_llm)
 
-        # State tracking
-        self.curr_state = None
-        self.ticker = None
-        self.log_states_dict = {}  # date to full state dict
-
         # Set up the graph
         self.graph = self.graph_setup.setup_graph(selected_analysts)
 
@@ -253,17 +269,25 @@ class TradingAgentsGraph:
             ),
         }
 
-    def propagate(self, company_name, trade_date):
-        """Run the trading agents graph for a company on a specific date."""
+    def propagate(self, company_name, trade_date, market_type=None, progress_callback=None):
+        """Run the trading agents graph for a company on a specific date.
+
+        Args:
+            company_name: stock code
+            trade_date: analysis date
+            market_type: market of the stock, recorded in the state log
+            progress_callback: optional callable(progress, step); when given the graph
+                is streamed and the callback is invoked as each stage completes.
+                Exceptions raised by the callback (e.g. cancellation) abort the run.
+        Returns:
+            (final_state, processed signal)
+        """
 
         # 添加详细的接收日志
         logger.debug(f"🔍 [GRAPH DEBUG] ===== TradingAgentsGraph.propagate 接收参数 =====")
         logger.debug(f"🔍 [GRAPH DEBUG] 接收到的company_name: '{company_name}' (类型: {type(company_name)})")
         logger.debug(f"🔍 [GRAPH DEBUG] 接收到的trade_date: '{trade_date}' (类型: {type(trade_date)})")
 
-        self.ticker = company_name
-        logger.debug(f"🔍 [GRAPH DEBUG] 设置self.ticker: '{self.ticker}'")
-
         # Initialize state
         logger.debug(f"🔍 [GRAPH DEBUG] 创建初始状态，传递参数: company_name='{company_name}', trade_date='{trade_date}'")
         init_agent_state = self.propagator.create_initial_state(
@@ -273,39 +297,47 @@ class TradingAgentsGraph:
         logger.debug(f"🔍 [GRAPH DEBUG] 初始状态中的trade_date: '{init_agent_state.get('trade_date', 'NOT_FOUND')}'")
         args = self.propagator.get_graph_args()
 
-        if self.debug:
+        if self.debug or progress_callback:
             # Debug mode with tracing
-            trace = []
+            final_state = None
+            reported = set()
             for chunk in self.graph.stream(init_agent_state, **args):
                 if len(chunk["messages"]) == 0:
-                    pass
-                else:
+                    continue
+                if self.debug:
                     chunk["messages"][-1].pretty_print()
-                    trace.append(chunk)
-
-            final_state = trace[-1]
+                if progress_callback:
+                    for key, progress, step in PROGRESS_STAGES:
+                        if key not in reported and chunk.get(key):
+                            reported.add(key)
+                            progress_callback(progress, step)
+                final_state = chunk
         else:
             # Standard mode without tracing
             final_state = self.graph.invoke(init_agent_state, **args)
 
-        # Store current state for reflection
-        self.curr_state = final_state
+        analyst_timings = final_state.get("analyst_timings") or {}
+        if analyst_timings:
+            timing_text = ", ".join(f"{name}={seconds:.1f}s" for name, seconds in analyst_timings.items())
+            logger.info(f"⏱️ [分析师耗时] {timing_text}")
 
         # Log state
-        self._log_state(trade_date, final_state)
+        self._log_state(company_name, trade_date, final_state, market_type)
 
         # Return decision and processed signal
         return final_state, self.process_signal(final_state["final_trade_decision"], company_name)
 
-    def _log_state(self, trade_date, final_state):
-        """Log the final state to a JSON file."""
-        self.log_states_dict[str(trade_date)] = {
+    def _log_state(self, ticker, trade_date, final_state, market_type=None):
+        """Merge the final state into the ticker's JSON log, keyed by trade date."""
+        entry = {
             "company_of_interest": final_state["company_of_interest"],
             "trade_date": final_state["trade_date"],
+            "market_type": market_type,
             "market_report": final_state["market_report"],
             "sentiment_report": final_state["sentiment_report"],
             "news_report": final_state["news_report"],
             "fundamentals_report": final_state["fundamentals_report"],
+            "analyst_timings": final_state.get("analyst_timings", {}),
             "investment_debate_state": {
                 "bull_history": final_state["investment_debate_state"]["bull_history"],
                 "bear_history": final_state["investment_debate_state"]["bear_history"],
@@ -330,31 +362,43 @@ class TradingAgentsGraph:
         }
 
         # Save to file
-        directory = Path(f"eval_results/{self.ticker}/TradingAgentsStrategy_logs/")
+        directory = Path(f"eval_results/{ticker}/TradingAgentsStrategy_logs/")
         directory.mkdir(parents=True, exist_ok=True)
+        log_path = directory / "full_states_log.json"
+
+        with _state_log_lock:
+            log_states = {}
+            if log_path.exists():
+                try:
+                    with open(log_path, "r") as f:
+                        log_states = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"⚠️ 状态日志读取失败，将重新写入: {log_path}: {e}")
+            log_states[str(trade_date)] = entry
+            with open(log_path, "w") as f:
+                json.dump(log_states, f, indent=4)
+
+    def reflect_and_remember(self, returns_losses, final_state):
+        """Reflect on decisions and update memory based on returns.
 
-        with open(
-            f"eval_results/{self.ticker}/TradingAgentsStrategy_logs/full_states_log.json",
-            "w",
-        ) as f:
-            json.dump(self.log_states_dict, f, indent=4)
-
-    def reflect_and_remember(self, returns_losses):
-        """Reflect on decisions and update memory based on returns."""
+        Args:
+            returns_losses: realized returns of the decision
+            final_state: state returned by propagate for that decision
+        """
         self.reflector.reflect_bull_researcher(
-            self.curr_state, returns_losses, self.bull_memory
+            final_state, returns_losses, self.bull_memory
         )
         self.reflector.reflect_bear_researcher(
-            self.curr_state, returns_losses, self.bear_memory
+            final_state, returns_losses, self.bear_memory
         )
         self.reflector.reflect_trader(
-            self.curr_state, returns_losses, self.trader_memory
+            final_state, returns_losses, self.trader_memory
         )
         self.reflector.reflect_invest_judge(
-            self.curr_state, returns_losses, self.invest_judge_memory
+            final_state, returns_losses, self.invest_judge_memory
         )
         self.reflector.reflect_risk_manager(
-            self.curr_state, returns_losses, self.risk_manager_memory
+            final_state, returns_losses, self.risk_manager_memory
         )
 
     def process_signal(self, full_signal, stock_symbol=None):
@@ -1,5 +1,6 @@
 # LLM Adapters for TradingAgents
 from .dashscope_adapter import ChatDashScope
 from .dashscope_openai_adapter import ChatDashScopeOpenAI
+from .openai_compatible_base import ChatOpenAICached
 
-__all__ = ["ChatDashScope", "ChatDashScopeOpenAI"]
+__all__ = ["ChatDashScope", "ChatDashScopeOpenAI", "ChatOpenAICached"]
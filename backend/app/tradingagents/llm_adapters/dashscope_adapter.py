@@ -16,6 +16,7 @@ from pydantic import Field, SecretStr
 import dashscope
 from dashscope import Generation
 from ..config.config_manager import token_tracker
+from .response_cache import lookup_llm_cache, store_llm_cache
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -101,6 +102,12 @@ class ChatDashScope(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         """生成聊天回复"""
+
+        cache_slot, cached = lookup_llm_cache(
+            "dashscope", self.model, messages, self.temperature, stop, kwargs, run_manager
+        )
+        if cached is not None:
+            return cached
         
         # 转换消息格式
         dashscope_messages = self._convert_messages_to_dashscope_format(messages)
@@ -176,8 +183,12 @@ class ChatDashScope(BaseChatModel):
                 
                 # 创建生成结果
                 generation = ChatGeneration(message=ai_message)
-                
-                return ChatResult(generations=[generation])
+                result = ChatResult(
+                    generations=[generation],
+                    llm_output={"token_usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens}}
+                )
+                store_llm_cache(cache_slot, result)
+                return result
             else:
                 raise Exception(f"DashScope API error: {response.code} - {response.message}")
                 
@@ -10,6 +10,7 @@ from langchain_openai import ChatOpenAI
 from langchain_core.tools import BaseTool
 from pydantic import Field, SecretStr
 from ..config.config_manager import token_tracker
+from .response_cache import lookup_llm_cache, store_llm_cache
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger
@@ -50,11 +51,17 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         api_base = getattr(self, 'base_url', None) or getattr(self, 'openai_api_base', None) or kwargs.get('base_url', 'unknown')
         logger.info(f"   API Base: {api_base}")
     
-    def _generate(self, *args, **kwargs):
-        """重写生成方法，添加 token 使用量追踪"""
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        """重写生成方法，添加 token 使用量追踪；启用响应缓存时命中则直接返回"""
+
+        cache_slot, cached = lookup_llm_cache(
+            "dashscope", self.model_name, messages, self.temperature, stop, kwargs, run_manager
+        )
+        if cached is not None:
+            return cached
         
         # 调用父类的生成方法
-        result = super()._generate(*args, **kwargs)
+        result = super()._generate(messages, stop, run_manager, **kwargs)
         
         # 追踪 token 使用量
         try:
@@ -67,7 +74,7 @@ class ChatDashScopeOpenAI(ChatOpenAI):
                 
                 if input_tokens > 0 or output_tokens > 0:
                     # 生成会话ID
-                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(args))%10000}")
+                    session_id = kwargs.get('session_id', f"dashscope_openai_{hash(str(messages))%10000}")
                     analysis_type = kwargs.get('analysis_type', 'stock_analysis')
                     
                     # 使用 TokenTracker 记录使用量
@@ -83,7 +90,8 @@ class ChatDashScopeOpenAI(ChatOpenAI):
         except Exception as track_error:
             # token 追踪失败不应该影响主要功能
             logger.error(f"⚠️ Token 追踪失败: {track_error}")
-        
+
+        store_llm_cache(cache_slot, result)
         return result
 
 
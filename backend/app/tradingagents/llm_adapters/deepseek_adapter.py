@@ -12,6 +12,7 @@ from langchain_core.callbacks import CallbackManagerForLLMRun
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_llm_logging
+from .response_cache import lookup_llm_cache, store_llm_cache
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger, get_logger_manager
@@ -92,6 +93,12 @@ class ChatDeepSeek(ChatOpenAI):
         session_id = kwargs.pop('session_id', None)
         analysis_type = kwargs.pop('analysis_type', None)
 
+        cache_slot, cached = lookup_llm_cache(
+            "deepseek", self.model_name, messages, self.temperature, stop, kwargs, run_manager
+        )
+        if cached is not None:
+            return cached
+
         try:
             # 调用父类方法生成响应
             result = super()._generate(messages, stop, run_manager, **kwargs)
@@ -152,7 +159,8 @@ class ChatDeepSeek(ChatOpenAI):
 
                 except Exception as track_error:
                     logger.error(f"⚠️ [DeepSeek] Token统计失败: {track_error}", exc_info=True)
-            
+
+            store_llm_cache(cache_slot, result)
             return result
             
         except Exception as e:
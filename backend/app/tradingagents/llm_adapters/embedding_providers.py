@@ -0,0 +1,207 @@
+"""
+嵌入向量提供者与共享缓存
+FinancialSituationMemory 通过 EmbeddingProvider 获取向量，一次请求提交一批文本，而不是每条文本一次请求。
+
+- OpenAIEmbeddingProvider：OpenAI 兼容接口（OpenAI、DeepSeek、Ollama 等），input 传文本列表
+- DashScopeEmbeddingProvider：阿里百炼 TextEmbedding，input 传文本列表（text-embedding-v3 每批最多 10 条）
+- LocalEmbeddingProvider：本地确定性哈希向量，不访问网络，用于离线测试或无嵌入服务的环境
+
+所有记忆库共用进程内的 EmbeddingCache（LRU，键为 提供者/模型/文本 的 SHA-256），
+同一次分析中多头、空头、交易员、研究经理、风险经理查询同一市场情况时只请求一次，
+复盘写入记忆时也直接复用这些向量。容量由 EMBEDDING_CACHE_SIZE 设置。
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+
+class EmbeddingProvider:
+    """嵌入向量提供者接口：embed_batch 一次请求返回与输入等长、同序的向量列表"""
+
+    name = "base"
+    batch_size = 16
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def cache_namespace(self) -> str:
+        """缓存键的前缀，不同服务或模型的向量互不混用"""
+        return f"{self.name}:{self.model}"
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI 兼容的 embeddings 接口"""
+
+    name = "openai"
+
+    def __init__(self, client, model: str = "text-embedding-3-small", batch_size: int = 64):
+        super().__init__(model)
+        self.client = client
+        self.batch_size = batch_size
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{getattr(self.client, 'base_url', '')}:{self.model}"
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(model=self.model, input=list(texts))
+        data = sorted(response.data, key=lambda item: item.index)
+        logger.debug(f"✅ OpenAI embedding成功: {len(data)} 条")
+        return [item.embedding for item in data]
+
+
+class DashScopeEmbeddingProvider(EmbeddingProvider):
+    """阿里百炼 TextEmbedding 接口"""
+
+    name = "dashscope"
+
+    def __init__(self, model: str = "text-embedding-v3", batch_size: int = 10):
+        super().__init__(model)
+        self.batch_size = batch_size
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        import dashscope
+        from dashscope import TextEmbedding
+
+        if not getattr(dashscope, 'api_key', None):
+            raise RuntimeError("DashScope API密钥未设置")
+
+        response = TextEmbedding.call(model=self.model, input=list(texts))
+        if response.status_code != 200:
+            raise RuntimeError(f"DashScope API错误: {response.code} - {response.message}")
+        items = sorted(response.output['embeddings'], key=lambda item: item['text_index'])
+        logger.debug(f"✅ DashScope embedding成功: {len(items)} 条")
+        return [item['embedding'] for item in items]
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """本地确定性嵌入：英文单词与中文单字/双字组合哈希到固定维度并归一化，相同文本总得到相同向量"""
+
+    name = "local"
+    batch_size = 256
+
+    _token_pattern = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]")
+
+    def __init__(self, dimension: int = 256):
+        super().__init__(f"hash-{dimension}")
+        self.dimension = dimension
+
+    def _tokens(self, text: str) -> List[str]:
+        tokens = self._token_pattern.findall(text.lower())
+        return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in self._tokens(text):
+            digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+            vector[digest % self.dimension] += 1.0 if (digest >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            # 无可用词元时给出固定的非零向量，避免被当成"记忆已禁用"的空向量
+            vector[0], norm = 1.0, 1.0
+        return [v / norm for v in vector]
+
+
+class EmbeddingCache:
+    """按文本哈希缓存嵌入向量的 LRU（线程安全）"""
+
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or int(os.getenv('EMBEDDING_CACHE_SIZE', 2048))
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\n{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._vectors.get(key)
+                if vector is None:
+                    self.misses += 1
+                    continue
+                self._vectors.move_to_end(key)
+                self.hits += 1
+                found[key] = vector
+        return found
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._vectors[key] = list(vector)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_size:
+                self._vectors.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'size': len(self._vectors), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """获取进程内所有记忆库共享的嵌入缓存"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+
+def embed_texts(provider: EmbeddingProvider, texts: Sequence[str],
+                cache: Optional[EmbeddingCache] = None) -> List[List[float]]:
+    """
+    获取一组文本的向量：先查缓存，未命中的文本去重后按 provider.batch_size 分批请求。
+    请求失败时异常向上抛出，已成功的批次保留在缓存中。
+    """
+    cache = cache if cache is not None else get_embedding_cache()
+    keys = [cache.make_key(provider.cache_namespace, text) for text in texts]
+    vectors = cache.get_many(keys)
+
+    missing = OrderedDict()
+    for key, text in zip(keys, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    pending = list(missing.items())
+
+    for start in range(0, len(pending), provider.batch_size):
+        chunk = pending[start:start + provider.batch_size]
+        embedded = provider.embed_batch([text for _, text in chunk])
+        if len(embedded) != len(chunk):
+            raise ValueError(f"{provider.name} 返回 {len(embedded)} 个向量，请求了 {len(chunk)} 条文本")
+        for (key, _), vector in zip(chunk, embedded):
+            vectors[key] = vector
+            cache.put(key, vector)
+
+    if pending:
+        logger.debug(f"[嵌入] {provider.name}: {len(texts)} 条文本，请求 {len(pending)} 条，"
+                     f"{(len(pending) + provider.batch_size - 1) // provider.batch_size} 次调用")
+    return [list(vectors[key]) for key in keys]
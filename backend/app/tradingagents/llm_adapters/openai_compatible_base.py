@@ -13,6 +13,7 @@ from langchain_core.callbacks import CallbackManagerForLLMRun
 
 # 导入统一日志系统
 from tradingagents.utils.logging_init import setup_llm_logging
+from .response_cache import lookup_llm_cache, store_llm_cache
 
 # 导入日志模块
 from tradingagents.utils.logging_manager import get_logger, get_logger_manager
@@ -109,11 +110,17 @@ class OpenAICompatibleBase(ChatOpenAI):
         **kwargs: Any,
     ) -> ChatResult:
         """
-        生成聊天响应，并记录token使用量
+        生成聊天响应，并记录token使用量；启用响应缓存时命中则直接返回
         """
         
         # 记录开始时间
         start_time = time.time()
+
+        cache_slot, cached = lookup_llm_cache(
+            self.provider_name, self.model_name, messages, self.temperature, stop, kwargs, run_manager
+        )
+        if cached is not None:
+            return cached
         
         # 调用父类生成方法
         result = super()._generate(messages, stop, run_manager, **kwargs)
@@ -124,7 +131,8 @@ class OpenAICompatibleBase(ChatOpenAI):
                 self._track_token_usage(result, kwargs, start_time)
             except Exception as e:
                 logger.error(f"⚠️ {self.provider_name} Token追踪失败: {e}", exc_info=True)
-        
+
+        store_llm_cache(cache_slot, result)
         return result
     
     def _track_token_usage(self, result: ChatResult, kwargs: Dict, start_time: float):
@@ -169,6 +177,31 @@ class OpenAICompatibleBase(ChatOpenAI):
                 )
 
 
+class ChatOpenAICached(ChatOpenAI):
+    """
+    OpenAI（及 OpenRouter、Ollama 等 OpenAI 接口）客户端，_generate 接入响应缓存；
+    未启用缓存时与 ChatOpenAI 完全相同
+    """
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # 同名模型可能来自不同的服务，以 API 地址区分
+        provider = self.openai_api_base or "openai"
+        cache_slot, cached = lookup_llm_cache(
+            provider, self.model_name, messages, self.temperature, stop, kwargs, run_manager
+        )
+        if cached is not None:
+            return cached
+        result = super()._generate(messages, stop, run_manager, **kwargs)
+        store_llm_cache(cache_slot, result)
+        return result
+
+
 class ChatDeepSeekOpenAI(OpenAICompatibleBase):
     """DeepSeek OpenAI兼容适配器"""
     
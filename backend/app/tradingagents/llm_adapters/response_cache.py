@@ -0,0 +1,346 @@
+"""
+LLM响应缓存
+按内容寻址缓存聊天模型的生成结果：相同的模型、消息、工具和温度直接返回已保存的结果，不再调用API。
+
+- 键为 (提供商, 模型, 温度, 停止词, 消息, 工具等调用参数) 规范化后的 SHA-256；
+  消息只取类型、内容、名称和工具调用的名称与参数，不含每次运行都不同的消息ID和工具调用ID
+- 后端：磁盘（每个键一个JSON文件，原子替换写入）或 Redis（SETEX）
+- 节点开关：LangGraph 节点名（如 "Market Analyst" → market_analyst）或调用时在
+  metadata 中指定的 llm_cache_node（如 signal_processor、reflector）；
+  LLM_CACHE_NODES 为逗号分隔的节点名，"*" 表示全部
+- TTL：LLM_CACHE_TTL（秒），可用 LLM_CACHE_TTL_<节点名> 单独设置
+- 命中率按节点统计，并与 token 使用量一起记录到 TokenTracker
+
+默认关闭，设置 LLM_CACHE_ENABLED=true 启用。
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# 导入日志模块
+from tradingagents.utils.logging_manager import get_logger
+logger = get_logger('agents')
+
+DEFAULT_NODE = "default"
+
+# 不影响生成结果的调用参数
+IGNORED_KWARGS = {"session_id", "analysis_type"}
+
+CacheSlot = namedtuple("CacheSlot", ["key", "node", "provider", "model"])
+
+
+def _normalize_node(name: str) -> str:
+    return "_".join(str(name).strip().lower().split())
+
+
+def _canonical_message(message: BaseMessage) -> Dict[str, Any]:
+    canonical = {"type": message.type, "content": message.content}
+    name = getattr(message, "name", None)
+    if name:
+        canonical["name"] = name
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        canonical["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+    return canonical
+
+
+class DiskCacheBackend:
+    """每个键一个JSON文件，按键前两位分目录"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at") and entry["expires_at"] < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get("value")
+
+    def set(self, key: str, value: str, ttl: int):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"expires_at": time.time() + ttl if ttl else None, "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def purge_expired(self) -> int:
+        """删除已过期的缓存文件，返回删除数量"""
+        removed = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        expires_at = json.load(f).get("expires_at")
+                    if expires_at and expires_at < now:
+                        os.remove(path)
+                        removed += 1
+                except (OSError, ValueError):
+                    continue
+        return removed
+
+
+class RedisCacheBackend:
+    """Redis 后端，过期由 Redis 处理"""
+
+    def __init__(self, client, prefix: str = "llm_cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            value = value.decode("utf-8")
+        return value
+
+    def set(self, key: str, value: str, ttl: int):
+        if ttl:
+            self.client.setex(self.prefix + key, int(ttl), value)
+        else:
+            self.client.set(self.prefix + key, value)
+
+
+class LLMResponseCache:
+    """聊天模型响应缓存"""
+
+    def __init__(self, backend, ttl: int = 86400, nodes: Optional[Iterable[str]] = None,
+                 node_ttls: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            backend: DiskCacheBackend 或 RedisCacheBackend
+            ttl: 默认过期时间（秒），0 表示不过期
+            nodes: 启用缓存的节点名，None 或包含 "*" 表示全部
+            node_ttls: 按节点覆盖过期时间
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.nodes = None if nodes is None or "*" in nodes else {_normalize_node(n) for n in nodes}
+        self.node_ttls = {_normalize_node(k): v for k, v in (node_ttls or {}).items()}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def node_name(run_manager=None) -> str:
+        """从调用的 metadata 中取节点名：llm_cache_node 优先，其次 LangGraph 节点名"""
+        metadata = getattr(run_manager, "metadata", None) or {}
+        name = metadata.get("llm_cache_node") or metadata.get("langgraph_node")
+        return _normalize_node(name) if name else DEFAULT_NODE
+
+    def is_enabled_for(self, node: str) -> bool:
+        return self.nodes is None or node in self.nodes
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: List[BaseMessage], temperature: Optional[float] = None,
+                 stop: Optional[List[str]] = None, **kwargs) -> str:
+        payload = {
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "stop": stop,
+            "messages": [_canonical_message(m) for m in messages],
+            "kwargs": {k: v for k, v in kwargs.items() if k not in IGNORED_KWARGS},
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def serialize(result: ChatResult) -> str:
+        generations = []
+        for generation in result.generations:
+            message = message_to_dict(generation.message)
+            # 不保存消息ID：回放的消息由图重新分配ID，避免与当前状态中的消息ID冲突
+            message["data"]["id"] = None
+            generations.append({"message": message, "generation_info": generation.generation_info})
+        token_usage = (result.llm_output or {}).get("token_usage") or {}
+        return json.dumps({
+            "generations": generations,
+            "token_usage": {
+                "prompt_tokens": token_usage.get("prompt_tokens", 0) or 0,
+                "completion_tokens": token_usage.get("completion_tokens", 0) or 0,
+            },
+        }, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def deserialize(value: str) -> ChatResult:
+        data = json.loads(value)
+        generations = []
+        for item in data["generations"]:
+            message = messages_from_dict([item["message"]])[0]
+            if hasattr(message, "usage_metadata"):
+                message.usage_metadata = None
+            generations.append(ChatGeneration(message=message, generation_info=item.get("generation_info")))
+        return ChatResult(generations=generations,
+                          llm_output={"cache_hit": True, "cached_token_usage": data.get("token_usage", {})})
+
+    def _count(self, node: str, hit: bool):
+        with self._lock:
+            stats = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+            stats["hits" if hit else "misses"] += 1
+
+    def lookup(self, provider: str, model: str, messages: List[BaseMessage], temperature: Optional[float],
+               stop: Optional[List[str]], kwargs: Dict[str, Any],
+               run_manager=None) -> Tuple[Optional[CacheSlot], Optional[ChatResult]]:
+        """
+        查询缓存
+
+        Returns:
+            (slot, result)：命中时 result 为缓存的 ChatResult；未命中时 result 为 None，
+            生成后用 store(slot, result) 保存；节点未启用缓存时 slot 为 None
+        """
+        node = self.node_name(run_manager)
+        if not self.is_enabled_for(node):
+            return None, None
+        key = self.make_key(provider, model, messages, temperature, stop, **kwargs)
+        slot = CacheSlot(key, node, provider, model)
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] 读取失败: {e}")
+            value = None
+
+        result = None
+        if value is not None:
+            try:
+                result = self.deserialize(value)
+            except Exception as e:
+                logger.warning(f"⚠️ [LLM缓存] 缓存内容无法解析，将重新生成: {e}")
+
+        self._count(node, result is not None)
+        usage = result.llm_output["cached_token_usage"] if result is not None else {}
+        _record_lookup(provider, model, node, result is not None,
+                       usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        if result is not None:
+            logger.info(f"⚡ [LLM缓存] 命中: {provider}/{model} 节点={node}")
+        return slot, result
+
+    def store(self, slot: Optional[CacheSlot], result: ChatResult):
+        if slot is None:
+            return
+        ttl = self.node_ttls.get(slot.node, self.ttl)
+        try:
+            self.backend.set(slot.key, self.serialize(result), ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] 写入失败: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """按节点的命中统计"""
+        with self._lock:
+            return {
+                node: {**counts, "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"])}
+                for node, counts in self._stats.items()
+            }
+
+
+def _record_lookup(provider, model, node, hit, input_tokens, output_tokens):
+    try:
+        from tradingagents.config.config_manager import token_tracker
+    except ImportError:
+        return
+    try:
+        token_tracker.record_cache_lookup(provider, model, hit, input_tokens, output_tokens, node=node)
+    except Exception as e:
+        logger.debug(f"[LLM缓存] 命中统计记录失败: {e}")
+
+
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_loaded = False
+_response_cache_lock = threading.Lock()
+
+
+def _create_from_env() -> Optional[LLMResponseCache]:
+    if os.getenv("LLM_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "disk").lower()
+    backend = None
+    if backend_name == "redis":
+        try:
+            from tradingagents.config.database_manager import get_redis_client
+            client = get_redis_client()
+        except Exception as e:
+            logger.warning(f"⚠️ [LLM缓存] Redis 客户端获取失败: {e}")
+            client = None
+        if client is not None:
+            backend = RedisCacheBackend(client)
+        else:
+            logger.warning("⚠️ [LLM缓存] Redis 不可用，改用磁盘缓存")
+    if backend is None:
+        default_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataflows", "data_cache", "llm_responses")
+        backend = DiskCacheBackend(os.getenv("LLM_CACHE_DIR", default_dir))
+
+    nodes = [n for n in os.getenv("LLM_CACHE_NODES", "*").split(",") if n.strip()]
+    node_ttls = {
+        key[len("LLM_CACHE_TTL_"):]: int(value)
+        for key, value in os.environ.items()
+        if key.startswith("LLM_CACHE_TTL_") and value.strip()
+    }
+    cache = LLMResponseCache(backend, ttl=int(os.getenv("LLM_CACHE_TTL", 86400)), nodes=nodes, node_ttls=node_ttls)
+    logger.info(f"✅ [LLM缓存] 已启用: 后端={type(backend).__name__}, 节点={','.join(nodes)}, TTL={cache.ttl}s")
+    return cache
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """获取进程内共享的响应缓存，未启用时返回 None"""
+    global _response_cache, _response_cache_loaded
+    with _response_cache_lock:
+        if not _response_cache_loaded:
+            _response_cache = _create_from_env()
+            _response_cache_loaded = True
+        return _response_cache
+
+
+def set_llm_response_cache(cache: Optional[LLMResponseCache]):
+    """替换进程内共享的响应缓存（None 表示关闭）"""
+    global _response_cache, _response_cache_loaded
+    with _response_cache_lock:
+        _response_cache = cache
+        _response_cache_loaded = True
+
+
+def lookup_llm_cache(provider, model, messages, temperature, stop, kwargs, run_manager=None):
+    """适配器 _generate 调用：未启用缓存时返回 (None, None)"""
+    cache = get_llm_response_cache()
+    if cache is None:
+        return None, None
+    return cache.lookup(provider, model, messages, temperature, stop, kwargs, run_manager)
+
+
+def store_llm_cache(slot, result):
+    """适配器 _generate 调用：保存 lookup_llm_cache 未命中的生成结果"""
+    if slot is None:
+        return
+    cache = get_llm_response_cache()
+    if cache is not None:
+        cache.store(slot, result)
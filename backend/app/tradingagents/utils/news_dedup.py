@@ -0,0 +1,203 @@
+"""
+新闻近似重复检测
+基于 MinHash + LSH 分桶的增量索引，用于识别标题、措辞略有差异的转载新闻。
+
+每条新闻按字符 n-gram 计算 MinHash 签名，签名分成若干段（band），任意一段完全相同的
+新闻才会成为候选，再用签名估计的 Jaccard 相似度确认，单条查询只与少量候选比较，
+不随索引规模线性增长。索引可保存到文件，在多次运行之间保留。
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# MinHash 使用的梅森素数 2^31-1，shingle 哈希为 32 位，a*x+b 不会溢出 uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """小写并去掉空白和标点，使转载时的格式差异不影响比较"""
+    return _NON_WORD.sub('', str(text or '').lower())
+
+
+class NearDuplicateIndex:
+    """
+    MinHash-LSH 近似重复索引（线程安全）
+
+    默认 64 个哈希函数分为 16 段、每段 4 行，相似度约 0.5 以上的文本大概率进入同一分桶；
+    候选再以签名估计的 Jaccard 相似度与 threshold 比较。
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.6,
+                 shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: MinHash 哈希函数个数，必须能被 bands 整除
+            bands: LSH 分段数
+            threshold: 判定为重复的相似度阈值
+            shingle_size: 字符 n-gram 长度
+            seed: 哈希函数随机种子，持久化的索引必须使用相同参数
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.seed = seed
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._timestamps: Dict[Hashable, float] = {}
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """计算文本的 MinHash 签名，文本为空时返回 None"""
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        k = self.shingle_size
+        shingles = {normalized[i:i + k] for i in range(max(1, len(normalized) - k + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    @staticmethod
+    def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+        """以签名中相同位置相等的比例估计 Jaccard 相似度"""
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+    def query(self, text: Optional[str] = None, signature: Optional[np.ndarray] = None):
+        """
+        查找与文本近似重复的已有条目
+
+        Returns:
+            (key, similarity)：最相似的已有条目，没有时返回 (None, 0.0)
+        """
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return None, 0.0
+
+        best_key, best_score = None, 0.0
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(band_key, ()))
+            for key in candidates:
+                score = self.similarity(signature, self._signatures[key])
+                if score > best_score:
+                    best_key, best_score = key, score
+        if best_score >= self.threshold:
+            return best_key, best_score
+        return None, best_score
+
+    def add(self, key: Hashable, text: Optional[str] = None, signature: Optional[np.ndarray] = None,
+            timestamp: Optional[float] = None) -> bool:
+        """把条目加入索引，文本为空时不加入并返回 False"""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return False
+        with self._lock:
+            if key in self._signatures:
+                self._remove_from_buckets(key)
+            self._signatures[key] = signature
+            self._timestamps[key] = timestamp if timestamp is not None else time.time()
+            for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+                bucket.setdefault(band_key, []).append(key)
+        return True
+
+    def check_and_add(self, key: Hashable, text: str, timestamp: Optional[float] = None):
+        """
+        查询并登记一条新闻
+
+        Returns:
+            已有的近似重复条目的 key；不重复时把新闻加入索引并返回 None
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            duplicate_key, _ = self.query(signature=signature)
+            if duplicate_key is not None:
+                return duplicate_key
+            self.add(key, signature=signature, timestamp=timestamp)
+        return None
+
+    def _remove_from_buckets(self, key):
+        for bucket, band_key in zip(self._buckets, self._band_keys(self._signatures[key])):
+            keys = bucket.get(band_key)
+            if keys is None:
+                continue
+            keys.remove(key)
+            if not keys:
+                del bucket[band_key]
+
+    def prune(self, before: float) -> int:
+        """删除登记时间早于 before（时间戳）的条目，返回删除数量"""
+        with self._lock:
+            expired = [key for key, ts in self._timestamps.items() if ts < before]
+            for key in expired:
+                self._remove_from_buckets(key)
+                del self._signatures[key]
+                del self._timestamps[key]
+        return len(expired)
+
+    def save(self, path: str):
+        """保存签名和登记时间（分桶在加载时重建）"""
+        with self._lock:
+            keys = list(self._signatures)
+            signatures = (np.stack([self._signatures[k] for k in keys]) if keys
+                          else np.empty((0, self.num_perm), dtype=np.uint32))
+            timestamps = np.array([self._timestamps[k] for k in keys], dtype=np.float64)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, keys=np.array([str(k) for k in keys], dtype=str), signatures=signatures,
+                     timestamps=timestamps,
+                     params=np.array([self.num_perm, self.bands, self.shingle_size, self.seed]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = 0.6) -> 'NearDuplicateIndex':
+        """从文件加载索引，参数与保存时一致；文件缺失、损坏或为旧版（含 pickle 对象）时返回空索引"""
+        if not os.path.exists(path):
+            return cls(threshold=threshold)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                num_perm, bands, shingle_size, seed = (int(v) for v in data['params'])
+                index = cls(num_perm=num_perm, bands=bands, threshold=threshold,
+                            shingle_size=shingle_size, seed=seed)
+                for key, signature, ts in zip(data['keys'], data['signatures'], data['timestamps']):
+                    index.add(str(key), signature=signature, timestamp=float(ts))
+            return index
+        except Exception as e:
+            logger.warning(f"加载新闻去重索引 {path} 失败，使用空索引: {e}")
+            return cls(threshold=threshold)
@@ -48,6 +48,15 @@ app.register_blueprint(api_blueprint)
 # --- 初始化应用 ---
 # 使用应用上下文来确保在正确的时机执行初始化
 with app.app_context():
+    # 启动过期任务清理线程（按结束时间索引删除超过保留时长的已结束任务，多个进程间只有一个执行清理）
+    analysis_container.task_manager().start_cleaner_thread()
+
+    # 可选：由 Web 进程拉起任务工作进程（生产环境建议单独运行 python -m app.analysis.task_queue）
+    embedded_workers = int(os.getenv('TASK_EMBEDDED_WORKERS', 0))
+    if embedded_workers > 0 and os.getenv('TASK_EXECUTION_MODE', 'queue').lower() == 'queue':
+        from app.analysis.task_queue import start_worker_processes
+        start_worker_processes(embedded_workers)
+
     # 初始化日志输出
     print("="*50)
     print("应用启动")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+智能体分析图实例池测试
+验证相同配置复用实例、配置不同则分别构建、并发请求只构建一次，以及 LRU 淘汰
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.agent_graph_pool import AgentGraphPool
+
+ANALYSTS = ["market", "social", "news", "fundamentals"]
+
+
+class FakeFactory:
+    """记录构建次数的工厂，build_delay 模拟 LLM 客户端与记忆库的初始化耗时"""
+
+    def __init__(self, build_delay=0.0):
+        self.build_delay = build_delay
+        self.builds = []
+        self._lock = threading.Lock()
+
+    def __call__(self, selected_analysts, config, debug):
+        time.sleep(self.build_delay)
+        with self._lock:
+            self.builds.append((tuple(selected_analysts), config['llm_provider'], debug))
+        return object()
+
+
+def make_config(**overrides):
+    config = {'llm_provider': 'openai', 'deep_think_llm': 'gpt-4o', 'quick_think_llm': 'gpt-4o',
+              'memory_enabled': True, 'max_tokens': 2048}
+    config.update(overrides)
+    return config
+
+
+class AgentGraphPoolTest(unittest.TestCase):
+
+    def test_same_config_reuses_instance(self):
+        factory = FakeFactory()
+        pool = AgentGraphPool(factory=factory)
+        first = pool.get(ANALYSTS, make_config(), debug=True)
+        # 键与字典顺序无关
+        second = pool.get(ANALYSTS, dict(reversed(list(make_config().items()))), debug=True)
+        self.assertIs(first, second)
+        self.assertEqual(len(factory.builds), 1)
+        self.assertEqual(pool.stats()['hits'], 1)
+
+    def test_config_differences_build_new_instances(self):
+        factory = FakeFactory()
+        pool = AgentGraphPool(max_size=10, factory=factory)
+        base = pool.get(ANALYSTS, make_config())
+        variants = [
+            pool.get(ANALYSTS, make_config(memory_enabled=False)),
+            pool.get(ANALYSTS, make_config(quick_think_llm='gpt-4o-mini')),
+            pool.get(ANALYSTS, make_config(llm_provider='deepseek')),
+            pool.get(["market"], make_config()),
+            pool.get(list(reversed(ANALYSTS)), make_config()),
+            pool.get(ANALYSTS, make_config(), debug=True),
+        ]
+        self.assertEqual(len({id(g) for g in [base] + variants}), 7)
+        self.assertEqual(len(factory.builds), 7)
+
+    def test_concurrent_requests_build_once(self):
+        factory = FakeFactory(build_delay=0.2)
+        pool = AgentGraphPool(factory=factory)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            graphs = list(executor.map(lambda _: pool.get(ANALYSTS, make_config()), range(8)))
+        self.assertEqual(len(factory.builds), 1)
+        self.assertTrue(all(g is graphs[0] for g in graphs))
+
+    def test_different_configs_build_in_parallel(self):
+        factory = FakeFactory(build_delay=0.2)
+        pool = AgentGraphPool(factory=factory)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda m: pool.get(ANALYSTS, make_config(quick_think_llm=m)), ['a', 'b', 'c']))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(len(factory.builds), 3)
+
+    def test_lru_eviction(self):
+        factory = FakeFactory()
+        pool = AgentGraphPool(max_size=2, factory=factory)
+        a = pool.get(ANALYSTS, make_config(quick_think_llm='a'))
+        pool.get(ANALYSTS, make_config(quick_think_llm='b'))
+        # 访问 a 后 b 成为最久未使用
+        self.assertIs(pool.get(ANALYSTS, make_config(quick_think_llm='a')), a)
+        pool.get(ANALYSTS, make_config(quick_think_llm='c'))
+        self.assertEqual(pool.stats()['size'], 2)
+        self.assertIs(pool.get(ANALYSTS, make_config(quick_think_llm='a')), a)
+        pool.get(ANALYSTS, make_config(quick_think_llm='b'))
+        self.assertEqual(len(factory.builds), 4)
+
+    def test_failed_build_is_not_cached(self):
+        calls = []
+
+        def factory(selected_analysts, config, debug):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("ChromaDB 初始化失败")
+            return object()
+
+        pool = AgentGraphPool(factory=factory)
+        with self.assertRaises(RuntimeError):
+            pool.get(ANALYSTS, make_config())
+        self.assertIsNotNone(pool.get(ANALYSTS, make_config()))
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回测引擎测试
+验证向量化动作与 get_recommendation 一致、止损/分批止盈/冷静期的持仓模拟，
+以及多进程回测与单进程结果一致、参数调优按指标排序
+
+运行基准测试（200 只股票 × 1500 根K线）:
+    python tests/test_backtest_engine.py --benchmark
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.backtest_engine import (ACTION_NAMES, BacktestEngine, BacktestStrategy, recommendation_actions,
+                                          simulate)
+
+try:
+    os.environ.setdefault('OPENAI_API_KEY', 'test')
+    from app.core.cache import Cache
+    from app.analysis.stock_analyzer import StockAnalyzer
+    ANALYZER_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ StockAnalyzer 不可用: {e}")
+    ANALYZER_AVAILABLE = False
+
+RECOMMENDATION_ACTIONS = {
+    '强烈建议买入': 'strong_buy', '建议买入': 'buy', '谨慎买入': 'cautious_buy', '持观望态度': 'hold',
+    '谨慎持有': 'cautious_hold', '建议减仓': 'reduce', '建议卖出': 'sell'
+}
+
+
+def make_frames(count=6, days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(count):
+        length = days - 30 * (i % 6)
+        dates = pd.bdate_range('2020-01-01', periods=days)[-length:]
+        close = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, length)))
+        frames[f"{600000 + i}"] = pd.DataFrame({
+            'date': dates,
+            'open': close * (1 + rng.normal(0, 0.005, length)),
+            'close': close,
+            'high': close * (1 + abs(rng.normal(0, 0.01, length))),
+            'low': close * (1 - abs(rng.normal(0, 0.01, length))),
+            'volume': rng.integers(1000, 100000, length).astype(float)
+        })
+    return frames
+
+
+def make_ind(close, low=None, open_=None, volatility=1.5):
+    """单只股票的最小指标集"""
+    close = np.asarray(close, dtype=float)[None, :]
+    return {
+        'close': close,
+        'open': close.copy() if open_ is None else np.asarray(open_, dtype=float)[None, :],
+        'high': close * 1.01,
+        'low': close * 0.99 if low is None else np.asarray(low, dtype=float)[None, :],
+        'Volatility': np.full(close.shape, volatility),
+    }
+
+
+class RecommendationActionsTest(unittest.TestCase):
+
+    @unittest.skipUnless(ANALYZER_AVAILABLE, "StockAnalyzer 不可用")
+    def test_matches_get_recommendation(self):
+        analyzer = StockAnalyzer(Cache())
+        grid = [(score, rsi, macd, vol)
+                for score in (10, 20, 40, 50, 60, 75, 90)
+                for rsi in (15, 50, 85)
+                for macd in (-1.0, 1.0)
+                for vol in (2.0, 5.0)]
+        scores = np.array([[g[0] for g in grid]], dtype=float)
+        ind = {'RSI': np.array([[g[1] for g in grid]], dtype=float),
+               'MACD': np.array([[g[2] for g in grid]]),
+               'Signal': np.zeros((1, len(grid))),
+               'Volatility': np.array([[g[3] for g in grid]], dtype=float)}
+        actions = recommendation_actions(scores, ind, 'A')[0]
+
+        for (score, rsi, macd, vol), action in zip(grid, actions):
+            technical_data = {'RSI': rsi, 'MACD_signal': 'bullish' if macd > 0 else 'bearish', 'Volatility': vol}
+            text = analyzer.get_recommendation(score, 'A', technical_data).split(' ')[0]
+            self.assertEqual(ACTION_NAMES[action], RECOMMENDATION_ACTIONS[text], (score, rsi, macd, vol))
+
+
+class SimulateTest(unittest.TestCase):
+
+    def setUp(self):
+        # 满仓位 = 5% / 5% = 1，便于核对收益
+        self.strategy = BacktestStrategy(name='test', entry_score=70, exit_score=45, risk_percent=5,
+                                         fee_rate=0.0, profit_take_percent=1000)
+
+    def test_stop_loss_fills_at_stop_price(self):
+        close = [10, 10, 10, 9, 9]
+        low = [10, 10, 10, 9, 9]
+        ind = make_ind(close, low=low, open_=[10, 10, 10, 9.8, 9])
+        scores = np.full((1, 5), 90.0)
+        result = simulate(ind, scores, None, self.strategy)
+
+        np.testing.assert_allclose(result['returns'][0], [0, 0, 0, -0.05, 0])
+        np.testing.assert_allclose(result['exposure'][0], [0, 1, 1, 0, 1])
+        self.assertEqual(result['trades'][0], 1)
+        self.assertEqual(result['wins'][0], 0)
+
+        # 跳空低开到止损价以下，以开盘价成交
+        ind = make_ind(close, low=low, open_=[10, 10, 10, 9.0, 9])
+        self.assertAlmostEqual(simulate(ind, scores, None, self.strategy)['returns'][0, 3], -0.1)
+
+    def test_profit_taking_once_per_trade(self):
+        strategy = BacktestStrategy(name='test', entry_score=70, risk_percent=5, fee_rate=0.0,
+                                    profit_take_percent=20, profit_take_fraction=0.5)
+        close = [10, 10, 11, 12.5, 13, 14]
+        result = simulate(make_ind(close), np.full((1, 6), 90.0), None, strategy)
+        exposure = result['exposure'][0]
+        self.assertEqual(exposure[2], 1.0)
+        # 浮盈 20% 时减半，之后随价格漂移但不再减仓，评分仍满足开仓条件也不加回
+        self.assertAlmostEqual(exposure[3], 0.5)
+        self.assertGreaterEqual(exposure[4], 0.5)
+        self.assertAlmostEqual(result['turnover'][0, 3], 0.5)
+
+    def test_consecutive_losses_trigger_cooldown(self):
+        strategy = BacktestStrategy(name='test', entry_score=70, exit_score=45, risk_percent=5, fee_rate=0.0,
+                                    max_consecutive_losses=2, cooldown_bars=3, stop_loss_percent=5)
+        days = 12
+        close = 10 * 0.99 ** np.arange(days)
+        scores = np.where(np.arange(days) % 2 == 1, 90.0, 0.0)[None, :]
+        result = simulate(make_ind(close, low=close), scores, None, strategy)
+
+        opened = np.nonzero(np.diff(np.r_[0, result['exposure'][0]]) > 0)[0].tolist()
+        # 第 2、4 根K线两笔亏损后冷静到第 7 根，第 5、7 根的开仓信号被忽略
+        self.assertEqual(opened, [1, 3, 9, 11])
+        self.assertEqual(result['wins'][0], 0)
+
+    def test_fees_charged_on_turnover(self):
+        strategy = BacktestStrategy(name='test', entry_score=70, risk_percent=5, fee_rate=0.001)
+        result = simulate(make_ind([10, 10, 10]), np.full((1, 3), 90.0), None, strategy)
+        np.testing.assert_allclose(result['returns'][0], [0, -0.001, 0])
+
+    def test_missing_volatility_does_not_open(self):
+        ind = make_ind([10, 10, 10], volatility=np.nan)
+        result = simulate(ind, np.full((1, 3), 90.0), None, self.strategy)
+        self.assertTrue(np.all(result['exposure'] == 0))
+
+
+class BacktestEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = make_frames()
+
+    def test_run_reports_strategies_and_benchmark(self):
+        result = BacktestEngine(processes=1).run(self.frames)
+        self.assertEqual(sorted(result), ['benchmark', 'recommendation', 'score_70_45'])
+        for summary in result.values():
+            self.assertEqual(summary['symbols'], 6)
+            self.assertLessEqual(summary['max_drawdown'], 0)
+            self.assertEqual(sorted(summary['per_symbol']), sorted(self.frames))
+        self.assertEqual(result['benchmark']['annual_turnover'], 0.0)
+        self.assertGreater(result['recommendation']['annual_turnover'], 0.0)
+
+    def test_processes_match_single_process(self):
+        single = BacktestEngine(processes=1, chunk_size=2).run(self.frames)
+        parallel = BacktestEngine(processes=2, chunk_size=2).run(self.frames)
+        self.assertEqual(single, parallel)
+
+        whole = BacktestEngine(processes=1, chunk_size=50).run(self.frames)
+        self.assertAlmostEqual(whole['recommendation']['total_return'], single['recommendation']['total_return'])
+
+    def test_tune_ranks_by_metric(self):
+        grid = {'rsi_period': [6, 14], 'ma_periods.short': [5, 10]}
+        ranked = BacktestEngine(processes=2, chunk_size=3).tune(self.frames, grid, metric='total_return')
+        self.assertEqual(len(ranked), 4)
+        values = [item['metrics']['total_return'] for item in ranked]
+        self.assertEqual(values, sorted(values, reverse=True))
+        self.assertNotIn('per_symbol', ranked[0]['metrics'])
+        self.assertEqual({tuple(item['params'].values()) for item in ranked}, {(6, 5), (6, 10), (14, 5), (14, 10)})
+
+    def test_no_usable_data_reports_error(self):
+        short = {code: frame.head(1) for code, frame in self.frames.items()}
+        for frames in ({}, short):
+            result = BacktestEngine(processes=1).run(frames)
+            self.assertEqual(sorted(result), ['benchmark', 'recommendation', 'score_70_45'])
+            self.assertTrue(all(summary == {"error": "没有可回测的数据"} for summary in result.values()))
+        ranked = BacktestEngine(processes=1).tune({}, {'rsi_period': [6, 14]})
+        self.assertEqual([item['metrics'] for item in ranked], [{"error": "没有可回测的数据"}] * 2)
+
+
+def benchmark(count=200, days=1500):
+    frames = make_frames(count=count, days=days)
+    for processes in (1, os.cpu_count() or 1):
+        start = time.perf_counter()
+        result = BacktestEngine(processes=processes).run(frames)
+        print(f"📊 {count} 只股票 × {days} 根K线，{processes} 个进程: {time.perf_counter() - start:.2f}s")
+    for name, summary in result.items():
+        print(f"   {name}: 收益 {summary['total_return']:.1f}%，最大回撤 {summary['max_drawdown']:.1f}%，"
+              f"年化换手 {summary['annual_turnover']:.2f}")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量指标引擎测试
+验证向量化指标与评分、批量快速分析报告和 StockAnalyzer 的逐只计算结果一致
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.batch_indicator_engine import BatchIndicatorEngine, OHLCVPanel
+
+try:
+    os.environ.setdefault('OPENAI_API_KEY', 'test')
+    from app.core.cache import Cache
+    from app.analysis.stock_analyzer import StockAnalyzer
+    ANALYZER_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ StockAnalyzer 不可用: {e}")
+    ANALYZER_AVAILABLE = False
+
+
+def make_frames(count=40, seed=0):
+    """生成长度不一的随机行情数据"""
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(count):
+        n = int(rng.integers(1, 200))
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        frames[f"{i:06d}"] = pd.DataFrame({
+            'date': pd.date_range('2024-01-01', periods=n),
+            'open': (close * (1 + rng.normal(0, 0.005, n))).round(2),
+            'close': close.round(2),
+            'high': (close * (1 + abs(rng.normal(0, 0.01, n)))).round(2),
+            'low': (close * (1 - abs(rng.normal(0, 0.01, n)))).round(2),
+            'volume': rng.integers(1000, 100000, n).astype(float)
+        })
+    return frames
+
+
+class TestBatchIndicatorEngine(unittest.TestCase):
+    """批量指标引擎测试类"""
+
+    def setUp(self):
+        self.frames = make_frames()
+        self.engine = BatchIndicatorEngine()
+        self.panel = OHLCVPanel.from_frames(self.frames)
+        self.indicators = self.engine.calculate_indicators(self.panel)
+
+    def test_panel_right_aligned(self):
+        """测试面板按最新K线右对齐"""
+        for i, code in enumerate(self.panel.symbols):
+            df = self.frames[code]
+            self.assertEqual(self.panel.close[i, -1], df['close'].iloc[-1])
+            self.assertEqual(int(self.indicators['bars'][i, -1]), len(df))
+
+    def test_indicators_match_pandas(self):
+        """测试指标与 pandas 计算结果一致"""
+        for i, code in enumerate(self.panel.symbols):
+            close = self.frames[code]['close']
+            n = len(close)
+            expected_ema = close.ewm(span=20, adjust=False).mean().round(2).to_numpy()
+            expected_bb = close.rolling(window=20).mean().round(2).to_numpy()
+            np.testing.assert_allclose(self.indicators['MA20'][i, -n:], expected_ema)
+            np.testing.assert_allclose(self.indicators['BB_middle'][i, -n:], expected_bb)
+
+    def test_to_frame(self):
+        """测试还原单只股票的指标 DataFrame"""
+        df = self.engine.to_frame(self.panel, self.indicators, 0)
+        self.assertEqual(len(df), len(self.frames[self.panel.symbols[0]]))
+        self.assertIn('Volume_Ratio', df.columns)
+
+    def test_scores_match_calculate_score(self):
+        """测试批量评分与 calculate_score 一致"""
+        if not ANALYZER_AVAILABLE:
+            self.skipTest("StockAnalyzer 不可用")
+
+        analyzer = StockAnalyzer(Cache())
+        for market_type in ['A', 'US', 'HK']:
+            batch = analyzer.calculate_scores_batch(self.frames, market_type)
+            for code, df in self.frames.items():
+                expected = analyzer.calculate_score(analyzer.calculate_indicators(df.copy()), market_type)
+                self.assertEqual(batch[code]['score'], expected, f"{market_type} {code}")
+
+    def test_quick_analyze_batch_matches_single(self):
+        """测试批量快速分析的报告与 quick_analyze_stock 一致"""
+        if not ANALYZER_AVAILABLE:
+            self.skipTest("StockAnalyzer 不可用")
+
+        analyzer = StockAnalyzer(Cache())
+        frames = {code: df for code, df in self.frames.items() if len(df) > 1}
+        infos = {code: {'股票名称': f"股票{code}", '行业': '测试'} for code in frames}
+        analyzer.get_stock_data = lambda code, market_type='A': frames[code].copy()
+        analyzer.get_stock_info = lambda code: infos[code]
+
+        reports = analyzer.quick_analyze_batch(frames, infos)
+        for code in frames:
+            expected = analyzer.quick_analyze_stock(code)
+            actual = reports[code]
+            for key, value in expected.items():
+                if isinstance(value, float):
+                    np.testing.assert_allclose(actual[key], value, err_msg=f"{code} {key}")
+                else:
+                    self.assertEqual(actual[key], value, f"{code} {key}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DataFrame 缓存编解码器测试
+验证列式二进制格式的往返一致性，并与原有 JSON records 格式做性能对比
+
+运行基准测试:
+    python tests/test_cache_codec.py --benchmark
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.core.cache import Cache
+from app.core.cache_codec import JsonRecordsCodec, NumpyFrameCodec
+
+
+def make_price_frame(days=250):
+    """生成与 get_stock_data 结构一致的行情数据"""
+    rng = np.random.default_rng(0)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=days),
+        '股票代码': ['600000'] * days,
+        'open': close.round(2),
+        'close': close.round(2),
+        'high': (close * 1.01).round(2),
+        'low': (close * 0.99).round(2),
+        'volume': rng.integers(1000, 100000, days),
+        'amount': rng.random(days) * 1e8,
+    })
+
+
+class TestNumpyFrameCodec(unittest.TestCase):
+    """列式编解码器测试类"""
+
+    def setUp(self):
+        self.codec = NumpyFrameCodec()
+
+    def test_roundtrip_preserves_dtypes(self):
+        """测试往返后数据与 dtype 不变"""
+        df = make_price_frame()
+        decoded = self.codec.decode(self.codec.encode(df))
+        pd.testing.assert_frame_equal(decoded, df, check_dtype=False)
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(decoded['date']))
+        self.assertEqual(decoded['volume'].dtype, df['volume'].dtype)
+
+    def test_roundtrip_index_and_tz(self):
+        """测试非默认索引和带时区的日期列"""
+        df = make_price_frame(10)
+        df['ts'] = pd.date_range('2024-01-01', periods=10, tz='Asia/Shanghai')
+        df = df.set_index('date')
+        decoded = self.codec.decode(self.codec.encode(df))
+        pd.testing.assert_frame_equal(decoded, df, check_dtype=False, check_freq=False)
+
+    def test_decoded_frame_is_writable(self):
+        """测试解码结果可以原地修改（calculate_indicators 会添加列）"""
+        decoded = self.codec.decode(self.codec.encode(make_price_frame(5)))
+        decoded.loc[0, 'close'] = 1.0
+        decoded['MA5'] = decoded['close']
+        self.assertEqual(decoded.loc[0, 'close'], 1.0)
+
+    def test_cache_frame_memory_backend(self):
+        """测试 Cache 内存模式的 DataFrame 缓存"""
+        cache = Cache()
+        df = make_price_frame(20)
+        cache.set_frame('k', df)
+        pd.testing.assert_frame_equal(cache.get_frame('k'), df, check_dtype=False)
+        self.assertIsNone(cache.get_frame('missing'))
+
+
+def benchmark(iterations=200, days=250):
+    """对比 JSON records 与列式二进制格式的编解码耗时和体积"""
+    df = make_price_frame(days)
+    print(f"📊 {days} 行行情数据，{iterations} 次编解码")
+    for codec in [JsonRecordsCodec(), NumpyFrameCodec()]:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            data = codec.encode(df)
+        encode_ms = (time.perf_counter() - start) / iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            codec.decode(data)
+        decode_ms = (time.perf_counter() - start) / iterations * 1000
+
+        print(f"  {codec.name:>6}: 编码 {encode_ms:.3f}ms, 解码 {decode_ms:.3f}ms, 大小 {len(data) / 1024:.1f}KB")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
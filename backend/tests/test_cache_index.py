@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存元数据索引测试
+验证 CacheIndex 的写入、查找、过期与统计，以及 StockDataCache 启动时与元数据文件的对账
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+from tradingagents.dataflows.cache_manager import CacheIndex, StockDataCache
+
+
+def make_metadata(symbol, cached_at=None, data_type='stock_data', file_path=None):
+    return {'symbol': symbol, 'data_type': data_type, 'market_type': 'china', 'data_source': 'tdx',
+            'start_date': '2024-01-01', 'end_date': '2024-02-01', 'file_path': file_path,
+            'file_format': 'csv', 'cached_at': (cached_at or datetime.now()).isoformat()}
+
+
+class CacheIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.index = CacheIndex(Path(self.tmp.name) / "index.sqlite3")
+
+    def test_upsert_and_get(self):
+        data_file = Path(self.tmp.name) / "data.csv"
+        data_file.write_text("a,b\n1,2\n")
+        metadata = make_metadata('600000', file_path=str(data_file))
+        self.index.upsert('k1', metadata)
+        stored = self.index.get('k1')
+        self.assertEqual(stored['symbol'], '600000')
+        self.assertEqual(stored['cached_at'], metadata['cached_at'])
+        self.assertEqual(stored['file_size'], data_file.stat().st_size)
+        self.assertIsNone(self.index.get('missing'))
+
+        self.index.upsert('k1', make_metadata('600000', data_type='news'))
+        self.assertEqual(self.index.count(), 1)
+        self.assertEqual(self.index.get('k1')['data_type'], 'news')
+
+    def test_find_orders_newest_first_and_filters(self):
+        now = datetime.now()
+        self.index.upsert('old', make_metadata('600000', now - timedelta(hours=3)))
+        self.index.upsert('new', make_metadata('600000', now))
+        self.index.upsert('other', make_metadata('000001', now))
+        self.assertEqual(self.index.find('600000', 'stock_data'), ['new', 'old'])
+        self.assertEqual(self.index.find('600000', 'stock_data', market_type='china', data_source='tdx',
+                                         min_cached_at=(now - timedelta(hours=1)).timestamp()), ['new'])
+        self.assertEqual(self.index.find('600000', 'news'), [])
+
+    def test_expired_delete_and_stats(self):
+        now = datetime.now()
+        self.index.upsert('old', make_metadata('600000', now - timedelta(days=10), file_path='/tmp/old.csv'))
+        self.index.upsert('new', make_metadata('600000', now))
+        self.index.upsert('news', make_metadata('600000', now, data_type='news'))
+        expired = self.index.expired((now - timedelta(days=1)).timestamp())
+        self.assertEqual(expired, [('old', '/tmp/old.csv')])
+        self.index.delete([key for key, _ in expired])
+        self.assertEqual({k: v['count'] for k, v in self.index.stats().items()}, {'stock_data': 1, 'news': 1})
+
+
+class StockDataCacheReconcileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = StockDataCache(self.tmp.name)
+        self.frame = pd.DataFrame({'close': [10.0, 10.5]})
+
+    def test_rebuild_from_meta_files(self):
+        key = self.cache.save_stock_data('600000', self.frame, '2024-01-01', '2024-02-01', 'tdx')
+        os.remove(self.cache.metadata_dir / "cache_index.sqlite3")
+        cache = StockDataCache(self.tmp.name)
+        self.assertEqual(cache.index.count(), 1)
+        self.assertEqual(cache.find_cached_stock_data('600000', '2024-01-01', '2024-02-01', 'tdx'), key)
+        self.assertEqual(len(cache.load_stock_data(key)), 2)
+
+    def test_meta_files_added_or_removed_outside_index(self):
+        removed = self.cache.save_stock_data('600000', self.frame, '2024-01-01', '2024-02-01', 'tdx')
+        kept = self.cache.save_stock_data('000001', self.frame, '2024-01-01', '2024-02-01', 'tdx')
+
+        # 另一个进程写入的元数据文件
+        external = make_metadata('600036', file_path=str(self.cache.china_stock_dir / "external.csv"))
+        with open(self.cache.metadata_dir / "external_key_meta.json", 'w', encoding='utf-8') as f:
+            json.dump(external, f)
+        os.remove(self.cache.metadata_dir / f"{removed}_meta.json")
+
+        cache = StockDataCache(self.tmp.name)
+        self.assertIsNone(cache.index.get(removed))
+        self.assertIsNotNone(cache.index.get(kept))
+        self.assertEqual(cache.index.get('external_key')['symbol'], '600036')
+
+    def test_modified_meta_file_is_reimported(self):
+        key = self.cache.save_stock_data('600000', self.frame, '2024-01-01', '2024-02-01', 'tdx')
+        meta_path = self.cache.metadata_dir / f"{key}_meta.json"
+        metadata = json.loads(meta_path.read_text(encoding='utf-8'))
+        metadata['data_source'] = 'akshare'
+        meta_path.write_text(json.dumps(metadata), encoding='utf-8')
+        future = time.time() + 60
+        os.utime(meta_path, (future, future))
+
+        cache = StockDataCache(self.tmp.name)
+        self.assertEqual(cache.index.get(key)['data_source'], 'akshare')
+
+    def test_unindexed_meta_file_found_on_lookup(self):
+        external = make_metadata('600036')
+        with open(self.cache.metadata_dir / "late_key_meta.json", 'w', encoding='utf-8') as f:
+            json.dump(external, f)
+        self.assertEqual(self.cache._load_metadata('late_key')['symbol'], '600036')
+        self.assertIsNotNone(self.cache.index.get('late_key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+资金流向表列映射测试
+验证整列转换与原逐行 iterrows 解析结果一致（CapitalFlowAnalyzer / IndustryAnalyzer）
+
+运行基准测试（全市场个股资金流排名）:
+    python tests/test_column_mapping.py --benchmark
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.column_mapping import frame_to_records
+from app.analysis.capital_flow_analyzer import CapitalFlowAnalyzer, fund_flow_fields
+from app.analysis.industry_analyzer import IndustryAnalyzer
+from app.analysis.fund_flow_snapshot import FundFlowSnapshot
+
+LEVELS = ("主力", "超大单", "大单", "中单", "小单")
+
+
+class DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+
+def make_rank_frame(rows=5000, period="10日", seed=0):
+    """生成 stock_individual_fund_flow_rank 结构的排名表"""
+    rng = np.random.default_rng(seed)
+    prefix = "" if period == "今日" else period
+    data = {
+        "序号": np.arange(1, rows + 1),
+        "代码": [f"{i:06d}" for i in range(rows)],
+        "名称": [f"股票{i}" for i in range(rows)],
+        "最新价": rng.uniform(1, 200, rows).round(2),
+        f"{prefix}涨跌幅": rng.normal(0, 3, rows).round(2),
+    }
+    for label in LEVELS:
+        data[f"{prefix}{label}净流入-净额"] = rng.normal(0, 1e7, rows).round(2)
+        data[f"{prefix}{label}净流入-净占比"] = rng.normal(0, 5, rows).round(2)
+    return pd.DataFrame(data)
+
+
+def loop_parse_rank(stock_data, period):
+    """原 get_individual_fund_flow_rank 的逐行解析，作为对照"""
+    prefix = "" if period == "今日" else period
+    result = []
+    for _, row in stock_data.iterrows():
+        try:
+            item = {
+                "rank": int(row.get("序号", 0)),
+                "code": row.get("代码", ""),
+                "name": row.get("名称", ""),
+                "price": float(row.get("最新价", 0)),
+                "change_percent": float(row.get(f"{prefix}涨跌幅", 0)),
+            }
+            for key, label in zip(("main", "super_large", "large", "medium", "small"), LEVELS):
+                item[f"{key}_net_inflow"] = float(row.get(f"{prefix}{label}净流入-净额", 0))
+                item[f"{key}_net_inflow_percent"] = float(row.get(f"{prefix}{label}净流入-净占比", 0))
+            result.append(item)
+        except Exception:
+            continue
+    return result
+
+
+class ColumnMappingTest(unittest.TestCase):
+
+    def test_converters_and_defaults(self):
+        frame = pd.DataFrame({
+            "n": ["1.5", None, "bad", 3],
+            "p": ["1.23%", "-0.5%", np.nan, 2.0],
+            "s": ["a", None, "c", "d"],
+        })
+        records = frame_to_records(frame, [
+            ("float", "n", "float"), ("int", "n", "int"), ("percent", "p", "percent"),
+            ("percent_str", "p", "percent_str"), ("text", "s", "str"),
+            ("constant", None, "int"), ("missing", "不存在", "float"), ("skipped", "不存在", "str"),
+        ], optional=("skipped",))
+        self.assertEqual(records[0], {"float": 1.5, "int": 1, "percent": 1.23, "percent_str": "1.23",
+                                      "text": "a", "constant": 0, "missing": 0.0})
+        self.assertEqual([r["float"] for r in records], [1.5, 0.0, 0.0, 3.0])
+        self.assertEqual([r["percent_str"] for r in records], ["1.23", "-0.5", "0.00", "2.0"])
+        self.assertEqual(records[1]["text"], "")
+        self.assertIsInstance(records[0]["int"], int)
+        self.assertEqual(frame_to_records(pd.DataFrame(), [("a", "a", "float")]), [])
+
+    def test_rank_matches_loop(self):
+        for period in ("今日", "10日"):
+            frame = make_rank_frame(200, period)
+            analyzer = CapitalFlowAnalyzer(DictCache(), FundFlowSnapshot())
+            with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+                ak.stock_individual_fund_flow_rank.return_value = frame
+                result = analyzer.get_individual_fund_flow_rank(period)
+            self.assertEqual(result, loop_parse_rank(frame, period))
+
+    def test_individual_flow_history(self):
+        frame = make_rank_frame(30, "今日").drop(columns=["序号", "代码", "名称", "最新价"])
+        frame.insert(0, "日期", pd.date_range("2024-01-01", periods=30).date)
+        frame.insert(1, "收盘价", np.linspace(10, 12, 30))
+        analyzer = CapitalFlowAnalyzer(DictCache(), FundFlowSnapshot())
+        with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+            ak.stock_individual_fund_flow.return_value = frame
+            result = analyzer.get_individual_fund_flow("600000")
+        self.assertEqual(len(result["data"]), 30)
+        self.assertEqual(result["data"][0]["date"], frame["日期"].iloc[0])
+        self.assertEqual(result["summary"]["recent_days"], 10)
+        # 汇总取日期最新的10天（数据源按日期升序返回）
+        self.assertAlmostEqual(result["summary"]["total_main_net_inflow"],
+                               frame["主力净流入-净额"].iloc[-10:].sum())
+
+    def test_concept_flow_parses_percent(self):
+        frame = pd.DataFrame({"序号": [1, 2], "行业": ["半导体", "医药"], "公司家数": [50, 80],
+                              "行业指数": [1000.5, 2000.0], "阶段涨跌幅": ["3.5%", "-1.2%"],
+                              "流入资金": [10.0, 5.0], "流出资金": [4.0, 8.0], "净额": [6.0, -3.0]})
+        analyzer = CapitalFlowAnalyzer(DictCache(), FundFlowSnapshot())
+        with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+            ak.stock_fund_flow_concept.return_value = frame
+            result = analyzer.get_concept_fund_flow()
+        self.assertEqual(result[1], {"rank": 2, "sector": "医药", "company_count": 80, "sector_index": 2000.0,
+                                     "change_percent": -1.2, "inflow": 5.0, "outflow": 8.0, "net_flow": -3.0})
+
+    def test_industry_realtime_flow(self):
+        frame = pd.DataFrame({"序号": [1], "行业": ["银行"], "行业指数": [1200.0], "行业-涨跌幅": [1.25],
+                              "流入资金": [30.0], "流出资金": [20.0], "净额": [10.0], "公司家数": [42],
+                              "领涨股": ["招商银行"], "领涨股-涨跌幅": ["2.10%"], "当前价": [35.2]})
+        with mock.patch("app.analysis.industry_analyzer.ak") as ak:
+            ak.stock_fund_flow_industry.return_value = frame
+            result = IndustryAnalyzer().get_industry_fund_flow("即时")
+            self.assertEqual(result, [{"rank": 1, "industry": "银行", "index": 1200.0, "change": "1.25",
+                                       "inflow": 30.0, "outflow": 20.0, "netFlow": 10.0, "companyCount": 42,
+                                       "leadingStock": "招商银行", "leadingStockChange": "2.10",
+                                       "leadingStockPrice": 35.2}])
+
+            ak.stock_fund_flow_industry.return_value = frame.drop(columns=["领涨股", "领涨股-涨跌幅", "当前价"])
+            result = IndustryAnalyzer().get_industry_fund_flow("即时")
+            self.assertNotIn("leadingStock", result[0])
+
+    def test_shared_fields_use_period_prefix(self):
+        columns = [column for _, column, _ in fund_flow_fields("5日")]
+        self.assertIn("5日主力净流入-净额", columns)
+        self.assertIn("5日涨跌幅", columns)
+
+
+def benchmark(rows=5200):
+    frame = make_rank_frame(rows)
+    print(f"📊 个股资金流排名 {rows} 行 × {len(frame.columns)} 列")
+
+    start = time.perf_counter()
+    loop_parse_rank(frame, "10日")
+    loop_time = time.perf_counter() - start
+    print(f"   逐行解析: {loop_time * 1000:.1f}ms")
+
+    fields = [("rank", "序号", "int"), ("code", "代码", "raw"), ("name", "名称", "raw"),
+              ("price", "最新价", "float")] + fund_flow_fields("10日")
+    start = time.perf_counter()
+    for _ in range(10):
+        frame_to_records(frame, fields)
+    vec_time = (time.perf_counter() - start) / 10
+    print(f"   整列转换: {vec_time * 1000:.1f}ms  (加速 {loop_time / vec_time:.0f}x)")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+嵌入向量批量请求与共享缓存测试
+验证按批次请求、文本去重、跨记忆库共享的 LRU 缓存、各提供者的批量调用，以及本地确定性嵌入
+"""
+
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+try:
+    from tradingagents.llm_adapters.embedding_providers import (DashScopeEmbeddingProvider, EmbeddingCache,
+                                                                LocalEmbeddingProvider, OpenAIEmbeddingProvider,
+                                                                embed_texts)
+    EMBEDDINGS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ 嵌入提供者不可用: {e}")
+    EMBEDDINGS_AVAILABLE = False
+
+try:
+    from tradingagents.agents.utils.memory import FinancialSituationMemory
+    MEMORY_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ FinancialSituationMemory 不可用: {e}")
+    MEMORY_AVAILABLE = False
+
+
+def cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+if EMBEDDINGS_AVAILABLE:
+    class CountingProvider(LocalEmbeddingProvider):
+        """记录每次批量请求的本地提供者"""
+
+        def __init__(self, batch_size=10, fail_on_call=None):
+            super().__init__(dimension=64)
+            self.batch_size = batch_size
+            self.batches = []
+            self.fail_on_call = fail_on_call
+
+        def embed_batch(self, texts):
+            self.batches.append(list(texts))
+            if self.fail_on_call == len(self.batches):
+                raise ConnectionError("embedding service unavailable")
+            return super().embed_batch(texts)
+
+
+@unittest.skipUnless(EMBEDDINGS_AVAILABLE, "嵌入提供者不可用")
+class EmbeddingCacheTest(unittest.TestCase):
+
+    def test_texts_are_batched_and_deduplicated(self):
+        provider = CountingProvider(batch_size=10)
+        cache = EmbeddingCache(max_size=100)
+        texts = [f"situation {i}" for i in range(25)] + ["situation 3", "situation 7"]
+        vectors = embed_texts(provider, texts, cache)
+
+        self.assertEqual([len(b) for b in provider.batches], [10, 10, 5])
+        self.assertEqual(len(vectors), 27)
+        self.assertEqual(vectors[25], vectors[3])
+        self.assertEqual(vectors[0], provider.embed_batch(["situation 0"])[0])
+
+    def test_cached_texts_are_not_requested_again(self):
+        provider = CountingProvider()
+        cache = EmbeddingCache(max_size=100)
+        embed_texts(provider, ["市场情况 A", "市场情况 B"], cache)
+        embed_texts(provider, ["市场情况 B", "市场情况 C", "市场情况 A"], cache)
+        self.assertEqual(provider.batches, [["市场情况 A", "市场情况 B"], ["市场情况 C"]])
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_namespaces_do_not_share_vectors(self):
+        cache = EmbeddingCache(max_size=100)
+        small, large = CountingProvider(), LocalEmbeddingProvider(dimension=128)
+        embed_texts(small, ["same text"], cache)
+        self.assertEqual(len(embed_texts(large, ["same text"], cache)[0]), 128)
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_lru_eviction(self):
+        provider = CountingProvider()
+        cache = EmbeddingCache(max_size=2)
+        embed_texts(provider, ["a"], cache)
+        embed_texts(provider, ["b"], cache)
+        embed_texts(provider, ["a"], cache)
+        embed_texts(provider, ["c"], cache)
+        embed_texts(provider, ["a", "b"], cache)
+        self.assertEqual(provider.batches, [["a"], ["b"], ["c"], ["b"]])
+
+    def test_failed_batch_is_not_cached(self):
+        provider = CountingProvider(batch_size=2, fail_on_call=2)
+        cache = EmbeddingCache(max_size=100)
+        with self.assertRaises(ConnectionError):
+            embed_texts(provider, ["a", "b", "c"], cache)
+        embed_texts(provider, ["a", "b", "c"], cache)
+        self.assertEqual(provider.batches, [["a", "b"], ["c"], ["c"]])
+
+    def test_local_embeddings_are_deterministic(self):
+        provider = LocalEmbeddingProvider()
+        first, again, related, unrelated = provider.embed_batch([
+            "tech sector selloff with institutional selling",
+            "tech sector selloff with institutional selling",
+            "institutional selling in the tech sector",
+            "consumer staples benefit from inflation",
+        ])
+        self.assertEqual(first, again)
+        self.assertAlmostEqual(cosine(first, first), 1.0)
+        self.assertGreater(cosine(first, related), cosine(first, unrelated))
+        self.assertTrue(any(provider.embed_batch([""])[0]))
+
+    def test_openai_provider_sends_one_request_per_batch(self):
+        client = mock.Mock(base_url="https://api.openai.com/v1")
+        client.embeddings.create.return_value = SimpleNamespace(data=[
+            SimpleNamespace(index=1, embedding=[0.0, 1.0]), SimpleNamespace(index=0, embedding=[1.0, 0.0])])
+        vectors = embed_texts(OpenAIEmbeddingProvider(client), ["first", "second"], EmbeddingCache(max_size=10))
+        client.embeddings.create.assert_called_once_with(model="text-embedding-3-small", input=["first", "second"])
+        self.assertEqual(vectors, [[1.0, 0.0], [0.0, 1.0]])
+
+    def test_dashscope_provider_sends_one_request_per_batch(self):
+        import dashscope
+
+        def call(model, input):
+            embeddings = [{'text_index': i, 'embedding': [float(i)]} for i in reversed(range(len(input)))]
+            return SimpleNamespace(status_code=200, output={'embeddings': embeddings})
+
+        with mock.patch.object(dashscope, 'api_key', 'test-key'), \
+                mock.patch('dashscope.TextEmbedding.call', side_effect=call) as text_embedding:
+            vectors = embed_texts(DashScopeEmbeddingProvider(), [f"t{i}" for i in range(12)],
+                                  EmbeddingCache(max_size=100))
+        self.assertEqual(text_embedding.call_count, 2)
+        self.assertEqual(vectors[11], [1.0])
+        self.assertEqual(vectors[9], [9.0])
+
+
+@unittest.skipUnless(EMBEDDINGS_AVAILABLE and MEMORY_AVAILABLE, "FinancialSituationMemory 不可用")
+class FinancialSituationMemoryBatchTest(unittest.TestCase):
+
+    config = {"llm_provider": "openai", "backend_url": "https://api.openai.com/v1"}
+
+    def test_memories_share_query_embeddings(self):
+        provider = CountingProvider()
+        with mock.patch('tradingagents.llm_adapters.embedding_providers._embedding_cache', EmbeddingCache(100)):
+            memories = [FinancialSituationMemory(f"batch_memory_{role}", self.config, embedding_provider=provider)
+                        for role in ("bull", "bear", "trader", "judge", "risk")]
+            memories[0].add_situations([
+                ("High inflation with rising rates", "Favor consumer staples"),
+                ("Tech selloff with institutional selling", "Trim growth exposure"),
+            ])
+            situation = "Tech sector selloff as institutions keep selling"
+            results = [memory.get_memories(situation, n_matches=1) for memory in memories]
+
+        self.assertEqual(len(provider.batches), 2)
+        self.assertEqual(results[0][0]["recommendation"], "Trim growth exposure")
+
+    def test_batch_recall(self):
+        with mock.patch('tradingagents.llm_adapters.embedding_providers._embedding_cache', EmbeddingCache(100)):
+            memory = FinancialSituationMemory("batch_memory_recall", {**self.config, "embedding_provider": "local"})
+            memory.add_situations([("通胀上升 利率上行", "防御板块"), ("美元走强 新兴市场承压", "对冲汇率风险")])
+            matches = memory.get_memories_batch(["通胀 利率", "美元 新兴市场"], n_matches=1)
+        self.assertEqual([m[0]["recommendation"] for m in matches], ["防御板块", "对冲汇率风险"])
+
+    def test_disabled_memory_returns_nothing(self):
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": ""}):
+            memory = FinancialSituationMemory("batch_memory_disabled", self.config)
+        self.assertIsNone(memory.embedding_provider)
+        self.assertEqual(memory.get_memories("anything"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场资金流向快照测试
+验证按代码查询、每日历史面板、个股历史补录与连续性检查、获取失败后的退避，以及评分优先使用快照而不逐只请求
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.fund_flow_snapshot import FundFlowSnapshot, SNAPSHOT_FIELDS
+from app.analysis.capital_flow_analyzer import CapitalFlowAnalyzer
+
+LEVELS = ("主力", "超大单", "大单", "中单", "小单")
+
+
+class DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.data[key] = value
+
+
+def make_today_frame(codes, seed=0):
+    """生成 stock_individual_fund_flow_rank(indicator="今日") 结构的排名表"""
+    rng = np.random.default_rng(seed)
+    rows = len(codes)
+    data = {"序号": np.arange(1, rows + 1), "代码": codes, "名称": [f"股票{c}" for c in codes],
+            "最新价": rng.uniform(5, 50, rows).round(2), "今日涨跌幅": rng.normal(0, 2, rows).round(2)}
+    for label in LEVELS:
+        data[f"今日{label}净流入-净额"] = rng.normal(0, 1e6, rows).round(2)
+        data[f"今日{label}净流入-净占比"] = rng.normal(0, 3, rows).round(2)
+    return pd.DataFrame(data)
+
+
+def business_dates(days, end='2024-03-29'):
+    return [d.strftime('%Y-%m-%d') for d in pd.bdate_range(end=end, periods=days)]
+
+
+class FundFlowSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.codes = [f"{i:06d}" for i in range(50)]
+
+    def fill_history(self, snapshot, days):
+        dates = business_dates(days)
+        for i, date in enumerate(dates):
+            snapshot.update(make_today_frame(self.codes, seed=i), date=date)
+        return dates
+
+    def test_lookup_by_code(self):
+        snapshot = FundFlowSnapshot()
+        frame = make_today_frame(self.codes)
+        snapshot.update(frame, date='2024-03-29')
+        snapshot._fetched_at += 3600  # 避免 get() 触发刷新
+        item = snapshot.get('000003')
+        self.assertEqual(item['price'], frame.loc[3, '最新价'])
+        self.assertEqual(item['main_net_inflow'], frame.loc[3, '今日主力净流入-净额'])
+        self.assertEqual(item['date'], '2024-03-29')
+        self.assertIsNone(snapshot.get('999999'))
+
+    def test_panel_and_history(self):
+        snapshot = FundFlowSnapshot()
+        dates = self.fill_history(snapshot, 12)
+        panel = snapshot.panel('main_net_inflow')
+        self.assertEqual(list(panel.index), dates)
+        self.assertEqual(panel.shape, (12, 50))
+
+        records = snapshot.history('000007', days=10)
+        self.assertEqual([r['date'] for r in records], dates[::-1][:10])
+        self.assertEqual(records[0]['main_net_inflow'], panel.loc[dates[-1], '000007'])
+        self.assertEqual(set(records[0]) - {'date'}, set(SNAPSHOT_FIELDS))
+        self.assertIsNone(snapshot.history('000007', days=20))
+
+    def test_history_requires_latest_day(self):
+        snapshot = FundFlowSnapshot()
+        self.fill_history(snapshot, 10)
+        # 最新快照中没有该股票（如停牌）时，历史不再连续
+        snapshot.update(make_today_frame(self.codes[1:]), date='2024-04-01')
+        self.assertIsNone(snapshot.history('000000', days=10))
+        self.assertIsNotNone(snapshot.history('000001', days=10))
+
+    def test_history_requires_consecutive_days(self):
+        snapshot = FundFlowSnapshot()
+        dates = self.fill_history(snapshot, 12)
+        self.assertEqual([item['date'] for item in snapshot.history('000001', days=10)], dates[::-1][:10])
+        # 中间某天缺少该股票
+        snapshot._days[dates[5]] = snapshot._days[dates[5]].drop('000001')
+        self.assertIsNone(snapshot.history('000001', days=10))
+        # 日期不是相邻的工作日（缺少一整天）
+        del snapshot._days[dates[6]]
+        self.assertIsNone(snapshot.history('000002', days=10))
+        self.assertIsNotNone(snapshot.history('000002', days=5))
+
+    def test_record_history_backfills_symbol(self):
+        snapshot = FundFlowSnapshot()
+        snapshot.update(make_today_frame(self.codes), date='2024-03-29')
+        records = [dict({f: float(i) for f in SNAPSHOT_FIELDS}, date=pd.Timestamp(d).date())
+                   for i, d in enumerate(business_dates(15, end='2024-03-28'))]
+        snapshot.record_history('600000', records)
+        snapshot.update(make_today_frame(self.codes + ['600000']), date='2024-03-29')
+
+        history = snapshot.history('600000', days=10)
+        self.assertEqual(history[0]['date'], '2024-03-29')
+        self.assertEqual(history[1]['main_net_inflow'], 14.0)
+        # 补录不覆盖已有的全市场快照
+        self.assertIsNone(snapshot.history('000001', days=10))
+
+    def test_persistence_and_pruning(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = FundFlowSnapshot(save_dir=tmp, history_days=5)
+            dates = self.fill_history(snapshot, 8)
+            self.assertEqual(len(os.listdir(tmp)), 5)
+
+            restored = FundFlowSnapshot(save_dir=tmp, history_days=5)
+            self.assertEqual(list(restored.panel('price').index), dates[-5:])
+            pd.testing.assert_frame_equal(restored.panel('price'), snapshot.panel('price'))
+
+    def test_refresh_backs_off_after_failure(self):
+        snapshot = FundFlowSnapshot(ttl=0, retry_interval=3600)
+        with mock.patch("app.analysis.fund_flow_snapshot.ak") as ak:
+            ak.stock_individual_fund_flow_rank.side_effect = RuntimeError('boom')
+            self.assertFalse(snapshot.refresh())
+            self.assertFalse(snapshot.refresh())
+            self.assertIsNone(snapshot.get('000001'))
+            self.assertEqual(ak.stock_individual_fund_flow_rank.call_count, 1)
+
+            ak.stock_individual_fund_flow_rank.side_effect = None
+            ak.stock_individual_fund_flow_rank.return_value = make_today_frame(self.codes)
+            self.assertTrue(snapshot.refresh(force=True))
+            self.assertIsNotNone(snapshot.get('000001'))
+
+    def test_score_served_from_snapshot(self):
+        snapshot = FundFlowSnapshot(ttl=3600)
+        self.fill_history(snapshot, 10)
+        analyzer = CapitalFlowAnalyzer(DictCache(), snapshot)
+        with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+            scores = [analyzer.calculate_capital_flow_score(code) for code in self.codes]
+            ak.stock_individual_fund_flow.assert_not_called()
+        self.assertTrue(all(s['details']['summary']['recent_days'] == 10 for s in scores))
+
+        panel = snapshot.panel('main_net_inflow')
+        expected = int((panel['000005'] > 0).sum())
+        self.assertEqual(scores[5]['details']['summary']['positive_days'], expected)
+
+    def test_score_falls_back_and_backfills(self):
+        snapshot = FundFlowSnapshot(ttl=3600)
+        snapshot.update(make_today_frame(self.codes), date='2024-03-29')
+        history = make_today_frame(['600000'] * 20, seed=3).drop(columns=["序号", "代码", "名称"])
+        history.columns = [c.replace("今日", "") for c in history.columns]
+        history = history.rename(columns={"最新价": "收盘价"})
+        history.insert(0, "日期", pd.bdate_range(end='2024-03-28', periods=20).date)
+
+        analyzer = CapitalFlowAnalyzer(DictCache(), snapshot)
+        with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+            ak.stock_individual_fund_flow.return_value = history
+            analyzer.calculate_capital_flow_score('000001')
+            self.assertEqual(ak.stock_individual_fund_flow.call_count, 1)
+        self.assertEqual(len(snapshot.panel('price')), 21)
+
+    def test_fallback_summary_uses_latest_days(self):
+        # 单只股票请求返回的数据按日期升序（最新在最后）
+        dates = pd.bdate_range(end='2024-03-28', periods=20).date
+        history = make_today_frame(['600000'] * 20, seed=3).drop(columns=["序号", "代码", "名称"])
+        history.columns = [c.replace("今日", "") for c in history.columns]
+        history = history.rename(columns={"最新价": "收盘价"})
+        history["主力净流入-净额"] = [-1.0] * 10 + [1.0] * 10
+        history.insert(0, "日期", dates)
+
+        analyzer = CapitalFlowAnalyzer(DictCache(), FundFlowSnapshot(ttl=3600))
+        with mock.patch("app.analysis.capital_flow_analyzer.ak") as ak:
+            ak.stock_individual_fund_flow.return_value = history
+            summary = analyzer.get_individual_fund_flow('000001')['summary']
+        self.assertEqual(summary['recent_days'], 10)
+        self.assertEqual(summary['positive_days'], 10)
+        self.assertEqual(summary['total_main_net_inflow'], 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地增量行情库测试
+验证首次全量同步、增量追加、复权变化后重新同步、本地区间查询，以及数据与元数据不一致时重新同步
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.core.history_store import PriceHistoryStore
+
+
+class FakeSource:
+    """模拟数据源，记录每次请求的日期区间"""
+
+    def __init__(self, days=30):
+        self.frame = self._make(pd.date_range('2024-01-01', periods=days), 10.0)
+        self.calls = []
+
+    @staticmethod
+    def _make(dates, base):
+        return pd.DataFrame({
+            'date': dates,
+            'open': base, 'close': [base + i * 0.1 for i in range(len(dates))],
+            'high': base + 1, 'low': base - 1, 'volume': 1000.0
+        })
+
+    def fetch(self, stock_code, market_type, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        start = pd.to_datetime(start_date)
+        return self.frame[self.frame['date'] >= start].reset_index(drop=True)
+
+
+class TestPriceHistoryStore(unittest.TestCase):
+    """增量行情库测试类"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = FakeSource()
+        self.store = PriceHistoryStore(self.source.fetch, base_dir=self.tmp.name, refresh_interval=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_incremental_append(self):
+        """测试首次全量同步后只拉取增量数据"""
+        self.assertEqual(len(self.store.sync('600000')), 30)
+        self.assertEqual(self.store.stats['full_syncs'], 1)
+
+        new_rows = FakeSource._make(pd.date_range('2024-01-31', periods=5), 10.0)
+        new_rows['close'] = [13.0 + i * 0.1 for i in range(5)]
+        self.source.frame = pd.concat([self.source.frame, new_rows], ignore_index=True)
+
+        df = self.store.sync('600000')
+        self.assertEqual(len(df), 35)
+        self.assertEqual(self.store.stats['incremental_syncs'], 1)
+        # 增量请求从最后一根已保存的K线开始
+        self.assertEqual(self.source.calls[-1][0], '20240130')
+
+    def test_adjustment_change_triggers_full_sync(self):
+        """测试复权价格变化时重新同步全部历史"""
+        self.store.sync('600000')
+        self.source.frame['close'] = self.source.frame['close'] * 0.9
+        df = self.store.sync('600000')
+        self.assertEqual(self.store.stats['full_syncs'], 2)
+        self.assertAlmostEqual(df['close'].iloc[0], 9.0)
+
+    def test_failed_incremental_sync_returns_stored(self):
+        """测试增量拉取失败时返回本地已有数据，下次调用再重试"""
+        self.store.sync('600000')
+
+        def failing_fetch(*args):
+            raise ConnectionError("akshare 超时")
+
+        self.store.fetcher = failing_fetch
+        df = self.store.sync('600000')
+        self.assertEqual(len(df), 30)
+        self.assertEqual(self.store.stats['full_syncs'], 1)
+
+        self.store.fetcher = self.source.fetch
+        self.store.sync('600000')
+        self.assertEqual(self.store.stats['incremental_syncs'], 1)
+
+    def test_range_query_is_local(self):
+        """测试区间查询在本地切片"""
+        store = PriceHistoryStore(self.source.fetch, base_dir=self.tmp.name, refresh_interval=3600)
+        store.sync('600000')
+        calls = len(self.source.calls)
+        df = store.get_range('600000', start_date='20240110', end_date='2024-01-19')
+        self.assertEqual(len(df), 10)
+        self.assertEqual(df['date'].iloc[0], pd.Timestamp('2024-01-10'))
+        self.assertEqual(len(self.source.calls), calls)
+
+    def test_mismatched_data_and_meta_triggers_full_sync(self):
+        """测试数据文件与元数据不属于同一次写入时视为没有本地数据"""
+        store = PriceHistoryStore(self.source.fetch, base_dir=self.tmp.name, refresh_interval=3600)
+        store.sync('600000')
+        data_path, _ = store._paths('600000', 'A')
+        # 模拟写完数据文件、尚未写元数据时中断
+        with open(data_path, 'wb') as f:
+            f.write(store.codec.encode(self.source.frame.iloc[:10]))
+        self.assertEqual(store.load('600000'), (None, None))
+
+        df = store.sync('600000')
+        self.assertEqual(len(df), 30)
+        self.assertEqual(store.stats['full_syncs'], 2)
+        self.assertEqual([name for name in os.listdir(os.path.dirname(data_path)) if name.endswith('.tmp')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+指数/行业分析测试
+验证成分股在共享有界线程池中分析（并发数受限）、成分股结果跨指数/行业复用，以及汇总结果缓存
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.index_industry_analyzer import IndexIndustryAnalyzer
+from app.analysis import market_scan_engine
+
+
+class FakeAnalyzer:
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def fetch_scan_data(self, stock_code, market_type='A'):
+        with self.lock:
+            self.calls.append(stock_code)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if stock_code.endswith('9'):
+            raise ValueError('no data')
+        return int(stock_code), {}
+
+    def quick_analyze_batch(self, frames, stock_infos=None, market_type='A'):
+        return {code: {'stock_code': code, 'score': value % 100, 'price_change': value % 3 - 1}
+                for code, value in frames.items()}
+
+
+def index_frame(codes):
+    return pd.DataFrame({'成分券代码': codes, '权重(%)': [float(len(codes) - i) for i in range(len(codes))]})
+
+
+class IndexIndustryAnalyzerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = FakeAnalyzer()
+        self.index_analyzer = IndexIndustryAnalyzer(self.analyzer)
+        patcher = mock.patch('app.analysis.index_industry_analyzer.ak')
+        self.ak = patcher.start()
+        self.addCleanup(patcher.stop)
+        # 测试不限速
+        limiter_patcher = mock.patch.dict(market_scan_engine._rate_limiters,
+                                          {'akshare': market_scan_engine.RateLimiter(0)})
+        limiter_patcher.start()
+        self.addCleanup(limiter_patcher.stop)
+
+    def test_constituents_run_on_bounded_shared_pool(self):
+        codes = [f"{i:06d}" for i in range(120)]
+        self.ak.index_stock_cons_weight_csindex.return_value = index_frame(codes)
+        result = self.index_analyzer.analyze_index('000905', limit=None)
+
+        pool_size = market_scan_engine.get_analysis_executor()._max_workers
+        self.assertLessEqual(self.analyzer.max_active, pool_size)
+        self.assertEqual(len(self.analyzer.calls), 120)
+        # 以 9 结尾的股票分析失败，被跳过
+        self.assertEqual(result['stock_count'], 108)
+        weights = {r['stock_code']: r['weight'] for r in result['results']}
+        self.assertEqual(weights['000000'], 120.0)
+
+    def test_constituent_results_reused_across_requests(self):
+        self.ak.index_stock_cons_weight_csindex.return_value = index_frame([f"{i:06d}" for i in range(20)])
+        self.index_analyzer.analyze_index('000300', limit=None)
+        self.ak.stock_board_industry_cons_em.return_value = pd.DataFrame(
+            {'代码': [f"{i:06d}" for i in range(10, 30)]})
+        result = self.index_analyzer.analyze_industry('银行', limit=None)
+
+        # 000010-000019 已由指数请求分析过（其中 000019 失败，需要重试）
+        self.assertEqual(len(self.analyzer.calls), 20 + 11)
+        self.assertNotIn('weight', result['results'][0])
+
+    def test_aggregate_result_cached_per_limit(self):
+        self.ak.index_stock_cons_weight_csindex.return_value = index_frame([f"{i:06d}" for i in range(30)])
+        first = self.index_analyzer.analyze_index('000300', limit=10)
+        self.assertIs(self.index_analyzer.analyze_index('000300', limit=10), first)
+        self.assertEqual(self.ak.index_stock_cons_weight_csindex.call_count, 1)
+        self.assertEqual(self.index_analyzer.analyze_index('000300', limit=30)['stock_count'], 27)
+        # 失败的 000009 不缓存，第二次请求时重新分析
+        self.assertEqual(len(self.analyzer.calls), 31)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+行业板块历史缓存测试
+验证并发获取、收盘前复用缓存、过期后增量更新，以及在对齐面板的同一交易日上排名
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis import market_scan_engine
+from app.analysis.market_scan_engine import RateLimiter
+from app.analysis.industry_board_history import IndustryBoardHistory, next_close_time
+from app.analysis.industry_analyzer import IndustryAnalyzer
+from app.analysis.index_industry_analyzer import IndexIndustryAnalyzer
+
+
+def make_board_list(count):
+    return pd.DataFrame({"排名": np.arange(1, count + 1),
+                         "板块名称": [f"行业{i}" for i in range(count)],
+                         "板块代码": [f"BK{i:04d}" for i in range(count)]})
+
+
+class FakeBoardSource:
+    """模拟 stock_board_industry_hist_em：按日期区间返回确定性的行情，并记录调用"""
+
+    def __init__(self, end='2024-03-29', delay=0.0):
+        self.dates = pd.bdate_range(end=end, periods=200)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol, start_date, end_date, period, adjust=""):
+        with self._lock:
+            self.calls.append((symbol, start_date))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        seed = int(symbol[2:])
+        dates = self.dates[(self.dates >= pd.Timestamp(start_date)) & (self.dates <= pd.Timestamp(end_date))]
+        close = 1000 + seed * 10 + np.arange(len(self.dates))[-len(dates):] * (seed - 5) if len(dates) else []
+        return pd.DataFrame({"日期": dates.strftime('%Y-%m-%d'), "收盘": close,
+                             "涨跌幅": np.full(len(dates), seed - 5.0),
+                             "成交量": np.full(len(dates), 100.0 * seed),
+                             "成交额": np.full(len(dates), 1e6 * seed)})
+
+
+class IndustryBoardHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(market_scan_engine, '_rate_limiters', {'akshare': RateLimiter(0)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.ak = mock.patch("app.analysis.industry_board_history.ak").start()
+        self.addCleanup(mock.patch.stopall)
+        self.ak.stock_board_industry_name_em.return_value = make_board_list(12)
+        self.source = FakeBoardSource()
+        self.ak.stock_board_industry_hist_em.side_effect = self.source
+        # 固定“今天”为行情最后一天
+        now = mock.patch("app.analysis.industry_board_history.datetime", wraps=datetime).start()
+        now.now.return_value = datetime(2024, 3, 29, 20, 0)
+
+    def test_compare_ranks_on_aligned_panel(self):
+        result = IndustryBoardHistory(history_days=30).compare(limit=0)
+        self.assertEqual(result["count"], 12)
+        self.assertEqual(result["date"], '2024-03-29')
+        changes = [item["change"] for item in result["results"]]
+        self.assertEqual(changes, sorted(changes, reverse=True))
+        top = result["top_industries"][0]
+        self.assertEqual((top["industry"], top["code"], top["volume"]), ("行业11", "BK0011", 1100.0))
+        # 5日涨跌幅由对齐后的收盘价面板计算
+        self.assertAlmostEqual(top["change_5d"], (1110 + 199 * 6) / (1110 + 194 * 6) * 100 - 100, places=3)
+        self.assertEqual(len(result["bottom_industries"]), 5)
+        # 以板块代码请求，避免 akshare 每次再查一遍板块列表
+        self.assertTrue(all(symbol.startswith("BK") for symbol, _ in self.source.calls))
+
+    def test_histories_fetched_concurrently(self):
+        self.source.delay = 0.05
+        start = time.perf_counter()
+        IndustryBoardHistory().compare(limit=0)
+        self.assertGreater(self.source.max_active, 1)
+        self.assertLess(time.perf_counter() - start, 12 * 0.05)
+
+    def test_cache_reused_until_close_then_updated_incrementally(self):
+        board_history = IndustryBoardHistory(history_days=30)
+        board_history.compare(limit=5)
+        board_history.compare(limit=5)
+        self.assertEqual(len(self.source.calls), 5)
+        self.assertEqual(self.ak.stock_board_industry_name_em.call_count, 1)
+
+        # 收盘后缓存过期：只从缓存最后一天开始请求
+        for code, (frame, _) in list(board_history._histories.items()):
+            board_history._histories[code] = (frame, 0.0)
+        self.source.dates = pd.bdate_range(end='2024-04-01', periods=200)
+        with mock.patch("app.analysis.industry_board_history.datetime", wraps=datetime) as now:
+            now.now.return_value = datetime(2024, 4, 1, 20, 0)
+            result = board_history.compare(limit=5)
+        self.assertEqual(result["date"], '2024-04-01')
+        self.assertEqual({start for _, start in self.source.calls[5:]}, {'20240329'})
+        frame = board_history.history('BK0001')
+        self.assertEqual(len(frame), 30)
+        self.assertEqual(frame['日期'].iloc[-1], '2024-04-01')
+        self.assertTrue(frame['日期'].is_unique)
+
+    def test_failed_board_keeps_stale_history(self):
+        board_history = IndustryBoardHistory()
+        board_history.compare(limit=3)
+        board_history._histories['BK0001'] = (board_history._histories['BK0001'][0], 0.0)
+        self.ak.stock_board_industry_hist_em.side_effect = RuntimeError('timeout')
+        self.assertEqual(board_history.compare(limit=3)["count"], 3)
+
+    def test_next_close_time(self):
+        self.assertEqual(next_close_time(datetime(2024, 3, 29, 10, 0)), datetime(2024, 3, 29, 15, 5).timestamp())
+        # 周五收盘后到下周一收盘
+        self.assertEqual(next_close_time(datetime(2024, 3, 29, 16, 0)), datetime(2024, 4, 1, 15, 5).timestamp())
+        self.assertEqual(next_close_time(datetime(2024, 3, 30, 10, 0)), datetime(2024, 4, 1, 15, 5).timestamp())
+
+    def test_analyzers_share_board_history(self):
+        board_history = IndustryBoardHistory()
+        first = IndustryAnalyzer(board_history=board_history).compare_industries(limit=4)
+        second = IndexIndustryAnalyzer(analyzer=None, board_history=board_history).compare_industries(limit=4)
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.source.calls), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存测试
+验证内容寻址的键、磁盘/Redis 后端与 TTL、按节点开关、工具调用消息的回放，以及命中统计
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+try:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_openai import ChatOpenAI
+    from langgraph.graph import END, START, MessagesState, StateGraph
+    from tradingagents.config.config_manager import token_tracker
+    from tradingagents.llm_adapters import ChatOpenAICached
+    from tradingagents.llm_adapters import response_cache
+    from tradingagents.llm_adapters.response_cache import (DiskCacheBackend, LLMResponseCache, RedisCacheBackend,
+                                                           set_llm_response_cache)
+    CACHE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ LLM响应缓存不可用: {e}")
+    CACHE_AVAILABLE = False
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+class FakeCompletions:
+    """替代 ChatOpenAI._generate，记录真实调用次数"""
+
+    def __init__(self, tool_call=False):
+        self.calls = 0
+        self.tool_call = tool_call
+
+    def __call__(self, llm, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.tool_call:
+            message = AIMessage(content="", tool_calls=[
+                {"name": "get_stock_market_data_unified", "args": {"ticker": "600000"}, "id": f"call_{self.calls}"}])
+        else:
+            message = AIMessage(content=f"报告 #{self.calls}: {messages[-1].content}",
+                                usage_metadata={"input_tokens": 120, "output_tokens": 30, "total_tokens": 150})
+        return ChatResult(generations=[ChatGeneration(message=message)],
+                          llm_output={"token_usage": {"prompt_tokens": 120, "completion_tokens": 30}})
+
+
+@unittest.skipUnless(CACHE_AVAILABLE, "LLM响应缓存不可用")
+class LLMResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.cache = LLMResponseCache(DiskCacheBackend(self.cache_dir), ttl=3600)
+        set_llm_response_cache(self.cache)
+        self.addCleanup(set_llm_response_cache, None)
+
+        self.fake = FakeCompletions()
+        patcher = mock.patch.object(ChatOpenAI, '_generate', autospec=True, side_effect=self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.llm = ChatOpenAICached(model="cache-test-model", api_key="test", base_url="http://llm.test/v1",
+                                    temperature=0.1)
+        self.messages = [SystemMessage(content="你是市场分析师"), HumanMessage(content="分析 600000")]
+
+    def test_repeat_prompt_hits_cache(self):
+        first = self.llm.invoke(self.messages)
+        second = self.llm.invoke(self.messages)
+        self.assertEqual(self.fake.calls, 1)
+        self.assertEqual(second.content, first.content)
+        self.assertIsNone(second.usage_metadata)
+        self.assertNotEqual(second.id, first.id)
+        self.assertEqual(self.cache.stats()["default"], {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_key_depends_on_model_temperature_and_tools(self):
+        self.llm.invoke(self.messages)
+        ChatOpenAICached(model="cache-test-model", api_key="test", base_url="http://llm.test/v1",
+                         temperature=0.7).invoke(self.messages)
+        ChatOpenAICached(model="cache-test-model-2", api_key="test", base_url="http://llm.test/v1",
+                         temperature=0.1).invoke(self.messages)
+
+        def get_price(ticker: str) -> str:
+            """Get the latest price."""
+            return ticker
+
+        self.llm.bind_tools([get_price]).invoke(self.messages)
+        self.llm.invoke(self.messages[:1] + [HumanMessage(content="分析 000001")])
+        self.assertEqual(self.fake.calls, 5)
+        self.llm.bind_tools([get_price]).invoke(self.messages)
+        self.assertEqual(self.fake.calls, 5)
+
+    def test_key_ignores_message_and_tool_call_ids(self):
+        call = {"name": "lookup", "args": {"symbol": "600000"}}
+        first = [HumanMessage(content="x", id="a"), AIMessage(content="", tool_calls=[{**call, "id": "call_1"}]),
+                 ToolMessage(content="data", tool_call_id="call_1", name="lookup")]
+        second = [HumanMessage(content="x", id="b"), AIMessage(content="", tool_calls=[{**call, "id": "call_2"}]),
+                  ToolMessage(content="data", tool_call_id="call_2", name="lookup")]
+        make_key = LLMResponseCache.make_key
+        self.assertEqual(make_key("p", "m", first, 0.1), make_key("p", "m", second, 0.1))
+        second[2] = ToolMessage(content="other", tool_call_id="call_2", name="lookup")
+        self.assertNotEqual(make_key("p", "m", first, 0.1), make_key("p", "m", second, 0.1))
+        # 会话参数不影响生成结果
+        self.assertEqual(make_key("p", "m", first, 0.1, session_id="s1"), make_key("p", "m", first, 0.1))
+
+    def test_tool_call_response_round_trip(self):
+        self.fake.tool_call = True
+        first = self.llm.invoke(self.messages)
+        second = self.llm.invoke(self.messages)
+        self.assertEqual(self.fake.calls, 1)
+        self.assertEqual(second.tool_calls, first.tool_calls)
+
+    def test_disk_ttl_expiry(self):
+        self.cache.ttl = 60
+        self.llm.invoke(self.messages)
+        with mock.patch.object(response_cache.time, 'time', return_value=time.time() + 120):
+            self.llm.invoke(self.messages)
+        self.assertEqual(self.fake.calls, 2)
+
+        backend = self.cache.backend
+        backend.set("ab" * 32, "{}", 1)
+        with mock.patch.object(response_cache.time, 'time', return_value=time.time() + 120):
+            self.assertGreaterEqual(backend.purge_expired(), 1)
+        self.assertIsNone(backend.get("ab" * 32))
+
+    def test_per_node_flags_and_ttls(self):
+        cache = LLMResponseCache(DiskCacheBackend(self.cache_dir), ttl=3600, nodes=["signal_processor"],
+                                 node_ttls={"SIGNAL_PROCESSOR": 5})
+        set_llm_response_cache(cache)
+        llm = self.llm
+
+        def market_analyst(state):
+            return {"messages": [llm.invoke(state["messages"])]}
+
+        graph = StateGraph(MessagesState)
+        graph.add_node("Market Analyst", market_analyst)
+        graph.add_edge(START, "Market Analyst")
+        graph.add_edge("Market Analyst", END)
+        graph = graph.compile()
+        graph.invoke({"messages": self.messages})
+        graph.invoke({"messages": self.messages})
+        self.assertEqual(self.fake.calls, 2)
+        self.assertNotIn("market_analyst", cache.stats())
+
+        config = {"metadata": {"llm_cache_node": "signal_processor"}}
+        with mock.patch.object(cache.backend, 'set', wraps=cache.backend.set) as backend_set:
+            llm.invoke(self.messages, config=config)
+            self.assertEqual(backend_set.call_args[0][2], 5)
+        llm.invoke(self.messages, config=config)
+        self.assertEqual(self.fake.calls, 3)
+        self.assertEqual(cache.stats()["signal_processor"]["hits"], 1)
+
+    def test_graph_node_name_is_used(self):
+        self.assertEqual(LLMResponseCache.node_name(mock.Mock(metadata={"langgraph_node": "Bull Researcher"})),
+                         "bull_researcher")
+        self.assertEqual(LLMResponseCache.node_name(None), "default")
+
+    def test_hits_recorded_with_token_tracking(self):
+        self.llm.invoke(self.messages)
+        self.llm.invoke(self.messages)
+        self.llm.invoke(self.messages)
+        stats = token_tracker.get_cache_statistics()["models"]["http://llm.test/v1/cache-test-model"]
+        self.assertGreaterEqual(stats["hits"], 2)
+        self.assertGreaterEqual(stats["saved_input_tokens"], 240)
+        self.assertGreaterEqual(stats["saved_output_tokens"], 60)
+        self.assertIn("default", stats["nodes"])
+
+    def test_backend_failure_falls_back_to_generation(self):
+        with mock.patch.object(self.cache.backend, 'get', side_effect=OSError("disk full")), \
+                mock.patch.object(self.cache.backend, 'set', side_effect=OSError("disk full")):
+            self.assertTrue(self.llm.invoke(self.messages).content)
+        self.assertEqual(self.fake.calls, 1)
+
+    def test_disabled_cache_calls_model(self):
+        set_llm_response_cache(None)
+        self.llm.invoke(self.messages)
+        self.llm.invoke(self.messages)
+        self.assertEqual(self.fake.calls, 2)
+
+    @unittest.skipUnless(FAKEREDIS_AVAILABLE, "fakeredis 不可用")
+    def test_redis_backend(self):
+        client = fakeredis.FakeRedis()
+        set_llm_response_cache(LLMResponseCache(RedisCacheBackend(client), ttl=120))
+        self.llm.invoke(self.messages)
+        self.llm.invoke(self.messages)
+        self.assertEqual(self.fake.calls, 1)
+        keys = client.keys("llm_cache:*")
+        self.assertEqual(len(keys), 1)
+        self.assertTrue(0 < client.ttl(keys[0]) <= 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
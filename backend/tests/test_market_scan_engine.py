@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+市场扫描引擎测试
+验证并发扫描的结果、批量评分、进度推送、取消和限速
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.market_scan_engine import MarketScanEngine, RateLimiter
+from app.analysis.task_manager import TaskCancelledException
+
+
+class FakeAnalyzer:
+    """按股票代码生成固定评分的分析器"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def fetch_scan_data(self, stock_code, market_type='A'):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if stock_code == 'bad':
+            raise ValueError("数据为空")
+        return int(stock_code), {'股票名称': stock_code}
+
+    def quick_analyze_batch(self, frames, stock_infos=None, market_type='A'):
+        self.batches.append(len(frames))
+        return {code: {'stock_code': code, 'score': value % 100} for code, value in frames.items()}
+
+
+class TestMarketScanEngine(unittest.TestCase):
+    """市场扫描引擎测试类"""
+
+    def test_scan_filters_and_sorts(self):
+        """测试扫描结果过滤与排序，单只失败不影响整体"""
+        engine = MarketScanEngine(FakeAnalyzer(), max_workers=4)
+        codes = [f"{i:06d}" for i in range(50)] + ['bad']
+        results = engine.scan(codes, min_score=40)
+        scores = [r['score'] for r in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual(len(results), 10)
+
+    def test_scores_in_batches(self):
+        """测试取回的行情按批评分，而不是逐只评分"""
+        analyzer = FakeAnalyzer()
+        engine = MarketScanEngine(analyzer, max_workers=4, score_batch_size=20)
+        results = engine.scan([f"{i:06d}" for i in range(50)], min_score=0)
+        self.assertEqual(len(results), 50)
+        self.assertEqual(sum(analyzer.batches), 50)
+        self.assertLessEqual(len(analyzer.batches), 3)
+
+    def test_custom_analyze_fn(self):
+        """测试指定 analyze_fn 时逐只分析"""
+        analyzer = FakeAnalyzer()
+        engine = MarketScanEngine(analyzer, max_workers=2)
+        results = engine.scan(['000001', '000002'], min_score=0,
+                              analyze_fn=lambda code, market_type: {'stock_code': code, 'score': 70})
+        self.assertEqual(len(results), 2)
+        self.assertEqual(analyzer.batches, [])
+
+    def test_progress_pushed_to_task(self):
+        """测试部分结果和吞吐量写入任务"""
+        task_manager = MagicMock()
+        task_manager.is_cancelled.return_value = False
+        engine = MarketScanEngine(FakeAnalyzer(), task_manager=task_manager, max_workers=2, progress_interval=0)
+        engine.scan([f"{i:06d}" for i in range(5)], min_score=0, task_id='t1')
+
+        last_result = task_manager.update_task.call_args.kwargs['result']
+        self.assertEqual(last_result['processed'], 5)
+        self.assertEqual(len(last_result['partial_results']), 5)
+        self.assertIn('throughput', last_result)
+        self.assertIn('eta_seconds', last_result)
+
+    def test_cancel_stops_submission(self):
+        """测试取消后不再分析剩余股票"""
+        analyzer = FakeAnalyzer(delay=0.01)
+        task_manager = MagicMock()
+        task_manager.is_cancelled.return_value = True
+        engine = MarketScanEngine(analyzer, task_manager=task_manager, max_workers=2, progress_interval=0)
+
+        with self.assertRaises(TaskCancelledException):
+            engine.scan([f"{i:06d}" for i in range(200)], task_id='t1')
+        self.assertLess(analyzer.calls, 200)
+        # 取消检查只读取本地标记，不再轮询 Redis
+        task_manager.get_task.assert_not_called()
+        task_manager.release_cancel_event.assert_called_once_with('t1')
+
+    def test_rate_limiter(self):
+        """测试令牌桶限速"""
+        limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内存缓存测试
+验证 Cache 内存模式的过期时间、容量上限、LRU淘汰和统计信息
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.core.cache import Cache, MemoryCache
+
+
+class TestMemoryCache(unittest.TestCase):
+    """内存缓存测试类"""
+
+    def test_expire(self):
+        """测试过期时间生效"""
+        cache = MemoryCache()
+        cache.set('a', 1, expire=0.05)
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.06)
+        self.assertIsNone(cache.get('a'))
+        self.assertFalse(cache.exists('a'))
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+
+    def test_lru_by_entries(self):
+        """测试按条目数LRU淘汰"""
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_lru_by_bytes(self):
+        """测试按近似字节数淘汰"""
+        cache = MemoryCache(max_bytes=100)
+        cache.set('a', 'x' * 40)
+        cache.set('b', 'y' * 40)
+        cache.set('c', 'z' * 40)
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['bytes'], 100)
+        self.assertIsNone(cache.get('a'))
+        # 单条超过上限的值不缓存
+        cache.set('d', 'w' * 200)
+        self.assertIsNone(cache.get('d'))
+
+    def test_expired_entries_evicted_first(self):
+        """测试容量已满时先清理已过期条目，覆盖后的新过期时间不受旧记录影响"""
+        cache = MemoryCache(max_entries=3)
+        cache.set('short', 1, expire=0.05)
+        cache.set('renewed', 2, expire=0.05)
+        cache.set('renewed', 2, expire=60)
+        cache.set('keep', 3)
+        time.sleep(0.06)
+        cache.set('new', 4)
+        stats = cache.get_stats()
+        self.assertEqual(stats['expirations'], 1)
+        self.assertEqual(stats['evictions'], 0)
+        self.assertEqual(cache.get('renewed'), 2)
+        self.assertEqual(cache.get('keep'), 3)
+
+    def test_cache_info(self):
+        """测试 Cache 内存模式的统计信息和 ttl 兼容参数"""
+        cache = Cache()
+        cache.set('k', {'v': 1}, ttl=60)
+        self.assertEqual(cache.get('k'), {'v': 1})
+        self.assertIsNone(cache.get('missing'))
+        info = cache.get_cache_info()
+        self.assertEqual(info['type'], 'memory')
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['misses'], 1)
+        self.assertEqual(info['size'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+蒙特卡洛情景模拟测试
+验证路径矩阵的统计性质、种子可复现、分位数区间与目标概率、请求参数校验与上限，以及 ScenarioPredictor 的输出结构
+
+运行基准测试（10000 条路径 × 250 天）:
+    python tests/test_monte_carlo.py --benchmark
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.monte_carlo import (historical_log_returns, simulate_log_paths, percentile_bands,
+                                      target_probability)
+from app.analysis import scenario_predictor
+from app.analysis.scenario_predictor import ScenarioPredictor, limit_simulation_args
+
+
+def make_price_frame(days=250, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, days)))
+    return pd.DataFrame({
+        "close": close,
+        "MA20": pd.Series(close).rolling(20, min_periods=1).mean(),
+        "BB_upper": close * 1.08,
+        "BB_lower": close * 0.92,
+    })
+
+
+class MonteCarloTest(unittest.TestCase):
+
+    def setUp(self):
+        self.returns = np.random.default_rng(1).normal(0.001, 0.02, 500)
+
+    def test_gbm_matches_historical_moments(self):
+        log_paths = simulate_log_paths(self.returns, days=100, paths=20000, seed=7)
+        self.assertEqual(log_paths.shape, (20000, 101))
+        self.assertTrue(np.all(log_paths[:, 0] == 0))
+        steps = np.diff(log_paths, axis=1)
+        self.assertAlmostEqual(steps.mean(), self.returns.mean(), delta=2e-4)
+        self.assertAlmostEqual(steps.std(), self.returns.std(ddof=1), delta=2e-4)
+
+    def test_bootstrap_draws_from_history(self):
+        log_paths = simulate_log_paths(self.returns, days=20, paths=500, method='bootstrap', seed=3)
+        steps = np.diff(log_paths, axis=1)
+        self.assertTrue(np.isin(np.round(steps, 12), np.round(self.returns, 12)).all())
+
+    def test_seed_is_reproducible(self):
+        first = simulate_log_paths(self.returns, days=30, paths=100, seed=42)
+        np.testing.assert_array_equal(first, simulate_log_paths(self.returns, days=30, paths=100, seed=42))
+        self.assertFalse(np.array_equal(first, simulate_log_paths(self.returns, days=30, paths=100, seed=43)))
+
+    def test_bands_and_probabilities(self):
+        log_paths = simulate_log_paths(self.returns, days=60, paths=10000, seed=0)
+        bands = percentile_bands(log_paths)
+        self.assertEqual(sorted(bands), [5, 25, 50, 75, 95])
+        self.assertTrue(np.all(bands[5] <= bands[50]) and np.all(bands[50] <= bands[95]))
+
+        final, touch = target_probability(log_paths, bands[75][-1])
+        self.assertAlmostEqual(final, 0.25, delta=0.01)
+        self.assertGreaterEqual(touch, final)
+        final, touch = target_probability(log_paths, bands[5][-1])
+        self.assertAlmostEqual(final, 0.05, delta=0.01)
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            simulate_log_paths(self.returns, days=10, method='garch')
+        with self.assertRaises(ValueError):
+            simulate_log_paths([np.nan, 0.01], days=10)
+
+    def test_historical_log_returns_skips_bad_prices(self):
+        returns = historical_log_returns([10.0, np.nan, 11.0, 0.0, 12.1])
+        np.testing.assert_allclose(returns, np.log([1.1, 1.1]))
+
+
+class ScenarioSimulationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.predictor = ScenarioPredictor.__new__(ScenarioPredictor)
+        self.df = make_price_frame()
+
+    def test_scenario_paths_end_at_targets(self):
+        result = self.predictor._calculate_scenarios(self.df, 60, paths=5000, seed=1)
+        for name in ('optimistic', 'neutral', 'pessimistic'):
+            scenario = result[name]
+            self.assertEqual(len(scenario['path']), 61)
+            self.assertEqual(list(scenario['path'].values())[0], result['current_price'])
+            final_median = list(scenario['path'].values())[-1]
+            self.assertAlmostEqual(final_median / scenario['target_price'], 1, delta=0.02)
+            self.assertEqual(sorted(scenario['bands']), ['p25', 'p5', 'p50', 'p75', 'p95'])
+            self.assertTrue(0 <= scenario['probability'] <= scenario['touch_probability'] <= 1)
+        self.assertEqual(result['simulation']['paths'], 5000)
+
+    def test_seeded_scenarios_are_reproducible(self):
+        first = self.predictor._calculate_scenarios(self.df, 30, method='bootstrap', paths=1000, seed=5)
+        second = self.predictor._calculate_scenarios(self.df, 30, method='bootstrap', paths=1000, seed=5)
+        self.assertEqual(first, second)
+
+
+    def test_simulation_args_are_limited(self):
+        self.assertEqual(limit_simulation_args(30, 1000), (30, 1000, None, None))
+        self.assertEqual(limit_simulation_args('30'), (30, None, None, None))
+        self.assertEqual(limit_simulation_args(30, None, 'bootstrap', '7'), (30, None, 'bootstrap', 7))
+        self.assertEqual(limit_simulation_args(10 ** 6, 10 ** 9)[:2],
+                         (scenario_predictor.SCENARIO_MAX_DAYS, scenario_predictor.SCENARIO_SIMULATION_MAX_PATHS))
+        for days, paths in ((0, 100), (-5, 100), ('abc', 100), (30, 0), (30, -1), (None, 100), (True, 100)):
+            with self.assertRaises(ValueError):
+                limit_simulation_args(days, paths)
+        for method, seed in (('normal', None), ('GBM', None), (['gbm'], None),
+                             (None, -1), (None, 'abc'), (None, 1.5), (None, True), (None, [1])):
+            with self.assertRaises(ValueError):
+                limit_simulation_args(30, 100, method, seed)
+
+        with mock.patch.object(scenario_predictor, 'SCENARIO_SIMULATION_MAX_PATHS', 2000), \
+                mock.patch.object(scenario_predictor, 'SCENARIO_MAX_DAYS', 90):
+            result = self.predictor._calculate_scenarios(self.df, 10 ** 6, paths=10 ** 9, seed=1)
+        self.assertEqual(result['simulation']['paths'], 2000)
+        self.assertEqual(len(result['neutral']['path']), 91)
+
+
+def benchmark(paths=10000, days=250):
+    returns = np.random.default_rng(0).normal(0, 0.02, 500)
+    for method in ('gbm', 'bootstrap'):
+        start = time.perf_counter()
+        log_paths = simulate_log_paths(returns, days, paths=paths, method=method, seed=0)
+        simulated = time.perf_counter()
+        percentile_bands(log_paths)
+        target_probability(log_paths, 0.15)
+        done = time.perf_counter()
+        print(f"📊 {method}: {paths} 条路径 × {days} 天，模拟 {(simulated - start) * 1000:.1f}ms，"
+              f"分位数与概率 {(done - simulated) * 1000:.1f}ms")
+
+    predictor = ScenarioPredictor.__new__(ScenarioPredictor)
+    start = time.perf_counter()
+    predictor._calculate_scenarios(make_price_frame(), days, paths=paths, seed=0)
+    print(f"   三种情景合计: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新闻近似重复检测测试
+验证 MinHash-LSH 索引的识别效果、持久化，以及在新闻聚合器和 NewsFetcher 中的使用
+"""
+
+import json
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+from tradingagents.utils.news_dedup import NearDuplicateIndex
+
+ORIGINAL = "央行宣布下调存款准备金率0.5个百分点，释放长期资金约1万亿元，支持实体经济发展"
+REPOST = "【快讯】央行宣布下调存款准备金率0.5个百分点，释放长期资金约1万亿元，以支持实体经济发展。"
+UNRELATED = "苹果公司发布新款iPhone，起售价较上一代上调100美元，市场反应平淡"
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+
+    def test_detects_repost_and_keeps_unrelated(self):
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.check_and_add('a', ORIGINAL))
+        self.assertEqual(index.check_and_add('b', REPOST), 'a')
+        self.assertIsNone(index.check_and_add('c', UNRELATED))
+        self.assertEqual(len(index), 2)
+
+    def test_english_title_variants(self):
+        index = NearDuplicateIndex()
+        index.add(1, "Apple shares rise after record iPhone sales in the holiday quarter")
+        key, score = index.query("Apple Shares Rise After Record iPhone Sales in Holiday Quarter - Reuters")
+        self.assertEqual(key, 1)
+        self.assertGreaterEqual(score, index.threshold)
+
+    def test_empty_text_is_ignored(self):
+        index = NearDuplicateIndex()
+        self.assertIsNone(index.check_and_add('a', '  ，。 '))
+        self.assertEqual(len(index), 0)
+
+    def test_persistence_and_prune(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'index.npz')
+            index = NearDuplicateIndex()
+            index.add('old', UNRELATED, timestamp=100.0)
+            index.add('new', ORIGINAL)
+            self.assertEqual(index.prune(before=1000.0), 1)
+            index.save(path)
+
+            loaded = NearDuplicateIndex.load(path)
+            self.assertEqual(len(loaded), 1)
+            self.assertEqual(loaded.query(REPOST)[0], 'new')
+            self.assertIsNone(loaded.query(UNRELATED)[0])
+
+            # 保存文件不含 pickle 对象，可在 allow_pickle=False 下读取
+            with np.load(path, allow_pickle=False) as data:
+                self.assertEqual(data['keys'].dtype.kind, 'U')
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class AggregatorDedupTest(unittest.TestCase):
+
+    def test_realtime_aggregator_removes_near_duplicates(self):
+        from tradingagents.dataflows.realtime_news_utils import NewsItem, RealtimeNewsAggregator
+
+        def item(title, source):
+            return NewsItem(title=title, content='', source=source, publish_time=datetime.now(),
+                            url='', urgency='low', relevance_score=0.5)
+
+        news = [item(ORIGINAL, '财联社'), item(REPOST, '东方财富'), item(UNRELATED, '新浪财经')]
+        unique = RealtimeNewsAggregator()._deduplicate_news(news)
+        self.assertEqual([n.source for n in unique], ['财联社', '新浪财经'])
+
+    def test_news_fetcher_index_persists_across_runs(self):
+        from app.analysis.news_fetcher import NewsFetcher
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            first = NewsFetcher(save_dir=tmp_dir)
+            first._fetch_from_source = lambda source: [
+                {'title': ORIGINAL[:20], 'content': ORIGINAL, 'date': today, 'time': '09:00:00', 'source': source}]
+            first.fetch_and_save(sources=['cls'])
+
+            # 新实例从索引文件恢复，转载版本（内容哈希不同）被识别为重复
+            second = NewsFetcher(save_dir=tmp_dir)
+            second._fetch_from_source = lambda source: [
+                {'title': REPOST[:20], 'content': REPOST, 'date': today, 'time': '09:05:00', 'source': source},
+                {'title': UNRELATED[:20], 'content': UNRELATED, 'date': today, 'time': '09:10:00', 'source': source}]
+            second.fetch_and_save(sources=['global_em'])
+
+            news = second.get_latest_news(days=1)
+            self.assertEqual(sorted(n['content'] for n in news), sorted([ORIGINAL, UNRELATED]))
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_rebuilt_index_keeps_item_time(self):
+        from app.analysis.news_fetcher import NewsFetcher
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            fetched = datetime.now() - timedelta(days=2)
+            first = NewsFetcher(save_dir=tmp_dir)
+            first._fetch_from_source = lambda source: [
+                {'title': ORIGINAL[:20], 'content': ORIGINAL, 'date': fetched.strftime('%Y-%m-%d'),
+                 'time': '09:00:00', 'source': source}]
+            first.fetch_and_save(sources=['cls'])
+            filename = first.get_news_filename(fetched)
+            with open(filename, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            saved[0]['fetch_time'] = fetched.strftime('%Y-%m-%d %H:%M:%S')
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(saved, f)
+            os.remove(first.near_dup_index_path)
+
+            # 索引文件缺失时从已保存的新闻重建，登记时间沿用新闻自身的获取时间
+            second = NewsFetcher(save_dir=tmp_dir)
+            self.assertEqual(len(second.near_dup_index), 1)
+            stamped = second.near_dup_index._timestamps[saved[0]['hash']]
+            self.assertAlmostEqual(stamped, fetched.replace(microsecond=0).timestamp(), delta=1)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
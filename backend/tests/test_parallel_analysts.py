@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行分析师分支测试
+验证分析师分支从 START 并发执行并在下游节点前汇合、各分支的消息互不交错，以及分支耗时的记录
+"""
+
+import os
+import sys
+import time
+import unittest
+from typing import Annotated, Dict
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+try:
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langchain_core.tools import tool
+    from langgraph.graph import END, START, MessagesState, StateGraph
+    from langgraph.prebuilt import ToolNode
+    from tradingagents.graph.analyst_branches import create_analyst_branch
+    BRANCHES_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ 分析师分支不可用: {e}")
+    BRANCHES_AVAILABLE = False
+
+
+def merge_timings(left, right):
+    return {**(left or {}), **(right or {})}
+
+
+if BRANCHES_AVAILABLE:
+    class BranchState(MessagesState):
+        company_of_interest: str
+        market_report: str
+        news_report: str
+        fundamentals_report: str
+        analyst_timings: Annotated[Dict[str, float], merge_timings]
+
+
+def make_analyst(analyst_type, report_key, seen, delay=0.2):
+    """先调用一次本分析师的工具，拿到工具结果后写报告"""
+    tool_name = f"lookup_{analyst_type}"
+
+    def node(state):
+        seen.setdefault(analyst_type, []).append([m.type for m in state["messages"]])
+        tool_messages = [m for m in state["messages"] if isinstance(m, ToolMessage)]
+        time.sleep(delay)
+        if not tool_messages:
+            call = {"name": tool_name, "args": {"symbol": state["company_of_interest"]}, "id": f"call_{analyst_type}"}
+            return {"messages": [AIMessage(content="", tool_calls=[call])]}
+        if any(m.name != tool_name for m in tool_messages):
+            raise AssertionError(f"{analyst_type} 分支看到了其他分支的工具消息")
+        return {"messages": [AIMessage(content="done")], report_key: f"{analyst_type}:{tool_messages[0].content}"}
+
+    @tool(tool_name)
+    def lookup(symbol: str) -> str:
+        """Look up data for a symbol."""
+        return f"{symbol}-{analyst_type}"
+
+    return node, ToolNode([lookup])
+
+
+def should_continue_for(analyst_type):
+    def should_continue(state):
+        last_message = state["messages"][-1]
+        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
+            return f"tools_{analyst_type}"
+        return f"Msg Clear {analyst_type.capitalize()}"
+    return should_continue
+
+
+@unittest.skipUnless(BRANCHES_AVAILABLE, "分析师分支不可用")
+class ParallelAnalystsTest(unittest.TestCase):
+
+    def build(self, analysts, seen, delay=0.2):
+        joined = {}
+        workflow = StateGraph(BranchState)
+        names = []
+        for analyst_type, report_key in analysts.items():
+            node, tools = make_analyst(analyst_type, report_key, seen, delay)
+            name = f"{analyst_type.capitalize()} Analyst"
+            workflow.add_node(name, create_analyst_branch(
+                analyst_type, node, tools, should_continue_for(analyst_type), BranchState))
+            workflow.add_edge(START, name)
+            names.append(name)
+
+        def bull_researcher(state):
+            joined.update({key: state[key] for key in analysts.values()})
+            joined["messages"] = [m.type for m in state["messages"]]
+            return {}
+
+        workflow.add_node("Bull Researcher", bull_researcher)
+        workflow.add_edge(names, "Bull Researcher")
+        workflow.add_edge("Bull Researcher", END)
+        return workflow.compile(), joined
+
+    def setUp(self):
+        self.analysts = {"market": "market_report", "news": "news_report", "fundamentals": "fundamentals_report"}
+        self.initial = {"messages": [("human", "600000")], "company_of_interest": "600000",
+                        "market_report": "", "news_report": "", "fundamentals_report": "", "analyst_timings": {}}
+
+    def test_branches_run_concurrently_and_join(self):
+        seen = {}
+        graph, joined = self.build(self.analysts, seen, delay=0.2)
+        start = time.perf_counter()
+        final_state = graph.invoke(self.initial)
+        elapsed = time.perf_counter() - start
+
+        # 每个分支两轮 LLM（工具调用 + 报告）共 0.4s，串行需要 1.2s
+        self.assertLess(elapsed, 1.0)
+        for analyst_type, report_key in self.analysts.items():
+            self.assertEqual(final_state[report_key], f"{analyst_type}:600000-{analyst_type}")
+            self.assertEqual(joined[report_key], final_state[report_key])
+        self.assertEqual(sorted(final_state["analyst_timings"]), sorted(self.analysts))
+        self.assertTrue(all(t >= 0.4 for t in final_state["analyst_timings"].values()))
+
+    def test_branch_messages_stay_isolated(self):
+        seen = {}
+        graph, joined = self.build(self.analysts, seen, delay=0.05)
+        graph.invoke(self.initial)
+
+        for analyst_type in self.analysts:
+            # 第一轮只有初始消息，第二轮是 初始消息 + 本分支的工具调用与工具结果
+            self.assertEqual(seen[analyst_type], [["human"], ["human", "ai", "tool"]])
+        # 分支消息不写回主图
+        self.assertEqual(joined["messages"], ["human"])
+
+
+if __name__ == '__main__':
+    unittest.main()
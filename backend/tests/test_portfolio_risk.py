@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+组合风险测试
+验证收益对齐、协方差风险指标（波动率、VaR/CVaR、风险贡献），
+以及 RiskMonitor 并发获取持仓、批量评估与逐只分析结果一致
+
+运行基准测试（100 只持仓）:
+    python tests/test_portfolio_risk.py --benchmark
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis import market_scan_engine
+from app.analysis.market_scan_engine import RateLimiter
+from app.analysis.portfolio_risk import align_returns, portfolio_risk_metrics
+from app.analysis.risk_monitor import RiskMonitor
+
+try:
+    os.environ.setdefault('OPENAI_API_KEY', 'test')
+    from app.core.cache import Cache
+    from app.analysis.stock_analyzer import StockAnalyzer
+    ANALYZER_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ StockAnalyzer 不可用: {e}")
+    ANALYZER_AVAILABLE = False
+
+
+def make_frames(count=5, days=260, seed=0, common=0.015):
+    """生成带共同因子的随机行情，用于产生相关的收益"""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2023-01-02', periods=days)
+    market = rng.normal(0, common, days)
+    frames = {}
+    for i in range(count):
+        returns = market * rng.uniform(0.5, 1.5) + rng.normal(0, 0.01 * (i % 5 + 1), days)
+        close = 10 * np.exp(np.cumsum(returns))
+        frames[f"{600000 + i}"] = pd.DataFrame({
+            'date': dates,
+            'open': (close * (1 + rng.normal(0, 0.005, days))).round(2),
+            'close': close.round(2),
+            'high': (close * (1 + abs(rng.normal(0, 0.01, days)))).round(2),
+            'low': (close * (1 - abs(rng.normal(0, 0.01, days)))).round(2),
+            'volume': rng.integers(1000, 100000, days).astype(float)
+        })
+    return frames
+
+
+class FakeAnalyzer:
+    """只提供行情与基本信息的分析器，记录并发请求数"""
+
+    def __init__(self, frames, delay=0.0):
+        self.frames = frames
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_stock_data(self, stock_code, market_type='A'):
+        with self._lock:
+            self.calls.append(stock_code)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if stock_code not in self.frames:
+            raise ValueError(f"未找到 {stock_code}")
+        return self.frames[stock_code].copy()
+
+    def get_stock_info(self, stock_code):
+        return {'行业': '银行' if int(stock_code) % 2 else '医药'}
+
+
+class PortfolioRiskMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.frames = make_frames()
+        self.returns = align_returns(self.frames)
+        self.weights = np.array([0.4, 0.3, 0.1, 0.1, 0.1])
+
+    def test_align_returns_fills_suspension(self):
+        frames = dict(self.frames)
+        code = next(iter(frames))
+        # 停牌两天（缺少K线）：沿用前收盘价，收益为0
+        frames[code] = frames[code].drop(index=[100, 101])
+        returns = align_returns(frames, lookback=None)
+        self.assertEqual(len(returns), 259)
+        self.assertEqual(returns[code].iloc[100], 0.0)
+
+        # 新上市的股票只保留共同区间
+        frames[code] = self.frames[code].iloc[200:]
+        self.assertEqual(len(align_returns(frames, lookback=None)), 59)
+        self.assertEqual(len(align_returns(self.frames, lookback=60)), 60)
+
+    def test_volatility_and_contributions(self):
+        metrics = portfolio_risk_metrics(self.returns, self.weights * 10)
+        expected = np.std(self.returns.to_numpy() @ self.weights, ddof=1) * 100
+        self.assertAlmostEqual(metrics['daily_volatility'], expected, places=8)
+        self.assertAlmostEqual(metrics['annual_volatility'], expected * np.sqrt(252), places=8)
+
+        holdings = metrics['holdings']
+        self.assertAlmostEqual(sum(h['weight'] for h in holdings), 1.0)
+        self.assertAlmostEqual(sum(h['risk_contribution_percent'] for h in holdings), 100.0)
+        self.assertAlmostEqual(sum(h['risk_contribution'] for h in holdings), metrics['annual_volatility'])
+        self.assertGreater(metrics['diversification_ratio'], 1.0)
+
+        corr = np.array(metrics['correlation']['matrix'])
+        np.testing.assert_allclose(corr, self.returns.corr().to_numpy(), atol=1e-4)
+
+    def test_marginal_risk_matches_finite_difference(self):
+        base = portfolio_risk_metrics(self.returns, self.weights)
+        eps = 1e-6
+        bumped = self.weights.copy()
+        bumped[0] += eps
+        cov = self.returns.cov().to_numpy()
+        sigma = lambda w: np.sqrt(w @ cov @ w) * np.sqrt(252) * 100
+        numeric = (sigma(bumped) - sigma(self.weights)) / eps
+        self.assertAlmostEqual(base['holdings'][0]['marginal_risk'], numeric, places=3)
+
+    def test_var_and_cvar(self):
+        metrics = portfolio_risk_metrics(self.returns, self.weights, confidence=0.95)
+        portfolio = self.returns.to_numpy() @ self.weights * 100
+        historical = metrics['var']['historical']
+        self.assertAlmostEqual(historical['var'], -np.quantile(portfolio, 0.05))
+        self.assertGreaterEqual(historical['cvar'], historical['var'])
+
+        parametric = metrics['var']['parametric']
+        sigma = metrics['daily_volatility']
+        self.assertAlmostEqual(parametric['var'], 1.6448536 * sigma - portfolio.mean(), places=5)
+        self.assertGreater(parametric['cvar'], parametric['var'])
+        higher = portfolio_risk_metrics(self.returns, self.weights, confidence=0.99)
+        self.assertGreater(higher['var']['parametric']['var'], parametric['var'])
+
+    def test_insufficient_data(self):
+        with self.assertRaises(ValueError):
+            portfolio_risk_metrics(self.returns.iloc[:1], self.weights)
+
+
+class RiskMonitorPortfolioTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(market_scan_engine, '_rate_limiters', {'akshare': RateLimiter(0)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.frames = make_frames(count=6)
+        self.portfolio = [{'stock_code': code, 'weight': i + 1} for i, code in enumerate(self.frames)]
+
+    def test_holdings_fetched_once_and_concurrently(self):
+        analyzer = FakeAnalyzer(self.frames, delay=0.05)
+        result = RiskMonitor(analyzer).analyze_portfolio_risk(self.portfolio)
+        self.assertEqual(sorted(analyzer.calls), sorted(self.frames))
+        self.assertGreater(analyzer.max_active, 1)
+
+        self.assertEqual(list(result['stock_risks']), list(self.frames))
+        metrics = result['portfolio_metrics']
+        self.assertEqual(metrics['excluded'], [])
+        self.assertEqual([h['weight'] for h in metrics['holdings']], [i / 21 for i in range(1, 7)])
+        self.assertEqual(result['risk_concentration']['max_industry'], '银行')
+
+    def test_failed_holding_is_excluded(self):
+        portfolio = self.portfolio + [{'stock_code': '000000', 'weight': 1}]
+        result = RiskMonitor(FakeAnalyzer(self.frames)).analyze_portfolio_risk(portfolio)
+        self.assertIn('error', result['stock_risks']['000000'])
+        self.assertEqual(result['portfolio_metrics']['excluded'], ['000000'])
+        self.assertEqual(len(result['portfolio_metrics']['holdings']), 6)
+
+    def test_correlated_portfolio_alert(self):
+        frames = make_frames(count=3, common=0.05)
+        portfolio = [{'stock_code': code} for code in frames]
+        result = RiskMonitor(FakeAnalyzer(frames)).analyze_portfolio_risk(portfolio)
+        self.assertIn('correlation', [alert['type'] for alert in result['alerts']])
+
+    @unittest.skipUnless(ANALYZER_AVAILABLE, "StockAnalyzer 不可用")
+    def test_batch_assessment_matches_single_stock(self):
+        analyzer = StockAnalyzer(Cache())
+        analyzer.get_stock_data = FakeAnalyzer(self.frames).get_stock_data
+        monitor = RiskMonitor(analyzer)
+        assessed = monitor._assess_holdings({code: analyzer.get_stock_data(code) for code in self.frames})
+        for code in self.frames:
+            single = monitor.analyze_stock_risk(code)
+            self.assertEqual(assessed[code]['total_risk_score'], single['total_risk_score'])
+            self.assertEqual(assessed[code]['alerts'], single['alerts'])
+
+
+def benchmark(count=100):
+    with mock.patch.object(market_scan_engine, '_rate_limiters', {'akshare': RateLimiter(0)}):
+        frames = make_frames(count=count)
+        analyzer = FakeAnalyzer(frames, delay=0.02)
+        portfolio = [{'stock_code': code} for code in frames]
+        start = time.perf_counter()
+        result = RiskMonitor(analyzer).analyze_portfolio_risk(portfolio)
+        elapsed = time.perf_counter() - start
+    print(f"📊 {count} 只持仓（每只行情请求 20ms）: {elapsed * 1000:.0f}ms，"
+          f"串行请求下限 {count * 20}ms")
+    print(f"   组合年化波动率 {result['portfolio_metrics']['annual_volatility']:.2f}%")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+前复权价格计算测试
+验证向量化实现与原逐行循环实现结果一致，并支持多只股票批量复权
+
+运行基准测试（10年以上日线）:
+    python tests/test_price_adjustment.py --benchmark
+"""
+
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+from tradingagents.dataflows.price_adjustment import forward_adjust_prices
+
+
+def make_daily_frame(days=250, ts_code='600000.SH', seed=0):
+    """生成 Tushare daily 接口结构的除权行情（含一次除权跳空）"""
+    rng = np.random.default_rng(seed)
+    pct = rng.normal(0, 2, days).round(2)
+    close = 10 * np.cumprod(1 + pct / 100)
+    # 模拟除权：除权日之后的原始价格整体下移，但 pct_chg 仍为连续涨跌幅
+    close[days // 2:] *= 0.8
+    dates = pd.bdate_range('2010-01-04', periods=days).strftime('%Y%m%d')
+    return pd.DataFrame({
+        'ts_code': ts_code,
+        'trade_date': dates,
+        'open': (close * 0.995).round(2),
+        'high': (close * 1.01).round(2),
+        'low': (close * 0.99).round(2),
+        'close': close.round(2),
+        'pct_chg': pct,
+    }).iloc[::-1].reset_index(drop=True)  # Tushare 按日期倒序返回
+
+
+def loop_forward_adjust(data):
+    """原 TushareProvider._calculate_forward_adjusted_prices 的逐行实现，作为对照"""
+    adjusted_data = data.copy().sort_values('trade_date').reset_index(drop=True)
+    for col in ('close', 'open', 'high', 'low'):
+        adjusted_data[f'{col}_raw'] = adjusted_data[col].copy()
+    adjusted_closes = [float(adjusted_data.iloc[-1]['close'])]
+    for i in range(len(adjusted_data) - 2, -1, -1):
+        pct_change = float(adjusted_data.iloc[i + 1]['pct_chg']) / 100.0
+        adjusted_closes.insert(0, adjusted_closes[0] / (1 + pct_change))
+    adjusted_data['close'] = adjusted_closes
+    for i in range(len(adjusted_data)):
+        if adjusted_data.iloc[i]['close_raw'] != 0:
+            ratio = adjusted_data.iloc[i]['close'] / adjusted_data.iloc[i]['close_raw']
+            for col in ('open', 'high', 'low'):
+                adjusted_data.iloc[i, adjusted_data.columns.get_loc(col)] = adjusted_data.iloc[i][f'{col}_raw'] * ratio
+    adjusted_data['price_type'] = 'forward_adjusted'
+    return adjusted_data
+
+
+class ForwardAdjustTest(unittest.TestCase):
+
+    def assert_frames_close(self, left, right):
+        self.assertEqual(list(left.columns), list(right.columns))
+        for col in ('open', 'high', 'low', 'close'):
+            np.testing.assert_allclose(left[col].to_numpy(float), right[col].to_numpy(float), rtol=1e-10)
+        pd.testing.assert_series_equal(left['trade_date'], right['trade_date'])
+
+    def test_matches_loop_implementation(self):
+        df = make_daily_frame(300)
+        self.assert_frames_close(forward_adjust_prices(df), loop_forward_adjust(df))
+
+    def test_price_series_is_continuous(self):
+        df = make_daily_frame(300)
+        result = forward_adjust_prices(df)
+        # 前复权后收盘价的日涨跌幅与 pct_chg 一致，除权跳空消失
+        returns = result['close'].pct_change().iloc[1:] * 100
+        np.testing.assert_allclose(returns.to_numpy(), result['pct_chg'].iloc[1:].to_numpy(), atol=1e-9)
+        self.assertEqual(result['close'].iloc[-1], result['close_raw'].iloc[-1])
+
+    def test_zero_close_rows_keep_raw_prices(self):
+        df = make_daily_frame(20)
+        df.loc[5, 'close'] = 0.0
+        result = forward_adjust_prices(df)
+        row = result[result['close_raw'] == 0].iloc[0]
+        self.assertEqual(row['open'], row['open_raw'])
+        self.assert_frames_close(result, loop_forward_adjust(df))
+
+    def test_batch_matches_per_symbol(self):
+        frames = [make_daily_frame(200 + i * 17, ts_code=f'60000{i}.SH', seed=i) for i in range(4)]
+        combined = pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=1)
+        batch = forward_adjust_prices(combined, group_col='ts_code')
+        for frame in frames:
+            code = frame['ts_code'].iloc[0]
+            expected = forward_adjust_prices(frame)
+            actual = batch[batch['ts_code'] == code].reset_index(drop=True)
+            self.assert_frames_close(actual, expected)
+
+    def test_single_row(self):
+        df = make_daily_frame(1)
+        result = forward_adjust_prices(df)
+        self.assertEqual(result['close'].iloc[0], df['close'].iloc[0])
+
+
+def benchmark(years=12, symbols=50):
+    """对比逐行循环与向量化实现的耗时"""
+    days = years * 250
+    df = make_daily_frame(days)
+    print(f"📊 单只股票 {days} 根日线（约{years}年）")
+
+    start = time.perf_counter()
+    loop_forward_adjust(df)
+    loop_time = time.perf_counter() - start
+    print(f"   逐行循环: {loop_time * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        forward_adjust_prices(df)
+    vec_time = (time.perf_counter() - start) / 20
+    print(f"   向量化:   {vec_time * 1000:.2f}ms  (加速 {loop_time / vec_time:.0f}x)")
+
+    combined = pd.concat([make_daily_frame(days, ts_code=f'{i:06d}.SZ', seed=i) for i in range(symbols)],
+                         ignore_index=True)
+    start = time.perf_counter()
+    forward_adjust_prices(combined, group_col='ts_code')
+    print(f"📊 批量复权 {symbols} 只股票 × {days} 根日线: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时新闻聚合并发获取测试
+验证各新闻源并发获取、单源截止时间与整体截止时间、同一股票超时未结束新闻源的跳过（不影响其他股票和并发请求），以及耗时直方图记录
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+from tradingagents.dataflows import realtime_news_utils
+from tradingagents.dataflows.realtime_news_utils import (
+    NewsItem, RealtimeNewsAggregator, get_news_source_latency_stats
+)
+
+
+HEADLINES = {
+    'FinnHub': "{ticker} beats quarterly earnings estimates on services growth",
+    'AlphaVantage': "Analysts raise {ticker} price target ahead of product launch",
+    'NewsAPI': "Regulators open antitrust probe into {ticker} app store rules",
+    'Eastmoney': "{ticker} 供应链订单大幅增加，多家机构上调评级",
+}
+
+
+def make_source(title, delay, error=None, timeouts=None):
+    def fetch(ticker, hours_back, timeout=None):
+        if timeouts is not None:
+            timeouts.append(timeout)
+        time.sleep(delay)
+        if error:
+            raise error
+        return [NewsItem(title=HEADLINES[title].format(ticker=ticker), content='', source=title,
+                         publish_time=datetime.now(), url='', urgency='low', relevance_score=0.5)]
+    return fetch
+
+
+class RealtimeNewsFanoutTest(unittest.TestCase):
+
+    def setUp(self):
+        # 前一个用例中超时的新闻源可能仍在后台运行
+        realtime_news_utils._inflight_sources.clear()
+
+    def make_aggregator(self, delays, **kwargs):
+        aggregator = RealtimeNewsAggregator(**kwargs)
+        aggregator.newsapi_key = 'test'
+        aggregator._get_finnhub_realtime_news = make_source('FinnHub', delays[0])
+        aggregator._get_alpha_vantage_news = make_source('AlphaVantage', delays[1])
+        aggregator._get_newsapi_news = make_source('NewsAPI', delays[2])
+        aggregator._get_chinese_finance_news = make_source('Eastmoney', delays[3])
+        return aggregator
+
+    def test_concurrent_latency_is_slowest_source(self):
+        aggregator = self.make_aggregator([0.2, 0.2, 0.2, 0.2], fetch_mode='concurrent')
+        start = time.monotonic()
+        news = aggregator.get_realtime_stock_news('AAPL')
+        elapsed = time.monotonic() - start
+        self.assertEqual(len(news), 4)
+        self.assertLess(elapsed, 0.6)
+
+    def test_sequential_mode(self):
+        aggregator = self.make_aggregator([0.05, 0.05, 0.05, 0.05], fetch_mode='sequential')
+        start = time.monotonic()
+        news = aggregator.get_realtime_stock_news('AAPL')
+        self.assertEqual(len(news), 4)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_slow_source_is_dropped_at_source_deadline(self):
+        aggregator = self.make_aggregator([0.05, 0.05, 2.0, 0.05], fetch_mode='concurrent',
+                                          source_timeout=0.3, total_timeout=5)
+        start = time.monotonic()
+        news = aggregator.get_realtime_stock_news('AAPL')
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(sorted(item.source for item in news), ['AlphaVantage', 'Eastmoney', 'FinnHub'])
+        self.assertGreaterEqual(get_news_source_latency_stats()['NewsAPI']['outcomes'].get('timeout', 0), 1)
+
+    def test_global_deadline_returns_partial_results(self):
+        aggregator = self.make_aggregator([0.05, 2.0, 2.0, 2.0], fetch_mode='concurrent',
+                                          source_timeout=10, total_timeout=0.3)
+        start = time.monotonic()
+        news = aggregator.get_realtime_stock_news('AAPL')
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual([item.source for item in news], ['FinnHub'])
+
+    def test_source_timeout_is_passed_to_fetch(self):
+        timeouts = []
+        aggregator = self.make_aggregator([0.01, 0.01, 0.01, 0.01], fetch_mode='concurrent',
+                                          source_timeout=3, total_timeout=5)
+        aggregator._get_newsapi_news = make_source('NewsAPI', 0.01, timeouts=timeouts)
+        aggregator.get_realtime_stock_news('AAPL')
+        self.assertEqual(len(timeouts), 1)
+        self.assertAlmostEqual(timeouts[0], 3, places=3)
+
+        aggregator = self.make_aggregator([0.01, 0.01, 0.01, 0.01], fetch_mode='concurrent',
+                                          source_timeout=3, total_timeout=1)
+        aggregator._get_newsapi_news = make_source('NewsAPI', 0.01, timeouts=timeouts)
+        aggregator.get_realtime_stock_news('AAPL')
+        self.assertAlmostEqual(timeouts[1], 1, places=3)
+
+    def test_source_still_running_is_skipped(self):
+        aggregator = self.make_aggregator([0.01, 0.01, 1.0, 0.01], fetch_mode='concurrent',
+                                          source_timeout=0.1, total_timeout=5)
+        self.assertEqual(len(aggregator.get_realtime_stock_news('AAPL')), 3)
+        calls = []
+        aggregator._get_newsapi_news = make_source('NewsAPI', 0.01, timeouts=calls)
+        news = aggregator.get_realtime_stock_news('AAPL')
+        self.assertEqual(len(news), 3)
+        self.assertEqual(calls, [])
+        self.assertGreaterEqual(get_news_source_latency_stats()['NewsAPI']['outcomes'].get('skipped', 0), 1)
+
+    def test_timed_out_source_is_not_skipped_for_other_ticker(self):
+        aggregator = self.make_aggregator([0.01, 0.01, 1.0, 0.01], fetch_mode='concurrent',
+                                          source_timeout=0.1, total_timeout=5)
+        self.assertEqual(len(aggregator.get_realtime_stock_news('AAPL')), 3)
+        calls = []
+        aggregator._get_newsapi_news = make_source('NewsAPI', 0.01, timeouts=calls)
+        self.assertEqual(len(aggregator.get_realtime_stock_news('MSFT')), 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_overlapping_requests_are_not_skipped(self):
+        aggregator = self.make_aggregator([0.01, 0.01, 0.3, 0.01], fetch_mode='concurrent',
+                                          source_timeout=2, total_timeout=5)
+        counts = []
+        threads = [threading.Thread(target=lambda: counts.append(len(aggregator.get_realtime_stock_news('AAPL'))))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counts, [4, 4])
+
+    def test_failing_source_does_not_break_aggregation(self):
+        aggregator = self.make_aggregator([0.01, 0.01, 0.01, 0.01], fetch_mode='concurrent')
+        aggregator._get_alpha_vantage_news = make_source('AlphaVantage', 0.01, error=RuntimeError('boom'))
+        news = aggregator.get_realtime_stock_news('AAPL')
+        self.assertEqual(len(news), 3)
+        stats = get_news_source_latency_stats()
+        self.assertGreaterEqual(stats['Alpha Vantage']['outcomes'].get('error', 0), 1)
+        self.assertEqual(sum(stats['FinnHub']['buckets'].values()), stats['FinnHub']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
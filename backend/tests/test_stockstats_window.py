@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技术指标窗口测试
+验证一次计算的指标窗口与逐日重新包装行情的结果一致，以及离线数据缺失时仍然抛出错误
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+try:
+    from stockstats import wrap
+    from tradingagents.dataflows import interface
+    from tradingagents.dataflows.stockstats_utils import StockstatsUtils
+    STOCKSTATS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ stockstats 工具不可用: {e}")
+    STOCKSTATS_AVAILABLE = False
+
+SYMBOL = "TEST"
+
+
+@unittest.skipUnless(STOCKSTATS_AVAILABLE, "stockstats 工具不可用")
+class StockstatsWindowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        StockstatsUtils.clear_cache()
+        self.addCleanup(StockstatsUtils.clear_cache)
+
+        price_dir = os.path.join(self.tmp.name, "market_data", "price_data")
+        os.makedirs(price_dir)
+        dates = pd.bdate_range("2024-01-01", periods=80)
+        rng = np.random.default_rng(7)
+        close = 100 + np.cumsum(rng.normal(0, 1, len(dates)))
+        self.data_file = os.path.join(price_dir, f"{SYMBOL}-YFin-data-2015-01-01-2025-03-25.csv")
+        pd.DataFrame({
+            "Date": dates.strftime("%Y-%m-%d"), "Open": close - 0.5, "High": close + 1, "Low": close - 1,
+            "Close": close, "Volume": rng.integers(1000, 5000, len(dates)),
+        }).to_csv(self.data_file, index=False)
+
+        patcher = mock.patch.object(interface, "DATA_DIR", self.tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def baseline(self, indicator, date_str):
+        """原实现：每个交易日重新读取并包装整份行情后取当天的值"""
+        data = pd.read_csv(self.data_file)
+        df = wrap(data)
+        df["Date"] = data["Date"].astype(str).str[:10]
+        df[indicator]
+        return df[df["Date"] == date_str][indicator].values[0]
+
+    def test_window_matches_per_day_values(self):
+        for indicator in ("close_10_ema", "rsi", "macd", "boll_ub"):
+            report = interface.get_stock_stats_indicators_window(SYMBOL, indicator, "2024-04-10", 20, False)
+            lines = [line for line in report.splitlines() if line[:4] == "2024" and ": " in line]
+            self.assertEqual(len(lines), 15)
+            self.assertEqual(lines[0].split(": ")[0], "2024-04-10")
+            for line in lines:
+                date_str, value = line.split(": ", 1)
+                self.assertAlmostEqual(float(value), float(self.baseline(indicator, date_str)), places=9,
+                                       msg=f"{indicator} {date_str}")
+
+    def test_indicator_computed_once_per_file(self):
+        with mock.patch.object(StockstatsUtils, "_load_data", wraps=StockstatsUtils._load_data) as load:
+            interface.get_stock_stats_indicators_window(SYMBOL, "rsi", "2024-04-10", 30, False)
+            interface.get_stock_stats_indicators_window(SYMBOL, "rsi", "2024-03-10", 10, False)
+        self.assertEqual(load.call_count, 1)
+
+    def test_missing_offline_data_raises(self):
+        with self.assertRaises(Exception):
+            interface.get_stock_stats_indicators_window("MISSING", "rsi", "2024-04-10", 10, False)
+
+
+if __name__ == '__main__':
+    unittest.main()
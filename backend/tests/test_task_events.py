@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务进度推送测试
+验证 update_task 只写不读并发布事件、subscribe 推送快照与更新事件及结束条件、取消请求跨实例送达本地取消标记
+（需要 fakeredis[lua]，未安装时跳过）
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.task_manager import TaskManager, TaskStatus
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, "需要安装 fakeredis[lua]")
+class TaskEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.task_manager = TaskManager(self.make_client())
+
+    def make_client(self):
+        return fakeredis.FakeRedis(server=self.server, decode_responses=True)
+
+    def test_update_is_write_only(self):
+        task = self.task_manager.create_task('Market Scan', {'stock_list_count': 3})
+        self.assertTrue(self.task_manager.update_task(task['id'], status=TaskStatus.RUNNING, progress=40,
+                                                      result={'processed': 1}))
+        stored = self.task_manager.get_task(task['id'])
+        self.assertEqual(stored['status'], TaskStatus.RUNNING)
+        self.assertEqual(stored['progress'], 40)
+        self.assertEqual(stored['result'], {'processed': 1})
+
+        # 不存在的任务不会被写入
+        self.assertFalse(self.task_manager.update_task('missing', progress=10))
+        self.assertFalse(self.task_manager.redis_client.exists('task:missing'))
+
+    def test_subscribe_streams_snapshot_and_updates(self):
+        task = self.task_manager.create_task('Agent Analysis')
+        events = []
+
+        def consume():
+            for event in self.task_manager.subscribe(task['id'], heartbeat=60):
+                events.append(event)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        time.sleep(0.2)
+        self.task_manager.update_task(task['id'], status=TaskStatus.RUNNING, progress=50,
+                                      result={'current_step': '市场分析'})
+        self.task_manager.update_task(task['id'], status=TaskStatus.COMPLETED, progress=100)
+        consumer.join(timeout=5)
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual([e['type'] for e in events], ['snapshot', 'update', 'update'])
+        self.assertEqual(events[1]['progress'], 50)
+        self.assertEqual(events[1]['result'], {'current_step': '市场分析'})
+        self.assertEqual(events[2]['status'], TaskStatus.COMPLETED)
+
+    def test_subscribe_ends_when_task_deleted_or_expired(self):
+        task = self.task_manager.create_task('Agent Analysis')
+        events = []
+
+        def consume(**kwargs):
+            for event in self.task_manager.subscribe(task['id'], heartbeat=60, **kwargs):
+                events.append(event)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        time.sleep(0.2)
+        self.task_manager.delete_task(task['id'])
+        consumer.join(timeout=5)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual([e['type'] for e in events], ['snapshot'])
+
+        # 任务一直未结束时，订阅在最长时长后结束
+        task = self.task_manager.create_task('Agent Analysis')
+        start = time.monotonic()
+        events = list(self.task_manager.subscribe(task['id'], heartbeat=60, max_lifetime=0.3))
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([e['type'] for e in events], ['snapshot'])
+
+    def test_cancel_reaches_worker_in_another_process(self):
+        task = self.task_manager.create_task('Market Scan')
+        cancel_event = self.task_manager.get_cancel_event(task['id'])
+        self.assertFalse(cancel_event.is_set())
+        time.sleep(0.2)  # 等待控制频道监听线程订阅
+
+        # 另一个 TaskManager 实例（模拟处理取消请求的其他 Web 进程）
+        other = TaskManager(self.make_client())
+        self.assertTrue(other.cancel_task(task['id']))
+        self.assertTrue(cancel_event.wait(timeout=5))
+        self.assertTrue(self.task_manager.is_cancelled(task['id']))
+        self.assertEqual(self.task_manager.get_task(task['id'])['status'], TaskStatus.CANCELLED)
+
+    def test_cancelled_before_registration(self):
+        task = self.task_manager.create_task('Market Scan')
+        self.task_manager.cancel_task(task['id'])
+        self.assertTrue(TaskManager(self.make_client()).is_cancelled(task['id']))
+
+
+if __name__ == '__main__':
+    unittest.main()
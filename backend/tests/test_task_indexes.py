@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务索引测试
+验证按状态分组的分页查询、按结束时间的过期清理与清理锁，以及旧数据的索引补建
+（需要 fakeredis[lua]，未安装时跳过）
+"""
+
+import os
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.task_manager import (
+    TaskManager, TaskStatus, TASKS_FINISHED_KEY, TASKS_INDEX_VERSION_KEY, TASK_RETENTION_SECONDS
+)
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, "需要安装 fakeredis[lua]")
+class TaskIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.task_manager = TaskManager(self.redis)
+
+    def create_tasks(self, count):
+        ids = []
+        for i in range(count):
+            ids.append(self.task_manager.create_task(f'task {i}')['id'])
+            time.sleep(0.001)  # 保证创建时间不同
+        return ids
+
+    def test_status_index_follows_updates(self):
+        ids = self.create_tasks(5)
+        for task_id in ids[:3]:
+            self.task_manager.update_task(task_id, status=TaskStatus.RUNNING)
+        self.task_manager.update_task(ids[0], status=TaskStatus.COMPLETED, progress=100)
+
+        running, total = self.task_manager.list_tasks(status=TaskStatus.RUNNING)
+        self.assertEqual(total, 2)
+        self.assertEqual([t['id'] for t in running], [ids[2], ids[1]])
+
+        pending, _ = self.task_manager.list_tasks(status='pending')
+        self.assertEqual([t['id'] for t in pending], [ids[4], ids[3]])
+        self.assertEqual(self.redis.zcard(TASKS_FINISHED_KEY), 1)
+
+    def test_pagination_and_multi_status(self):
+        ids = self.create_tasks(7)
+        for task_id in ids[::2]:
+            self.task_manager.update_task(task_id, status=TaskStatus.FAILED)
+
+        page, total = self.task_manager.list_tasks(offset=2, limit=3)
+        self.assertEqual(total, 7)
+        self.assertEqual([t['id'] for t in page], [ids[4], ids[3], ids[2]])
+
+        page, total = self.task_manager.list_tasks(status=['failed', 'pending'], offset=1, limit=2)
+        self.assertEqual(total, 7)
+        self.assertEqual([t['id'] for t in page], [ids[5], ids[4]])
+
+    def test_clean_old_tasks_uses_finish_time(self):
+        ids = self.create_tasks(4)
+        self.task_manager.update_task(ids[0], status=TaskStatus.COMPLETED)
+        self.task_manager.update_task(ids[1], status=TaskStatus.CANCELLED)
+        self.task_manager.update_task(ids[2], status=TaskStatus.RUNNING)
+        # 让第一个任务的结束时间早于保留期限
+        self.redis.zadd(TASKS_FINISHED_KEY, {ids[0]: time.time() - 7200})
+
+        self.assertEqual(self.task_manager._clean_old_tasks(max_age=3600), 1)
+        self.assertIsNone(self.task_manager.get_task(ids[0]))
+        self.assertIsNotNone(self.task_manager.get_task(ids[1]))
+        _, total = self.task_manager.list_tasks()
+        self.assertEqual(total, 3)
+        self.assertEqual(self.task_manager.list_tasks(status=TaskStatus.COMPLETED)[1], 0)
+
+    def test_default_retention_and_single_cleaner(self):
+        ids = self.create_tasks(2)
+        self.task_manager.update_task(ids[0], status=TaskStatus.COMPLETED)
+        self.task_manager.update_task(ids[1], status=TaskStatus.COMPLETED)
+        self.redis.zadd(TASKS_FINISHED_KEY, {ids[0]: time.time() - 7200,
+                                             ids[1]: time.time() - TASK_RETENTION_SECONDS - 60})
+        # 默认保留期限内的任务（如一小时前完成的智能体分析）不会被清理
+        self.assertEqual(self.task_manager._clean_old_tasks(), 1)
+        self.assertIsNotNone(self.task_manager.get_task(ids[0]))
+        self.assertIsNone(self.task_manager.get_task(ids[1]))
+
+        # 同一清理间隔内只有一个 TaskManager（进程）取得清理锁
+        self.assertTrue(self.task_manager._acquire_cleaner_lock())
+        self.assertFalse(TaskManager(self.redis)._acquire_cleaner_lock())
+
+    def test_delete_removes_index_entries(self):
+        task_id = self.create_tasks(1)[0]
+        self.task_manager.update_task(task_id, status=TaskStatus.FAILED)
+        self.assertTrue(self.task_manager.delete_task(task_id))
+        self.assertEqual(self.task_manager.list_tasks(status=TaskStatus.FAILED), ([], 0))
+        self.assertEqual(self.redis.zcard(TASKS_FINISHED_KEY), 0)
+
+    def test_indexes_rebuilt_for_legacy_tasks(self):
+        old = (datetime.now() - timedelta(hours=3)).isoformat()
+        self.redis.hset('task:legacy-1', mapping={'id': 'legacy-1', 'status': 'completed', 'updated_at': old,
+                                                  'progress': 100, 'created_at': old})
+        self.redis.hset('task:legacy-2', mapping={'id': 'legacy-2', 'status': 'running', 'updated_at': old,
+                                                  'progress': 10, 'created_at': old})
+        self.redis.zadd('tasks_sorted_by_time', {'legacy-1': 1.0, 'legacy-2': 2.0})
+        self.redis.delete(TASKS_INDEX_VERSION_KEY)
+
+        task_manager = TaskManager(self.redis)
+        self.assertEqual([t['id'] for t in task_manager.list_tasks(status='running')[0]], ['legacy-2'])
+        self.assertEqual(task_manager._clean_old_tasks(max_age=3600), 1)
+        self.assertIsNone(task_manager.get_task('legacy-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持久化任务队列测试
+验证任务领取、失败重试（含按任务类型的次数上限）、崩溃工作进程的租约回收、已取消任务的跳过，
+以及工作进程入口在仅有项目根目录的路径下能导入依赖注入容器
+（需要 fakeredis[lua]，未安装时跳过）
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.analysis.task_manager import TaskManager, TaskStatus, TaskCancelledException
+from app.analysis.task_queue import (TaskQueue, TaskWorker, TASK_QUEUE_PENDING_KEY, TASK_QUEUE_PROCESSING_KEY,
+                                     TASK_PAYLOAD_KEY)
+
+try:
+    import fakeredis
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+
+@unittest.skipUnless(FAKEREDIS_AVAILABLE, "需要安装 fakeredis[lua]")
+class TaskQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.task_manager = TaskManager(self.redis)
+        self.queue = TaskQueue(self.task_manager, lease_timeout=30, max_attempts=2)
+        self.calls = []
+
+    def make_worker(self, handler, worker_id='worker-1'):
+        return TaskWorker(self.queue, stock_analyzer=None, handlers={'job': handler}, worker_id=worker_id)
+
+    def submit(self, payload=None):
+        task_id = self.task_manager.create_task('job')['id']
+        self.queue.enqueue(task_id, 'job', payload or {'n': 1})
+        return task_id
+
+    def test_worker_runs_task_and_cleans_up(self):
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            self.calls.append(payload)
+            task_manager.update_task(task_id, status=TaskStatus.COMPLETED, progress=100, result={'ok': True})
+
+        task_id = self.submit({'n': 7})
+        worker = self.make_worker(handler)
+        self.assertTrue(worker.run_once())
+        self.assertFalse(worker.run_once())
+
+        self.assertEqual(self.calls, [{'n': 7}])
+        self.assertEqual(self.task_manager.get_task(task_id)['status'], TaskStatus.COMPLETED)
+        self.assertEqual(self.redis.zcard(TASK_QUEUE_PROCESSING_KEY), 0)
+        self.assertFalse(self.redis.exists(TASK_PAYLOAD_KEY.format(task_id=task_id)))
+
+    def test_tasks_claimed_in_fifo_order(self):
+        ids = [self.submit() for _ in range(3)]
+        claimed = [self.queue.claim('w')[0] for _ in range(3)]
+        self.assertEqual(claimed, ids)
+        self.assertIsNone(self.queue.claim('w'))
+
+    def test_failed_task_is_retried_then_marked_failed(self):
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            self.calls.append(task_id)
+            raise RuntimeError('boom')
+
+        task_id = self.submit()
+        worker = self.make_worker(handler)
+
+        worker.run_once()
+        task = self.task_manager.get_task(task_id)
+        self.assertEqual(task['status'], TaskStatus.PENDING)
+        self.assertIn('boom', task['error'])
+        self.assertEqual(self.redis.llen(TASK_QUEUE_PENDING_KEY), 1)
+
+        worker.run_once()
+        task = self.task_manager.get_task(task_id)
+        self.assertEqual(task['status'], TaskStatus.FAILED)
+        self.assertEqual(task['error'], 'boom')
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.redis.llen(TASK_QUEUE_PENDING_KEY), 0)
+
+    def test_agent_analysis_is_not_retried_by_default(self):
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            self.calls.append(task_id)
+            raise RuntimeError('boom')
+
+        task_id = self.task_manager.create_task('Agent Analysis')['id']
+        self.queue.enqueue(task_id, 'agent_analysis', {'stock_code': '600000'})
+        worker = TaskWorker(self.queue, stock_analyzer=None, handlers={'agent_analysis': handler})
+        worker.run_once()
+        self.assertEqual(self.task_manager.get_task(task_id)['status'], TaskStatus.FAILED)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.redis.llen(TASK_QUEUE_PENDING_KEY), 0)
+
+    def test_expired_lease_is_requeued(self):
+        task_id = self.submit()
+        # 模拟工作进程领取后崩溃：租约不再续期
+        self.queue.claim('crashed-worker')
+        self.redis.zadd(TASK_QUEUE_PROCESSING_KEY, {task_id: time.time() - 1})
+
+        self.assertEqual(self.queue.requeue_expired(), 1)
+        self.assertEqual(self.task_manager.get_task(task_id)['status'], TaskStatus.PENDING)
+
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            task_manager.update_task(task_id, status=TaskStatus.COMPLETED)
+
+        self.make_worker(handler, 'worker-2').run_once()
+        self.assertEqual(self.task_manager.get_task(task_id)['status'], TaskStatus.COMPLETED)
+        # 崩溃的工作进程恢复后不能再确认已被回收的任务
+        self.assertFalse(self.queue.complete(task_id, 'crashed-worker'))
+
+    def test_heartbeat_extends_lease(self):
+        task_id = self.submit()
+        self.queue.claim('w')
+        before = self.redis.zscore(TASK_QUEUE_PROCESSING_KEY, task_id)
+        time.sleep(0.01)
+        self.queue.heartbeat('w', [task_id])
+        self.assertGreater(self.redis.zscore(TASK_QUEUE_PROCESSING_KEY, task_id), before)
+        self.assertEqual(self.queue.live_workers(), 1)
+        self.assertEqual(self.queue.requeue_expired(), 0)
+
+    def test_cancelled_task_is_skipped(self):
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            self.calls.append(task_id)
+
+        task_id = self.submit()
+        self.task_manager.cancel_task(task_id)
+        self.assertTrue(self.make_worker(handler).run_once())
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.task_manager.get_task(task_id)['status'], TaskStatus.CANCELLED)
+
+    def test_cancellation_during_run_is_not_retried(self):
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            self.calls.append(task_id)
+            raise TaskCancelledException('cancelled')
+
+        self.submit()
+        worker = self.make_worker(handler)
+        worker.run_once()
+        self.assertFalse(worker.run_once())
+        self.assertEqual(len(self.calls), 1)
+
+    def test_submit_falls_back_to_thread_without_workers(self):
+        done = threading.Event()
+
+        def handler(task_id, payload, task_manager, stock_analyzer):
+            done.set()
+
+        from app.analysis import task_handlers
+        task_id = self.task_manager.create_task('job')['id']
+        original = dict(task_handlers.TASK_HANDLERS)
+        task_handlers.TASK_HANDLERS['job'] = handler
+        try:
+            self.assertEqual(self.queue.submit(task_id, 'job', {}, None), 'thread')
+            self.assertTrue(done.wait(5))
+        finally:
+            task_handlers.TASK_HANDLERS.clear()
+            task_handlers.TASK_HANDLERS.update(original)
+
+        self.queue.heartbeat('worker-1')
+        self.assertEqual(self.queue.submit(task_id, 'job', {}, None), 'queued')
+        self.assertEqual(self.redis.llen(TASK_QUEUE_PENDING_KEY), 1)
+
+
+class WorkerEntryImportTest(unittest.TestCase):
+
+    def test_container_imports_like_worker_main(self):
+        # 与 python -m app.analysis.task_queue 一致：只有项目根目录在路径上，app/ 不在
+        env = dict(os.environ, PYTHONPATH=project_root)
+        result = subprocess.run([sys.executable, '-c', 'import app.analysis._analysis_container'],
+                                cwd=project_root, env=env, capture_output=True, text=True, timeout=300)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Token使用记录追加日志测试
+验证缓冲区批量写入、读取前写入、日志压缩与跨进程文件锁、旧版 usage.json 迁移，
+以及 ConfigManager 的设置缓存、O(1) 记录和多进程下的成本警告
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.join(project_root, 'app'))
+
+from tradingagents.config.config_manager import ConfigManager, TokenTracker
+from tradingagents.config import usage_log as usage_log_module
+from tradingagents.config.usage_log import UsageLog
+
+# tradingagents.config 导出了同名的全局实例，这里取模块本身
+config_manager_module = sys.modules['tradingagents.config.config_manager']
+
+
+def make_record(i, cost=0.01):
+    return {"timestamp": f"2026-01-01T00:00:{i % 60:02d}", "provider": "dashscope", "model_name": "qwen-turbo",
+            "input_tokens": 100, "output_tokens": 50, "cost": cost, "session_id": f"s{i}",
+            "analysis_type": "stock_analysis"}
+
+
+def read_lines(path):
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+
+class UsageLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "usage.jsonl"
+
+    def make_log(self, **kwargs):
+        kwargs.setdefault('flush_interval', 60)
+        kwargs.setdefault('flush_size', 1000)
+        log = UsageLog(self.path, **kwargs)
+        self.addCleanup(log.close)
+        return log
+
+    def wait_for_lines(self, count, timeout=2.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if len(read_lines(self.path)) >= count:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_append_is_buffered_until_flush(self):
+        log = self.make_log()
+        for i in range(10):
+            log.append(make_record(i))
+        self.assertFalse(self.path.exists())
+        log.flush()
+        self.assertEqual([r["session_id"] for r in read_lines(self.path)], [f"s{i}" for i in range(10)])
+
+    def test_background_flush_by_size_and_interval(self):
+        log = self.make_log(flush_size=5)
+        for i in range(5):
+            log.append(make_record(i))
+        self.assertTrue(self.wait_for_lines(5))
+
+        log = UsageLog(self.path, flush_interval=0.05, flush_size=1000)
+        self.addCleanup(log.close)
+        log.append(make_record(5))
+        self.assertTrue(self.wait_for_lines(6))
+
+    def test_read_all_includes_buffered_records(self):
+        log = self.make_log()
+        log.append(make_record(1))
+        self.assertEqual(len(log.read_all()), 1)
+
+    def test_compaction_keeps_latest_records(self):
+        log = self.make_log(max_records=5)
+        for i in range(11):
+            log.append(make_record(i))
+        log.flush()
+        self.assertEqual([r["session_id"] for r in read_lines(self.path)], [f"s{i}" for i in range(6, 11)])
+        # 压缩阈值之内只追加，读取时仍按上限截断
+        for i in range(11, 14):
+            log.append(make_record(i))
+        log.flush()
+        self.assertEqual(len(read_lines(self.path)), 8)
+        self.assertEqual([r["session_id"] for r in log.read_all()], [f"s{i}" for i in range(9, 14)])
+
+    def test_legacy_usage_json_is_migrated(self):
+        legacy = Path(self.temp_dir.name) / "usage.json"
+        legacy.write_text(json.dumps([make_record(i) for i in range(3)]), encoding='utf-8')
+        log = self.make_log(legacy_path=legacy)
+        self.assertEqual(len(log.read_all()), 3)
+        self.assertFalse(legacy.exists())
+        self.assertTrue(legacy.with_name("usage.json.bak").exists())
+
+    def test_truncated_line_is_skipped(self):
+        self.path.write_text(json.dumps(make_record(0)) + '\n{"timestamp": "2026', encoding='utf-8')
+        self.assertEqual(len(self.make_log().read_all()), 1)
+
+    def test_concurrent_appends(self):
+        log = self.make_log(flush_size=20, flush_interval=0.01)
+
+        def worker(offset):
+            for i in range(200):
+                log.append(make_record(offset + i))
+
+        threads = [threading.Thread(target=worker, args=(n * 1000,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+        self.assertEqual(len(read_lines(self.path)), 1600)
+        self.assertEqual(len({r["session_id"] for r in read_lines(self.path)}), 1600)
+
+    @unittest.skipUnless(usage_log_module.fcntl, "需要 fcntl")
+    def test_append_and_compact_wait_for_file_lock(self):
+        fcntl = usage_log_module.fcntl
+        log = self.make_log(max_records=2)
+        log.append(make_record(0))
+        log.flush()
+
+        # 另一个进程持有锁（flock 按打开的文件区分，同一进程内另开一次即可模拟）
+        lock_path = self.path.with_name(self.path.name + '.lock')
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            log.append(make_record(1))
+            writers = [threading.Thread(target=log.flush), threading.Thread(target=log.compact)]
+            for writer in writers:
+                writer.start()
+            time.sleep(0.2)
+            self.assertTrue(all(writer.is_alive() for writer in writers))
+            self.assertEqual(len(read_lines(self.path)), 1)
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        for writer in writers:
+            writer.join(timeout=5)
+        self.assertFalse(any(writer.is_alive() for writer in writers))
+        self.assertEqual([r["session_id"] for r in read_lines(self.path)], ["s0", "s1"])
+
+
+class ConfigManagerUsageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.manager = ConfigManager(self.temp_dir.name)
+        self.addCleanup(self.manager.usage_log.close)
+        self.tracker = TokenTracker(self.manager)
+
+    def track(self, n=1):
+        return [self.tracker.track_usage("dashscope", "qwen-turbo", 1000, 500, session_id="session_a")
+                for _ in range(n)]
+
+    def test_tracking_does_not_reread_files(self):
+        self.track()
+        with mock.patch.object(config_manager_module.json, 'load', wraps=json.load) as json_load, \
+                mock.patch.object(self.manager, 'get_usage_statistics',
+                                  wraps=self.manager.get_usage_statistics) as statistics:
+            records = self.track(20)
+        self.assertEqual(json_load.call_count, 0)
+        self.assertEqual(statistics.call_count, 0)
+        self.assertTrue(all(r.cost > 0 for r in records))
+
+        stats = self.manager.get_usage_statistics(1)
+        self.assertEqual(stats["total_requests"], 21)
+        self.assertAlmostEqual(self.tracker.get_session_cost("session_a"), 21 * records[0].cost)
+
+    def test_settings_cache_invalidation(self):
+        settings = self.manager.load_settings()
+        settings["enable_cost_tracking"] = False
+        self.manager.save_settings(settings)
+        self.assertEqual(self.track(), [None])
+
+        # 外部修改 settings.json 后按 mtime 重新读取
+        settings["enable_cost_tracking"] = True
+        self.manager.settings_file.write_text(json.dumps(settings), encoding='utf-8')
+        stat = self.manager.settings_file.stat()
+        os.utime(self.manager.settings_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNotNone(self.track()[0])
+
+        # 调用方修改返回值不影响缓存
+        self.manager.load_settings()["enable_cost_tracking"] = False
+        self.assertTrue(self.manager.load_settings()["enable_cost_tracking"])
+
+    def test_cost_alert_uses_running_daily_total(self):
+        settings = self.manager.load_settings()
+        settings["cost_alert_threshold"] = 0.01
+        self.manager.save_settings(settings)
+        with mock.patch.object(config_manager_module.logger, 'warning') as warning:
+            self.track(3)
+        self.assertEqual(warning.call_count, 2)
+        self.assertIn("0.0150", warning.call_args[0][0])
+
+    def test_cost_alert_includes_other_processes(self):
+        settings = self.manager.load_settings()
+        settings["cost_alert_threshold"] = 0.012
+        self.manager.save_settings(settings)
+        # 另一个进程的 ConfigManager 写入同一份使用记录
+        other = ConfigManager(self.temp_dir.name)
+        self.addCleanup(other.usage_log.close)
+
+        with mock.patch.object(config_manager_module.logger, 'warning') as warning:
+            self.track()
+            for _ in range(2):
+                other.add_usage_record("dashscope", "qwen-turbo", 1000, 500, session_id="session_b")
+            other.usage_log.flush()
+            self.track()
+            # 未到重新统计的时间，只累加本进程的使用量
+            self.assertEqual(warning.call_count, 0)
+
+            self.tracker.reseed_interval = 0
+            self.track()
+        self.assertEqual(warning.call_count, 1)
+        self.assertIn("0.0250", warning.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()